@@ -0,0 +1,25 @@
+# alembic/versions/add_company_data_revision.py
+"""Add write-bumped data revision to companies
+
+Revision ID: add_company_data_revision
+Revises: add_emission_factor_validity
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_company_data_revision'
+down_revision = 'add_emission_factor_validity'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('companies', sa.Column('data_revision', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('companies', 'data_revision')
@@ -0,0 +1,36 @@
+# alembic/versions/add_company_suggestion_sets.py
+"""Add company_suggestion_sets for precomputed suggestions
+
+Revision ID: add_company_suggestion_sets
+Revises: add_report_fingerprint
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_company_suggestion_sets'
+down_revision = 'add_report_fingerprint'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'company_suggestion_sets',
+        sa.Column('company_id', sa.Integer(), nullable=False),
+        sa.Column('suggestions', sa.JSON(), nullable=False),
+        sa.Column('strategy_metrics', sa.JSON(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=True),
+        sa.Column('stale_since', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('company_id')
+    )
+    op.create_index(op.f('ix_company_suggestion_sets_stale_since'), 'company_suggestion_sets', ['stale_since'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_company_suggestion_sets_stale_since'), table_name='company_suggestion_sets')
+    op.drop_table('company_suggestion_sets')
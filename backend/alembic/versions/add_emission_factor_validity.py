@@ -0,0 +1,45 @@
+# alembic/versions/add_emission_factor_validity.py
+"""Version emission factors with valid_from/valid_to
+
+Revision ID: add_emission_factor_validity
+Revises: add_company_suggestion_sets
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_emission_factor_validity'
+down_revision = 'add_company_suggestion_sets'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # key artık tekil değil; her geçerlilik dönemi ayrı satır
+    op.drop_constraint('emission_factors_pkey', 'emission_factors', type_='primary')
+    op.execute('ALTER TABLE emission_factors ADD COLUMN id SERIAL')
+    op.create_primary_key('emission_factors_pkey', 'emission_factors', ['id'])
+    op.create_index(op.f('ix_emission_factors_id'), 'emission_factors', ['id'], unique=False)
+
+    op.add_column('emission_factors', sa.Column('valid_from', sa.Date(), nullable=True))
+    op.add_column('emission_factors', sa.Column('valid_to', sa.Date(), nullable=True))
+    op.execute('UPDATE emission_factors SET valid_from = make_date(year, 1, 1) WHERE year IS NOT NULL')
+    op.create_unique_constraint('uq_emission_factors_key_valid_from', 'emission_factors', ['key', 'valid_from'])
+
+
+def downgrade():
+    # Anahtar başına yalnızca en güncel versiyon tutulabilir
+    op.execute(
+        'DELETE FROM emission_factors e USING emission_factors newer '
+        'WHERE e.key = newer.key AND COALESCE(newer.valid_from, DATE \'0001-01-01\') > COALESCE(e.valid_from, DATE \'0001-01-01\')'
+    )
+    op.drop_constraint('uq_emission_factors_key_valid_from', 'emission_factors', type_='unique')
+    op.drop_column('emission_factors', 'valid_to')
+    op.drop_column('emission_factors', 'valid_from')
+    op.drop_index(op.f('ix_emission_factors_id'), table_name='emission_factors')
+    op.drop_constraint('emission_factors_pkey', 'emission_factors', type_='primary')
+    op.drop_column('emission_factors', 'id')
+    op.create_primary_key('emission_factors_pkey', 'emission_factors', ['key'])
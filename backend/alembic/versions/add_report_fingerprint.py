@@ -0,0 +1,27 @@
+# alembic/versions/add_report_fingerprint.py
+"""Add fingerprint to reports for content-addressed reuse
+
+Revision ID: add_report_fingerprint
+Revises: add_verification_fields
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_report_fingerprint'
+down_revision = 'add_verification_fields'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('reports', sa.Column('fingerprint', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_reports_fingerprint'), 'reports', ['fingerprint'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_reports_fingerprint'), table_name='reports')
+    op.drop_column('reports', 'fingerprint')
@@ -5,23 +5,25 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 import schemas
 
 # Diğer dosyalarımızdan gerekli parçaları import ediyoruz
-from database import get_db
+from database import async_read_session, get_async_db, get_db, read_session
+from services import auth_cache, password_hashing, read_routing
 
 # .env dosyasından güvenlik ayarlarını yükle
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
-# Şifre hashleme ve doğrulama işlemleri için
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Şifre hashleme ve doğrulama işlemleri için (işler ayrı süreç havuzunda yapılır)
+pwd_context = password_hashing.pwd_context
 
 # FastAPI'ye token'ın hangi endpoint'ten alınacağını belirtir
 # Bu "token" string'i, main.py'deki login fonksiyonumuzun adresi olacak
@@ -33,9 +35,13 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    """Verilen bilgilere göre yeni bir JWT access token oluşturur."""
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None, claims: Optional[dict] = None):
+    """
+    Verilen bilgilere göre yeni bir JWT access token oluşturur.
+    claims: isteğe bağlı imzalı yetki talepleri (bkz. auth_cache.build_claims)
+    """
     to_encode = data.copy()
+    to_encode.update(claims or {})
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
@@ -50,27 +56,103 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 # from database import get_db şeklinde import edilebilir
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Token'ı çözer ve veritabanından ilgili kullanıcıyı bulup döndürür."""
-    # crud.py ile döngüsel import (circular import) hatası almamak için
-    # crud'u fonksiyonun içinde import ediyoruz. Bu yaygın bir çözümdür.
-    import crud
-
-    credentials_exception = HTTPException(
+def _credentials_exception(detail: str = "Could not validate credentials") -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
+        detail=detail,
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: Optional[str] = payload.get("sub")
         if email is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(email=email)
+            raise _credentials_exception()
+        schemas.TokenData(email=email)
     except JWTError:
-        raise credentials_exception
-    
-    user = crud.get_user_by_email(db, email=token_data.email)
+        raise _credentials_exception()
+    return payload
+
+
+def _ensure_active(user) -> None:
     if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        raise _credentials_exception()
+    # None: kolon eklenmeden önce oluşturulmuş kayıtlar aktif sayılır
+    if user.is_active is False:
+        raise _credentials_exception("Inactive user")
+
+
+def _resolve_user(db: Session, payload: dict):
+    try:
+        user = auth_cache.user_from_claims(db, payload)
+    except auth_cache.StaleClaimsError:
+        raise _credentials_exception("Token permissions are outdated, please refresh the token")
+    if user is None:
+        user = auth_cache.get_user(db, email=payload["sub"])
+    _ensure_active(user)
+    read_routing.bind_user(db, user.id)
+    return user
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """
+    Token'ı çözer ve ilgili kullanıcıyı döndürür.
+    Token güncel yetki talepleri taşıyorsa kullanıcı ve üyelikler token'dan,
+    aksi halde istek içi ve Redis önbelleğinden çözülür (bkz. services.auth_cache).
+    """
+    return _resolve_user(db, _decode_token(token))
+
+
+def _resolve_user_with_memberships(db: Session, payload: dict):
+    user = _resolve_user(db, payload)
+    # Endpoint'in yetki kontrolleri önbellek ıskasında Redis'e değil istek içi önbelleğe düşsün
+    auth_cache.get_memberships(db, user.id)
+    return user
+
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """
+    Async endpoint'ler için get_current_user. Çözümleme aynı async oturumun
+    senkron görünümünde (run_sync) yapılır; sorgular async sürücüden geçer ve
+    istek içi önbellek endpoint'in yetki kontrolleriyle paylaşılır.
+
+    redis-py senkron olduğu için Redis okumaları önceden, yazımları sonradan
+    thread'de yapılır; olay döngüsü Redis'i (veya kesintide zaman aşımını) beklemez.
+    """
+    payload = _decode_token(token)
+    auth_cache.prime(db.sync_session, await run_in_threadpool(auth_cache.prefetch, payload))
+    user = await db.run_sync(_resolve_user_with_memberships, payload)
+    writes = auth_cache.take_writes(db.sync_session)
+    if writes:
+        await run_in_threadpool(auth_cache.write_back, writes)
+    return user
+
+
+def get_current_user_ignoring_claims(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """Token yenileme için: yetki taleplerini yok sayıp kullanıcıyı normal yoldan çözer."""
+    payload = _decode_token(token)
+    user = auth_cache.get_user(db, email=payload["sub"])
+    _ensure_active(user)
+    return user
+
+
+def get_user_read_db(current_user=Depends(get_current_user)):
+    """
+    Analitik okumalar için salt okunur oturum. Kullanıcı az önce yazdıysa
+    kendi verisini görsün diye primary'den okunur (bkz. services.read_routing).
+    """
+    db = read_session(prefer_primary=read_routing.wrote_recently(current_user.id))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_user_read_db_async(current_user=Depends(get_current_user_async)):
+    """get_user_read_db'nin async endpoint'ler için karşılığı"""
+    # Redis kontrolü thread'de; olay döngüsü beklemez
+    prefer_primary = await run_in_threadpool(read_routing.wrote_recently, current_user.id)
+    async with await async_read_session(prefer_primary=prefer_primary) as db:
+        yield db
@@ -10,6 +10,7 @@ import auth
 import crud
 import models
 from database import get_db
+from services.auth_cache import get_company_memberships
 
 
 def require_superuser(current_user: models.User = Depends(auth.get_current_user)):
@@ -33,13 +34,8 @@ def get_company_if_member(
     if not db_company:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Company not found")
     
-    # Yeni Member modeli üzerinden kontrol
-    member = db.query(models.Member).filter(
-        models.Member.user_id == current_user.id,
-        models.Member.company_id == company_id
-    ).first()
-    
-    if not member:
+    # Yeni Member modeli üzerinden kontrol (önbellekten)
+    if not get_company_memberships(db, current_user.id, company_id):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not a member of this company")
         
     return db_company
@@ -56,18 +52,16 @@ def check_user_role(
     if allowed_roles is None:
         allowed_roles = []
 
-    # Member tablosu üzerinden sorgu
-    member = db.query(models.Member).filter(
-        models.Member.user_id == current_user.id,
-        models.Member.company_id == company_id
-    ).first()
+    # Member kayıtları (önbellekten)
+    memberships = get_company_memberships(db, current_user.id, company_id)
 
-    if not member:
+    if not memberships:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not a member of this company")
 
-    # Kullanıcının rolü, izin verilen rollerden biri mi?
+    # Kullanıcının rollerinden biri izin verilen rollerden biri mi?
     # Şirket sahibi/admin her zaman tüm yetkilere sahiptir.
-    if member.role not in allowed_roles and member.role not in [models.CompanyMemberRole.owner, models.CompanyMemberRole.admin]:
+    permitted = set(allowed_roles) | {models.CompanyMemberRole.owner, models.CompanyMemberRole.admin}
+    if not any(member.role in permitted for member in memberships):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have the required permissions for this action")
 
     return True
@@ -91,35 +85,19 @@ def check_facility_access(
     Başarılı → Facility nesnesi, başarısız → None
     """
     
-    # Tesisi bul
-    facility = db.query(models.Facility).filter(
-        models.Facility.id == facility_id
-    ).first()
+    # Tesisi bul (oturumda yüklüyse sorgu yapılmaz)
+    facility = db.get(models.Facility, facility_id)
     
     if not facility:
         return None
     
-    company_id = facility.company_id
-    
-    # Üyelik kaydını kontrol et
-    member = db.query(models.Member).filter(
-        models.Member.user_id == user_id,
-        models.Member.company_id == company_id
-    ).first()
-    
-    if not member:
-        return None
+    # Üyelik kayıtlarını kontrol et (önbellekten)
+    memberships = get_company_memberships(db, user_id, facility.company_id)
     
-    # Üye ise, tesis kısıtlaması var mı kontrol et
-    if member.facility_id is None:
-        # Kısıtlama yok → tüm tesisler erişim var
+    # Kısıtlama yok (facility_id NULL) → tüm tesisler; kısıtlıysa yalnızca eşleşen tesis
+    if any(member.facility_id is None or member.facility_id == facility_id for member in memberships):
         return facility
-    elif member.facility_id == facility_id:
-        # Kısıtlanmış tesis ve eşleşiyor
-        return facility
-    else:
-        # Kısıtlanmış tesis ama eşleşmiyor
-        return None
+    return None
 
 
 def get_member_facilities(
@@ -133,26 +111,23 @@ def get_member_facilities(
     
     Dönen değer:
     - Eğer member.facility_id = NULL → şirketin tüm tesisleri
-    - Eğer member.facility_id varsa → sadece o tesis
+    - Eğer member.facility_id varsa → sadece kısıtlı tesis(ler)
     """
     
-    member = db.query(models.Member).filter(
-        models.Member.user_id == user_id,
-        models.Member.company_id == company_id
-    ).first()
+    memberships = get_company_memberships(db, user_id, company_id)
     
-    if not member:
+    if not memberships:
         return []
     
-    if member.facility_id is None:
+    if any(member.facility_id is None for member in memberships):
         # Tüm tesisler erişim var
         facilities = db.query(models.Facility).filter(
             models.Facility.company_id == company_id
         ).all()
         return facilities
     else:
-        # Sadece belirli tesis
-        facility = db.query(models.Facility).filter(
-            models.Facility.id == member.facility_id
-        ).first()
-        return [facility] if facility else []
\ No newline at end of file
+        # Sadece belirli tesisler
+        facility_ids = {member.facility_id for member in memberships}
+        return db.query(models.Facility).filter(
+            models.Facility.id.in_(facility_ids)
+        ).order_by(models.Facility.id).all()
\ No newline at end of file
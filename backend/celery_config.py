@@ -1,12 +1,13 @@
 # backend/celery_config.py
 
 import os
+from typing import Optional
 
 import celery
 from celery import Celery
 from dotenv import load_dotenv
 
-from database import SessionLocal
+from database import SessionLocal, read_session
 
 load_dotenv()
 
@@ -45,6 +46,14 @@ app.conf.update(
             'task': 'tasks.detect_anomalies',
             'schedule': 86400.0,  # 1 gün (saniye cinsinden)
         },
+        'dispatch_report_jobs': {
+            'task': 'tasks.dispatch_report_jobs',
+            'schedule': 30.0,  # 30 saniye - rapor şeritlerinde bekleyen işler
+        },
+        'rebuild_leaderboard_cache_daily': {
+            'task': 'tasks.rebuild_leaderboard_cache',
+            'schedule': 86400.0,  # 1 gün - Redis kaybına karşı DB'den yeniden yükleme
+        },
     }
 )
 
@@ -52,7 +61,8 @@ app.conf.update(
 app.conf.task_queues = {
     'q_ingestion': {},
     'q_invalid_data': {},
-    'q_reports': {},
+    'q_reports_interactive': {},  # Kullanıcının beklediği tekil raporlar
+    'q_reports_bulk': {},  # Toplu / dönem sonu rapor üretimi
     'q_analytics': {},
     'q_dead_letter': {},
 }
@@ -60,11 +70,15 @@ app.conf.task_queues = {
 
 class DBTask(celery.Task):
     _db = None
+    _read_db = None
 
     def after_return(self, status, retval, task_id, args, kwargs, einfo):
         if self._db is not None:
             self._db.close()
             self._db = None
+        if self._read_db is not None:
+            self._read_db.close()
+            self._read_db = None
 
     @property
     def db(self):
@@ -72,6 +86,33 @@ class DBTask(celery.Task):
             self._db = SessionLocal()
         return self._db
 
+    @property
+    def read_db(self):
+        """Ağır okumalar için salt okunur oturum (replika gecikmesi sınırdaysa replika)"""
+        if self._read_db is None:
+            self._read_db = read_session()
+        return self._read_db
+
+    def read_db_for(self, user_id: Optional[int]):
+        """
+        Bir kullanıcı adına üretilen çıktılar için read_db: kullanıcı az önce
+        yazdıysa oturum primary'ye açılır (bkz. services.read_routing).
+        Görevin okuma oturumu zaten açıldıysa o kullanılır.
+        """
+        if self._read_db is None:
+            from services import read_routing
+            prefer_primary = user_id is not None and read_routing.wrote_recently(user_id)
+            self._read_db = read_session(prefer_primary=prefer_primary)
+        return self._read_db
+
+
+class ReadOnlyDBTask(DBTask):
+    """Yalnızca okuyan görevler: self.db de salt okunur oturumdur"""
+
+    @property
+    def db(self):
+        return self.read_db
+
 
 class DeadLetterTask(DBTask):
     def on_failure(self, exc, task_id, args, kwargs, einfo):
@@ -1,29 +1,47 @@
 # backend/crud.py
-from datetime import date, timedelta
+import hashlib
+import logging
+import os
+from datetime import date, datetime, timedelta
 from typing import List, Optional
 
 from fastapi import HTTPException
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 import auth
 import models
 import schemas
-import suggestion_engine
+from db_functions import year_month
+from services import data_revision, password_hashing, reference_data, suggestion_store
+from services.leaderboard_service import get_leaderboard_service
+
+logger = logging.getLogger(__name__)
+
+# Bu süreden uzun süredir kuyrukta/işlemde görünen rapor takılmış sayılır
+REPORT_INFLIGHT_WINDOW = timedelta(minutes=int(os.getenv("REPORT_INFLIGHT_WINDOW_MINUTES", "60")))
 
 
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    # auth.py'deki pwd_context'i kullan
-    hashed_password = auth.pwd_context.hash(user.password) 
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: Optional[str] = None):
+    # Hash ayrı süreç havuzunda hesaplanır (bkz. services.password_hashing)
+    if hashed_password is None:
+        hashed_password = password_hashing.hash_password(user.password)
     db_user = models.User(email=user.email, hashed_password=hashed_password)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
     return db_user
 
+def update_user_password_hash(db: Session, user: models.User, hashed_password: str) -> models.User:
+    """Maliyet parametreleri değiştiğinde girişte yeniden hesaplanan hash'i kaydeder."""
+    user.hashed_password = hashed_password
+    db.commit()
+    return user
+
 
 def get_company_by_id(db: Session, company_id: int):
     return db.query(models.Company).filter(models.Company.id == company_id).first()
@@ -79,32 +97,44 @@ def get_facility_by_id(db: Session, facility_id: int):
     return db.query(models.Facility).filter(models.Facility.id == facility_id).first()
 
 
-def get_dashboard_summary(db: Session, user_id: int):
-    """
-    Kullanıcının dashboard özet bilgilerini scope bazlı olarak döndürür.
-    """
+def _dashboard_trend_statement(user_id: int):
+    """Aylık, scope bazlı emisyon toplamları; senkron ve async yol aynı sorguyu kullanır"""
     # Kullanıcının üye olduğu tüm şirketlerin tesis ID'lerini al
     facility_ids = (
-        db.query(models.Facility.id)
+        select(models.Facility.id)
         .join(models.Company)
         .join(models.Company.members)
-        .filter(models.User.id == user_id)
-        .subquery()
+        .where(models.User.id == user_id)
     )
     
     # Aylık emisyonları scope bazında gruplayarak hesapla
-    monthly_trend_query = (
-        db.query(
-            func.to_char(models.ActivityData.start_date, 'YYYY-MM').label("month"),
+    return (
+        select(
+            year_month(models.ActivityData.start_date).label("month"),
             models.ActivityData.scope,
             func.sum(models.ActivityData.calculated_co2e_kg).label("co2e_kg"),
         )
-        .filter(models.ActivityData.facility_id.in_(facility_ids))
+        .where(models.ActivityData.facility_id.in_(facility_ids))
         .group_by("month", models.ActivityData.scope)
         .order_by("month")
-        .all()
     )
-    
+
+
+def get_dashboard_summary(db: Session, user_id: int):
+    """
+    Kullanıcının dashboard özet bilgilerini scope bazlı olarak döndürür.
+    """
+    return _summarize_dashboard(db.execute(_dashboard_trend_statement(user_id)).all())
+
+
+async def get_dashboard_summary_async(db: AsyncSession, user_id: int):
+    """get_dashboard_summary'nin async oturumla çalışan karşılığı"""
+    result = await db.execute(_dashboard_trend_statement(user_id))
+    return _summarize_dashboard(result.all())
+
+
+def _summarize_dashboard(monthly_trend_query) -> dict:
+    """(ay, scope, co2e_kg) satırlarından dashboard özeti"""
     # Verileri ay bazında gruplayarak scope ayrımı yap
     monthly_data = {}
     for row in monthly_trend_query:
@@ -189,39 +219,43 @@ def delete_suggestion_parameter(db: Session, key: str):
 # -- Emission Factor CRUD --
 
 def get_emission_factor_by_key(db: Session, key: str) -> Optional[models.EmissionFactor]:
-    return db.query(models.EmissionFactor).filter(models.EmissionFactor.key == key).first()
+    """Anahtarın en son başlayan versiyonu"""
+    return db.query(models.EmissionFactor).filter(models.EmissionFactor.key == key).order_by(
+        models.EmissionFactor.valid_from.desc().nullslast(),
+        models.EmissionFactor.year.desc().nullslast(),
+        models.EmissionFactor.id.desc()
+    ).first()
+
+def get_emission_factor_versions(db: Session, key: str) -> List[models.EmissionFactor]:
+    """Anahtarın tüm versiyonları, en eskiden en yeniye"""
+    return db.query(models.EmissionFactor).filter(models.EmissionFactor.key == key).order_by(
+        models.EmissionFactor.valid_from.asc().nullsfirst(),
+        models.EmissionFactor.id
+    ).all()
 
 def get_all_emission_factors(db: Session) -> dict[str, models.EmissionFactor]:
-    """Veritabanındaki tüm emisyon faktörlerini bir sözlük olarak döndürür."""
-    factors = db.query(models.EmissionFactor).all()
+    """Veritabanındaki emisyon faktörlerini anahtar başına en son versiyonla döndürür."""
+    factors = db.query(models.EmissionFactor).order_by(
+        models.EmissionFactor.valid_from.asc().nullsfirst(),
+        models.EmissionFactor.id
+    ).all()
     return {f.key: f for f in factors}
 
-def get_emission_factors_by_year(db: Session, year: int) -> dict[str, models.EmissionFactor]:
+def get_emission_factors_as_of(db: Session, on: date) -> dict[str, reference_data.EmissionFactorRecord]:
     """
-    Belirtilen yıla ait emisyon faktörlerini döndürür.
-    Yıl bilgisi yoksa en güncel faktörleri kullanır (fallback).
+    Verilen tarihte geçerli emisyon faktörleri (anahtar başına bir versiyon).
+    Süreç içi referans görüntüsündeki aralık indeksinden okunur; sorgu yapmaz.
     """
-    # Önce belirtilen yıla ait faktörleri bul
-    factors_for_year = db.query(models.EmissionFactor).filter(
-        models.EmissionFactor.year == year
-    ).all()
-    
-    if factors_for_year:
-        return {f.key: f for f in factors_for_year}
-    
-    # Yıl bilgisi yoksa, yıl alanı NULL olan faktörleri al
-    factors_no_year = db.query(models.EmissionFactor).filter(
-        models.EmissionFactor.year.is_(None)
-    ).all()
-    
-    if factors_no_year:
-        return {f.key: f for f in factors_no_year}
-    
-    # Hiçbiri yoksa tüm faktörleri döndür
-    return get_all_emission_factors(db)
+    return reference_data.get_reference_snapshot(db).emission_factors_as_of(on)
+
+def get_emission_factors_by_year(db: Session, year: int) -> dict[str, reference_data.EmissionFactorRecord]:
+    """Belirtilen yılın 1 Ocak'ında geçerli emisyon faktörleri."""
+    return get_emission_factors_as_of(db, date(year, 1, 1))
 
 def create_emission_factor(db: Session, factor: schemas.EmissionFactorCreate) -> models.EmissionFactor:
     db_factor = models.EmissionFactor(**factor.model_dump())
+    if db_factor.valid_from is None and db_factor.year is not None:
+        db_factor.valid_from = date(db_factor.year, 1, 1)
     db.add(db_factor)
     db.commit()
     db.refresh(db_factor)
@@ -292,6 +326,10 @@ def delete_company(db: Session, company_id: int):
         raise HTTPException(status_code=400, detail="Cannot delete company with associated facilities. Please delete facilities first.")
     db.delete(db_company)
     db.commit()
+    try:
+        get_leaderboard_service().remove_company(company_id)
+    except Exception as e:
+        logger.warning(f"Leaderboard'dan şirket çıkarılamadı: {e}")
     return db_company
 
 def delete_facility(db: Session, facility_id: int):
@@ -328,6 +366,10 @@ def update_company(db: Session, company_id: int, company_data: schemas.CompanyCr
     
     db.commit()
     db.refresh(db_company)
+    try:
+        get_leaderboard_service().rename_company(company_id, db_company.name)
+    except Exception as e:
+        logger.warning(f"Leaderboard şirket adı güncellenemedi: {e}")
     return db_company
 
 def update_facility(db: Session, facility_id: int, facility_data: schemas.FacilityCreate):
@@ -409,24 +451,188 @@ def upsert_company_financials(db: Session, company_id: int, financials_data: sch
     return db_financials
 
 
-def get_suggestions_for_company(db: Session, company_id: int) -> list[str]:
+def get_suggestions_for_company(db: Session, company_id: int) -> list:
     """
-    Bir şirket için kişiselleştirilmiş öneriler oluşturur.
+    Bir şirket için kişiselleştirilmiş öneriler döndürür.
+    Sonuçlar önceden hesaplanıp saklanır; veri değiştiğinde arka planda yenilenir.
     """
-    # Şirketi, finansal bilgileriyle birlikte tek bir sorguda çek (eager loading)
-    from sqlalchemy.orm import joinedload
+    return suggestion_store.get_company_suggestions(db, company_id)
 
-    db_company = db.query(models.Company).options(
-        joinedload(models.Company.financials)
-    ).filter(models.Company.id == company_id).first()
 
-    if not db_company:
-        return ["Şirket bulunamadı."] # Hata durumu için bir mesaj
+def get_all_suggestion_parameters(db: Session) -> dict:
+    """Tüm öneri parametrelerini bir sözlük olarak döndürür (süreç içi referans görüntüsünden)."""
+    return dict(reference_data.get_reference_snapshot(db).suggestion_parameters)
 
-    return suggestion_engine.generate_suggestions(company=db_company, db=db)
 
+# -- Leaderboard CRUD --
 
-def get_all_suggestion_parameters(db: Session) -> dict:
-    """Veritabanındaki tüm öneri parametrelerini bir sözlük olarak döndürür."""
-    params = db.query(models.SuggestionParameter).all()
-    return {p.key: p.value for p in params}
\ No newline at end of file
+def upsert_leaderboard_entry(
+    db: Session,
+    company: models.Company,
+    efficiency_score: float,
+    region: Optional[str] = None,
+    emissions_per_employee_kwh: Optional[float] = None
+) -> Optional[models.LeaderboardEntry]:
+    """
+    Şirketin sıralama skorunu kaydeder (kalıcı tablo) ve Redis sıralamasını
+    artımlı olarak günceller. Sektörü olmayan şirketler sıralamaya girmez.
+    """
+    if not company.industry_type:
+        return None
+
+    if region is None and company.facilities:
+        region = company.facilities[0].city
+
+    entry = db.query(models.LeaderboardEntry).filter(
+        models.LeaderboardEntry.company_id == company.id
+    ).first()
+    if not entry:
+        entry = models.LeaderboardEntry(company_id=company.id)
+        db.add(entry)
+
+    entry.industry_type = company.industry_type
+    entry.region = region
+    entry.efficiency_score = efficiency_score
+    entry.emissions_per_employee_kwh = emissions_per_employee_kwh
+    # Kalıcı sıra, Redis erişilemediğinde kullanılan DB yolu içindir
+    entry.rank = db.query(func.count(models.LeaderboardEntry.id)).filter(
+        models.LeaderboardEntry.industry_type == company.industry_type,
+        models.LeaderboardEntry.region == region,
+        models.LeaderboardEntry.company_id != company.id,
+        models.LeaderboardEntry.efficiency_score > efficiency_score
+    ).scalar() + 1
+
+    db.commit()
+    db.refresh(entry)
+
+    try:
+        get_leaderboard_service().record_score(
+            company_id=company.id,
+            company_name=company.name,
+            industry_type=company.industry_type,
+            region=region,
+            efficiency_score=efficiency_score,
+            emissions_per_employee_kwh=emissions_per_employee_kwh
+        )
+    except Exception as e:
+        logger.warning(f"Leaderboard Redis güncellemesi başarısız (DB kaydı tamam): {e}")
+
+    return entry
+
+
+# -- Rapor Önbelleği (içerik adresli) --
+
+def get_company_data_version(db: Session, company_id: int) -> str:
+    """
+    Şirketin rapor girdilerinin (aktivite verisi, tesisler, finansallar) versiyonu.
+    Girdilere yazan her işlemde değişir (bkz. services.data_revision); tek
+    birincil anahtar okumasıdır.
+    """
+    revision = db.execute(
+        select(models.Company.data_revision).where(models.Company.id == company_id)
+    ).scalar_one_or_none()
+    return data_revision.label(revision)
+
+
+def get_company_data_versions(db: Session, company_ids: Optional[List[int]] = None) -> dict:
+    """Birden çok şirketin veri versiyonu tek sorguda ({company_id: versiyon}); company_ids None ise tüm şirketler"""
+    query = select(models.Company.id, models.Company.data_revision)
+    if company_ids is not None:
+        query = query.where(models.Company.id.in_(company_ids))
+    return {company_id: data_revision.label(revision) for company_id, revision in db.execute(query)}
+
+
+def get_report_fingerprint(
+    db: Session,
+    report_type: str,
+    company_id: int,
+    start_date: date,
+    end_date: date,
+    data_version: Optional[str] = None
+) -> str:
+    """
+    (rapor tipi, şirket, dönem, veri versiyonu, üretici versiyonu) parmak izi.
+    ROI analizi bugünden geriye doğru hesaplandığı için güne de bağlıdır.
+    Toplu üretimde veri versiyonu önceden (gruplanmış) hesaplanıp verilebilir.
+    """
+    from services.cbam_service import CBAMReportService
+    from services.roi_calculator_service import ROICalculatorService
+
+    report_type = getattr(report_type, "value", report_type)
+    if data_version is None:
+        data_version = get_company_data_version(db, company_id)
+    parts = [report_type, str(company_id), str(start_date), str(end_date), data_version]
+    if report_type in ("cbam_xml", "combined"):
+        parts.append(f"cbam:{CBAMReportService.GENERATOR_VERSION}")
+    if report_type in ("roi_analysis", "combined"):
+        parts.append(f"roi:{ROICalculatorService.GENERATOR_VERSION}:{date.today()}")
+
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def find_reusable_report(db: Session, fingerprint: str) -> Optional[models.Report]:
+    """Aynı parmak izine sahip, süresi dolmamış ve dosyası duran tamamlanmış rapor"""
+    candidates = db.query(models.Report).filter(
+        models.Report.fingerprint == fingerprint,
+        models.Report.status == models.ReportStatus.completed,
+        models.Report.file_path.isnot(None),
+        models.Report.expires_at > datetime.utcnow()
+    ).order_by(models.Report.completed_at.desc()).limit(5).all()
+
+    for report in candidates:
+        if os.path.exists(report.file_path):
+            return report
+    return None
+
+
+def find_inflight_report(db: Session, fingerprint: str, user_id: int) -> Optional[models.Report]:
+    """
+    Kullanıcının aynı parmak izli, hâlâ kuyrukta/işlenmekte olan raporu.
+    REPORT_INFLIGHT_WINDOW'dan eski satırlar takılmış sayılır ve eşleşmez.
+    """
+    return db.query(models.Report).filter(
+        models.Report.fingerprint == fingerprint,
+        models.Report.user_id == user_id,
+        models.Report.status.in_([models.ReportStatus.pending, models.ReportStatus.processing]),
+        models.Report.requested_at > datetime.utcnow() - REPORT_INFLIGHT_WINDOW
+    ).order_by(models.Report.requested_at.desc()).first()
+
+
+def clone_report_from_cache(
+    db: Session,
+    source: models.Report,
+    user_id: int,
+    period_name: Optional[str] = None
+) -> models.Report:
+    """Yeni rapor kaydını Celery'ye gitmeden mevcut artefakta bağlar"""
+    report = models.Report(
+        company_id=source.company_id,
+        user_id=user_id,
+        report_type=source.report_type,
+        start_date=source.start_date,
+        end_date=source.end_date,
+        period_name=period_name or source.period_name,
+        fingerprint=source.fingerprint,
+        status=models.ReportStatus.completed,
+        file_path=source.file_path,
+        file_size_bytes=source.file_size_bytes,
+        total_emissions_tco2e=source.total_emissions_tco2e,
+        total_savings_tl=source.total_savings_tl,
+        notify_user_when_ready=False,
+        completed_at=datetime.utcnow(),
+        # Dosya paylaşıldığı için kaynağın ömrünü devralır
+        expires_at=source.expires_at
+    )
+    db.add(report)
+    db.commit()
+    db.refresh(report)
+    return report
+
+
+def is_report_file_shared(db: Session, file_path: str, exclude_report_id: int) -> bool:
+    """Dosya, başka bir (süresi dolmamış) rapor tarafından hâlâ kullanılıyor mu?"""
+    return db.query(models.Report.id).filter(
+        models.Report.file_path == file_path,
+        models.Report.id != exclude_report_id,
+        models.Report.status != models.ReportStatus.expired
+    ).first() is not None
@@ -4,6 +4,7 @@ import io
 import logging
 import os
 from datetime import datetime
+from typing import List, Tuple
 
 from sqlalchemy.orm import Session
 
@@ -25,6 +26,7 @@ class CSVProcessor:
     - Turkish decimal (comma) handling
     - Comprehensive validation with line-by-line error reporting
     - Pluggable calculation service provider
+    - Batch emission calculation (per-row factor version by start_date)
     - Atomic transactions (all-or-nothing commit)
     """
     
@@ -38,6 +40,8 @@ class CSVProcessor:
         self.facility_id = facility_id
         # YENİ: Use factory function for pluggable provider selection
         self.calculation_service: ICalculationService = get_calculation_service(self.db)
+        # Doğrudan yazma modunda hesaplanmayı bekleyen satırlar: (sonuç, aktivite)
+        self._pending: List[Tuple[schemas.ActivityDataCSVRow, schemas.ActivityDataCreate]] = []
     
     def process_csv_file(self, file_content: bytes) -> schemas.CSVUploadResult:
         """
@@ -54,8 +58,7 @@ class CSVProcessor:
             CSVUploadResult: İşlem sonucu ve detayları
         """
         results = []
-        successful_rows = 0
-        failed_rows = 0
+        self._pending = []
         
         try:
             # Byte içeriğini string'e çevir
@@ -75,15 +78,14 @@ class CSVProcessor:
                 )
             
             for row_number, row in enumerate(reader, start=2):  # 2'den başla (başlık 1. satır)
-                result = self._process_row(row, row_number)
-                results.append(result)
-                
-                if result.success:
-                    successful_rows += 1
-                else:
-                    failed_rows += 1
+                results.append(self._process_row(row, row_number))
+            
+            # Bekleyen satırların emisyonları tek seferde hesaplanır
+            self._calculate_pending()
             
             total_rows = len(results)
+            successful_rows = sum(1 for result in results if result.success)
+            failed_rows = total_rows - successful_rows
             
             # Sonuç mesajını oluştur
             if total_rows == 0:
@@ -228,6 +230,17 @@ class CSVProcessor:
                 end_date=emission_row.end_date
             )
             
+            row_result = schemas.ActivityDataCSVRow(
+                row_number=row_number,
+                activity_type=activity_type.value,
+                quantity=quantity,
+                unit=unit,
+                start_date=start_date_str,
+                end_date=end_date_str,
+                error=None,
+                success=True
+            )
+
             # EVENT PIPELINE: Doğrudan DB yerine event kuyruğuna gönder
             if os.getenv('EVENT_PIPELINE_ENABLED', 'true').lower() == 'true':
                 try:
@@ -256,32 +269,10 @@ class CSVProcessor:
                         success=False
                     )
             else:
-                # Emisyon hesapla ve DB'ye yaz (geriye uyumluluk)
-                calculation_result = self.calculation_service.calculate_for_activity(activity_data)
-                db_activity_data = models.ActivityData(
-                    facility_id=self.facility_id,
-                    activity_type=activity_data.activity_type,
-                    quantity=activity_data.quantity,
-                    unit=activity_data.unit,
-                    start_date=activity_data.start_date,
-                    end_date=activity_data.end_date,
-                    scope=calculation_result.scope,
-                    calculated_co2e_kg=calculation_result.total_co2e_kg,
-                    is_fallback_calculation=calculation_result.is_fallback
-                )
-                self.db.add(db_activity_data)
-                self.db.flush()
+                # Doğrudan DB'ye yazma (geriye uyumluluk): emisyon dosya sonunda toplu hesaplanır
+                self._pending.append((row_result, activity_data))
             
-            return schemas.ActivityDataCSVRow(
-                row_number=row_number,
-                activity_type=activity_type.value,
-                quantity=quantity,
-                unit=unit,
-                start_date=start_date_str,
-                end_date=end_date_str,
-                error=None,
-                success=True
-            )
+            return row_result
             
         except ValueError as e:
             # Pydantic validation hatası
@@ -308,6 +299,38 @@ class CSVProcessor:
                 success=False
             )
     
+    def _calculate_pending(self):
+        """
+        Bekleyen satırları tek toplu hesaplamayla (satır başına start_date'e göre
+        faktör versiyonu) hesaplar ve DB'ye ekler. Hata olursa bu satırlar başarısız işaretlenir.
+        """
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        
+        try:
+            calculation_results = self.calculation_service.calculate_batch([activity for _, activity in pending])
+        except Exception as e:
+            logger.error(f"Toplu emisyon hesaplama hatası: {str(e)}", exc_info=True)
+            for row_result, _ in pending:
+                row_result.success = False
+                row_result.error = f"Emisyon hesaplama hatası: {str(e)}"
+            return
+        
+        for (_, activity_data), calculation_result in zip(pending, calculation_results, strict=True):
+            self.db.add(models.ActivityData(
+                facility_id=self.facility_id,
+                activity_type=activity_data.activity_type,
+                quantity=activity_data.quantity,
+                unit=activity_data.unit,
+                start_date=activity_data.start_date,
+                end_date=activity_data.end_date,
+                scope=calculation_result.scope,
+                calculated_co2e_kg=calculation_result.total_co2e_kg,
+                is_fallback_calculation=calculation_result.is_fallback
+            ))
+        self.db.flush()
+    
     def commit(self):
         """Tüm değişiklikleri veritabanına kaydet."""
         self.db.commit()
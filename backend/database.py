@@ -6,14 +6,21 @@ Includes SSL support for encrypted production connections and
 comprehensive connection pooling.
 """
 
+import asyncio
 import logging
 import os
+import threading
+import time
+from typing import Optional
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.orm import Session, sessionmaker
+
+import db_pool
 
 logger = logging.getLogger(__name__)
 
@@ -22,24 +29,67 @@ load_dotenv()
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./karbonuyum.db")
 DATABASE_SSL_MODE = os.getenv("DATABASE_SSL_MODE", "prefer")  # prefer|require|disable|allow
 
-# Connection pool configuration
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    poolclass=QueuePool if SQLALCHEMY_DATABASE_URL.startswith("postgresql") else None,
-    pool_size=10 if SQLALCHEMY_DATABASE_URL.startswith("postgresql") else 0,
-    max_overflow=20 if SQLALCHEMY_DATABASE_URL.startswith("postgresql") else 0,
-    pool_recycle=3600,  # Recycle connections after 1 hour
-    pool_pre_ping=True,  # Verify connections before reusing
-    echo_pool=False,
-    # SSL configuration for PostgreSQL
-    connect_args={
-        "sslmode": DATABASE_SSL_MODE,
-        # For production with self-signed certs: set sslrootcert
-        # "sslrootcert": os.getenv("DB_SSL_CERT_PATH"),
-    } if SQLALCHEMY_DATABASE_URL and SQLALCHEMY_DATABASE_URL.startswith("postgresql") else {},
-    # SQLite specific settings
-    **{"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
-)
+
+def _connect_args(url: str) -> dict:
+    if url.startswith("postgresql"):
+        return {
+            # SSL configuration for PostgreSQL
+            "sslmode": DATABASE_SSL_MODE,
+            # For production with self-signed certs: set sslrootcert
+            # "sslrootcert": os.getenv("DB_SSL_CERT_PATH"),
+            **db_pool.connect_options(url),
+        }
+    if url.startswith("sqlite"):
+        # API thread havuzundaki istekler aynı bağlantıyı farklı thread'lerden kullanabilir
+        return {"check_same_thread": False}
+    return {}
+
+
+# --- SQLite profili --------------------------------------------------------
+# Tek sunuculu / şirket içi kurulumlar için her bağlantıda uygulanan ayarlar:
+# WAL okuyucuların yazıcıyı beklemesini kaldırır; synchronous=NORMAL WAL ile
+# güvenlidir (yalnızca işletim sistemi çökmesinde son commit'ler kaybolabilir).
+# SQLITE_PROFILE=0 ile kapatılabilir.
+
+SQLITE_PROFILE_ENABLED = os.getenv("SQLITE_PROFILE", "1") == "1"
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negatif değer KiB: 64 MB
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "temp_store": "MEMORY",
+}
+
+
+def enable_sqlite_profile(sqlite_engine, pragmas: Optional[dict] = None) -> None:
+    """Engine'in açtığı her SQLite bağlantısına PRAGMA ayarlarını uygular"""
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+
+    @event.listens_for(sqlite_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def _build_engine(url: str, replica: bool = False):
+    """Connection pool configuration: süreç rolüne göre (bkz. db_pool)"""
+    built = create_engine(
+        url,
+        echo_pool=False,
+        connect_args=_connect_args(url),
+        **db_pool.engine_options(url, replica=replica),
+    )
+    if url.startswith("sqlite") and SQLITE_PROFILE_ENABLED:
+        enable_sqlite_profile(built)
+    return built
+
+
+engine = _build_engine(SQLALCHEMY_DATABASE_URL)
 
 # Log SSL configuration
 if SQLALCHEMY_DATABASE_URL and SQLALCHEMY_DATABASE_URL.startswith("postgresql"):
@@ -62,4 +112,208 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# --- Async engine ---------------------------------------------------------
+# Okuma ağırlıklı endpoint'ler (dashboard, bildirimler, sıralama, rapor durumu,
+# fatura listesi) thread havuzunu işgal etmeden bu engine üzerinden çalışır;
+# eşzamanlılık thread sayısıyla değil bağlantı havuzuyla sınırlanır.
+# psycopg 3 hem senkron hem async sürücü olduğundan ek bağımlılık gerekmez.
+
+def _async_url(url: str) -> Optional[str]:
+    """
+    Senkron URL'den async sürücülü URL türetir.
+    postgresql / postgresql+psycopg2 → postgresql+psycopg (psycopg 3 async);
+    sqlite → sqlite+aiosqlite (requirements.txt'te sabit; kurulu değilse None).
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "postgresql":
+        return parsed.set(drivername="postgresql+psycopg").render_as_string(hide_password=False)
+    if backend == "sqlite":
+        try:
+            import aiosqlite  # noqa: F401
+        except ImportError:
+            return None
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    return None
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(SQLALCHEMY_DATABASE_URL)
+
+
+def _build_async_engine(url: str, replica: bool = False):
+    built = create_async_engine(
+        url,
+        connect_args={} if url.startswith("sqlite") else _connect_args(url),
+        **db_pool.engine_options(url, asynchronous=True, replica=replica),
+    )
+    if url.startswith("sqlite") and SQLITE_PROFILE_ENABLED:
+        enable_sqlite_profile(built.sync_engine)
+    return built
+
+
+async_engine = None
+AsyncSessionLocal = None
+if ASYNC_DATABASE_URL:
+    async_engine = _build_async_engine(ASYNC_DATABASE_URL)
+    # expire_on_commit=False: commit sonrası nitelik erişimi gizli (await'siz) sorgu tetiklemesin
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+else:
+    logger.warning("⚠️ Async veritabanı sürücüsü yok; async endpoint'ler kullanılamaz")
+
+
+async def get_async_db():
+    """
+    Dependency injection for async database sessions.
+    Yields an AsyncSession and ensures proper cleanup.
+    """
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database engine is not configured (ASYNC_DATABASE_URL)")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+
+# --- Okuma replikası --------------------------------------------------------
+# DATABASE_READ_URL tanımlıysa analitik ve raporlama okumaları kendi havuzu olan
+# replikaya gider; tanımlı değilse okuma oturumları da primary'ye bağlanır.
+# Okuma oturumları salt okunurdur: flush edilecek değişiklik varsa hata verilir.
+#
+# Sınırlı bayatlık kuralları:
+#   - Replika gecikmesi DATABASE_READ_MAX_LAG_SECONDS'ı aşarsa (veya ölçülemezse)
+#     okumalar primary'ye döner. Gecikme süreç başına en fazla
+#     REPLICA_LAG_CHECK_INTERVAL saniyede bir ölçülür.
+#   - Kullanıcının kendi yazımından sonraki READ_AFTER_WRITE_SECONDS boyunca
+#     okumaları primary'den yapılır (bkz. services.read_routing).
+
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+ASYNC_DATABASE_READ_URL = os.getenv("ASYNC_DATABASE_READ_URL") or (
+    _async_url(DATABASE_READ_URL) if DATABASE_READ_URL else None
+)
+DATABASE_READ_MAX_LAG_SECONDS = float(os.getenv("DATABASE_READ_MAX_LAG_SECONDS", "30"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "5"))
+
+READ_ONLY_KEY = "read_only"
+REPLICA_KEY = "replica"
+
+read_engine = _build_engine(DATABASE_READ_URL, replica=True) if DATABASE_READ_URL else engine
+async_read_engine = (
+    _build_async_engine(ASYNC_DATABASE_READ_URL, replica=True) if DATABASE_READ_URL and ASYNC_DATABASE_READ_URL else async_engine
+)
+
+ReadSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=read_engine, info={READ_ONLY_KEY: True, REPLICA_KEY: True}
+)
+PrimaryReadSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine, info={READ_ONLY_KEY: True, REPLICA_KEY: False}
+)
+AsyncReadSessionLocal = None
+AsyncPrimaryReadSessionLocal = None
+if async_read_engine is not None:
+    AsyncReadSessionLocal = async_sessionmaker(
+        bind=async_read_engine, class_=AsyncSession, expire_on_commit=False,
+        info={READ_ONLY_KEY: True, REPLICA_KEY: True}
+    )
+    AsyncPrimaryReadSessionLocal = async_sessionmaker(
+        bind=async_engine, class_=AsyncSession, expire_on_commit=False,
+        info={READ_ONLY_KEY: True, REPLICA_KEY: False}
+    )
+
+db_pool.register("primary", engine)
+if async_engine is not None:
+    db_pool.register("async_primary", async_engine)
+if read_engine is not engine:
+    db_pool.register("read", read_engine)
+if async_read_engine is not None and async_read_engine is not async_engine:
+    db_pool.register("async_read", async_read_engine)
+
+if DATABASE_READ_URL:
+    logger.info(f"✅ Okuma replikası etkin (en fazla {DATABASE_READ_MAX_LAG_SECONDS:.0f} sn gecikme)")
+
+
+class ReadOnlySessionError(RuntimeError):
+    """Salt okunur (okuma replikası) oturumunda yazma denemesi"""
+
+
+@event.listens_for(Session, "before_flush")
+def _reject_writes_on_read_sessions(session: Session, flush_context, instances) -> None:
+    if session.info.get(READ_ONLY_KEY) and (session.new or session.dirty or session.deleted):
+        raise ReadOnlySessionError("Read-only session cannot flush changes; use the primary session")
+
+
+_REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+_lag_lock = threading.Lock()
+_lag_state = {"checked_at": float("-inf"), "fresh": True}
+
+
+def _replica_check_due() -> bool:
+    return time.monotonic() - _lag_state["checked_at"] >= REPLICA_LAG_CHECK_INTERVAL
+
+
+def replica_is_fresh() -> bool:
+    """
+    Replika gecikmesi sınır içinde mi. Replika yoksa her zaman True.
+    Sonuç REPLICA_LAG_CHECK_INTERVAL boyunca önbellekte tutulur.
+    """
+    if read_engine is engine:
+        return True
+    if not _replica_check_due():
+        return _lag_state["fresh"]
+    with _lag_lock:
+        if _replica_check_due():
+            try:
+                with read_engine.connect() as conn:
+                    lag = conn.execute(_REPLICA_LAG_SQL).scalar() or 0
+                fresh = float(lag) <= DATABASE_READ_MAX_LAG_SECONDS
+                if not fresh:
+                    logger.warning(f"🐢 Okuma replikası {float(lag):.1f} sn geride; okumalar primary'ye yönlendiriliyor")
+            except Exception as e:
+                logger.warning(f"⚠️ Replika gecikmesi ölçülemedi, primary kullanılacak: {e}")
+                fresh = False
+            _lag_state.update(checked_at=time.monotonic(), fresh=fresh)
+    return _lag_state["fresh"]
+
+
+def read_session(prefer_primary: bool = False) -> Session:
+    """
+    Salt okunur oturum: replika uygunsa replikaya, aksi halde primary'ye bağlı.
+    prefer_primary: çağıranın bayat veri göremeyeceği durumlar (ör. kendi yazımı)
+    """
+    if prefer_primary or not replica_is_fresh():
+        return PrimaryReadSessionLocal()
+    return ReadSessionLocal()
+
+
+async def async_read_session(prefer_primary: bool = False) -> AsyncSession:
+    """read_session'ın async karşılığı; gecikme ölçümü event loop'u bloklamaz"""
+    if AsyncReadSessionLocal is None:
+        raise RuntimeError("Async database engine is not configured (ASYNC_DATABASE_URL)")
+    if prefer_primary:
+        return AsyncPrimaryReadSessionLocal()
+    if async_read_engine is not async_engine and _replica_check_due():
+        await asyncio.to_thread(replica_is_fresh)
+    return AsyncReadSessionLocal() if replica_is_fresh() else AsyncPrimaryReadSessionLocal()
+
+
+def get_read_db():
+    """
+    Dependency injection for read-only sessions (replica when healthy).
+    Kullanıcının kendi yazımını görmesi gereken endpoint'ler auth.get_user_read_db kullanır.
+    """
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db():
+    """get_read_db'nin async karşılığı"""
+    async with await async_read_session() as db:
+        yield db
@@ -0,0 +1,30 @@
+# backend/db_functions.py
+
+"""
+Veritabanından bağımsız SQL fonksiyonları
+
+Sorgular PostgreSQL'e özgü fonksiyonları (ör. to_char) doğrudan
+kullandığında SQLite kurulumlarında hata verir. Buradaki ifadeler her
+diyalekt için ayrı derlenir.
+"""
+
+from sqlalchemy import String
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+
+class year_month(FunctionElement):
+    """Tarihi 'YYYY-MM' metnine çevirir (aylık gruplama anahtarı)"""
+    type = String()
+    name = "year_month"
+    inherit_cache = True
+
+
+@compiles(year_month)
+def _year_month_default(element, compiler, **kw):
+    return "to_char(%s, 'YYYY-MM')" % compiler.process(element.clauses, **kw)
+
+
+@compiles(year_month, "sqlite")
+def _year_month_sqlite(element, compiler, **kw):
+    return "strftime('%%Y-%%m', %s)" % compiler.process(element.clauses, **kw)
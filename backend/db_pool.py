@@ -0,0 +1,230 @@
+# backend/db_pool.py
+
+"""
+Veritabanı Bağlantı Havuzu Ayarları ve Ölçümleri
+
+API, Celery worker ve beat süreçleri farklı eşzamanlılıkla çalışır; havuz
+boyutları süreç rolüne göre belirlenir. Rol DB_PROCESS_ROLE ile verilir
+(api | worker | beat); verilmezse celery komut satırından tahmin edilir.
+
+Her ayar için öncelik sırası (ör. havuz boyutu, worker rolü, okuma replikası):
+    DB_READ_POOL_SIZE_WORKER → DB_READ_POOL_SIZE → DB_POOL_SIZE_WORKER → DB_POOL_SIZE → rol varsayılanı
+
+PgBouncer:
+  - DB_POOL_MODE=null: uygulama tarafında havuz tutulmaz (NullPool); her
+    checkout PgBouncer'dan bağlantı alır, iade edince kapatır.
+  - DB_PGBOUNCER_TRANSACTION=1: transaction pooling ile uyumsuz olan psycopg
+    sunucu tarafı hazırlanmış ifadeleri kapatılır.
+
+Havuzlar bağlantı alma süresini, zaman aşımlarını ve eşzamanlı kullanımı ölçer;
+stats() bu süreçteki tüm kayıtlı engine'lerin anlık durumunu döndürür.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+load_dotenv()
+
+ROLES = ("api", "worker", "beat")
+
+# Prefork worker süreci aynı anda tek görev çalıştırır (birincil + okuma oturumu)
+_ROLE_DEFAULTS = {
+    "api": {"pool_size": 10, "max_overflow": 20},
+    "worker": {"pool_size": 2, "max_overflow": 2},
+    "beat": {"pool_size": 1, "max_overflow": 0},
+}
+_COMMON_DEFAULTS = {"pool_timeout": 30, "pool_recycle": 3600}
+
+POOL_MODE = os.getenv("DB_POOL_MODE", "queue")  # queue | null
+PGBOUNCER_TRANSACTION = os.getenv("DB_PGBOUNCER_TRANSACTION", "0") == "1"
+
+_WAIT_WINDOW = 1000
+
+
+def process_role() -> str:
+    role = os.getenv("DB_PROCESS_ROLE")
+    if role:
+        if role not in ROLES:
+            raise ValueError(f"DB_PROCESS_ROLE must be one of {ROLES}, got {role!r}")
+        return role
+    if os.path.basename(sys.argv[0] if sys.argv else "").startswith("celery"):
+        return "beat" if "beat" in sys.argv else "worker"
+    return "api"
+
+
+PROCESS_ROLE = process_role()
+
+
+def _setting(name: str, replica: bool) -> int:
+    role = PROCESS_ROLE.upper()
+    prefixes = ("DB_READ_", "DB_") if replica else ("DB_",)
+    for prefix in prefixes:
+        for key in (f"{prefix}{name.upper()}_{role}", f"{prefix}{name.upper()}"):
+            value = os.getenv(key)
+            if value is not None:
+                return int(value)
+    return {**_COMMON_DEFAULTS, **_ROLE_DEFAULTS[PROCESS_ROLE]}[name]
+
+
+def engine_options(url: str, asynchronous: bool = False, replica: bool = False) -> Dict:
+    """
+    create_engine / create_async_engine için havuz argümanları.
+    SQLite için SQLAlchemy'nin kendi havuz seçimine bırakılır.
+    """
+    if not url.startswith("postgresql"):
+        return {}
+    options = {"pool_pre_ping": True}
+    if POOL_MODE == "null":
+        options["poolclass"] = InstrumentedNullPool
+        return options
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool if asynchronous else InstrumentedQueuePool,
+        pool_size=_setting("pool_size", replica),
+        max_overflow=_setting("max_overflow", replica),
+        pool_timeout=_setting("pool_timeout", replica),
+        pool_recycle=_setting("pool_recycle", replica),
+    )
+    return options
+
+
+def connect_options(url: str) -> Dict:
+    """Sürücüye iletilecek ek bağlantı argümanları"""
+    if url.startswith("postgresql") and PGBOUNCER_TRANSACTION:
+        # Transaction pooling'de ardışık sorgular farklı sunucu bağlantılarına düşebilir
+        return {"prepare_threshold": None}
+    return {}
+
+
+# --- Ölçüm ----------------------------------------------------------------
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waits = deque(maxlen=_WAIT_WINDOW)
+        self.acquired = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+
+    def record_acquire(self, seconds: float) -> None:
+        with self._lock:
+            self.acquired += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.waits.append(seconds * 1000)
+
+    def record_timeout(self, seconds: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self.waits.append(seconds * 1000)
+
+    def record_release(self) -> None:
+        with self._lock:
+            self.in_use -= 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            waits = list(self.waits)
+            snapshot = {
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "acquired": self.acquired,
+                "timeouts": self.timeouts,
+            }
+        snapshot["acquire_wait_ms"] = {
+            "count": len(waits),
+            "p50": _percentile(waits, 0.5),
+            "p95": _percentile(waits, 0.95),
+            "max": round(max(waits), 2) if waits else None,
+        }
+        return snapshot
+
+
+def _percentile(values, ratio: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * ratio))], 2)
+
+
+class _InstrumentedPool:
+    """
+    Bağlantı alma süresini (boş bağlantı beklemesi + gerekirse yeni bağlantı
+    açılışı) ve pool_timeout aşımlarını ölçer.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # recreate() (ör. engine.dispose) yeni örnek oluşturur; ölçümler sıfırlanır
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout(time.perf_counter() - started)
+            raise
+        self.metrics.record_acquire(time.perf_counter() - started)
+        return connection
+
+    def _do_return_conn(self, record) -> None:
+        self.metrics.record_release()
+        super()._do_return_conn(record)
+
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+class InstrumentedNullPool(_InstrumentedPool, NullPool):
+    pass
+
+
+_engines: Dict[str, object] = {}
+
+
+def register(name: str, engine) -> None:
+    """stats() çıktısına eklenecek engine (sync veya async)"""
+    _engines[name] = engine
+
+
+def stats() -> Dict:
+    """Bu süreçteki kayıtlı engine havuzlarının anlık durumu"""
+    engines = {}
+    for name, engine in _engines.items():
+        pool = getattr(engine, "sync_engine", engine).pool
+        entry = {"pool_class": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            entry.update(
+                pool_size=pool.size(),
+                max_overflow=pool._max_overflow,
+                timeout_seconds=pool.timeout(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+            )
+        if isinstance(pool, _InstrumentedPool):
+            entry.update(pool.metrics.snapshot())
+        else:
+            entry["status"] = pool.status()
+        engines[name] = entry
+    return {
+        "role": PROCESS_ROLE,
+        "pool_mode": POOL_MODE,
+        "pgbouncer_transaction": PGBOUNCER_TRANSACTION,
+        "pid": os.getpid(),
+        "engines": engines,
+    }
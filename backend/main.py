@@ -1,22 +1,26 @@
 # backend/main.py
+import io
 import logging
 import os
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Union
 
+import numpy as np
 from fastapi import (
     APIRouter,  # import APIRouter
     Depends,
     FastAPI,
     File,
     HTTPException,
+    Query,
     Request,
     Response,
     UploadFile,
     status,
 )
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, PlainTextResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 
 # YENİ: Rate Limiting (API maliyet kontrolü için)
@@ -24,6 +28,8 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 from sqladmin import Admin, ModelView
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 # Gerekli Kütüphaneler
@@ -31,16 +37,18 @@ from sqlalchemy.orm import Session
 import auth
 import auth_utils
 import crud
+import db_pool
 import models
 import schemas
 from csv_handler import CSVProcessor, get_csv_template
-from database import engine, get_db
+from database import engine, get_async_db, get_db
 
 # DEPRECATED: Eski dahili hesaplama servisi arşivlendi
 # from services.calculation_service import CalculationService, get_calculation_service
 # YENİ: Climatiq API tabanlı hesaplama servisi
-from services import ICalculationService, get_calculation_service
+from services import ICalculationService, auth_cache, get_calculation_service, password_hashing, report_storage
 from services.benchmarking_service import BenchmarkingService
+from services.reference_data import get_reference_snapshot
 
 # --- Loglama Yapılandırması ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -173,6 +181,76 @@ def delete_param(
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
+@admin_router.get("/reference-data")
+def read_reference_data_status(current_user: models.User = Depends(auth_utils.require_superuser)):
+    """Bu süreçteki referans veri görüntüsünün versiyonu ve içerik sayıları"""
+    snapshot = get_reference_snapshot()
+    return {
+        "version": snapshot.version,
+        "loaded_at": datetime.fromtimestamp(snapshot.loaded_at).isoformat(),
+        "suggestion_parameters": len(snapshot.suggestion_parameters),
+        "emission_factors": len(snapshot.emission_factors),
+        "industry_templates": len(snapshot.industry_templates),
+        "badges": len(snapshot.badges),
+    }
+
+@admin_router.post("/reference-data/reload", status_code=status.HTTP_202_ACCEPTED)
+def reload_reference_data(current_user: models.User = Depends(auth_utils.require_superuser)):
+    """Veritabanına doğrudan yapılan değişikliklerden sonra tüm süreçlere yeniden yükleme yayınlar"""
+    from services.reference_data import announce_change
+    announce_change()
+    return {"message": "Referans veri yeniden yükleme yayınlandı"}
+
+
+@admin_router.get("/password-hashing-stats")
+def read_password_hashing_stats(current_user: models.User = Depends(auth_utils.require_superuser)):
+    """Bu süreçteki şifre hash havuzunun doluluk, red ve gecikme ölçümleri"""
+    return password_hashing.stats()
+
+
+@admin_router.get("/db-pool-stats")
+def read_db_pool_stats(current_user: models.User = Depends(auth_utils.require_superuser)):
+    """Bu süreçteki veritabanı havuzlarının doluluk, taşma, bekleme süresi ve zaman aşımı ölçümleri"""
+    return db_pool.stats()
+
+
+@admin_router.get("/suggestion-strategy-stats")
+def read_suggestion_strategy_stats(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth_utils.require_superuser)
+):
+    """Saklı öneri hesaplamalarından strateji başına süre ve sorgu sayısı (en yavaş önce)"""
+    from services.suggestion_store import strategy_stats
+    return {"strategies": strategy_stats(db)}
+
+
+@admin_router.post("/reports/cbam/bulk", response_model=schemas.BulkCBAMReportResponse, status_code=status.HTTP_202_ACCEPTED)
+def request_bulk_cbam_reports(
+    bulk_request: schemas.BulkCBAMReportRequest,
+    current_user: models.User = Depends(auth_utils.require_superuser)
+):
+    """
+    Dönem sonu (CBAM beyan tarihi) için tüm şirketlerin raporlarını toplu üretir.
+    Aktivite verisi tek seferde taranır; XML üretimi toplu şeritteki worker'lara dağıtılır.
+    """
+    from tasks.reporting_tasks import BULK_QUEUE, generate_bulk_cbam_reports
+    task = generate_bulk_cbam_reports.apply_async(
+        kwargs={
+            "start_date": bulk_request.start_date.isoformat(),
+            "end_date": bulk_request.end_date.isoformat(),
+            "period_name": bulk_request.period_name,
+            "company_ids": bulk_request.company_ids,
+        },
+        queue=BULK_QUEUE
+    )
+    logger.info(f"📨 Toplu CBAM isteği: Task {task.id}, Dönem {bulk_request.start_date} - {bulk_request.end_date}")
+    return schemas.BulkCBAMReportResponse(
+        celery_task_id=task.id,
+        status="pending",
+        message="Toplu CBAM üretimi başlatıldı."
+    )
+
+
 # --- Sustainability Target Endpoints ---
 
 @app.post("/companies/{company_id}/targets/", response_model=schemas.SustainabilityTarget, status_code=status.HTTP_201_CREATED)
@@ -239,24 +317,63 @@ app.add_middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True
 # Uygulamaya router'ı eklemeyi unutmayın
 app.include_router(admin_router)
 
+@app.on_event("startup")
+async def start_password_hashing_pool():
+    # Havuz süreçleri ilk giriş yoğunluğundan önce hazır olsun
+    await run_in_threadpool(password_hashing.warm_up)
+
 # ... (read_root, login, create_user, create_company fonksiyonları aynı) ...
 @app.get("/")
 def read_root(): return {"status": "ok", "message": "KarbonUyum API v0.4.0 çalışıyor."}
 
-@app.post("/token", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = crud.get_user_by_email(db, email=form_data.username)
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password", headers={"WWW-Authenticate": "Bearer"})
+def _issue_access_token(db: Session, user: models.User, rehashed_password: Optional[str] = None) -> dict:
+    if rehashed_password:
+        crud.update_user_password_hash(db, user, rehashed_password)
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = auth.create_access_token(data={"sub": user.email}, expires_delta=access_token_expires)
+    access_token = auth.create_access_token(
+        data={"sub": user.email}, expires_delta=access_token_expires, claims=auth_cache.build_claims(db, user)
+    )
     return {"access_token": access_token, "token_type": "bearer"}
 
+def _password_hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many concurrent password operations, please retry",
+        headers={"Retry-After": str(password_hashing.RETRY_AFTER_SECONDS)}
+    )
+
+@app.post("/token", response_model=schemas.Token)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    # bcrypt ayrı süreç havuzunda; beklerken ne event loop ne de thread havuzu meşgul edilir
+    user = await run_in_threadpool(crud.get_user_by_email, db, form_data.username)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        valid, rehashed_password = await password_hashing.verify_and_update_async(form_data.password, user.hashed_password)
+    except password_hashing.PasswordHashingBusy:
+        raise _password_hashing_busy()
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password", headers={"WWW-Authenticate": "Bearer"})
+    return await run_in_threadpool(_issue_access_token, db, user, rehashed_password)
+
+@app.post("/token/refresh", response_model=schemas.Token)
+def refresh_access_token(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user_ignoring_claims)
+):
+    """Üyelikler değiştikten sonra güncel yetki talepleriyle yeni token verir."""
+    return _issue_access_token(db, current_user)
+
 @app.post("/users/", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
+async def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    # Girişteki gibi: hash beklenirken thread havuzu meşgul edilmez
+    db_user = await run_in_threadpool(crud.get_user_by_email, db, user.email)
     if db_user: raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db=db, user=user)
+    try:
+        hashed_password = await password_hashing.hash_password_async(user.password)
+    except password_hashing.PasswordHashingBusy:
+        raise _password_hashing_busy()
+    return await run_in_threadpool(crud.create_user, db, user, hashed_password)
 
 @app.post("/users/onboard", response_model=schemas.OnboardingResponse)
 def onboard_user(
@@ -271,9 +388,7 @@ def onboard_user(
     from datetime import datetime, timedelta
     
     # 1. Sektör template'ini bul
-    industry_template = db.query(models.IndustryTemplate).filter(
-        models.IndustryTemplate.industry_name == onboarding_data.industry_name
-    ).first()
+    industry_template = get_reference_snapshot(db).industry_template_by_name(onboarding_data.industry_name)
     
     if not industry_template:
         raise HTTPException(
@@ -491,9 +606,7 @@ def submit_wizard_data(
         # Sektör en iyi uygulamaları ile karşılaştır
         company = db.query(models.Company).filter(models.Company.id == wizard_data.company_id).first()
         if company and company.industry_type:
-            industry_template = db.query(models.IndustryTemplate).filter(
-                models.IndustryTemplate.industry_type == company.industry_type
-            ).first()
+            industry_template = get_reference_snapshot(db).industry_template_for_type(company.industry_type)
             
             if industry_template and industry_template.best_in_class_electricity_kwh:
                 # Basit ROI hesaplama: %20 tasarruf potansiyeli varsayımı
@@ -587,7 +700,7 @@ def create_activity_data_for_facility(
     if not db_facility:
         raise HTTPException(status_code=404, detail="Tesis bulunamadı")
 
-    auth_utils.check_user_role(db_facility.company.id, db, current_user, allowed_roles=[
+    auth_utils.check_user_role(db_facility.company_id, db, current_user, allowed_roles=[
         models.CompanyMemberRole.admin, models.CompanyMemberRole.data_entry, models.CompanyMemberRole.owner
     ])
 
@@ -681,7 +794,7 @@ def update_facility(facility_id: int, facility: schemas.FacilityCreate, db: Sess
     db_facility = crud.get_facility_by_id(db, facility_id=facility_id)
     if not db_facility: raise HTTPException(status_code=404, detail="Facility not found")
     # Güvenlik Kontrolü: Kullanıcı tesisin ait olduğu şirketin üyesi mi?
-    auth_utils.check_user_role(db_facility.company.id, db, current_user, allowed_roles=[
+    auth_utils.check_user_role(db_facility.company_id, db, current_user, allowed_roles=[
         models.CompanyMemberRole.admin, models.CompanyMemberRole.owner
     ])
     return crud.update_facility(db=db, facility_id=facility_id, facility_data=facility)
@@ -709,7 +822,7 @@ def update_activity_data(
     if not db_data:
         raise HTTPException(status_code=404, detail="Aktivite verisi bulunamadı")
 
-    auth_utils.check_user_role(db_data.facility.company.id, db, current_user, allowed_roles=[
+    auth_utils.check_user_role(db_data.facility.company_id, db, current_user, allowed_roles=[
         models.CompanyMemberRole.admin, models.CompanyMemberRole.data_entry, models.CompanyMemberRole.owner
     ])
 
@@ -760,15 +873,15 @@ def update_activity_data(
         return db_data
 
 @app.get("/dashboard/summary", response_model=schemas.DashboardSummary)
-def get_summary_for_dashboard(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+async def get_summary_for_dashboard(
+    db: AsyncSession = Depends(auth.get_user_read_db_async),
+    current_user: models.User = Depends(auth.get_current_user_async)
 ):
     """
     Giriş yapmış kullanıcının tüm verilerini özetleyerek
     dashboard için analitik veriler sunar.
     """
-    return crud.get_dashboard_summary(db=db, user_id=current_user.id)
+    return await crud.get_dashboard_summary_async(db=db, user_id=current_user.id)
 
 
 @app.delete("/companies/{company_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -787,7 +900,7 @@ def delete_activity_data(data_id: int, db: Session = Depends(get_db), current_us
     db_data = crud.get_activity_data_by_id(db, data_id=data_id)
     if not db_data: raise HTTPException(status_code=404, detail="Activity data not found")
     # Güvenlik Kontrolü: Sadece admin ve data_entry kullanıcıları veri silebilir
-    auth_utils.check_user_role(db_data.facility.company.id, db, current_user, allowed_roles=[
+    auth_utils.check_user_role(db_data.facility.company_id, db, current_user, allowed_roles=[
         models.CompanyMemberRole.admin, models.CompanyMemberRole.data_entry
     ])
     crud.delete_activity_data(db=db, data_id=data_id)
@@ -861,7 +974,7 @@ def get_company_suggestions(
 @app.get("/companies/{company_id}/benchmark-report", response_model=schemas.BenchmarkReportResponse)
 def get_benchmark_report(
     company_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(auth.get_user_read_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
     """
@@ -1002,25 +1115,21 @@ def generate_cbam_report(
     from services.cbam_service import CBAMReportService
     cbam_service = CBAMReportService(db, get_calculation_service(db))
     
-    # XML rapor üret
+    # XML rapor üret (toplamlar aynı geçişte hesaplanır)
     try:
-        xml_content = cbam_service.generate_cbam_report(
+        buffer = io.BytesIO()
+        totals = cbam_service.write_cbam_report(
+            buffer,
             company_id=company_id,
             start_date=report_request.start_date,
             end_date=report_request.end_date,
             reporting_period=report_request.reporting_period
         )
+        xml_content = buffer.getvalue().decode('utf-8')
         
         # Raporu doğrula
         is_valid = cbam_service.validate_cbam_report(xml_content)
         
-        # Toplam emisyonları hesapla
-        totals = cbam_service._calculate_total_emissions(
-            db.query(models.Company).filter(models.Company.id == company_id).first(),
-            report_request.start_date,
-            report_request.end_date
-        )
-        
         # Company bilgisi
         company = db.query(models.Company).filter(models.Company.id == company_id).first()
         
@@ -1111,11 +1220,11 @@ def health_check_calculation_service(
 
 # YENİ: Notification API Endpoints (Modül 2.1)
 @app.get("/notifications", response_model=schemas.NotificationList)
-def get_notifications(
+async def get_notifications(
     limit: int = 20,
     unread_only: bool = False,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_user_async)
 ):
     """
     Kullanıcının bildirimlerini getir
@@ -1124,15 +1233,10 @@ def get_notifications(
     
     notif_service = get_notification_service()
     
-    if unread_only:
-        notifications = notif_service.get_unread_notifications(db, current_user.id, limit)
-    else:
-        notifications = notif_service.get_all_notifications(db, current_user.id, limit)
+    notifications = await notif_service.get_notifications_async(db, current_user.id, limit, unread_only)
     
     unread_count = len([n for n in notifications if not n.is_read])
-    total_count = db.query(models.Notification).filter(
-        models.Notification.user_id == current_user.id
-    ).count()
+    total_count = await notif_service.count_notifications_async(db, current_user.id)
     
     return schemas.NotificationList(
         notifications=notifications,
@@ -1255,21 +1359,23 @@ def upload_invoice(
 
 
 @app.get("/facilities/{facility_id}/invoices", response_model=schemas.InvoiceList)
-def list_invoices(
+async def list_invoices(
     facility_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_user_async)
 ):
     """
     Tesisin faturalarını listele
     """
-    facility = auth_utils.check_facility_access(db, facility_id, current_user.id)
+    facility = await db.run_sync(auth_utils.check_facility_access, facility_id, current_user.id)
     if not facility:
         raise HTTPException(status_code=403, detail="Bu tesise erişim yetkiniz yok")
     
-    invoices = db.query(models.Invoice).filter(
-        models.Invoice.facility_id == facility_id
-    ).order_by(models.Invoice.created_at.desc()).all()
+    invoices = (await db.scalars(
+        select(models.Invoice).where(
+            models.Invoice.facility_id == facility_id
+        ).order_by(models.Invoice.created_at.desc())
+    )).all()
     
     pending = len([i for i in invoices if i.status == models.InvoiceStatus.pending])
     processing = len([i for i in invoices if i.status == models.InvoiceStatus.processing])
@@ -1427,10 +1533,14 @@ def get_roi_simulator(
     
     try:
         from services.roi_calculator_service import ROICalculatorService
+        from services.roi_surface_service import SLIDER_RANGES
         roi_service = ROICalculatorService(db)
         
+        # Tüm hesaplar aynı tüketim görüntüsünü paylaşır (tek sorgu)
+        snapshot = roi_service.load_snapshot(company_id, period_months=12)
+        
         # Standart ROI analizi al
-        base_roi = roi_service.calculate_roi_potential(company_id, period_months=12)
+        base_roi = roi_service.calculate_roi_potential(company_id, period_months=12, snapshot=snapshot)
         
         # Parametrik hesaplamalar (Slider değişiklikleri)
         simulations = {
@@ -1440,7 +1550,8 @@ def get_roi_simulator(
                 custom_parameters={
                     "capacity_kwp": solar_kwp,
                     "cost_per_kwp": 8000  # Sabit - kullanıcı değiştiremez şimdilik
-                }
+                },
+                snapshot=snapshot
             ),
             "led_simulation": roi_service.calculate_specific_measure_roi(
                 company_id=company_id,
@@ -1448,7 +1559,8 @@ def get_roi_simulator(
                 custom_parameters={
                     "savings_rate": led_savings_rate,
                     "cost_per_fixture": 500
-                }
+                },
+                snapshot=snapshot
             ),
             "insulation_simulation": roi_service.calculate_specific_measure_roi(
                 company_id=company_id,
@@ -1456,13 +1568,14 @@ def get_roi_simulator(
                 custom_parameters={
                     "savings_rate": 0.22,
                     "cost_per_m2": 150
-                }
+                },
+                snapshot=snapshot
             )
         }
         
         # Timeline: Payback yılını tablo halinde hesapla
         payback_timeline = _calculate_payback_timeline(
-            base_roi.top_opportunities,
+            [opp.model_dump() for opp in base_roi.top_opportunities],
             years=10,
             price_increase_rate=electricity_price_increase
         )
@@ -1473,9 +1586,12 @@ def get_roi_simulator(
             "simulations": simulations,
             "payback_timeline": payback_timeline,
             "slider_ranges": {
-                "solar_kwp": {"min": 10, "max": 500, "step": 10, "current": solar_kwp},
-                "electricity_price_increase": {"min": 0.05, "max": 0.25, "step": 0.01, "current": electricity_price_increase},
-                "led_savings_rate": {"min": 0.40, "max": 0.80, "step": 0.05, "current": led_savings_rate}
+                name: {**spec, "current": current}
+                for (name, spec), current in zip(
+                    SLIDER_RANGES.items(),
+                    (solar_kwp, electricity_price_increase, led_savings_rate),
+                    strict=True
+                )
             },
             "charts": {
                 "roi_vs_investment": _generate_roi_chart(base_roi, simulations),
@@ -1488,41 +1604,184 @@ def get_roi_simulator(
         raise HTTPException(status_code=500, detail=f"ROI hesaplama hatası: {str(e)}")
 
 
+@app.get("/companies/{company_id}/roi-simulator/surface")
+def get_roi_simulator_surface(
+    company_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    ROI Simülatörü yanıt yüzeyi - tüm slider ızgarası tek istekte
+    
+    solar_kwp × electricity_price_increase × led_savings_rate ızgarasının her
+    noktası için geri ödeme (ay), NPV ve yıllık tasarruf döner. Diziler float32
+    base64 olarak kodlanır; frontend slider değiştikçe yerel interpolasyon yapar.
+    Şirket + veri versiyonu başına önbelleklenir.
+    """
+    
+    # Erişim kontrolü
+    company = db.query(models.Company).filter(
+        models.Company.id == company_id,
+        models.Company.owner_id == current_user.id
+    ).first()
+    
+    if not company:
+        raise HTTPException(status_code=403, detail="Bu şirkete erişim yetkiniz yok")
+    
+    try:
+        from services.roi_surface_service import get_roi_surface_service
+        return get_roi_surface_service().get_surface(db, company_id)
+    except Exception as e:
+        logger.error(f"❌ ROI yüzeyi hatası: {e}")
+        raise HTTPException(status_code=500, detail=f"ROI hesaplama hatası: {str(e)}")
+
+
+@app.post("/companies/{company_id}/roi-monte-carlo")
+def run_roi_monte_carlo(
+    company_id: int,
+    request: schemas.ROIMonteCarloRequest = schemas.ROIMonteCarloRequest(),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    ROI belirsizlik analizi - önlem ve portföy bazında P10/P50/P90 NPV ve geri ödeme
+    
+    İyileştirme oranı, enerji fiyat patikası, yatırım maliyeti ve iskonto oranı
+    dağılımlardan örneklenir (varsayılan 100.000 senaryo). Dağılımlar istekte
+    parametre bazında değiştirilebilir; seed verilirse sonuç tekrarlanabilir.
+    """
+    
+    # Erişim kontrolü
+    company = db.query(models.Company).filter(
+        models.Company.id == company_id,
+        models.Company.owner_id == current_user.id
+    ).first()
+    
+    if not company:
+        raise HTTPException(status_code=403, detail="Bu şirkete erişim yetkiniz yok")
+    
+    from services.roi_monte_carlo_service import ROIMonteCarloService
+    
+    try:
+        return ROIMonteCarloService(db).analyze(
+            company_id,
+            scenarios=request.scenarios,
+            measure_types=request.measures,
+            distributions={
+                name: spec.model_dump(exclude_none=True)
+                for name, spec in (request.distributions or {}).items()
+            },
+            seed=request.seed
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"❌ Monte Carlo ROI hatası: {e}")
+        raise HTTPException(status_code=500, detail=f"ROI hesaplama hatası: {str(e)}")
+
+
+@app.get("/companies/{company_id}/macc")
+def get_company_macc(
+    company_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    Marjinal azaltım maliyet eğrisi - tesis × önlem bazında TL/tCO2e
+    
+    Her tesis için tüm verimlilik önlemleri değerlendirilir; eğri azaltım
+    maliyetine göre artan sıralı ve kümülatif azaltım ile döner. Şirket + veri
+    versiyonu başına önbelleklenir.
+    """
+    
+    # Erişim kontrolü
+    company = db.query(models.Company).filter(
+        models.Company.id == company_id,
+        models.Company.owner_id == current_user.id
+    ).first()
+    
+    if not company:
+        raise HTTPException(status_code=403, detail="Bu şirkete erişim yetkiniz yok")
+    
+    try:
+        from services.macc_service import get_macc_service
+        return get_macc_service().get_curve(db, company_id)
+    except Exception as e:
+        logger.error(f"❌ MACC hesaplama hatası: {e}")
+        raise HTTPException(status_code=500, detail=f"MACC hesaplama hatası: {str(e)}")
+
+
+@app.post("/companies/{company_id}/roi-portfolio")
+def optimise_roi_portfolio(
+    company_id: int,
+    request: schemas.ROIPortfolioRequest = schemas.ROIPortfolioRequest(),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    Bütçe kısıtlı yatırım portföyü - tesis başına önlem seçimi ve Pareto cephesi
+    
+    Önlemler arası etkileşim (aynı kWh'i azaltan önlemler) hesaba katılır.
+    Yanıt maliyet-azaltım Pareto cephesini ve bütçe / hedef için önerilen
+    tesis bazlı önlem setini içerir.
+    """
+    
+    # Erişim kontrolü
+    company = db.query(models.Company).filter(
+        models.Company.id == company_id,
+        models.Company.owner_id == current_user.id
+    ).first()
+    
+    if not company:
+        raise HTTPException(status_code=403, detail="Bu şirkete erişim yetkiniz yok")
+    
+    from services.portfolio_optimizer_service import PortfolioOptimizerService
+    
+    try:
+        return PortfolioOptimizerService(db).optimise_company(
+            company_id,
+            budget_tl=request.budget_tl,
+            target_reduction_tco2e=request.target_reduction_tco2e,
+            measure_types=request.measures,
+            resolution=request.resolution
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"❌ Portföy optimizasyonu hatası: {e}")
+        raise HTTPException(status_code=500, detail=f"ROI hesaplama hatası: {str(e)}")
+
+
 def _calculate_payback_timeline(
     opportunities: List[Dict],
     years: int = 10,
     price_increase_rate: float = 0.10
 ) -> List[Dict]:
     """
-    Yıllar içinde birikmiş tasarrufu hesapla
+    Yıllar içinde birikmiş tasarrufu hesapla (0. yıl yatırım yılı)
     """
-    timeline = []
+    from services import cashflow_engine
     
+    # Fırsatlar × yıl nakit akışı matrisi, tek motor çağrısı
+    flows = cashflow_engine.level_flows(
+        np.array([opp.get("annual_savings_tl", 0) for opp in opportunities], dtype=float),
+        np.array([opp.get("investment_tl", 0) for opp in opportunities], dtype=float),
+        years=years,
+        growth=price_increase_rate
+    ).sum(axis=0)
+    
+    total_investment = -flows[0]
+    annual_savings = np.concatenate([[0.0], flows[1:]])
+    cumulative_savings = np.cumsum(annual_savings)
+    
+    timeline = []
     for year in range(0, years + 1):
-        year_savings = 0
-        year_investments = 0
-        
-        for opp in opportunities:
-            annual_savings = opp.get("annual_savings_tl", 0)
-            investment = opp.get("investment_tl", 0)
-            
-            # Elektrik fiyat artışı simülasyonu
-            yearly_amount = annual_savings * ((1 + price_increase_rate) ** year)
-            
-            if year == 0:
-                year_investments += investment
-            
-            year_savings += yearly_amount
-        
-        # Kümülatif tasarruf
-        cumulative_savings = sum(y["cumulative_savings"] for y in timeline) + year_savings
-        roi_percentage = ((cumulative_savings - year_investments) / year_investments * 100) if year_investments > 0 else 0
-        
+        roi_percentage = ((cumulative_savings[year] - total_investment) / total_investment * 100) if total_investment > 0 else 0
         timeline.append({
             "year": year,
-            "annual_savings": round(year_savings, 0),
-            "cumulative_savings": round(cumulative_savings, 0),
-            "annual_roi_percentage": round(roi_percentage, 1)
+            "annual_savings": round(float(annual_savings[year]), 0),
+            "cumulative_savings": round(float(cumulative_savings[year]), 0),
+            "annual_roi_percentage": round(float(roi_percentage), 1)
         })
     
     return timeline
@@ -1535,7 +1794,7 @@ def _generate_roi_chart(base_roi: schemas.ROIAnalysisResponse, simulations: Dict
     data = []
     
     # Base opportunities
-    for i, opp in enumerate(base_roi.top_opportunities[:3]):
+    for opp in (o.model_dump() for o in base_roi.top_opportunities[:3]):
         data.append({
             "name": opp["name"],
             "investment": opp["investment_tl"],
@@ -1627,6 +1886,40 @@ def request_report_generation(
         raise HTTPException(status_code=403, detail="Bu şirkete erişim yetkiniz yok")
     
     try:
+        # Aynı girdilerle üretilmiş tamamlanmış rapor varsa yeniden üretme
+        fingerprint = crud.get_report_fingerprint(
+            db,
+            report_request.report_type,
+            company_id,
+            report_request.start_date,
+            report_request.end_date
+        )
+        cached = crud.find_reusable_report(db, fingerprint)
+        if cached:
+            report = crud.clone_report_from_cache(
+                db, cached, user_id=current_user.id, period_name=report_request.period_name
+            )
+            logger.info(f"♻️ Rapor önbellekten sunuldu: Report #{report.id} ← #{cached.id}")
+            return schemas.ReportGenerationResponse(
+                report_id=report.id,
+                celery_task_id=None,
+                status="completed",
+                message="Raporunuz hazır.",
+                estimated_time_seconds=0
+            )
+
+        # Aynı rapor zaten kuyrukta/işleniyorsa ikinci bir üretim başlatma
+        inflight = crud.find_inflight_report(db, fingerprint, current_user.id)
+        if inflight:
+            logger.info(f"♻️ Rapor isteği devam eden işe bağlandı: Report #{inflight.id}")
+            return schemas.ReportGenerationResponse(
+                report_id=inflight.id,
+                celery_task_id=inflight.celery_task_id,
+                status=getattr(inflight.status, "value", inflight.status),
+                message="Aynı rapor zaten hazırlanıyor.",
+                estimated_time_seconds=0
+            )
+
         # Report kaydı oluştur
         report = models.Report(
             company_id=company_id,
@@ -1635,6 +1928,7 @@ def request_report_generation(
             start_date=report_request.start_date,
             end_date=report_request.end_date,
             period_name=report_request.period_name,
+            fingerprint=fingerprint,
             status=models.ReportStatus.pending,
             notify_user_when_ready=report_request.notify_user
         )
@@ -1643,34 +1937,25 @@ def request_report_generation(
         db.commit()
         db.refresh(report)
         
-        # Celery task'ine gönder
-        from tasks import calculate_roi_analysis_async, generate_cbam_report_async
-        
-        if report_request.report_type == "cbam_xml":
-            task = generate_cbam_report_async.delay(report.id)
-            estimated_time = 20  # CBAM üretimi ~20 saniye
-        elif report_request.report_type == "roi_analysis":
-            task = calculate_roi_analysis_async.delay(report.id)
-            estimated_time = 15  # ROI hesaplama ~15 saniye
-        else:  # combined
-            # Her iki task'i de tetikle
-            task1 = generate_cbam_report_async.delay(report.id)
-            task2 = calculate_roi_analysis_async.delay(report.id)
-            task = task1  # First task ID'yi dön
-            estimated_time = 35
+        # Şirketin etkileşimli şerit kuyruğuna al; dağıtıcı token'a göre Celery'ye gönderir
+        from services.report_scheduler import LANE_INTERACTIVE, get_report_scheduler
+        job = get_report_scheduler().enqueue(
+            report.id, company_id, report_request.report_type, lane=LANE_INTERACTIVE
+        )
+        estimated_time = job["estimated_time_seconds"]
         
         # Task ID'yi kaydet
-        report.celery_task_id = task.id
+        report.celery_task_id = job["task_id"]
         db.commit()
         
         logger.info(
             f"📨 Rapor isteği oluşturuldu: Report #{report.id}, "
-            f"Task {task.id}, Type: {report_request.report_type}"
+            f"Task {job['task_id']}, Type: {report_request.report_type}"
         )
         
         return schemas.ReportGenerationResponse(
             report_id=report.id,
-            celery_task_id=task.id,
+            celery_task_id=job["task_id"],
             status="pending",
             message=f"Raporunuz hazırlanıyor... ({estimated_time} saniye sürebilir)",
             estimated_time_seconds=estimated_time
@@ -1745,19 +2030,21 @@ def list_company_reports(
 
 
 @app.get("/reports/{report_id}/status")
-def get_report_status(
+async def get_report_status(
     report_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_user_async)
 ):
     """
     Rapor durumunu kontrol et
     """
     
-    report = db.query(models.Report).filter(
-        models.Report.id == report_id,
-        models.Report.user_id == current_user.id
-    ).first()
+    report = await db.scalar(
+        select(models.Report).where(
+            models.Report.id == report_id,
+            models.Report.user_id == current_user.id
+        )
+    )
     
     if not report:
         raise HTTPException(status_code=404, detail="Rapor bulunamadı")
@@ -1777,11 +2064,16 @@ def get_report_status(
 @app.get("/reports/{report_id}/download")
 def download_report(
     report_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
     """
     Tamamlanan raporu indir
+    
+    Sıkıştırılmış artefaktlar, istemci gzip kabul ediyorsa olduğu gibi
+    (Content-Encoding: gzip) gönderilir; aksi halde açılarak akıtılır.
+    Her iki durumda da Range istekleri desteklenir.
     """
     
     report = db.query(models.Report).filter(
@@ -1801,29 +2093,65 @@ def download_report(
     if not report.file_path or not os.path.exists(report.file_path):
         raise HTTPException(status_code=404, detail="Rapor dosyası bulunamadı")
     
-    try:
-        # Download sayısını artır
-        report.download_count += 1
+    file_ext = report_storage.content_extension(report.file_path)
+    media_type = report_storage.media_type_for(report.file_path)
+    report_type = getattr(report.report_type, "value", report.report_type)
+    filename = f"{report_type}_{report.company_id}_{report.id}{file_ext}"
+    
+    # Devam eden indirmenin parçaları sayaca tekrar eklenmesin
+    range_header = request.headers.get("range")
+    if not range_header or range_header.startswith("bytes=0-"):
+        report.download_count = (report.download_count or 0) + 1
         db.commit()
-        
-        # Dosyayı döndür
-        
-        file_ext = os.path.splitext(report.file_path)[1].lower()
-        media_type = "application/xml" if file_ext == ".xml" else "application/json"
-        
-        filename = f"{report.report_type}_{report.company_id}_{report.id}{file_ext}"
-        
-        logger.info(f"📥 Rapor indirildi: #{report_id} - {filename}")
-        
+    
+    logger.info(f"📥 Rapor indirildi: #{report_id} - {filename}")
+    
+    # Eski (sıkıştırılmamış) artefaktlar veya gzip kabul eden istemci:
+    # dosya olduğu gibi gönderilir, Range desteği FileResponse'tan gelir
+    if not report_storage.is_compressed(report.file_path):
+        return FileResponse(path=report.file_path, media_type=media_type, filename=filename)
+    
+    if report_storage.accepts_gzip(request.headers.get("accept-encoding")):
         return FileResponse(
             path=report.file_path,
             media_type=media_type,
-            filename=filename
+            filename=filename,
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"}
         )
-        
-    except Exception as e:
-        logger.error(f"❌ Rapor indirme hatası: {e}")
-        raise HTTPException(status_code=500, detail="Rapor indirilemedi")
+    
+    # gzip desteklemeyen istemci: anında açarak akıt
+    size = report_storage.uncompressed_size(report.file_path)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Vary": "Accept-Encoding",
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+    try:
+        byte_range = report_storage.parse_range(range_header, size)
+    except report_storage.RangeNotSatisfiable:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="İstenen aralık geçersiz",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(
+            report_storage.iter_decompressed(report.file_path),
+            media_type=media_type,
+            headers=headers
+        )
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        report_storage.iter_decompressed(report.file_path, start, end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=media_type,
+        headers=headers
+    )
 
 
 @app.delete("/reports/{report_id}")
@@ -1845,8 +2173,12 @@ def delete_report(
         raise HTTPException(status_code=404, detail="Rapor bulunamadı")
     
     try:
-        # Dosyayı sil
-        if report.file_path and os.path.exists(report.file_path):
+        # Dosyayı sil (önbellekten paylaşılan dosyalar başka rapor kullanıyorsa kalır)
+        if (
+            report.file_path
+            and os.path.exists(report.file_path)
+            and not crud.is_report_file_shared(db, report.file_path, report.id)
+        ):
             os.remove(report.file_path)
         
         # Veritabanı kaydını sil
@@ -2631,6 +2963,7 @@ def get_user_badges(
         models.UserBadge.user_id == current_user.id,
         models.UserBadge.displayed == True
     ).order_by(models.UserBadge.earned_at.desc()).all()
+    badges = get_reference_snapshot(db).badges
     
     return schemas.UserBadgeList(
         badges=[
@@ -2638,7 +2971,7 @@ def get_user_badges(
                 id=ub.id,
                 badge_id=ub.badge_id,
                 earned_at=ub.earned_at.isoformat(),
-                badge=schemas.Badge.from_orm(ub.badge)
+                badge=schemas.Badge.model_validate(badges.get(ub.badge_id) or ub.badge)
             )
             for ub in user_badges
         ],
@@ -2648,12 +2981,13 @@ def get_user_badges(
 
 
 @app.get("/leaderboard")
-def get_leaderboard(
+async def get_leaderboard(
     industry_type: Optional[str] = None,
     region: Optional[str] = None,
-    limit: int = 50,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    limit: int = Query(50, ge=1, le=500),
+    neighbours: int = Query(2, ge=0, le=50),
+    db: AsyncSession = Depends(auth.get_user_read_db_async),
+    current_user: models.User = Depends(auth.get_current_user_async)
 ):
     """
     Sektör sıralamasını göster
@@ -2662,63 +2996,110 @@ def get_leaderboard(
     - industry_type: Sektör filtresi (optional)
     - region: Bölge filtresi (optional)
     - limit: Kaç kişi gösterilsin (default: 50)
-    """
-    
-    # Leaderboard girdilerini sorgula
-    query = db.query(models.LeaderboardEntry)
-    
-    if industry_type:
-        query = query.filter(models.LeaderboardEntry.industry_type == industry_type)
+    - neighbours: Şirketinizin üstünde/altında gösterilecek komşu sayısı (default: 2)
     
-    if region:
-        query = query.filter(models.LeaderboardEntry.region == region)
-    
-    entries = query.order_by(models.LeaderboardEntry.rank).limit(limit).all()
+    Sıralama Redis sorted set'lerinden tek round trip'te okunur;
+    Redis erişilemezse leaderboard_entries tablosuna düşülür.
+    """
+    from services.leaderboard_service import get_leaderboard_service
     
-    # Kullanıcının şirketi bulundu mu?
-    user_company = db.query(models.Member).filter(
-        models.Member.user_id == current_user.id
-    ).first()
+    # Kullanıcının şirketi
+    your_company_id = await db.scalar(
+        select(models.Member.company_id).where(
+            models.Member.user_id == current_user.id
+        ).limit(1)
+    )
     
-    your_rank = None
-    your_score = None
+    board = None
+    try:
+        # Redis istemcisi senkron; event loop'u bloklamamak için thread'de okunur
+        board = await run_in_threadpool(
+            get_leaderboard_service().get_leaderboard,
+            industry_type=industry_type,
+            region=region,
+            limit=limit,
+            company_id=your_company_id,
+            neighbours=neighbours
+        )
+    except Exception as e:
+        logger.warning(f"Redis leaderboard okunamadı, DB'ye düşülüyor: {e}")
     
-    if user_company:
-        your_entry = db.query(models.LeaderboardEntry).filter(
-            models.LeaderboardEntry.company_id == user_company.company_id
-        ).first()
-        
-        if your_entry:
-            your_rank = your_entry.rank
-            your_score = your_entry.efficiency_score
+    if board is None:
+        board = await db.run_sync(_get_leaderboard_from_db, industry_type, region, limit, your_company_id)
     
-    leaderboard_entries = []
-    for entry in entries:
-        company = db.query(models.Company).filter(
-            models.Company.id == entry.company_id
-        ).first()
-        
-        leaderboard_entries.append(
-            schemas.LeaderboardEntry(
-                company_id=entry.company_id,
-                company_name=company.name if company else "Bilinmiyor",
-                rank=entry.rank,
-                efficiency_score=entry.efficiency_score,
-                emissions_per_employee_kwh=entry.emissions_per_employee_kwh,
-                region=entry.region
-            )
-        )
+    entries = [schemas.LeaderboardEntry(**entry) for entry in board["entries"]]
     
     return schemas.Leaderboard(
         industry_type=industry_type or "Tümü",
         region=region,
-        entries=leaderboard_entries,
-        total=len(leaderboard_entries),
-        your_rank=your_rank,
-        your_score=your_score
+        entries=entries,
+        total=len(entries),
+        total_ranked=board["total"],
+        your_rank=board["your_rank"],
+        your_score=board["your_score"],
+        neighbours=[schemas.LeaderboardEntry(**entry) for entry in board["neighbours"]]
     )
 
 
+def _get_leaderboard_from_db(
+    db: Session,
+    industry_type: Optional[str],
+    region: Optional[str],
+    limit: int,
+    your_company_id: Optional[int]
+) -> Dict:
+    """
+    Redis olmadan sıralama (yedek yol) - şirket adları join ile tek sorguda alınır
+    """
+    filtered = db.query(models.LeaderboardEntry)
+    if industry_type:
+        filtered = filtered.filter(models.LeaderboardEntry.industry_type == industry_type)
+    if region:
+        filtered = filtered.filter(models.LeaderboardEntry.region == region)
+
+    rows = filtered.add_columns(models.Company.name).outerjoin(
+        models.Company, models.Company.id == models.LeaderboardEntry.company_id
+    ).order_by(models.LeaderboardEntry.efficiency_score.desc()).limit(limit).all()
+    
+    entries = [
+        {
+            "company_id": entry.company_id,
+            "company_name": company_name or "Bilinmiyor",
+            "rank": position,
+            "efficiency_score": entry.efficiency_score,
+            "emissions_per_employee_kwh": entry.emissions_per_employee_kwh,
+            "region": entry.region
+        }
+        for position, (entry, company_name) in enumerate(rows, start=1)
+    ]
+    
+    your_rank = None
+    your_score = None
+    for entry in entries:
+        if entry["company_id"] == your_company_id:
+            your_rank = entry["rank"]
+            your_score = entry["efficiency_score"]
+            break
+
+    if your_rank is None and your_company_id:
+        # Saklanan rank filtreden bağımsız ve eski olabilir; sıra aynı filtreyle sayılır
+        your_score = filtered.filter(
+            models.LeaderboardEntry.company_id == your_company_id
+        ).with_entities(models.LeaderboardEntry.efficiency_score).scalar()
+        if your_score is not None:
+            your_rank = filtered.filter(
+                models.LeaderboardEntry.efficiency_score > your_score
+            ).count() + 1
+
+    return {
+        "entries": entries,
+        "neighbours": [],
+        "total": filtered.count(),
+        "your_rank": your_rank,
+        "your_score": your_score
+    }
+
+
 @app.post("/admin/badges", response_model=schemas.Badge)
 def create_badge(
     badge_data: dict,
@@ -3,7 +3,20 @@
 import enum
 from datetime import date, datetime
 
-from sqlalchemy import Boolean, Column, Date, DateTime, Enum, Float, ForeignKey, Integer, String, Table
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Integer,
+    String,
+    Table,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 
 from database import Base
@@ -81,6 +94,8 @@ class Company(Base):
     tax_number = Column(String, unique=True, index=True)
     industry_type = Column(Enum(IndustryType), nullable=True, index=True)  # YENİ: index=True (Benchmark sorgusu filtrelemesi)
     owner_id = Column(Integer, ForeignKey("users.id"))
+    # Rapor girdilerine her yazımda artar (bkz. services.data_revision)
+    data_revision = Column(Integer, nullable=False, default=0, server_default="0")
 
     owner = relationship("User", back_populates="owned_companies")
     facilities = relationship("Facility", back_populates="company")
@@ -196,13 +211,22 @@ class IndustryTemplate(Base):
 
 class EmissionFactor(Base):
     __tablename__ = "emission_factors"
-    key = Column(String, primary_key=True, index=True)
+    __table_args__ = (UniqueConstraint('key', 'valid_from', name='uq_emission_factors_key_valid_from'),)
+
+    # Aynı anahtarın farklı geçerlilik dönemleri ayrı satırlardır
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String, nullable=False, index=True)
     value = Column(Float, nullable=False)
     unit = Column(String, nullable=False)
     source = Column(String, nullable=True)
     year = Column(Integer, nullable=True)
     description = Column(String, nullable=True)
 
+    # Geçerlilik aralığı [valid_from, valid_to); boş uç sınırsızdır.
+    # valid_from boşsa ve year doluysa year'ın 1 Ocak'ı başlangıç kabul edilir.
+    valid_from = Column(Date, nullable=True)
+    valid_to = Column(Date, nullable=True)
+
 # YENİ: Bildirim Modeli (Modül 2.1)
 class Notification(Base):
     __tablename__ = "notifications"
@@ -302,6 +326,9 @@ class Report(Base):
     celery_task_id = Column(String, unique=True, nullable=True)  # Celery task ID
     status = Column(Enum(ReportStatus), default=ReportStatus.pending, index=True)
     
+    # İçerik adresli önbellek: aynı parmak izli tamamlanmış rapor yeniden kullanılır
+    fingerprint = Column(String(64), nullable=True, index=True)
+    
     # İşlem sonuçları
     file_path = Column(String, nullable=True)  # S3 veya local path
     file_size_bytes = Column(Integer, nullable=True)
@@ -329,6 +356,18 @@ class Report(Base):
     company = relationship("Company")
     user = relationship("User")
 
+# Şirket bazında saklanan öneri sonuçları (veri/parametre değişiminde arka planda yenilenir)
+class CompanySuggestionSet(Base):
+    __tablename__ = "company_suggestion_sets"
+
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), primary_key=True)
+    suggestions = Column(JSON, nullable=False, default=list)  # schemas.*Suggestion.model_dump() listesi
+    strategy_metrics = Column(JSON, nullable=False, default=list)  # Strateji başına süre ve sorgu sayısı
+    computed_at = Column(DateTime, default=datetime.utcnow)
+    stale_since = Column(DateTime, nullable=True, index=True)  # Girdi değişti, yenileme bekleniyor
+
+    company = relationship("Company")
+
 # YENİ: Tedarikçi Ağı Sistemi (Modül 3.1)
 
 class SupplierInvitationStatus(str, enum.Enum):
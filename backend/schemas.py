@@ -2,7 +2,7 @@
 
 import enum
 from datetime import date, datetime
-from typing import List, Literal, Optional
+from typing import Dict, List, Literal, Optional
 
 from pydantic import BaseModel, ConfigDict, EmailStr, Field, computed_field, field_validator
 
@@ -195,6 +195,8 @@ class GESSuggestionDetails(BaseModel):
     avg_electricity_cost_kwh: float
     ges_estimated_cost_per_kwp: float
     ges_kwh_generation_per_kwp_annual: float
+    self_consumption_ratio: Optional[float] = None
+    grid_export_kwh_annual: Optional[float] = None
 
 class GESSuggestion(SuggestionBase):
     suggestion_type: str = "ges_investment"
@@ -256,6 +258,8 @@ class EmissionFactorBase(BaseModel):
     source: Optional[str] = None
     year: Optional[int] = None
     description: Optional[str] = None
+    valid_from: Optional[date] = None  # Boşsa year'ın 1 Ocak'ı
+    valid_to: Optional[date] = None    # Hariç; boşsa sonraki versiyona kadar geçerli
 
 class EmissionFactorCreate(EmissionFactorBase):
     pass
@@ -267,8 +271,12 @@ class EmissionFactorUpdate(BaseModel):
     source: Optional[str] = None
     year: Optional[int] = None
     description: Optional[str] = None
+    valid_from: Optional[date] = None
+    valid_to: Optional[date] = None
 
 class EmissionFactor(EmissionFactorBase):
+    id: int
+
     class Config:
         from_attributes = True
 
@@ -523,6 +531,8 @@ class ROIOpportunity(BaseModel):
     payback_months: float
     difficulty: str
     co2_reduction_tons: float
+    npv_tl: Optional[float] = None  # Önlem ömrü boyunca, %15 iskonto
+    irr_percentage: Optional[float] = None
 
 class QuickWin(BaseModel):
     name: str
@@ -550,6 +560,31 @@ class ROIAnalysisResponse(BaseModel):
     quick_wins: List[QuickWin]
     message: str
 
+class DistributionSpec(StrictBaseModel):
+    """Monte Carlo parametre dağılımı (triangular: low/mode/high, normal: mean/std, uniform: low/high, lognormal: mean/sigma)"""
+    dist: Literal["triangular", "normal", "uniform", "lognormal"]
+    low: Optional[float] = None
+    mode: Optional[float] = None
+    high: Optional[float] = None
+    mean: Optional[float] = None
+    std: Optional[float] = Field(None, ge=0)
+    sigma: Optional[float] = Field(None, ge=0)
+
+class ROIMonteCarloRequest(StrictBaseModel):
+    """ROI belirsizlik analizi; verilmeyen dağılımlar için varsayılanlar kullanılır"""
+    scenarios: int = Field(100_000, ge=1_000, le=500_000)
+    seed: Optional[int] = None
+    measures: Optional[List[str]] = None  # Boşsa tüm önlemler
+    # improvement_factor, price_growth, investment_factor, discount_rate
+    distributions: Optional[Dict[str, DistributionSpec]] = None
+
+class ROIPortfolioRequest(StrictBaseModel):
+    """Bütçe / CO2e hedefi kısıtlı önlem portföyü optimizasyonu"""
+    budget_tl: Optional[float] = Field(None, gt=0)  # Boşsa tüm önlemlerin toplam maliyeti
+    target_reduction_tco2e: Optional[float] = Field(None, ge=0)  # Yıllık
+    measures: Optional[List[str]] = None  # Boşsa tüm önlemler
+    resolution: int = Field(1000, ge=50, le=5000)  # Bütçe ekseni adım sayısı
+
 # YENİ: CBAM Report Schemas
 class CBAMReportRequest(StrictBaseModel):
     start_date: date
@@ -686,11 +721,30 @@ class ReportList(BaseModel):
 class ReportGenerationResponse(BaseModel):
     """Rapor oluşturma başlatma yanıtı"""
     report_id: int
-    celery_task_id: str
+    celery_task_id: Optional[str] = None  # Önbellekten dönen raporlarda None
     status: str
     message: str
     estimated_time_seconds: int  # Tahmin edilen işlem süresi
 
+class BulkCBAMReportRequest(StrictBaseModel):
+    """Dönem sonu toplu CBAM üretimi (admin)"""
+    start_date: date
+    end_date: date
+    period_name: Optional[str] = None  # "Q1 2024" gibi
+    company_ids: Optional[List[int]] = None  # Boşsa tesisi olan tüm şirketler
+
+    @field_validator('end_date')
+    @classmethod
+    def validate_dates(cls, v, info):
+        if 'start_date' in info.data and v < info.data['start_date']:
+            raise ValueError('Bitiş tarihi başlangıç tarihinden önce olamaz')
+        return v
+
+class BulkCBAMReportResponse(BaseModel):
+    celery_task_id: str
+    status: str
+    message: str
+
 # YENİ: Tedarikçi Ağı Schemas (Modül 3.1)
 
 class SupplierBase(StrictBaseModel):
@@ -896,5 +950,7 @@ class Leaderboard(BaseModel):
     region: Optional[str] = None
     entries: List[LeaderboardEntry]
     total: int
+    total_ranked: Optional[int] = None  # Filtredeki toplam şirket sayısı
     your_rank: Optional[int] = None
-    your_score: Optional[float] = None
\ No newline at end of file
+    your_score: Optional[float] = None
+    neighbours: List[LeaderboardEntry] = []  # Şirketinizin çevresindeki sıralama
\ No newline at end of file
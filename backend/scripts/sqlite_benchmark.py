@@ -0,0 +1,178 @@
+# backend/scripts/sqlite_benchmark.py
+
+"""
+SQLite profili benchmark'ı
+
+Aynı iş yükünü profil kapalı (varsayılan rollback journal) ve açık (WAL,
+synchronous=NORMAL, mmap, cache) iki ayrı geçici veritabanında çalıştırır:
+
+  1. Toplu yükleme: ActivityData satırları ekleme hızı (satır/sn)
+  2. Karışık yük: okuyucu thread'ler dashboard özetini
+     (crud.get_dashboard_summary) sorgularken yazıcı thread'ler API'deki gibi
+     satır başına commit ile veri ekler; okuma/yazma işlem hızı ve okuma
+     gecikmesi (p50/p95) raporlanır.
+
+Kullanım (backend dizininden):
+    python scripts/sqlite_benchmark.py --rows 50000 --seconds 10 --readers 4 --writers 2
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# database modülü içe aktarılırken varsayılan engine için bir URL gerekir
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "karbonuyum_bench_default.db"))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import crud  # noqa: E402
+import database  # noqa: E402
+import models  # noqa: E402
+
+FACILITIES = 20
+SEED_BATCH = 5000
+
+
+def _build(path: str, profile: bool):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    if profile:
+        database.enable_sqlite_profile(engine)
+    database.Base.metadata.create_all(engine)
+    return engine
+
+
+def _activity_row(facility_id: int, day: date, quantity: float) -> dict:
+    return {
+        "facility_id": facility_id,
+        "activity_type": models.ActivityType.electricity,
+        "quantity": quantity,
+        "unit": "kWh",
+        "scope": models.ScopeType.scope_2,
+        "start_date": day,
+        "end_date": day + timedelta(days=29),
+        "calculated_co2e_kg": quantity * 0.44,
+        "is_simulation": False,
+    }
+
+
+def _seed(Session, rows: int):
+    """Kullanıcı, şirket ve tesisleri oluşturur; satırları toplu ekler. (user_id, facility_ids, satır/sn)"""
+    with Session() as db:
+        user = models.User(email="bench@karbonuyum.local", hashed_password="x")
+        company = models.Company(name="Benchmark A.Ş.", owner=user)
+        company.members.append(user)
+        facilities = [models.Facility(company=company, name=f"Tesis {i}", city="Ankara") for i in range(FACILITIES)]
+        db.add_all([user, company, *facilities])
+        db.commit()
+        user_id, facility_ids = user.id, [f.id for f in facilities]
+
+    today = date.today()
+    started = time.perf_counter()
+    with Session() as db:
+        for offset in range(0, rows, SEED_BATCH):
+            batch = [
+                _activity_row(facility_ids[i % FACILITIES], today - timedelta(days=i % 730), 1000.0 + i % 500)
+                for i in range(offset, min(offset + SEED_BATCH, rows))
+            ]
+            db.execute(insert(models.ActivityData), batch)
+            db.commit()
+    return user_id, facility_ids, rows / (time.perf_counter() - started)
+
+
+def _mixed_load(Session, user_id: int, facility_ids, seconds: float, readers: int, writers: int) -> dict:
+    deadline = time.perf_counter() + seconds
+    lock = threading.Lock()
+    read_latencies, counts = [], {"writes": 0, "errors": 0}
+
+    def reader():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                with Session() as db:
+                    crud.get_dashboard_summary(db, user_id)
+            except Exception:
+                with lock:
+                    counts["errors"] += 1
+                continue
+            with lock:
+                read_latencies.append((time.perf_counter() - started) * 1000)
+
+    def writer(index: int):
+        i = 0
+        while time.perf_counter() < deadline:
+            try:
+                with Session() as db:
+                    db.execute(insert(models.ActivityData), [
+                        _activity_row(facility_ids[(index + i) % len(facility_ids)], date.today(), 750.0)
+                    ])
+                    db.commit()
+                with lock:
+                    counts["writes"] += 1
+            except Exception:
+                with lock:
+                    counts["errors"] += 1
+            i += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ordered = sorted(read_latencies)
+
+    def percentile(ratio):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))] if ordered else float("nan")
+
+    return {
+        "reads_per_s": len(ordered) / seconds,
+        "writes_per_s": counts["writes"] / seconds,
+        "read_p50_ms": percentile(0.5),
+        "read_p95_ms": percentile(0.95),
+        "errors": counts["errors"],
+    }
+
+
+def run(profile: bool, args) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = _build(os.path.join(directory, "bench.db"), profile)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        user_id, facility_ids, seed_rate = _seed(Session, args.rows)
+        result = _mixed_load(Session, user_id, facility_ids, args.seconds, args.readers, args.writers)
+        engine.dispose()
+    return {"seed_rows_per_s": seed_rate, **result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000, help="Başlangıçta yüklenecek ActivityData satırı")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Karışık yük süresi")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    args = parser.parse_args()
+    # Oturum olaylarının Redis uyarıları (tek sunuculu kurulumda Redis olmayabilir) çıktıyı boğmasın
+    logging.disable(logging.WARNING)
+
+    print(f"SQLite {'.'.join(map(str, __import__('sqlite3').sqlite_version_info))}, "
+          f"{args.rows} satır, {args.readers} okuyucu / {args.writers} yazıcı, {args.seconds:.0f} sn")
+    print(f"Profil: {database.SQLITE_PRAGMAS}\n")
+
+    results = {"profil kapalı": run(False, args), "profil açık": run(True, args)}
+
+    columns = ["seed_rows_per_s", "reads_per_s", "writes_per_s", "read_p50_ms", "read_p95_ms", "errors"]
+    print(f"{'':<16}" + "".join(f"{c:>17}" for c in columns))
+    for name, result in results.items():
+        print(f"{name:<16}" + "".join(f"{result[c]:>17.1f}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+# backend/services/auth_cache.py
+
+"""
+Kullanıcı ve Üyelik Çözümleme Önbelleği
+
+Her kimlikli istek JWT'yi çözüp kullanıcıyı e-postayla sorguluyor, ardından
+check_user_role / check_facility_access aynı kullanıcının Member kayıtlarını
+(bazı handler'larda birden çok kez) yeniden sorguluyordu. Bu modül iki katmanlı
+bir önbellek sağlar:
+
+  1. İstek içi: oturumun `info` sözlüğü. get_db her istek için bir oturum
+     açtığından bu katman istekle birlikte yok olur.
+  2. Redis: kısa ömürlü (AUTH_CACHE_TTL_SECONDS) kayıtlar, tüm API süreçleri
+     arasında paylaşılır.
+
+Kullanıcı Redis'ten geldiğinde `merge(load=False)` ile oturuma sorgusuz
+bağlanır; handler'lar her zamanki gibi oturuma bağlı bir `models.User` alır.
+Şifre hash'i önbelleğe yazılmaz, yalnızca erişildiğinde yüklenir.
+
+User veya Member satırları değiştiğinde (API, admin paneli, görevler) oturum
+olaylarıyla ilgili anahtarlar commit sonrasında silinir.
+
+Async endpoint'ler: redis-py senkron çalışır; olay döngüsünde beklemek tüm
+istekleri durdurur. Async yol, token'ın gerektireceği Redis kayıtlarını önce
+thread'de okur (prefetch) ve oturuma verir (prime). Çözümleme sırasında bu
+oturumda Redis'e gidilmez; önbellek yazımları biriktirilir ve yine thread'de
+yapılır (take_writes / write_back).
+
+İmzalı yetki talepleri (AUTH_TOKEN_CLAIMS=1):
+  Erişim token'ı kullanıcı id'si, aktiflik ve süper kullanıcı bayrakları,
+  (şirket, rol, tesis) listesi ve üyelik versiyonunu taşır. Token'daki versiyon Redis'teki kullanıcı
+  sayacıyla eşleşiyorsa kullanıcı ve üyelikler doğrudan token'dan çözülür;
+  veritabanına gidilmez. Üyelik veya kullanıcı değiştiğinde sayaç artırılır;
+  eski token'lar AUTH_STALE_CLAIMS_POLICY'ye göre ya normal yola düşer
+  ("fallback") ya da reddedilir ("reject"). Sayaç, yazan süreçte özellik
+  kapalı olsa da artırılır; aksi halde örneğin admin panelinden pasifleştirilen
+  kullanıcının token'ı API'de geçerli kalırdı.
+"""
+
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import redis
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+import models
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+USER_KEY = "auth:user:{email}"
+MEMBERSHIPS_KEY = "auth:memberships:{user_id}"
+VERSION_KEY = "auth:membership_version:{user_id}"
+
+CLAIMS_ENABLED = os.getenv("AUTH_TOKEN_CLAIMS", "0") == "1"
+STALE_CLAIMS_POLICY = os.getenv("AUTH_STALE_CLAIMS_POLICY", "fallback")  # fallback | reject
+
+_MEMO_KEY = "auth_cache"
+_INFO_KEY = "auth_cache_invalidate"
+_PREFETCH_KEY = "auth_cache_prefetch"
+
+# Önbelleğe alınan kullanıcı kolonları (hashed_password bilinçli olarak hariç)
+_USER_COLUMNS = ("id", "email", "is_active", "is_superuser")
+
+# Token'da roller tek harfle taşınır
+_ROLE_CODES = {
+    models.CompanyMemberRole.owner: "o",
+    models.CompanyMemberRole.admin: "a",
+    models.CompanyMemberRole.data_entry: "d",
+    models.CompanyMemberRole.viewer: "v",
+}
+_CODE_ROLES = {code: role for role, code in _ROLE_CODES.items()}
+
+
+class StaleClaimsError(Exception):
+    """Token'daki üyelik versiyonu güncel değil (reject politikası)"""
+
+
+@dataclass(frozen=True)
+class MembershipRecord:
+    company_id: int
+    role: models.CompanyMemberRole
+    facility_id: Optional[int]  # None → şirketin tüm tesisleri
+
+
+Memberships = Dict[int, Tuple[MembershipRecord, ...]]
+
+
+_redis_client: Optional[redis.Redis] = None
+
+
+def _get_redis() -> redis.Redis:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(
+            os.getenv('REDIS_URL', 'redis://localhost:6379/0'), socket_connect_timeout=1, socket_timeout=1
+        )
+    return _redis_client
+
+
+def _memo(db: Session) -> dict:
+    return db.info.setdefault(_MEMO_KEY, {})
+
+
+def _changed_in_transaction(db: Session, kind: str, value) -> bool:
+    """Bu oturumda commit edilmemiş değişiklik varsa Redis atlanır"""
+    pending = db.info.get(_INFO_KEY)
+    return bool(pending) and value in pending[kind]
+
+
+def _cache_get(key: str):
+    try:
+        raw = _get_redis().get(key)
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Kimlik önbelleği okunamadı: {e}")
+        return None
+    return json.loads(raw) if raw else None
+
+
+def _cache_set(key: str, value) -> None:
+    try:
+        _get_redis().set(key, json.dumps(value), ex=CACHE_TTL_SECONDS)
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Kimlik önbelleğine yazılamadı: {e}")
+
+
+def _shared_get(db: Session, key: str):
+    """Redis kaydı; async oturumda yalnızca önceden okunanlardan (yoksa ıska sayılır)"""
+    prefetched = db.info.get(_PREFETCH_KEY)
+    if prefetched is None:
+        return _cache_get(key)
+    return prefetched["values"].get(key)
+
+
+def _shared_set(db: Session, key: str, value) -> None:
+    prefetched = db.info.get(_PREFETCH_KEY)
+    if prefetched is None:
+        _cache_set(key, value)
+    else:
+        prefetched["writes"].append((key, value))
+
+
+def prefetch(payload: dict) -> dict:
+    """
+    Async istekler için thread'de çağrılır: token'ın çözümlemesinde gerekecek
+    Redis kayıtlarını (üyelik versiyonu, kullanıcı, üyelikler) okur.
+    """
+    values = {}
+    user_id = None
+    if CLAIMS_ENABLED and "mv" in payload and "uid" in payload:
+        user_id = payload["uid"]
+        values[VERSION_KEY.format(user_id=user_id)] = membership_version(user_id)
+    email = payload.get("sub")
+    if email:
+        values[USER_KEY.format(email=email)] = cached = _cache_get(USER_KEY.format(email=email))
+        if user_id is None and cached is not None:
+            user_id = cached["id"]
+    if user_id is not None:
+        values[MEMBERSHIPS_KEY.format(user_id=user_id)] = _cache_get(MEMBERSHIPS_KEY.format(user_id=user_id))
+    return values
+
+
+def prime(db: Session, values: dict) -> None:
+    """prefetch sonucunu oturuma verir; bu oturum artık Redis'e doğrudan gitmez"""
+    db.info[_PREFETCH_KEY] = {"values": values, "writes": []}
+
+
+def take_writes(db: Session) -> list:
+    """Async oturumda biriken önbellek yazımları (write_back ile thread'de yapılır)"""
+    prefetched = db.info.get(_PREFETCH_KEY)
+    if prefetched is None:
+        return []
+    writes, prefetched["writes"] = prefetched["writes"], []
+    return writes
+
+
+def write_back(writes: list) -> None:
+    for key, value in writes:
+        _cache_set(key, value)
+
+
+def get_user(db: Session, email: str) -> Optional[models.User]:
+    """E-postaya göre kullanıcı; önce istek içi, sonra Redis, en son veritabanı"""
+    memo = _memo(db)
+    memo_key = ("user", email)
+    if memo_key in memo:
+        return memo[memo_key]
+
+    shared = not _changed_in_transaction(db, "emails", email)
+    cached = _shared_get(db, USER_KEY.format(email=email)) if shared else None
+    if cached is not None:
+        user = models.User(**cached)
+        make_transient_to_detached(user)
+        user = db.merge(user, load=False)
+    else:
+        user = db.query(models.User).filter(models.User.email == email).first()
+        if user is not None and shared:
+            _shared_set(db, USER_KEY.format(email=email), {c: getattr(user, c) for c in _USER_COLUMNS})
+
+    memo[memo_key] = user
+    return user
+
+
+def get_memberships(db: Session, user_id: int) -> Memberships:
+    """Kullanıcının şirket bazında Member kayıtları"""
+    memo = _memo(db)
+    memo_key = ("memberships", user_id)
+    if memo_key in memo:
+        return memo[memo_key]
+
+    shared = not _changed_in_transaction(db, "user_ids", user_id)
+    rows = _shared_get(db, MEMBERSHIPS_KEY.format(user_id=user_id)) if shared else None
+    if rows is None:
+        rows = [
+            {"company_id": m.company_id, "role": m.role.value, "facility_id": m.facility_id}
+            for m in db.query(models.Member.company_id, models.Member.role, models.Member.facility_id).filter(
+                models.Member.user_id == user_id
+            ).order_by(models.Member.id)
+        ]
+        if shared:
+            _shared_set(db, MEMBERSHIPS_KEY.format(user_id=user_id), rows)
+
+    result = _group(
+        MembershipRecord(row["company_id"], models.CompanyMemberRole(row["role"]), row["facility_id"])
+        for row in rows
+    )
+    memo[memo_key] = result
+    return result
+
+
+def _group(records: Iterable[MembershipRecord]) -> Memberships:
+    memberships: Dict[int, list] = {}
+    for record in records:
+        memberships.setdefault(record.company_id, []).append(record)
+    return {company_id: tuple(items) for company_id, items in memberships.items()}
+
+
+def get_company_memberships(db: Session, user_id: int, company_id: int) -> Tuple[MembershipRecord, ...]:
+    """Kullanıcının bir şirketteki kayıtları; üye değilse boş"""
+    return get_memberships(db, user_id).get(company_id, ())
+
+
+def invalidate(emails: Set[str] = frozenset(), user_ids: Set[int] = frozenset()) -> None:
+    """Verilen kullanıcıların Redis kayıtlarını siler"""
+    keys = [USER_KEY.format(email=e) for e in emails] + [MEMBERSHIPS_KEY.format(user_id=u) for u in user_ids]
+    if not keys:
+        return
+    try:
+        _get_redis().delete(*keys)
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Kimlik önbelleği temizlenemedi: {e}")
+
+
+# --- İmzalı yetki talepleri ------------------------------------------------
+
+def membership_version(user_id: int) -> Optional[int]:
+    """
+    Kullanıcının üyelik versiyonu; Redis erişilemezse None.
+    Anahtar yoksa zaman damgasıyla başlatılır; Redis boşaltılsa bile eski
+    token'lardaki versiyonlar yeni değerle çakışmaz.
+    """
+    key = VERSION_KEY.format(user_id=user_id)
+    try:
+        client = _get_redis()
+        version = client.get(key)
+        if version is None:
+            client.set(key, time.time_ns(), nx=True)
+            version = client.get(key)
+        return int(version)
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Üyelik versiyonu okunamadı: {e}")
+        return None
+
+
+def bump_membership_versions(user_ids: Iterable[int]) -> None:
+    """Kullanıcıların token'lardaki yetki taleplerini geçersiz kılar"""
+    try:
+        pipe = _get_redis().pipeline()
+        for user_id in user_ids:
+            key = VERSION_KEY.format(user_id=user_id)
+            # Sayaç 1'den başlarsa Redis boşaltıldıktan sonra eski versiyonlarla çakışabilir
+            pipe.set(key, time.time_ns(), nx=True)
+            pipe.incr(key)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Üyelik versiyonu artırılamadı: {e}")
+
+
+def build_claims(db: Session, user: models.User) -> dict:
+    """
+    Token'a eklenecek yetki talepleri. Özellik kapalıysa veya versiyon
+    okunamıyorsa boş döner; token bu durumda normal yoldan doğrulanır.
+    """
+    if not CLAIMS_ENABLED:
+        return {}
+    version = membership_version(user.id)
+    if version is None:
+        return {}
+    memberships = get_memberships(db, user.id)
+    return {
+        "uid": user.id,
+        "act": bool(user.is_active),
+        "su": bool(user.is_superuser),
+        "mem": [
+            [m.company_id, _ROLE_CODES[m.role], m.facility_id]
+            for records in memberships.values() for m in records
+        ],
+        "mv": version,
+    }
+
+
+def user_from_claims(db: Session, payload: dict) -> Optional[models.User]:
+    """
+    Token'daki talepler güncelse kullanıcıyı ve üyeliklerini sorgusuz çözer.
+    Talep yoksa veya doğrulanamıyorsa None (normal yol kullanılır).
+    Versiyon eskiyse reject politikasında StaleClaimsError yükseltir.
+    """
+    if not CLAIMS_ENABLED or "mv" not in payload or "uid" not in payload:
+        return None
+    user_id, email = payload["uid"], payload.get("sub")
+    prefetched = db.info.get(_PREFETCH_KEY)
+    if prefetched is None:
+        current = membership_version(user_id)
+    else:
+        current = prefetched["values"].get(VERSION_KEY.format(user_id=user_id))
+    if current is None:
+        return None
+    if current != payload["mv"]:
+        if STALE_CLAIMS_POLICY == "reject":
+            raise StaleClaimsError(f"user {user_id}: token v{payload['mv']}, current v{current}")
+        return None
+
+    # Tüm önbelleklenen kolonlar verilir; erişildiğinde tembel yükleme yapılmaz
+    user = models.User(
+        id=user_id, email=email, is_active=payload.get("act", True), is_superuser=payload.get("su", False)
+    )
+    make_transient_to_detached(user)
+    user = db.merge(user, load=False)
+
+    memo = _memo(db)
+    memo[("user", email)] = user
+    memo[("memberships", user_id)] = _group(
+        MembershipRecord(company_id, _CODE_ROLES[role], facility_id)
+        for company_id, role, facility_id in payload.get("mem", [])
+    )
+    return user
+
+
+# --- Değişiklik yakalama ---------------------------------------------------
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context) -> None:
+    emails, user_ids = set(), set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, models.User):
+            history = inspect(obj).attrs.email.history
+            emails.update(e for e in chain(history.added, history.unchanged, history.deleted) if e)
+            if obj.id is not None:
+                user_ids.add(obj.id)
+        elif isinstance(obj, models.Member):
+            history = inspect(obj).attrs.user_id.history
+            user_ids.update(u for u in chain(history.added, history.unchanged, history.deleted) if u)
+
+    if not (emails or user_ids):
+        return
+    # Aynı istekte değişiklikten sonra yapılan kontroller güncel veriyi görsün
+    session.info.pop(_MEMO_KEY, None)
+    pending = session.info.setdefault(_INFO_KEY, {"emails": set(), "user_ids": set()})
+    pending["emails"].update(emails)
+    pending["user_ids"].update(user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    pending = session.info.pop(_INFO_KEY, None)
+    if pending:
+        invalidate(pending["emails"], pending["user_ids"])
+        # Token'ları okuyan süreçlerde özellik açık olabilir
+        bump_membership_versions(pending["user_ids"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session) -> None:
+    session.info.pop(_INFO_KEY, None)
+    session.info.pop(_MEMO_KEY, None)
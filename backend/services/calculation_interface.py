@@ -7,6 +7,7 @@ This interface ensures that all calculation service implementations
 """
 
 from abc import ABC, abstractmethod
+from typing import List, Sequence
 
 import schemas
 
@@ -39,6 +40,24 @@ class ICalculationService(ABC):
         """
         pass
     
+    def calculate_batch(
+        self,
+        activities: Sequence[schemas.ActivityDataBase]
+    ) -> List[schemas.EmissionCalculationResult]:
+        """
+        Calculate CO2e emissions for many activities at once.
+        
+        The default implementation calls calculate_for_activity per row; providers
+        that can resolve all rows in one pass should override it.
+        
+        Args:
+            activities: Activity rows, possibly spanning multiple years
+            
+        Returns:
+            List[EmissionCalculationResult]: Results aligned with the input order
+        """
+        return [self.calculate_for_activity(activity) for activity in activities]
+    
     @abstractmethod
     def get_provider_name(self) -> str:
         """
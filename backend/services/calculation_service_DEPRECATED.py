@@ -11,14 +11,16 @@ Fallback mekanizması olarak tutulur - sistem dayanıklılığını artırır.
 
 import logging
 from datetime import date
+from typing import List, Optional, Sequence
 
+import numpy as np
 from sqlalchemy.orm import Session
 
-import crud
 import models
 import schemas
 
 from .calculation_interface import ICalculationService
+from .reference_data import EmissionFactorRecord, get_reference_snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +28,8 @@ logger = logging.getLogger(__name__)
 class CalculationService(ICalculationService):
     """
     GHG Protokolü uyumlu emisyon hesaplama servisi (Fallback/Internal).
-    Yıl bazlı emisyon faktörleri kullanır ve Scope bilgisi ile hesaplama yapar.
+    Her aktivite, başlangıç tarihinde geçerli olan faktör versiyonuyla hesaplanır
+    ve Scope bilgisi ile hesaplama yapar.
     
     Implements ICalculationService interface for pluggable provider architecture.
     """
@@ -35,10 +38,12 @@ class CalculationService(ICalculationService):
         """
         Args:
             db: Veritabanı session'ı
-            year: Hesaplama için kullanılacak yıl. None ise mevcut yıl kullanılır.
+            year: emission_factors özetinin yılı. None ise mevcut yıl kullanılır.
+                Hesaplamalar her zaman aktivitenin start_date'ine göre yapılır.
         """
         self.db = db
         self.year = year if year is not None else date.today().year
+        self.factor_index = get_reference_snapshot(self.db).emission_factor_index
         self.emission_factors = self._load_factors()
     
     def get_provider_name(self) -> str:
@@ -53,9 +58,9 @@ class CalculationService(ICalculationService):
         """
         return len(self.emission_factors) > 0
     
-    def _load_factors(self) -> dict[str, models.EmissionFactor]:
-        """Belirtilen yıla ait emisyon faktörlerini yükler."""
-        return crud.get_emission_factors_by_year(self.db, self.year)
+    def _load_factors(self) -> dict[str, EmissionFactorRecord]:
+        """Belirtilen yılın başında geçerli emisyon faktörleri (süreç içi referans görüntüsünden)."""
+        return self.factor_index.as_of(date(self.year, 1, 1))
     
     def _get_scope(self, activity_type: models.ActivityType) -> models.ScopeType:
         """
@@ -83,9 +88,28 @@ class CalculationService(ICalculationService):
         }
         return factor_keys.get(activity_type)
     
+    def _missing_factor_result(
+        self, activity_data: schemas.ActivityDataBase, scope: models.ScopeType, factor_key: Optional[str]
+    ) -> schemas.EmissionCalculationResult:
+        logger.warning(
+            f"Emisyon faktörü '{factor_key}' bulunamadı. "
+            f"Aktivite tipi: {activity_data.activity_type}, Tarih: {activity_data.start_date}. "
+            f"Using internal fallback calculation with zero emissions."
+        )
+        # Sıfır emisyon döndür ama hesaplama bilgilerini koru
+        return schemas.EmissionCalculationResult(
+            total_co2e_kg=0.0,
+            scope=scope,
+            emission_factor_used=factor_key or "unknown",
+            emission_factor_value=0.0,
+            calculation_year=activity_data.start_date.year,
+            is_fallback=True
+        )
+    
     def calculate_for_activity(self, activity_data: schemas.ActivityDataBase) -> schemas.EmissionCalculationResult:
         """
         Verilen aktivite verisi için detaylı emisyon hesaplaması yapar.
+        Faktör, aktivitenin start_date'inde geçerli olan versiyondur.
         
         WARNING: This is a fallback/internal calculation service.
         Results may be less accurate than Climatiq API calculations.
@@ -98,25 +122,16 @@ class CalculationService(ICalculationService):
         
         # Emisyon faktörünü bul
         factor_key = self._get_factor_key(activity_data.activity_type)
+        emission_factor, covered = self.factor_index.match(factor_key, activity_data.start_date)
         
-        if not factor_key or factor_key not in self.emission_factors:
+        if emission_factor is None:
+            return self._missing_factor_result(activity_data, scope, factor_key)
+        if not covered:
             logger.warning(
-                f"Emisyon faktörü '{factor_key}' bulunamadı. "
-                f"Aktivite tipi: {activity_data.activity_type}, Yıl: {self.year}. "
-                f"Using internal fallback calculation with zero emissions."
-            )
-            # Sıfır emisyon döndür ama hesaplama bilgilerini koru
-            return schemas.EmissionCalculationResult(
-                total_co2e_kg=0.0,
-                scope=scope,
-                emission_factor_used=factor_key or "unknown",
-                emission_factor_value=0.0,
-                calculation_year=self.year,
-                is_fallback=True
+                f"'{factor_key}' için {activity_data.start_date} tarihini kapsayan versiyon yok; "
+                f"en yakın versiyon kullanıldı (valid_from={emission_factor.valid_from or emission_factor.year})."
             )
         
-        emission_factor = self.emission_factors[factor_key]
-        
         # CO2e hesaplama
         total_co2e_kg = activity_data.quantity * emission_factor.value
         
@@ -131,10 +146,49 @@ class CalculationService(ICalculationService):
             scope=scope,
             emission_factor_used=factor_key,
             emission_factor_value=emission_factor.value,
-            calculation_year=self.year,
+            calculation_year=activity_data.start_date.year,
             is_fallback=True  # Mark as fallback for legal transparency
         )
     
+    def calculate_batch(
+        self, activities: Sequence[schemas.ActivityDataBase]
+    ) -> List[schemas.EmissionCalculationResult]:
+        """
+        Çok yıllı toplu hesaplama: tüm satırların faktörleri tek bir as-of join ile
+        (satırın start_date'ine göre) bulunur ve CO2e vektörel hesaplanır.
+        """
+        if not activities:
+            return []
+        
+        factor_keys = [self._get_factor_key(a.activity_type) for a in activities]
+        join = self.factor_index.lookup_many(factor_keys, [a.start_date for a in activities])
+        totals = np.asarray([a.quantity for a in activities], dtype=np.float64) * join.values
+        
+        results = []
+        for row, activity_data in enumerate(activities):
+            scope = self._get_scope(activity_data.activity_type)
+            emission_factor = join.record(row)
+            if emission_factor is None:
+                results.append(self._missing_factor_result(activity_data, scope, factor_keys[row]))
+                continue
+            results.append(schemas.EmissionCalculationResult(
+                total_co2e_kg=float(totals[row]),
+                scope=scope,
+                emission_factor_used=factor_keys[row],
+                emission_factor_value=emission_factor.value,
+                calculation_year=activity_data.start_date.year,
+                is_fallback=True
+            ))
+        
+        uncovered = int(np.count_nonzero((join.positions >= 0) & ~join.covered))
+        if uncovered:
+            logger.warning(f"{uncovered} satır için tarihi kapsayan faktör versiyonu yok; en yakın versiyon kullanıldı.")
+        logger.warning(
+            f"Using internal fallback calculation for {len(activities)} activities. "
+            f"This calculation may not reflect current standards or Climatiq data."
+        )
+        return results
+    
     def calculate_co2e(self, activity_data: schemas.ActivityDataBase) -> float:
         """
         Basit CO2e hesaplama (geriye dönük uyumluluk için).
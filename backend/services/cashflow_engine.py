@@ -0,0 +1,138 @@
+# backend/services/cashflow_engine.py
+
+"""
+Vektörel Nakit Akışı Motoru - NPV, geri ödeme ve gerçek IRR
+
+Tüm fonksiyonlar son ekseni zaman (yıl) olan nakit akışı dizileri alır:
+    flows[..., 0]  = t=0 (genelde -yatırım)
+    flows[..., t]  = t. yılın net nakit akışı
+Önceki eksenler serbesttir (önlem × yıl, şirket × önlem × yıl, senaryo × yıl ...);
+böylece binlerce önlem/şirket kombinasyonu tek çağrıda değerlendirilir.
+İskonto oranları son eksen hariç şekle yayınlanabilir (broadcast) olmalıdır.
+"""
+
+from typing import Optional, Union
+
+import numpy as np
+
+ArrayLike = Union[float, np.ndarray]
+
+IRR_LOWER = -0.99
+IRR_UPPER = 10.0
+IRR_TOLERANCE = 1e-7
+IRR_MAX_ITER = 100
+
+
+def level_flows(
+    annual: ArrayLike,
+    investment: ArrayLike,
+    years: int,
+    growth: ArrayLike = 0.0,
+    degradation: ArrayLike = 0.0
+) -> np.ndarray:
+    """
+    Sabit yıllık tasarruftan nakit akışı dizisi üretir (..., years + 1).
+    t. yıl akışı: annual × (1 - degradation × t) × (1 + growth)^t, t=0'da -investment.
+    """
+    annual = np.asarray(annual, dtype=float)
+    investment = np.asarray(investment, dtype=float)
+    growth = np.asarray(growth, dtype=float)
+    degradation = np.asarray(degradation, dtype=float)
+
+    t = np.arange(1, years + 1)
+    profile = (1 - degradation[..., None] * t) * (1 + growth[..., None]) ** t
+    body = annual[..., None] * profile
+    head = np.broadcast_to(-investment, body.shape[:-1])[..., None]
+    return np.concatenate([head, body], axis=-1)
+
+
+def discount_factors(rate: ArrayLike, periods: int) -> np.ndarray:
+    """(1 + rate)^-t, t = 0..periods-1 → (..., periods)"""
+    rate = np.asarray(rate, dtype=float)
+    return (1 + rate[..., None]) ** -np.arange(periods)
+
+
+def npv(flows: np.ndarray, rate: ArrayLike) -> np.ndarray:
+    """Net bugünkü değer (t=0 iskontosuz)"""
+    flows = np.asarray(flows, dtype=float)
+    return (flows * discount_factors(rate, flows.shape[-1])).sum(axis=-1)
+
+
+def payback_years(flows: np.ndarray, rate: Optional[ArrayLike] = None) -> np.ndarray:
+    """
+    Kümülatif nakit akışının sıfırı geçtiği kesirli yıl (yıl içinde doğrusal).
+    rate verilirse iskontolu geri ödeme; hiç geçilmiyorsa NaN.
+    """
+    flows = np.asarray(flows, dtype=float)
+    if rate is not None:
+        flows = flows * discount_factors(rate, flows.shape[-1])
+
+    cumulative = np.cumsum(flows, axis=-1)
+    reached = cumulative >= 0
+    paid_back = reached.any(axis=-1)
+    idx = reached.argmax(axis=-1)
+
+    before = np.take_along_axis(cumulative, np.maximum(idx - 1, 0)[..., None], -1)[..., 0]
+    year_flow = np.take_along_axis(flows, idx[..., None], -1)[..., 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.where(year_flow > 0, -before / year_flow, 1.0)
+    years = np.where(idx > 0, idx - 1 + np.clip(fraction, 0, 1), 0.0)
+    return np.where(paid_back, years, np.nan)
+
+
+def irr(
+    flows: np.ndarray,
+    lower: float = IRR_LOWER,
+    upper: float = IRR_UPPER,
+    tol: float = IRR_TOLERANCE,
+    max_iter: int = IRR_MAX_ITER
+) -> np.ndarray:
+    """
+    İç verim oranı: NPV(r) = 0 kökü. Newton adımı [alt, üst] aralığının dışına
+    çıkarsa veya türev sıfırsa ikiye bölme yapılır (güvenli Newton). Aralıkta
+    işaret değişimi olmayan akışlar için NaN döner.
+    """
+    flows = np.asarray(flows, dtype=float)
+    shape = flows.shape[:-1]
+    t = np.arange(flows.shape[-1])
+
+    def value_and_slope(r):
+        base = (1 + r)[..., None]
+        disc = base ** -t
+        value = (flows * disc).sum(axis=-1)
+        slope = (-t * flows * disc / base).sum(axis=-1)
+        return value, slope
+
+    lo = np.full(shape, lower)
+    hi = np.full(shape, upper)
+    f_lo, _ = value_and_slope(lo)
+    f_hi, _ = value_and_slope(hi)
+    bracketed = np.sign(f_lo) * np.sign(f_hi) < 0
+
+    scale = np.maximum(1.0, np.abs(flows).max(axis=-1))
+    r = np.clip(np.full(shape, 0.1), lower, upper)
+    previous_step = np.full(shape, upper - lower)
+    done = ~bracketed
+    for _ in range(max_iter):
+        value, slope = value_and_slope(r)
+        done |= np.abs(value) <= tol * scale
+        if done.all():
+            break
+
+        # Kökü içeren aralığı daralt
+        same_as_lo = np.sign(value) == np.sign(f_lo)
+        lo = np.where(same_as_lo & ~done, r, lo)
+        f_lo = np.where(same_as_lo & ~done, value, f_lo)
+        hi = np.where(~same_as_lo & ~done, r, hi)
+
+        # Newton adımı aralık dışındaysa veya yeterince hızlı yakınsamıyorsa ikiye böl
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = r - value / slope
+        fast = np.abs(2 * value) <= np.abs(previous_step * slope)
+        use_newton = np.isfinite(newton) & (newton > lo) & (newton < hi) & fast
+        step = np.where(use_newton, newton, (lo + hi) / 2)
+        done |= np.abs(hi - lo) <= tol
+        previous_step = np.where(done, previous_step, np.abs(step - r))
+        r = np.where(done, r, step)
+
+    return np.where(bracketed, r, np.nan)
@@ -5,11 +5,14 @@ CBAM (Carbon Border Adjustment Mechanism) XML Rapor Servisi
 AB'nin CBAM düzenlemelerine uygun XML rapor üretimi
 """
 
+import io
 import logging
 from datetime import date, datetime
-from typing import Dict
+from itertools import groupby
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from lxml import etree
+from sqlalchemy import and_, func
 from sqlalchemy.orm import Session
 
 import models
@@ -27,6 +30,9 @@ class CBAMReportService:
     CBAM_NAMESPACE = "urn:eu:cbam:report:v1"
     CBAM_SCHEMA_LOCATION = "https://ec.europa.eu/taxation_customs/cbam/schemas/cbam_report_v1.xsd"
     
+    # Rapor çıktısını etkileyen her değişiklikte artırılmalı (rapor önbelleği parmak izi)
+    GENERATOR_VERSION = "2"
+    
     # CBAM ürün kodları (CN kodları)
     PRODUCT_CODES = {
         "electricity": "2716000000",  # Elektrik enerjisi
@@ -60,8 +66,30 @@ class CBAMReportService:
         Returns:
             XML string formatında CBAM raporu
         """
+        buffer = io.BytesIO()
+        self.write_cbam_report(buffer, company_id, start_date, end_date, reporting_period)
+        return buffer.getvalue().decode('utf-8')
+    
+    def write_cbam_report(
+        self,
+        output: Union[str, BinaryIO],
+        company_id: int,
+        start_date: date,
+        end_date: date,
+        reporting_period: str = None
+    ) -> Dict[str, float]:
+        """
+        CBAM XML raporunu doğrudan dosyaya/akışa artımlı olarak yazar.
+        
+        Tesis × scope × aktivite tipi toplamları tek bir gruplanmış SQL sorgusuyla
+        alınır ve tesis tesis akıtılır; bellekte tüm XML ağacı tutulmaz.
         
-        # Şirket bilgilerini al
+        Args:
+            output: Dosya yolu veya binary yazılabilir akış
+        
+        Returns:
+            Şirket toplam emisyonları (tCO2e): scope1, scope2, scope3, total
+        """
         company = self.db.query(models.Company).filter(
             models.Company.id == company_id
         ).first()
@@ -69,130 +97,267 @@ class CBAMReportService:
         if not company:
             raise ValueError(f"Şirket bulunamadı: {company_id}")
         
+        totals = self.render_cbam_report(
+            output,
+            declarant=self._declarant_payload(company),
+            installations=self._iter_facility_emissions(company_id, start_date, end_date),
+            start_date=start_date,
+            reporting_period=reporting_period,
+            has_electricity_imports=self._has_electricity_imports(company, start_date, end_date)
+        )
+        
+        logger.info(f"CBAM raporu üretildi: Company={company_id}, Period={reporting_period}")
+        
+        return totals
+    
+    @classmethod
+    def render_cbam_report(
+        cls,
+        output: Union[str, BinaryIO],
+        declarant: Dict,
+        installations: Iterable[Tuple[Dict, Dict[str, float]]],
+        start_date: date,
+        reporting_period: str = None,
+        has_electricity_imports: bool = False
+    ) -> Dict[str, float]:
+        """
+        Hazır (veritabanından bağımsız) verilerden CBAM XML'ini akıtarak yazar.
+        Toplu üretimde worker'lar bu metodu DB'ye dokunmadan çağırır.
+        
+        Args:
+            declarant: company_id, name, tax_number, contact_email
+            installations: (tesis {id, name, city}, emisyon verisi) çiftleri
+        
+        Returns:
+            Şirket toplam emisyonları (tCO2e): scope1, scope2, scope3, total
+        """
         # Raporlama dönemi
         if not reporting_period:
             reporting_period = f"{start_date.year}-Q{(start_date.month-1)//3+1}"
         
-        # XML root element
-        root = etree.Element(
-            "{%s}CBAMReport" % self.CBAM_NAMESPACE,
-            nsmap={None: self.CBAM_NAMESPACE},
-            version="1.0"
-        )
+        company_id = declarant["company_id"]
+        totals = {
+            "scope1": 0,
+            "scope2": 0,
+            "scope3": 0,
+            "total": 0
+        }
+        now = datetime.now()
         
-        # Report Header
-        header = etree.SubElement(root, "ReportHeader")
-        etree.SubElement(header, "ReportID").text = f"CBAM-TR-{company_id}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        etree.SubElement(header, "ReportingPeriod").text = reporting_period
-        etree.SubElement(header, "SubmissionDate").text = datetime.now().strftime("%Y-%m-%d")
-        etree.SubElement(header, "ReportType").text = "QUARTERLY"  # QUARTERLY veya ANNUAL
+        with etree.xmlfile(output, encoding='UTF-8') as xf:
+            xf.write_declaration()
+            with xf.element(cls._tag("CBAMReport"), nsmap={None: cls.CBAM_NAMESPACE}, version="1.0"):
+                xf.write("\n")
+                
+                # Report Header
+                header = cls._element("ReportHeader")
+                cls._sub(header, "ReportID", f"CBAM-TR-{company_id}-{now.strftime('%Y%m%d%H%M%S')}")
+                cls._sub(header, "ReportingPeriod", reporting_period)
+                cls._sub(header, "SubmissionDate", now.strftime("%Y-%m-%d"))
+                cls._sub(header, "ReportType", "QUARTERLY")  # QUARTERLY veya ANNUAL
+                xf.write(header, pretty_print=True)
+                
+                # Declarant (Beyan Eden) Bilgileri
+                declarant_el = cls._element("Declarant")
+                cls._sub(declarant_el, "Name", declarant["name"])
+                cls._sub(declarant_el, "TaxNumber", declarant.get("tax_number") or f"TR{company_id:010d}")
+                cls._sub(declarant_el, "Country", "TR")
+                cls._sub(declarant_el, "ContactEmail", declarant.get("contact_email") or "info@example.com")
+                xf.write(declarant_el, pretty_print=True)
+                
+                # Installations (Tesisler) - her tesis yazılır yazılmaz bellekten atılır
+                with xf.element(cls._tag("Installations")):
+                    xf.write("\n")
+                    for facility, emissions_data in installations:
+                        totals["scope1"] += emissions_data["scope1_total"]
+                        totals["scope2"] += emissions_data["scope2_total"]
+                        xf.write(cls._build_installation(facility, emissions_data), pretty_print=True)
+                xf.write("\n")
+                
+                # Goods (İthal Edilen Ürünler - Opsiyonel)
+                # Bu kısım, şirket ithalat yapıyorsa doldurulacak
+                goods = cls._element("ImportedGoods")
+                
+                # Elektrik ithalatı örneği (varsa)
+                if has_electricity_imports:
+                    good = cls._sub(goods, "Good")
+                    cls._sub(good, "CNCode", cls.PRODUCT_CODES["electricity"])
+                    cls._sub(good, "Description", "Imported Electricity")
+                    cls._sub(good, "Quantity", "0")  # İthalat miktarı
+                    cls._sub(good, "Unit", "MWh")
+                    cls._sub(good, "OriginCountry", "EU")  # Menşe ülke
+                    cls._sub(good, "EmbeddedEmissions", "0")  # Gömülü emisyonlar
+                xf.write(goods, pretty_print=True)
+                
+                # Summary (Özet) - tesisler yazılırken biriktirilen toplamlar
+                totals["total"] = totals["scope1"] + totals["scope2"] + totals["scope3"]
+                summary = cls._element("Summary")
+                cls._sub(summary, "TotalDirectEmissions", f"{totals['scope1']:.2f}")
+                cls._sub(summary, "TotalIndirectEmissions", f"{totals['scope2']:.2f}")
+                cls._sub(summary, "TotalEmissions", f"{totals['total']:.2f}")
+                cls._sub(summary, "Unit", "tCO2e")
+                xf.write(summary, pretty_print=True)
+                
+                # Verification (Doğrulama) Bilgileri
+                verification = cls._element("Verification")
+                cls._sub(verification, "Status", "PENDING")  # PENDING, VERIFIED, REJECTED
+                cls._sub(verification, "VerifierName", "KarbonUyum Platform")
+                cls._sub(verification, "VerificationDate", now.strftime("%Y-%m-%d"))
+                cls._sub(verification, "VerificationMethod", "CALCULATION_BASED")
+                xf.write(verification, pretty_print=True)
         
-        # Declarant (Beyan Eden) Bilgileri
-        declarant = etree.SubElement(root, "Declarant")
-        etree.SubElement(declarant, "Name").text = company.name
-        etree.SubElement(declarant, "TaxNumber").text = company.tax_number or f"TR{company.id:010d}"
-        etree.SubElement(declarant, "Country").text = "TR"
-        etree.SubElement(declarant, "ContactEmail").text = company.owner.email if company.owner else "info@example.com"
+        return totals
+    
+    @staticmethod
+    def _declarant_payload(company: models.Company) -> Dict:
+        return {
+            "company_id": company.id,
+            "name": company.name,
+            "tax_number": company.tax_number,
+            "contact_email": company.owner.email if company.owner else None,
+        }
+    
+    @classmethod
+    def _tag(cls, name: str) -> str:
+        return "{%s}%s" % (cls.CBAM_NAMESPACE, name)
+    
+    @classmethod
+    def _element(cls, name: str) -> etree._Element:
+        return etree.Element(cls._tag(name), nsmap={None: cls.CBAM_NAMESPACE})
+    
+    @classmethod
+    def _sub(cls, parent: etree._Element, name: str, text: Optional[str] = None) -> etree._Element:
+        child = etree.SubElement(parent, cls._tag(name))
+        if text is not None:
+            child.text = text
+        return child
+    
+    @classmethod
+    def _build_installation(cls, facility: Dict, emissions_data: Dict[str, float]) -> etree._Element:
+        """
+        Tek bir tesisin <Installation> alt ağacını oluşturur
+        """
+        installation = cls._element("Installation")
+        cls._sub(installation, "InstallationID", f"TR-FAC-{facility['id']}")
+        cls._sub(installation, "Name", facility["name"])
+        cls._sub(installation, "City", facility.get("city") or "Unknown")
+        cls._sub(installation, "Country", "TR")
         
-        # Installations (Tesisler)
-        installations = etree.SubElement(root, "Installations")
+        emissions = cls._sub(installation, "Emissions")
         
-        for facility in company.facilities:
-            installation = etree.SubElement(installations, "Installation")
-            etree.SubElement(installation, "InstallationID").text = f"TR-FAC-{facility.id}"
-            etree.SubElement(installation, "Name").text = facility.name
-            etree.SubElement(installation, "City").text = facility.city or "Unknown"
-            etree.SubElement(installation, "Country").text = "TR"
+        # Direct Emissions (Scope 1)
+        if emissions_data.get("scope1_total", 0) > 0:
+            direct = cls._sub(emissions, "DirectEmissions")
+            cls._sub(direct, "CO2", f"{emissions_data['scope1_total']:.2f}")
+            cls._sub(direct, "Unit", "tCO2e")
             
-            # Installation Emissions
-            emissions_data = self._calculate_facility_emissions(
-                facility, start_date, end_date
-            )
+            # Yakıt detayları
+            if emissions_data.get("natural_gas_co2", 0) > 0:
+                fuel = cls._sub(direct, "FuelType")
+                cls._sub(fuel, "Type", "NATURAL_GAS")
+                cls._sub(fuel, "Consumption", f"{emissions_data['natural_gas_m3']:.2f}")
+                cls._sub(fuel, "Unit", "m3")
+                cls._sub(fuel, "EmissionFactor", "2.03")
             
-            if emissions_data:
-                emissions = etree.SubElement(installation, "Emissions")
-                
-                # Direct Emissions (Scope 1)
-                if emissions_data.get("scope1_total", 0) > 0:
-                    direct = etree.SubElement(emissions, "DirectEmissions")
-                    etree.SubElement(direct, "CO2").text = f"{emissions_data['scope1_total']:.2f}"
-                    etree.SubElement(direct, "Unit").text = "tCO2e"
-                    
-                    # Yakıt detayları
-                    if emissions_data.get("natural_gas_co2", 0) > 0:
-                        fuel = etree.SubElement(direct, "FuelType")
-                        etree.SubElement(fuel, "Type").text = "NATURAL_GAS"
-                        etree.SubElement(fuel, "Consumption").text = f"{emissions_data['natural_gas_m3']:.2f}"
-                        etree.SubElement(fuel, "Unit").text = "m3"
-                        etree.SubElement(fuel, "EmissionFactor").text = "2.03"
-                    
-                    if emissions_data.get("diesel_co2", 0) > 0:
-                        fuel = etree.SubElement(direct, "FuelType")
-                        etree.SubElement(fuel, "Type").text = "DIESEL"
-                        etree.SubElement(fuel, "Consumption").text = f"{emissions_data['diesel_liters']:.2f}"
-                        etree.SubElement(fuel, "Unit").text = "liters"
-                        etree.SubElement(fuel, "EmissionFactor").text = "2.68"
-                
-                # Indirect Emissions (Scope 2 - Elektrik)
-                if emissions_data.get("scope2_total", 0) > 0:
-                    indirect = etree.SubElement(emissions, "IndirectEmissions")
-                    electricity = etree.SubElement(indirect, "Electricity")
-                    etree.SubElement(electricity, "Consumption").text = f"{emissions_data['electricity_kwh']:.2f}"
-                    etree.SubElement(electricity, "Unit").text = "MWh"
-                    etree.SubElement(electricity, "CO2").text = f"{emissions_data['scope2_total']:.2f}"
-                    etree.SubElement(electricity, "EmissionFactor").text = f"{emissions_data.get('electricity_factor', 0.42):.3f}"
-                    etree.SubElement(electricity, "GridMix").text = "TR_NATIONAL_GRID"
-        
-        # Goods (İthal Edilen Ürünler - Opsiyonel)
-        # Bu kısım, şirket ithalat yapıyorsa doldurulacak
-        goods = etree.SubElement(root, "ImportedGoods")
-        
-        # Elektrik ithalatı örneği (varsa)
-        if self._has_electricity_imports(company, start_date, end_date):
-            good = etree.SubElement(goods, "Good")
-            etree.SubElement(good, "CNCode").text = self.PRODUCT_CODES["electricity"]
-            etree.SubElement(good, "Description").text = "Imported Electricity"
-            etree.SubElement(good, "Quantity").text = "0"  # İthalat miktarı
-            etree.SubElement(good, "Unit").text = "MWh"
-            etree.SubElement(good, "OriginCountry").text = "EU"  # Menşe ülke
-            etree.SubElement(good, "EmbeddedEmissions").text = "0"  # Gömülü emisyonlar
+            if emissions_data.get("diesel_co2", 0) > 0:
+                fuel = cls._sub(direct, "FuelType")
+                cls._sub(fuel, "Type", "DIESEL")
+                cls._sub(fuel, "Consumption", f"{emissions_data['diesel_liters']:.2f}")
+                cls._sub(fuel, "Unit", "liters")
+                cls._sub(fuel, "EmissionFactor", "2.68")
         
-        # Summary (Özet)
-        summary = etree.SubElement(root, "Summary")
-        total_emissions = self._calculate_total_emissions(company, start_date, end_date)
+        # Indirect Emissions (Scope 2 - Elektrik)
+        if emissions_data.get("scope2_total", 0) > 0:
+            indirect = cls._sub(emissions, "IndirectEmissions")
+            electricity = cls._sub(indirect, "Electricity")
+            cls._sub(electricity, "Consumption", f"{emissions_data['electricity_kwh']:.2f}")
+            cls._sub(electricity, "Unit", "MWh")
+            cls._sub(electricity, "CO2", f"{emissions_data['scope2_total']:.2f}")
+            cls._sub(electricity, "EmissionFactor", f"{emissions_data.get('electricity_factor', 0.42):.3f}")
+            cls._sub(electricity, "GridMix", "TR_NATIONAL_GRID")
         
-        etree.SubElement(summary, "TotalDirectEmissions").text = f"{total_emissions['scope1']:.2f}"
-        etree.SubElement(summary, "TotalIndirectEmissions").text = f"{total_emissions['scope2']:.2f}"
-        etree.SubElement(summary, "TotalEmissions").text = f"{total_emissions['total']:.2f}"
-        etree.SubElement(summary, "Unit").text = "tCO2e"
+        return installation
+    
+    def _iter_facility_emissions(
+        self,
+        company_id: int,
+        start_date: date,
+        end_date: date
+    ) -> Iterator[Tuple[Dict, Dict[str, float]]]:
+        """
+        Şirketin tüm tesisleri için emisyonları tek bir gruplanmış sorguyla hesaplar
+        (tesis × scope × aktivite tipi) ve tesis sırasıyla akıtır.
+        Aktivite verisi olmayan tesisler de (sıfır değerlerle) döner.
+        """
+        for _, installations in self.iter_company_emissions([company_id], start_date, end_date):
+            yield from installations
+    
+    def iter_company_emissions(
+        self,
+        company_ids: Optional[List[int]],
+        start_date: date,
+        end_date: date
+    ) -> Iterator[Tuple[int, Iterator[Tuple[Dict, Dict[str, float]]]]]:
+        """
+        Birden çok şirketin tesis emisyonlarını TEK bir gruplanmış sorguyla tarar
+        (şirket × tesis × scope × aktivite tipi) ve şirket sırasıyla akıtır.
+        company_ids None ise tesisi olan tüm şirketler taranır.
         
-        # Verification (Doğrulama) Bilgileri
-        verification = etree.SubElement(root, "Verification")
-        etree.SubElement(verification, "Status").text = "PENDING"  # PENDING, VERIFIED, REJECTED
-        etree.SubElement(verification, "VerifierName").text = "KarbonUyum Platform"
-        etree.SubElement(verification, "VerificationDate").text = datetime.now().strftime("%Y-%m-%d")
-        etree.SubElement(verification, "VerificationMethod").text = "CALCULATION_BASED"
+        Tarih koşulları doğrudan activity_data.start_date/end_date üzerinde
+        olduğundan tablo dönemlere bölünmüşse planlayıcı ilgisiz bölümleri eler.
         
-        # XML'i string'e çevir
-        xml_string = etree.tostring(
-            root, 
-            pretty_print=True, 
-            xml_declaration=True, 
-            encoding='UTF-8'
-        ).decode('utf-8')
+        Yields:
+            (company_id, (tesis, emisyon verisi) iteratörü) — iç iteratör,
+            bir sonraki şirkete geçmeden tüketilmelidir.
+        """
+        query = self.db.query(
+            models.Facility.company_id,
+            models.Facility.id,
+            models.Facility.name,
+            models.Facility.city,
+            models.ActivityData.scope,
+            models.ActivityData.activity_type,
+            func.sum(models.ActivityData.quantity).label("quantity"),
+            func.sum(models.ActivityData.calculated_co2e_kg).label("co2e_kg"),
+        ).outerjoin(
+            models.ActivityData,
+            and_(
+                models.ActivityData.facility_id == models.Facility.id,
+                models.ActivityData.start_date >= start_date,
+                models.ActivityData.end_date <= end_date,
+                models.ActivityData.is_simulation == False  # Gerçek veri
+            )
+        )
+        if company_ids is not None:
+            query = query.filter(models.Facility.company_id.in_(company_ids))
         
-        logger.info(f"CBAM raporu üretildi: Company={company_id}, Period={reporting_period}")
+        rows = query.group_by(
+            models.Facility.company_id,
+            models.Facility.id,
+            models.Facility.name,
+            models.Facility.city,
+            models.ActivityData.scope,
+            models.ActivityData.activity_type,
+        ).order_by(
+            models.Facility.company_id,
+            models.Facility.id
+        ).yield_per(1000)
         
-        return xml_string
+        for company_id, company_rows in groupby(rows, key=lambda row: row.company_id):
+            yield company_id, self._group_installations(company_rows)
     
-    def _calculate_facility_emissions(
-        self, 
-        facility: models.Facility, 
-        start_date: date, 
-        end_date: date
-    ) -> Dict[str, float]:
+    @classmethod
+    def _group_installations(cls, rows) -> Iterator[Tuple[Dict, Dict[str, float]]]:
+        for _, facility_rows in groupby(rows, key=lambda row: row.id):
+            facility_rows = list(facility_rows)
+            first = facility_rows[0]
+            facility = {"id": first.id, "name": first.name, "city": first.city}
+            yield facility, cls._fold_emission_rows(facility_rows)
+    
+    @staticmethod
+    def _fold_emission_rows(rows) -> Dict[str, float]:
         """
-        Tesis için emisyon hesaplamaları
+        Bir tesisin (scope, aktivite tipi) toplam satırlarını rapor alanlarına dönüştürür
         """
         emissions = {
             "scope1_total": 0,
@@ -205,39 +370,33 @@ class CBAMReportService:
             "electricity_factor": 0.42  # Default TR grid factor
         }
         
-        # Aktivite verilerini al
-        activity_data = self.db.query(models.ActivityData).filter(
-            models.ActivityData.facility_id == facility.id,
-            models.ActivityData.start_date >= start_date,
-            models.ActivityData.end_date <= end_date,
-            models.ActivityData.is_simulation == False  # Gerçek veri
-        ).all()
-        
-        for data in activity_data:
-            co2_kg = data.calculated_co2e_kg or 0
+        for row in rows:
+            if row.scope is None:
+                continue  # Dönemde verisi olmayan tesis
+            
+            quantity = row.quantity or 0
+            co2_kg = row.co2e_kg or 0
             co2_tons = co2_kg / 1000  # tCO2e'ye çevir
             
-            if data.scope == models.ScopeType.scope_1:
+            if row.scope == models.ScopeType.scope_1:
                 emissions["scope1_total"] += co2_tons
                 
-                if data.activity_type == models.ActivityType.natural_gas:
-                    emissions["natural_gas_m3"] += data.quantity
+                if row.activity_type == models.ActivityType.natural_gas:
+                    emissions["natural_gas_m3"] += quantity
                     emissions["natural_gas_co2"] += co2_tons
-                elif data.activity_type == models.ActivityType.diesel_fuel:
-                    emissions["diesel_liters"] += data.quantity
+                elif row.activity_type == models.ActivityType.diesel_fuel:
+                    emissions["diesel_liters"] += quantity
                     emissions["diesel_co2"] += co2_tons
                     
-            elif data.scope == models.ScopeType.scope_2:
+            elif row.scope == models.ScopeType.scope_2:
                 emissions["scope2_total"] += co2_tons
                 
-                if data.activity_type == models.ActivityType.electricity:
-                    emissions["electricity_kwh"] += data.quantity
+                if row.activity_type == models.ActivityType.electricity:
+                    emissions["electricity_kwh"] += quantity
                     
-                    # Emisyon faktörünü hesapla (kg CO2/kWh)
-                    if data.quantity > 0:
-                        factor = (co2_kg / data.quantity)
-                        if factor > 0:
-                            emissions["electricity_factor"] = factor
+                    # Dönem için tüketim ağırlıklı emisyon faktörü (kg CO2/kWh)
+                    if quantity > 0 and co2_kg > 0:
+                        emissions["electricity_factor"] = co2_kg / quantity
         
         return emissions
     
@@ -248,7 +407,7 @@ class CBAMReportService:
         end_date: date
     ) -> Dict[str, float]:
         """
-        Şirket toplam emisyonlarını hesapla
+        Şirket toplam emisyonlarını hesapla (tek gruplanmış sorgu)
         """
         totals = {
             "scope1": 0,
@@ -257,8 +416,7 @@ class CBAMReportService:
             "total": 0
         }
         
-        for facility in company.facilities:
-            emissions = self._calculate_facility_emissions(facility, start_date, end_date)
+        for _, emissions in self._iter_facility_emissions(company.id, start_date, end_date):
             totals["scope1"] += emissions.get("scope1_total", 0)
             totals["scope2"] += emissions.get("scope2_total", 0)
         
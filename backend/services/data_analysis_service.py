@@ -1,6 +1,8 @@
 ### backend/services/data_analysis_service.py
+from collections import defaultdict
+from dataclasses import dataclass
 from datetime import date
-from typing import Tuple
+from typing import Dict, List, Tuple
 
 from dateutil.relativedelta import relativedelta
 from fastapi import Depends
@@ -9,6 +11,7 @@ from sqlalchemy.orm import Session
 
 import models
 from database import get_db
+from db_functions import year_month
 
 
 class DataAnalysisService:
@@ -26,7 +29,7 @@ class DataAnalysisService:
         start_date = end_date - relativedelta(months=months_ago)
 
         distinct_months_query = self.db.query(
-            func.count(func.distinct(func.to_char(models.ActivityData.start_date, 'YYYY-MM')))
+            func.count(func.distinct(year_month(models.ActivityData.start_date)))
         ).filter(
             models.ActivityData.facility_id == facility_id,
             models.ActivityData.activity_type == activity_type,
@@ -38,7 +41,7 @@ class DataAnalysisService:
             return 0, 0.0
 
         monthly_avg_quantity_query = self.db.query(
-            func.sum(models.ActivityData.quantity) / func.count(func.distinct(func.to_char(models.ActivityData.start_date, 'YYYY-MM')))
+            func.sum(models.ActivityData.quantity) / func.count(func.distinct(year_month(models.ActivityData.start_date)))
         ).filter(
             models.ActivityData.facility_id == facility_id,
             models.ActivityData.activity_type == activity_type,
@@ -48,5 +51,87 @@ class DataAnalysisService:
         
         return months_with_data, avg_monthly_quantity
 
+    def get_company_monthly_summaries(
+        self, company_id: int, months_ago: int = 12, include_simulation: bool = True
+    ) -> "CompanyMonthlySummaries":
+        """
+        Şirketin tüm tesisleri ve aktivite tipleri için aylık özetleri tek bir
+        gruplanmış sorguyla yükler (tesis × aktivite × yıl × ay toplamları).
+        include_simulation=False ise simülasyon kayıtları hariç tutulur.
+        """
+        start_date = date.today() - relativedelta(months=months_ago)
+        year = func.extract('year', models.ActivityData.start_date)
+        month = func.extract('month', models.ActivityData.start_date)
+
+        query = self.db.query(
+            models.ActivityData.facility_id,
+            models.ActivityData.activity_type,
+            month,
+            func.sum(models.ActivityData.quantity)
+        ).join(
+            models.Facility, models.Facility.id == models.ActivityData.facility_id
+        ).filter(
+            models.Facility.company_id == company_id,
+            models.ActivityData.start_date >= start_date
+        )
+        if not include_simulation:
+            query = query.filter(models.ActivityData.is_simulation == False)
+
+        rows = query.group_by(
+            models.ActivityData.facility_id, models.ActivityData.activity_type, year, month
+        ).all()
+
+        monthly: Dict[Tuple[int, models.ActivityType], List[Tuple[int, float]]] = defaultdict(list)
+        for facility_id, activity_type, month_number, quantity in rows:
+            monthly[(facility_id, activity_type)].append((int(month_number), float(quantity or 0)))
+
+        return CompanyMonthlySummaries({
+            key: MonthlyActivitySummary.from_months(values) for key, values in monthly.items()
+        })
+
+
+@dataclass(frozen=True)
+class MonthlyActivitySummary:
+    """Bir tesis + aktivite tipi için aylık veri özeti"""
+    months_with_data: int = 0
+    avg_monthly_quantity: float = 0.0
+    calendar_profile: Tuple[float, ...] = (0.0,) * 12  # Ocak-Aralık ortalama miktar
+
+    @classmethod
+    def from_months(cls, months: List[Tuple[int, float]]) -> "MonthlyActivitySummary":
+        """(takvim ayı, toplam) çiftlerinden özet; her çift ayrı bir yıl-ay grubudur"""
+        totals: List[List[float]] = [[] for _ in range(12)]
+        for month_number, quantity in months:
+            totals[month_number - 1].append(quantity)
+
+        # Verisi olmayan takvim ayları, verisi olan ayların ortalamasıyla doldurulur
+        averages = [sum(values) / len(values) if values else None for values in totals]
+        known = [value for value in averages if value is not None]
+        fill = sum(known) / len(known) if known else 0.0
+        total = sum(quantity for _, quantity in months)
+        return cls(
+            months_with_data=len(months),
+            avg_monthly_quantity=total / len(months) if months else 0.0,
+            calendar_profile=tuple(fill if value is None else value for value in averages),
+        )
+
+
+class CompanyMonthlySummaries:
+    """Şirket genelindeki aylık özetler; veri olmayan tesisler için boş özet döner"""
+
+    EMPTY = MonthlyActivitySummary()
+
+    def __init__(self, summaries: Dict[Tuple[int, models.ActivityType], MonthlyActivitySummary]):
+        self._summaries = summaries
+
+    def get(self, facility_id: int, activity_type: models.ActivityType) -> MonthlyActivitySummary:
+        return self._summaries.get((facility_id, activity_type), self.EMPTY)
+
+    def summary(self, facility_id: int, activity_type: models.ActivityType) -> Tuple[int, float]:
+        """get_monthly_activity_data_summary ile aynı dönüş: (veri olan ay sayısı, ortalama aylık miktar)"""
+        item = self.get(facility_id, activity_type)
+        return item.months_with_data, item.avg_monthly_quantity
+
+
 def get_data_analysis_service(db: Session = Depends(get_db)) -> DataAnalysisService:
     return DataAnalysisService(db)
@@ -0,0 +1,81 @@
+# backend/services/data_revision.py
+
+"""
+Şirket Veri Revizyonu
+
+Raporlar, ROI snapshot'ı ve türetilmiş önbellekler (yüzey, MACC) şirketin veri
+versiyonuyla anahtarlanır. Versiyon, companies.data_revision sayacıdır; rapor
+girdilerinden birine yazan her flush aynı işlem içinde sayacı artırır:
+
+  - Aktivite verisi eklendiğinde, silindiğinde veya herhangi bir alanı
+    (tarih, tür, kapsam, miktar, CO2e, tesis) değiştiğinde
+  - Tesis, finansal bilgi veya şirketin kendi alanları değiştiğinde
+  - Şirket sahibinin e-postası değiştiğinde (raporda görünür)
+
+Toplam/özet tabanlı bir parmak izi dönemler arası taşınan satırları veya
+satırlar arası aktarılan miktarları göremez; sayaç her yazımı görür ve tek
+birincil anahtar okumasıyla karşılaştırılır. İşlem geri alınırsa artış da
+geri alınır.
+"""
+
+from itertools import chain
+from typing import Optional
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+
+import models
+
+_COMPANY_KEYS = {
+    models.ActivityData: "facility_id",
+    models.Facility: "company_id",
+    models.CompanyFinancials: "company_id",
+    models.Company: "id",
+}
+
+
+def label(revision: Optional[int]) -> str:
+    """Sayacın önbellek anahtarlarında ve rapor parmak izlerinde kullanılan metni"""
+    return f"r{revision or 0}"
+
+
+def _changed(session: Session, obj) -> bool:
+    return obj in session.new or obj in session.deleted or session.is_modified(obj, include_collections=False)
+
+
+def _key_values(obj, key: str) -> set:
+    """Anahtarın eski ve yeni değerleri (tesis/şirket değiştiyse ikisi de etkilenir)"""
+    history = inspect(obj).attrs[key].history
+    return {value for value in chain(history.added, history.unchanged, history.deleted) if value is not None}
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_revisions(session: Session, flush_context) -> None:
+    company_ids, facility_ids, owner_ids = set(), set(), set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        key = _COMPANY_KEYS.get(type(obj))
+        if key is not None and _changed(session, obj):
+            (facility_ids if isinstance(obj, models.ActivityData) else company_ids).update(_key_values(obj, key))
+        elif isinstance(obj, models.User) and inspect(obj).attrs.email.history.has_changes() and obj.id is not None:
+            owner_ids.add(obj.id)
+
+    if not (company_ids or facility_ids or owner_ids):
+        return
+
+    connection = session.connection()
+    if facility_ids:
+        company_ids.update(connection.execute(
+            select(models.Facility.company_id).where(models.Facility.id.in_(facility_ids))
+        ).scalars())
+    if owner_ids:
+        company_ids.update(connection.execute(
+            select(models.Company.id).where(models.Company.owner_id.in_(owner_ids))
+        ).scalars())
+
+    company_ids.discard(None)
+    if company_ids:
+        connection.execute(
+            update(models.Company)
+            .where(models.Company.id.in_(company_ids))
+            .values(data_revision=models.Company.data_revision + 1)
+        )
@@ -0,0 +1,152 @@
+# backend/services/emission_factor_index.py
+
+"""
+Emisyon Faktörleri için Zamansal Aralık İndeksi
+
+Her faktör anahtarının birden fazla versiyonu olabilir; her versiyon
+[valid_from, valid_to) aralığında geçerlidir. İndeks versiyonları (anahtar,
+başlangıç) sırasına dizer ve tek bir tamsayı dizisinde tutar:
+
+    bileşik = anahtar_kodu * SPAN + başlangıç_gün_sırası
+
+Böylece "K anahtarının D tarihindeki faktörü" sorusu ikili arama ile O(log n),
+çok satırlı bir CSV'nin tüm satırları ise tek `np.searchsorted` çağrısıyla
+(as-of join) yanıtlanır.
+
+Eşleşme kuralı (as-of):
+  - D'den önce başlayan en son versiyon seçilir; valid_to'su D'yi kapsıyorsa
+    satır "kapsanmış" sayılır.
+  - Versiyonun valid_to'su D'den önce bitmişse (boşluk ya da süresi dolmuş
+    faktör) yine bu en yakın önceki versiyon kullanılır ama kapsanmamış işaretlenir.
+  - D tüm versiyonlardan önceyse anahtarın ilk versiyonu kullanılır (kapsanmamış).
+  - Bilinmeyen anahtar için eşleşme yoktur.
+"""
+
+import bisect
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Gün sıraları date.toordinal() ile aynı ölçekte; 0 = sınırsız başlangıç
+SPAN = date.max.toordinal() + 2
+OPEN_START = 0
+OPEN_END = SPAN - 1
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+DateLike = Union[date, np.datetime64]
+
+
+def effective_valid_from(record) -> Optional[date]:
+    """valid_from yoksa year'ın 1 Ocak'ı; ikisi de yoksa sınırsız (None)"""
+    if record.valid_from is not None:
+        return record.valid_from
+    if record.year is not None:
+        return date(record.year, 1, 1)
+    return None
+
+
+def _start_ordinal(record) -> int:
+    start = effective_valid_from(record)
+    return start.toordinal() if start else OPEN_START
+
+
+def _to_ordinals(dates: Union[Sequence[DateLike], np.ndarray]) -> np.ndarray:
+    """date dizisini veya datetime64 dizisini date.toordinal() ölçeğinde int64 diziye çevirir"""
+    if isinstance(dates, np.ndarray):
+        return dates.astype("datetime64[D]").astype(np.int64) + _EPOCH_ORDINAL
+    # datetime64'e dönüştürmek Python date nesneleri için toordinal'dan çok daha yavaş
+    return np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=len(dates))
+
+
+@dataclass(frozen=True)
+class AsOfJoin:
+    """
+    Toplu as-of eşleşmesinin sonucu; tüm diziler girdi satırlarıyla hizalıdır.
+
+    positions: eşleşen versiyonun indeks içindeki sırası (bilinmeyen anahtar: -1)
+    values:    faktör değeri (bilinmeyen anahtar: nan)
+    covered:   tarih versiyonun [valid_from, valid_to) aralığında mı
+    """
+    positions: np.ndarray
+    values: np.ndarray
+    covered: np.ndarray
+    index: "EmissionFactorIndex"
+
+    def record(self, row: int):
+        position = int(self.positions[row])
+        return self.index.records[position] if position >= 0 else None
+
+
+class EmissionFactorIndex:
+    """Faktör versiyonlarının değiştirilemez aralık indeksi"""
+
+    def __init__(self, records: Iterable):
+        ordered = sorted(records, key=lambda r: (r.key, _start_ordinal(r), r.id or 0))
+        self.keys: Tuple[str, ...] = tuple(dict.fromkeys(r.key for r in ordered))
+        self._codes: Dict[str, int] = {key: code for code, key in enumerate(self.keys)}
+        self.records: Tuple = tuple(ordered)
+
+        starts = [self._codes[r.key] * SPAN + _start_ordinal(r) for r in ordered]
+        ends = [r.valid_to.toordinal() if r.valid_to else OPEN_END for r in ordered]
+
+        self._start_list: List[int] = starts
+        self._starts = np.asarray(starts, dtype=np.int64)
+        self._ends = np.asarray(ends, dtype=np.int64)
+        self._values = np.asarray([r.value for r in ordered], dtype=np.float64)
+        self._record_codes = self._starts // SPAN
+        # Her anahtarın ilk versiyonunun sırası
+        self._first_positions = np.searchsorted(self._starts, np.arange(len(self.keys), dtype=np.int64) * SPAN)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def match(self, key: Optional[str], on: date) -> Tuple[Optional[object], bool]:
+        """(as-of versiyon, tarih aralıkta mı); anahtar yoksa (None, False). O(log n)"""
+        code = self._codes.get(key)
+        if code is None:
+            return None, False
+        position = bisect.bisect_right(self._start_list, code * SPAN + on.toordinal()) - 1
+        if position < 0 or self._record_codes[position] != code:
+            return self.records[self._first_positions[code]], False
+        return self.records[position], bool(on.toordinal() < self._ends[position])
+
+    def lookup(self, key: Optional[str], on: date, exact: bool = False):
+        """
+        Anahtarın verilen tarihteki faktörü; anahtar yoksa None.
+        exact=True iken yalnızca aralığı tarihi kapsayan versiyon döner.
+        """
+        record, covered = self.match(key, on)
+        if exact and not covered:
+            return None
+        return record
+
+    def as_of(self, on: date) -> Dict:
+        """Tüm anahtarların verilen tarihteki faktörleri"""
+        return {key: self.lookup(key, on) for key in self.keys}
+
+    def lookup_many(self, keys: Sequence[Optional[str]], dates: Union[Sequence[DateLike], np.ndarray]) -> AsOfJoin:
+        """Satır başına (anahtar, tarih) için as-of eşleşmesi; tek vektörel geçiş"""
+        if len(keys) != len(dates):
+            raise ValueError("keys ve dates aynı uzunlukta olmalı")
+        if len(keys) == 0 or len(self.records) == 0:
+            empty = np.full(len(keys), -1, dtype=np.int64)
+            return AsOfJoin(empty, np.full(len(keys), np.nan), np.zeros(len(keys), dtype=bool), self)
+
+        codes = np.fromiter((self._codes.get(k, -1) for k in keys), dtype=np.int64, count=len(keys))
+        ordinals = _to_ordinals(dates)
+        known = codes >= 0
+
+        positions = np.searchsorted(self._starts, codes * SPAN + ordinals, side="right") - 1
+        clipped = np.clip(positions, 0, None)
+        same_key = known & (positions >= 0) & (self._record_codes[clipped] == codes)
+
+        before_first = known & ~same_key
+        positions = np.where(before_first, self._first_positions[np.clip(codes, 0, None)], positions)
+        positions = np.where(known, positions, -1)
+
+        safe = np.clip(positions, 0, None)
+        covered = same_key & (ordinals < self._ends[safe])
+        values = np.where(known, self._values[safe], np.nan)
+        return AsOfJoin(positions=positions, values=values, covered=covered, index=self)
@@ -0,0 +1,248 @@
+# backend/services/leaderboard_service.py
+
+"""
+Canlı Sıralama Servisi - Redis sorted set tabanlı leaderboard
+
+Her (sektör, bölge) kombinasyonu için bir sorted set tutulur:
+    leaderboard:{industry_type|*}:{region|*}  →  company_id : efficiency_score
+
+Şirket adları `leaderboard:names` hash'inden, bölge/emisyon gibi gösterim
+alanları `leaderboard:meta` hash'inden okunur. Skor değiştiğinde sadece ilgili
+set'ler güncellenir (ZADD, O(log N)); okuma tarafı top-N, "sizin sıranız" ve
+komşularınızı tek bir Lua çağrısıyla (tek round trip) döndürür.
+
+`leaderboard_entries` tablosu kalıcı kaynak olarak kalır; Redis boşaldığında
+`rebuild_from_db` ile yeniden doldurulur.
+"""
+
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+import redis
+from sqlalchemy.orm import Session
+
+import models
+
+logger = logging.getLogger(__name__)
+
+ALL = "*"
+KEY_PREFIX = "leaderboard"
+NAMES_KEY = f"{KEY_PREFIX}:names"
+META_KEY = f"{KEY_PREFIX}:meta"
+
+# KEYS[1] = sorted set, KEYS[2] = isim hash'i, KEYS[3] = meta hash'i
+# ARGV[1] = limit, ARGV[2] = company_id ('' → yok), ARGV[3] = komşu yarıçapı
+_READ_SCRIPT = """
+local top = {}
+if tonumber(ARGV[1]) > 0 then
+    -- limit 0 iken 0..-1 aralığı tüm set'i döndürürdü
+    top = redis.call('ZREVRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1, 'WITHSCORES')
+end
+local total = redis.call('ZCARD', KEYS[1])
+local rank = false
+local score = false
+local around = {}
+local around_start = 0
+if ARGV[2] ~= '' then
+    rank = redis.call('ZREVRANK', KEYS[1], ARGV[2])
+    if rank then
+        score = redis.call('ZSCORE', KEYS[1], ARGV[2])
+        local radius = tonumber(ARGV[3])
+        around_start = math.max(rank - radius, 0)
+        around = redis.call('ZREVRANGE', KEYS[1], around_start, rank + radius, 'WITHSCORES')
+    end
+end
+local ids = {}
+for i = 1, #top, 2 do ids[#ids + 1] = top[i] end
+for i = 1, #around, 2 do ids[#ids + 1] = around[i] end
+local names = {}
+local metas = {}
+if #ids > 0 then
+    names = redis.call('HMGET', KEYS[2], unpack(ids))
+    metas = redis.call('HMGET', KEYS[3], unpack(ids))
+end
+return {top, total, rank, score, around, around_start, ids, names, metas}
+"""
+
+
+def leaderboard_key(industry_type: Optional[str] = None, region: Optional[str] = None) -> str:
+    """Filtre kombinasyonuna karşılık gelen sorted set anahtarı"""
+    return f"{KEY_PREFIX}:{industry_type or ALL}:{region or ALL}"
+
+
+def _company_keys(industry_type: Optional[str], region: Optional[str]) -> set:
+    """Bir şirketin yer aldığı tüm set'ler: {sektör, *} × {bölge, *}"""
+    industries = {ALL} | ({industry_type} if industry_type else set())
+    regions = {ALL} | ({region} if region else set())
+    return {leaderboard_key(i, r) for i in industries for r in regions}
+
+
+def _enum_value(value) -> Optional[str]:
+    return value.value if hasattr(value, "value") else value
+
+
+class LeaderboardService:
+    """Redis sorted set'leri üzerinde sıralama okuma/yazma"""
+
+    DEFAULT_NEIGHBOURS = 2
+
+    def __init__(self, redis_client: redis.Redis):
+        self.redis = redis_client
+        self._read = self.redis.register_script(_READ_SCRIPT)
+
+    # --- Yazma tarafı ---
+
+    def record_score(
+        self,
+        company_id: int,
+        company_name: str,
+        industry_type: Optional[str],
+        region: Optional[str],
+        efficiency_score: float,
+        emissions_per_employee_kwh: Optional[float] = None
+    ) -> None:
+        """
+        Şirketin skorunu artımlı olarak günceller.
+        Sektör/bölge değiştiyse eski set'lerden çıkarılır.
+        """
+        industry_type = _enum_value(industry_type)
+        new_keys = _company_keys(industry_type, region)
+
+        old_meta = self.redis.hget(META_KEY, company_id)
+        stale_keys = set()
+        if old_meta:
+            old = json.loads(old_meta)
+            stale_keys = _company_keys(old.get("industry_type"), old.get("region")) - new_keys
+
+        pipe = self.redis.pipeline(transaction=True)
+        for key in stale_keys:
+            pipe.zrem(key, company_id)
+        for key in new_keys:
+            pipe.zadd(key, {company_id: efficiency_score})
+        pipe.hset(NAMES_KEY, company_id, company_name or "")
+        pipe.hset(META_KEY, company_id, json.dumps({
+            "industry_type": industry_type,
+            "region": region,
+            "emissions_per_employee_kwh": emissions_per_employee_kwh,
+        }))
+        pipe.execute()
+
+    def rename_company(self, company_id: int, company_name: str) -> None:
+        """Sıralamada yer alan şirketin adını günceller"""
+        if self.redis.hexists(META_KEY, company_id):
+            self.redis.hset(NAMES_KEY, company_id, company_name)
+
+    def remove_company(self, company_id: int) -> None:
+        """Şirketi tüm sıralamalardan çıkarır"""
+        old_meta = self.redis.hget(META_KEY, company_id)
+        if not old_meta:
+            return
+        old = json.loads(old_meta)
+        pipe = self.redis.pipeline(transaction=True)
+        for key in _company_keys(old.get("industry_type"), old.get("region")):
+            pipe.zrem(key, company_id)
+        pipe.hdel(NAMES_KEY, company_id)
+        pipe.hdel(META_KEY, company_id)
+        pipe.execute()
+
+    def rebuild_from_db(self, db: Session) -> int:
+        """
+        Redis'i `leaderboard_entries` tablosundan sıfırdan doldurur
+        (soğuk başlangıç / Redis kaybı sonrası kurtarma).
+        """
+        rows = db.query(
+            models.LeaderboardEntry.company_id,
+            models.LeaderboardEntry.industry_type,
+            models.LeaderboardEntry.region,
+            models.LeaderboardEntry.efficiency_score,
+            models.LeaderboardEntry.emissions_per_employee_kwh,
+            models.Company.name,
+        ).join(
+            models.Company, models.Company.id == models.LeaderboardEntry.company_id
+        ).all()
+
+        existing = list(self.redis.scan_iter(match=f"{KEY_PREFIX}:*"))
+        pipe = self.redis.pipeline(transaction=True)
+        if existing:
+            pipe.delete(*existing)
+        for row in rows:
+            industry_type = _enum_value(row.industry_type)
+            for key in _company_keys(industry_type, row.region):
+                pipe.zadd(key, {row.company_id: row.efficiency_score})
+            pipe.hset(NAMES_KEY, row.company_id, row.name or "")
+            pipe.hset(META_KEY, row.company_id, json.dumps({
+                "industry_type": industry_type,
+                "region": row.region,
+                "emissions_per_employee_kwh": row.emissions_per_employee_kwh,
+            }))
+        pipe.execute()
+
+        logger.info(f"✅ Leaderboard Redis'e yeniden yüklendi: {len(rows)} şirket")
+        return len(rows)
+
+    # --- Okuma tarafı ---
+
+    def get_leaderboard(
+        self,
+        industry_type: Optional[str] = None,
+        region: Optional[str] = None,
+        limit: int = 50,
+        company_id: Optional[int] = None,
+        neighbours: int = DEFAULT_NEIGHBOURS
+    ) -> Optional[Dict]:
+        """
+        Top-N, şirketin sırası/skoru ve çevresindeki komşuları tek round trip'te döndürür.
+        Set hiç yoksa (Redis henüz doldurulmamış) None döner; çağıran DB'ye düşer.
+        """
+        key = leaderboard_key(industry_type, region)
+        top, total, rank, score, around, around_start, ids, names, metas = self._read(
+            keys=[key, NAMES_KEY, META_KEY],
+            args=[max(limit, 0), company_id if company_id is not None else "", max(neighbours, 0)]
+        )
+
+        if not total:
+            return None
+
+        details = {
+            int(cid): (name, meta)
+            for cid, name, meta in zip(ids, names or [], metas or [], strict=True)
+        }
+
+        return {
+            "entries": self._to_entries(top, 1, details),
+            "neighbours": self._to_entries(around, int(around_start) + 1, details),
+            "total": int(total),
+            "your_rank": int(rank) + 1 if rank is not None else None,
+            "your_score": float(score) if score is not None else None,
+        }
+
+    @staticmethod
+    def _to_entries(flat: List, first_rank: int, details: Dict) -> List[Dict]:
+        entries = []
+        for offset, i in enumerate(range(0, len(flat), 2)):
+            company_id = int(flat[i])
+            name, meta = details.get(company_id, (None, None))
+            meta = json.loads(meta) if meta else {}
+            entries.append({
+                "company_id": company_id,
+                "company_name": name.decode("utf-8") if isinstance(name, bytes) else (name or "Bilinmiyor"),
+                "rank": first_rank + offset,
+                "efficiency_score": float(flat[i + 1]),
+                "emissions_per_employee_kwh": meta.get("emissions_per_employee_kwh"),
+                "region": meta.get("region"),
+            })
+        return entries
+
+
+# Singleton instance
+_leaderboard_service = None
+
+def get_leaderboard_service() -> LeaderboardService:
+    """Leaderboard servisi singleton"""
+    global _leaderboard_service
+    if _leaderboard_service is None:
+        client = redis.Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+        _leaderboard_service = LeaderboardService(client)
+    return _leaderboard_service
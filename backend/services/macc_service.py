@@ -0,0 +1,228 @@
+# backend/services/macc_service.py
+
+"""
+Marjinal Azaltım Maliyet Eğrisi (MACC)
+
+Şirketin her tesisi için ROICalculatorService.IMPROVEMENT_POTENTIALS içindeki her
+önlem değerlendirilir. Tüketim tek bir ConsumptionSnapshot'tan (tek sorgu) gelir;
+tesis × önlem × yıl nakit akışı matrisi cashflow_engine ile tek çağrıda
+iskontolanır. Azaltım maliyeti:
+
+    (-NPV) / ömür boyu CO2e azaltımı   [TL/tCO2e]
+
+Negatif maliyet, önlemin kendini fazlasıyla amorti ettiği anlamına gelir. Eğri
+maliyete göre artan sıralanır ve kümülatif yıllık azaltım eklenir. Sonuç şirket +
+veri versiyonu başına Redis'te önbelleklenir.
+"""
+
+import json
+import logging
+import os
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import redis
+from sqlalchemy.orm import Session
+
+from services import cashflow_engine, pv_simulation_service
+from services.roi_calculator_service import ConsumptionSnapshot, FacilityConsumption, ROICalculatorService
+
+logger = logging.getLogger(__name__)
+
+# Eğri çıktısını etkileyen her değişiklikte artırılmalı (önbellek anahtarı)
+MACC_VERSION = "2"
+MACC_TTL_SECONDS = int(os.getenv("MACC_TTL_SECONDS", str(24 * 3600)))
+KEY_PREFIX = "macc"
+
+# TL → EUR dönüşümü (CBAM raporlaması için); tanımlı değilse EUR alanı dönmez
+EUR_TRY_RATE = float(os.getenv("EUR_TRY_RATE", "0") or 0)
+
+# Önlem varsayımları ve emisyon faktörleri tekil ROI hesaplarıyla ortak
+_ROI = ROICalculatorService
+
+
+def solar_simulations(facilities: Sequence[FacilityConsumption]) -> List[pv_simulation_service.PVSimulationResult]:
+    """Çatı alanına göre boyutlandırılmış GES'in tesisin ilindeki saatlik üretimi"""
+    return [
+        pv_simulation_service.simulate_pv(f.city, f.area_m2 * _ROI.ROOF_SHARE / _ROI.M2_PER_KWP)
+        for f in facilities
+    ]
+
+
+def measure_matrix(snapshot: ConsumptionSnapshot, measures: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Tesis × önlem matrisleri: yıllık tasarruf (TL), yatırım (TL), yıllık azaltım (tCO2e).
+    Her önlem tesislerin tüketim vektörleri üzerinde vektörel hesaplanır.
+    """
+    facilities = snapshot.facilities
+    electricity = np.array([f.electricity_kwh for f in facilities], dtype=float)
+    gas = np.array([f.natural_gas_m3 for f in facilities], dtype=float)
+    diesel = np.array([f.diesel_liters for f in facilities], dtype=float)
+    co2 = np.array([f.total_co2_tons for f in facilities], dtype=float)
+    area = np.array([f.area_m2 for f in facilities], dtype=float)
+
+    price = snapshot.electricity_cost_kwh
+    gas_price = snapshot.gas_cost_m3
+    potentials = _ROI.IMPROVEMENT_POTENTIALS
+    costs = _ROI.INVESTMENT_COSTS
+    electricity_kg = _ROI.ELECTRICITY_KG_PER_KWH
+
+    columns = {}
+    for measure in measures:
+        if measure == "lighting_upgrade":
+            kwh = electricity * _ROI.LIGHTING_SHARE * _ROI.LED_SAVINGS_RATE
+            columns[measure] = (kwh * price, area / _ROI.M2_PER_FIXTURE * _ROI.COST_PER_FIXTURE, kwh * electricity_kg / 1000)
+        elif measure == "insulation_improvement":
+            gas_m3 = gas * _ROI.HEATING_GAS_SHARE * _ROI.INSULATION_SAVINGS_RATE
+            kwh = electricity * _ROI.HVAC_SHARE * _ROI.INSULATION_SAVINGS_RATE
+            columns[measure] = (
+                gas_m3 * gas_price + kwh * price,
+                area * _ROI.WALL_AREA_RATIO * costs[measure],
+                (gas_m3 * _ROI.GAS_KG_PER_M3 + kwh * electricity_kg) / 1000,
+            )
+        elif measure == "solar_panel":
+            # Çatı alanına göre boyutlandırılmış GES; öz tüketim tesisin saatlik yüküyle eşleşir
+            simulations = solar_simulations(facilities)
+            capacity_kwp = np.array([sim.capacity_kwp for sim in simulations])
+            production = np.array([sim.annual_kwh for sim in simulations])
+            self_consumed = np.array([
+                float(pv_simulation_service.self_consumed_kwh(sim, f.monthly_electricity_kwh, f.load_profile))
+                for sim, f in zip(simulations, facilities, strict=True)
+            ])
+            savings = (self_consumed + (production - self_consumed) * _ROI.FEED_IN_RATIO) * price
+            columns[measure] = (savings, capacity_kwp * costs[measure], production * electricity_kg / 1000)
+        elif measure == "energy_management":
+            total_cost = electricity * price + gas * gas_price + diesel * _ROI.DIESEL_COST_TL
+            has_energy = (total_cost > 0).astype(float)
+            columns[measure] = (
+                total_cost * potentials[measure],
+                costs[measure] * has_energy,
+                co2 * potentials[measure],
+            )
+        else:
+            # Genel elektrik önlemi (calculate_specific_measure_roi ile aynı)
+            kwh = electricity * potentials[measure]
+            if measure == "hvac_optimization":
+                investment = costs[measure] * electricity / (365 * 8)
+            else:
+                investment = costs[measure] * (electricity > 0)
+            columns[measure] = (kwh * price, investment, kwh * electricity_kg / 1000)
+
+    savings, investment, abatement = (
+        np.stack([columns[m][i] for m in measures], axis=1) for i in range(3)
+    )
+    return {"savings": savings, "investment": investment, "abatement": abatement}
+
+
+def compute_macc(snapshot: ConsumptionSnapshot, measures: Optional[List[str]] = None) -> Dict:
+    """Tesis × önlem maliyet eğrisini tek vektörel geçişte hesaplar"""
+    measures = measures or list(_ROI.IMPROVEMENT_POTENTIALS)
+    facilities = snapshot.facilities
+
+    entries: List[Dict] = []
+    negative_cost_reduction = 0.0
+    if facilities:
+        matrix = measure_matrix(snapshot, measures)
+        lifetimes = np.array([_ROI.MEASURE_LIFETIMES.get(m, 10) for m in measures])
+        degradation = np.array([_ROI.MEASURE_DEGRADATION.get(m, 0.0) for m in measures])
+
+        # (F, M, Y+1) nakit akışları; önlem ömrü sonrası sıfır
+        flows = cashflow_engine.level_flows(
+            matrix["savings"], matrix["investment"], years=int(lifetimes.max()),
+            degradation=np.broadcast_to(degradation, matrix["savings"].shape)
+        )
+        alive = np.arange(flows.shape[-1])[None, :] <= lifetimes[:, None]    # (M, Y+1)
+        flows = flows * alive[None, :, :]
+        npv = cashflow_engine.npv(flows, _ROI.DISCOUNT_RATE)
+
+        # Ömür boyu azaltım, verim kaybıyla birlikte
+        t = np.arange(1, flows.shape[-1])
+        profile = ((1 - degradation[:, None] * t) * alive[:, 1:]).sum(axis=1)  # (M,)
+        lifetime_abatement = matrix["abatement"] * profile[None, :]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cost_per_t = np.where(lifetime_abatement > 0, -npv / lifetime_abatement, np.nan)
+
+        f_idx, m_idx = np.nonzero(np.isfinite(cost_per_t))
+        order = np.argsort(cost_per_t[f_idx, m_idx], kind="stable")
+        f_idx, m_idx = f_idx[order], m_idx[order]
+        cumulative = np.cumsum(matrix["abatement"][f_idx, m_idx])
+        negative_cost_reduction = float(matrix["abatement"][f_idx, m_idx][cost_per_t[f_idx, m_idx] < 0].sum())
+
+        for rank, (fi, mi, cum) in enumerate(zip(f_idx, m_idx, cumulative, strict=True), start=1):
+            facility, measure = facilities[fi], measures[mi]
+            cost = float(cost_per_t[fi, mi])
+            entry = {
+                "rank": rank,
+                "facility_id": facility.facility_id,
+                "facility_name": facility.name,
+                "measure_type": measure,
+                "measure_name": _ROI.MEASURE_NAMES.get(measure, measure),
+                "annual_savings_tl": round(float(matrix["savings"][fi, mi]), 0),
+                "investment_tl": round(float(matrix["investment"][fi, mi]), 0),
+                "npv_tl": round(float(npv[fi, mi]), 0),
+                "annual_reduction_tco2e": round(float(matrix["abatement"][fi, mi]), 3),
+                "lifetime_reduction_tco2e": round(float(lifetime_abatement[fi, mi]), 3),
+                "cost_per_tco2e_tl": round(cost, 1),
+                "cumulative_reduction_tco2e": round(float(cum), 3),
+            }
+            if EUR_TRY_RATE > 0:
+                entry["cost_per_tco2e_eur"] = round(cost / EUR_TRY_RATE, 1)
+            entries.append(entry)
+
+    return {
+        "company_id": snapshot.company_id,
+        "data_version": snapshot.data_version,
+        "macc_version": MACC_VERSION,
+        "facility_count": len(facilities),
+        "measures": measures,
+        "discount_rate": _ROI.DISCOUNT_RATE,
+        "total_annual_reduction_tco2e": entries[-1]["cumulative_reduction_tco2e"] if entries else 0,
+        "negative_cost_reduction_tco2e": round(negative_cost_reduction, 3),
+        "curve": entries,
+    }
+
+
+class MACCService:
+    """MACC'yi hesaplar ve şirket + veri versiyonu başına Redis'te tutar"""
+
+    def __init__(self, redis_client: redis.Redis):
+        self.redis = redis_client
+
+    @staticmethod
+    def cache_key(company_id: int, data_version: str) -> str:
+        # Ortak önlem varsayımları değişince ROI üretici versiyonu da değişir
+        versions = f"{MACC_VERSION}.{_ROI.GENERATOR_VERSION}"
+        return f"{KEY_PREFIX}:{company_id}:{data_version}:{versions}:{date.today().isoformat()}"
+
+    def get_curve(self, db: Session, company_id: int) -> Dict:
+        snapshot = ROICalculatorService(db).load_snapshot(company_id, period_months=12)
+        key = self.cache_key(company_id, snapshot.data_version)
+
+        try:
+            cached = self.redis.get(key)
+            if cached:
+                return json.loads(cached)
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ MACC önbelleği okunamadı: {e}")
+
+        curve = compute_macc(snapshot)
+
+        try:
+            self.redis.setex(key, MACC_TTL_SECONDS, json.dumps(curve))
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ MACC önbelleğe yazılamadı: {e}")
+
+        return curve
+
+
+_macc_service: Optional[MACCService] = None
+
+def get_macc_service() -> MACCService:
+    """MACC servisi singleton"""
+    global _macc_service
+    if _macc_service is None:
+        client = redis.Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+        _macc_service = MACCService(client)
+    return _macc_service
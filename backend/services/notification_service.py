@@ -10,6 +10,8 @@ from typing import Optional
 
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 import models
@@ -144,6 +146,13 @@ class NotificationService:
             logger.error(f"❌ Email gönderimi hatası: {e}")
             return False
     
+    @staticmethod
+    def _recent_statement(user_id: int, limit: int, unread_only: bool):
+        query = select(models.Notification).where(models.Notification.user_id == user_id)
+        if unread_only:
+            query = query.where(models.Notification.is_read == False)
+        return query.order_by(models.Notification.created_at.desc()).limit(limit)
+
     def get_unread_notifications(
         self,
         db: Session,
@@ -151,12 +160,7 @@ class NotificationService:
         limit: int = 20
     ) -> list:
         """Okunmamış bildirimler"""
-        return db.query(models.Notification).filter(
-            models.Notification.user_id == user_id,
-            models.Notification.is_read == False
-        ).order_by(
-            models.Notification.created_at.desc()
-        ).limit(limit).all()
+        return db.execute(self._recent_statement(user_id, limit, unread_only=True)).scalars().all()
     
     def get_all_notifications(
         self,
@@ -165,11 +169,24 @@ class NotificationService:
         limit: int = 50
     ) -> list:
         """Tüm bildirimler"""
-        return db.query(models.Notification).filter(
-            models.Notification.user_id == user_id
-        ).order_by(
-            models.Notification.created_at.desc()
-        ).limit(limit).all()
+        return db.execute(self._recent_statement(user_id, limit, unread_only=False)).scalars().all()
+
+    async def get_notifications_async(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        limit: int = 20,
+        unread_only: bool = False
+    ) -> list:
+        """Async oturumla son bildirimler (isteğe bağlı yalnızca okunmamışlar)"""
+        result = await db.execute(self._recent_statement(user_id, limit, unread_only))
+        return result.scalars().all()
+
+    async def count_notifications_async(self, db: AsyncSession, user_id: int) -> int:
+        """Kullanıcının toplam bildirim sayısı"""
+        return await db.scalar(
+            select(func.count(models.Notification.id)).where(models.Notification.user_id == user_id)
+        )
     
     def mark_as_read(
         self,
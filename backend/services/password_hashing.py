@@ -0,0 +1,191 @@
+# backend/services/password_hashing.py
+
+"""
+Şifre Hash'leme için Sınırlı Süreç Havuzu
+
+bcrypt kasıtlı olarak CPU yoğundur. Giriş ve kayıt işlemleri bunu FastAPI'nin
+ortak thread havuzunda yaptığında, vardiya değişimi gibi giriş yoğunluklarında
+havuz ve CPU dolar, diğer tüm senkron endpoint'ler bekler.
+
+Bu modül hash/doğrulama işini ayrı bir süreç havuzunda yapar:
+  - Havuz boyutu PASSWORD_HASH_WORKERS ile sınırlıdır (varsayılan CPU/2).
+  - Aynı anda en fazla PASSWORD_HASH_MAX_PENDING iş kabul edilir; fazlası
+    kuyruğa alınmadan PasswordHashingBusy ile reddedilir (endpoint'te 429).
+  - BCRYPT_ROUNDS değişirse, eski maliyetli hash'ler ilk başarılı girişte
+    yeniden hesaplanır (verify_and_update).
+  - Gecikme ve red sayıları stats() ile izlenir.
+
+Havuz süreç başına (fork sonrası çocukta yeniden) tembel olarak oluşturulur ve
+"forkserver" ile başlatılır; thread'li API sürecinden doğrudan fork edilmez.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+POOL_SIZE = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(POOL_SIZE * 8)))
+RETRY_AFTER_SECONDS = 1
+
+# Maliyet değişince needs_update eski hash'ler için True döner
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class PasswordHashingBusy(Exception):
+    """Bekleyen hash işi sınırı aşıldı"""
+
+
+# --- Havuz süreçlerinde çalışan fonksiyonlar --------------------------------
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+# --- Havuz yönetimi -------------------------------------------------------
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_lock = threading.Lock()
+_inflight = 0
+
+_LATENCY_WINDOW = 1000
+_latencies: Dict[str, deque] = {"hash": deque(maxlen=_LATENCY_WINDOW), "verify": deque(maxlen=_LATENCY_WINDOW)}
+_counters = {"completed": 0, "rejected": 0, "failed": 0, "rehashed": 0}
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor, _executor_pid
+    if _executor_pid != os.getpid():
+        with _lock:
+            if _executor_pid != os.getpid():
+                _executor = ProcessPoolExecutor(
+                    max_workers=POOL_SIZE, mp_context=multiprocessing.get_context("forkserver")
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _discard(executor: ProcessPoolExecutor) -> None:
+    """Bir işçi süreç öldüğünde havuz kullanılamaz; sonraki iş yeni havuz açar"""
+    global _executor, _executor_pid
+    with _lock:
+        if _executor is executor:
+            _executor, _executor_pid = None, None
+    executor.shutdown(wait=False, cancel_futures=True)
+    logger.warning("⚠️ Şifre hash havuzu bozuldu, yeniden oluşturulacak")
+
+
+def _submit(operation: str, fn, *args) -> Future:
+    """Kapasite varsa işi havuza gönderir; yoksa hemen PasswordHashingBusy"""
+    global _inflight
+    with _lock:
+        if _inflight >= MAX_PENDING:
+            _counters["rejected"] += 1
+            raise PasswordHashingBusy(f"{_inflight} bekleyen şifre işlemi")
+        _inflight += 1
+
+    started = time.perf_counter()
+    executor = _get_executor()
+    try:
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            _discard(executor)
+            executor = _get_executor()
+            future = executor.submit(fn, *args)
+    except Exception:
+        _release(operation, started, failed=True)
+        raise
+    future.add_done_callback(lambda f: _on_done(executor, operation, started, f))
+    return future
+
+
+def _on_done(executor: ProcessPoolExecutor, operation: str, started: float, future: Future) -> None:
+    error = None if future.cancelled() else future.exception()
+    if isinstance(error, BrokenProcessPool):
+        _discard(executor)
+    _release(operation, started, failed=future.cancelled() or error is not None)
+
+
+def _release(operation: str, started: float, failed: bool) -> None:
+    global _inflight
+    with _lock:
+        _inflight -= 1
+        _counters["failed" if failed else "completed"] += 1
+        _latencies[operation].append((time.perf_counter() - started) * 1000)
+
+
+def hash_password(password: str) -> str:
+    """Senkron kod yolları için; sonuç gelene kadar bekler"""
+    return _submit("hash", _hash, password).result()
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(_submit("hash", _hash, password))
+
+
+async def verify_and_update_async(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    (doğru mu, yeni hash) döner. Yeni hash yalnızca şifre doğruysa ve mevcut
+    hash güncel maliyet parametreleriyle üretilmemişse doludur.
+    """
+    valid, new_hash = await asyncio.wrap_future(_submit("verify", _verify_and_update, password, hashed_password))
+    if new_hash:
+        with _lock:
+            _counters["rehashed"] += 1
+    return valid, new_hash
+
+
+def warm_up() -> None:
+    """Havuz süreçlerini önceden başlatır; ilk girişler süreç açılışını beklemez"""
+    try:
+        executor = _get_executor()
+        for future in [executor.submit(_hash, "warm-up") for _ in range(POOL_SIZE)]:
+            future.result()
+        logger.info(f"✅ Şifre hash havuzu hazır: {POOL_SIZE} süreç, en fazla {MAX_PENDING} bekleyen iş")
+    except Exception as e:
+        logger.warning(f"⚠️ Şifre hash havuzu başlatılamadı: {e}")
+
+
+def _percentile(values, ratio: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * ratio))], 2)
+
+
+def stats() -> Dict:
+    """Bu süreçteki havuzun durumu ve son işlemlerin gecikmeleri (kuyruk bekleme dahil, ms)"""
+    with _lock:
+        latencies = {operation: list(values) for operation, values in _latencies.items()}
+        snapshot = {
+            "pool_size": POOL_SIZE,
+            "max_pending": MAX_PENDING,
+            "inflight": _inflight,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            **_counters,
+        }
+    for operation, values in latencies.items():
+        snapshot[f"{operation}_latency_ms"] = {
+            "count": len(values),
+            "p50": _percentile(values, 0.5),
+            "p95": _percentile(values, 0.95),
+            "max": round(max(values), 2) if values else None,
+        }
+    return snapshot
@@ -0,0 +1,240 @@
+# backend/services/portfolio_optimizer_service.py
+
+"""
+Bütçe Kısıtlı Yatırım Portföyü Optimizasyonu
+
+ROI analizi fırsatları yıllık tasarrufa göre sıralayıp ilk 3'ü seçer; bu hem
+sermaye bütçesini hem de önlemler arası etkileşimi yok sayar (GES ve LED aynı
+kWh'i azaltır). Bu servis her tesis için önlem alt kümelerini (6 önlem → 64
+seçenek) etkileşimleriyle birlikte önceden hesaplar:
+
+  - Verimlilik önlemleri aynı enerji taşıyıcısında çarpımsal azaltır:
+    kalan = tüketim × Π(1 - oran)  (azalan getiri)
+  - GES öz tüketimi, verimlilik önlemlerinden sonra kalan saatlik yükle
+    eşleştirilir (pv_simulation_service); azalan yük öz tüketimi de azaltır.
+
+Ardından tesis başına tek seçenek seçilen çoklu seçimli sırt çantası problemi,
+ayrıklaştırılmış bütçe üzerinde dinamik programlama ile çözülür. Her bütçe
+seviyesi için en yüksek CO2e azaltımı elde edilir; bu dizi maliyet-azaltım
+Pareto cephesidir. Hedef verilirse cephede hedefi karşılayan en ucuz nokta önerilir.
+"""
+
+import logging
+import time
+from itertools import product
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from services import pv_simulation_service
+from services.macc_service import measure_matrix, solar_simulations
+from services.roi_calculator_service import ConsumptionSnapshot, ROICalculatorService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESOLUTION = 1000  # Bütçe ekseni adım sayısı
+MAX_FRONT_POINTS = 200
+
+_ROI = ROICalculatorService
+_POTENTIALS = _ROI.IMPROVEMENT_POTENTIALS
+
+# Önlemin ilgili taşıyıcıdaki tüketimi azaltma oranı
+ELECTRICITY_FRACTIONS = {
+    "lighting_upgrade": _ROI.LIGHTING_SHARE * _ROI.LED_SAVINGS_RATE,
+    "hvac_optimization": _POTENTIALS["hvac_optimization"],
+    "process_optimization": _POTENTIALS["process_optimization"],
+    "energy_management": _POTENTIALS["energy_management"],
+    "insulation_improvement": _ROI.HVAC_SHARE * _ROI.INSULATION_SAVINGS_RATE,
+}
+GAS_FRACTIONS = {
+    "insulation_improvement": _ROI.HEATING_GAS_SHARE * _ROI.INSULATION_SAVINGS_RATE,
+    "energy_management": _POTENTIALS["energy_management"],
+}
+DIESEL_FRACTIONS = {
+    "energy_management": _POTENTIALS["energy_management"],
+}
+
+
+def facility_options(snapshot: ConsumptionSnapshot, measures: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Tesis × alt küme matrisleri (F, 2^M): yatırım, yıllık tasarruf, yıllık azaltım.
+    masks (2^M, M) hangi önlemlerin seçildiğini tutar; 0. seçenek boş kümedir.
+    """
+    facilities = snapshot.facilities
+    masks = np.array(list(product((False, True), repeat=len(measures))), dtype=bool)  # (S, M)
+
+    electricity = np.array([f.electricity_kwh for f in facilities], dtype=float)[:, None]
+    gas = np.array([f.natural_gas_m3 for f in facilities], dtype=float)[:, None]
+    diesel = np.array([f.diesel_liters for f in facilities], dtype=float)[:, None]
+
+    def remaining_factor(fractions: Dict[str, float]) -> np.ndarray:
+        rates = np.array([fractions.get(m, 0.0) for m in measures])
+        return np.where(masks, 1 - rates, 1.0).prod(axis=1)[None, :]             # (1, S)
+
+    electricity_factor = remaining_factor(ELECTRICITY_FRACTIONS)
+    electricity_left = electricity * electricity_factor                         # (F, S)
+    gas_left = gas * remaining_factor(GAS_FRACTIONS)
+    diesel_left = diesel * remaining_factor(DIESEL_FRACTIONS)
+
+    price = snapshot.electricity_cost_kwh
+    savings = (
+        (electricity - electricity_left) * price
+        + (gas - gas_left) * snapshot.gas_cost_m3
+        + (diesel - diesel_left) * _ROI.DIESEL_COST_TL
+    )
+    reduction_kg = (
+        (electricity - electricity_left) * _ROI.ELECTRICITY_KG_PER_KWH
+        + (gas - gas_left) * _ROI.GAS_KG_PER_M3
+        + (diesel - diesel_left) * _ROI.DIESEL_KG_PER_LITER
+    )
+
+    # GES: saatlik üretim, verimlilik sonrası kalan saatlik yükle eşleştirilir
+    matrix = measure_matrix(snapshot, measures)
+    if "solar_panel" in measures:
+        solar = measures.index("solar_panel")
+        simulations = solar_simulations(facilities)
+        production = np.array([sim.annual_kwh for sim in simulations])[:, None]  # kWh
+        self_consumed = np.array([
+            pv_simulation_service.self_consumed_kwh(
+                sim, f.monthly_electricity_kwh, f.load_profile, load_scale=electricity_factor[0]
+            )
+            for sim, f in zip(simulations, facilities, strict=True)
+        ])                                                                       # (F, S)
+        solar_savings = (self_consumed + (production - self_consumed) * _ROI.FEED_IN_RATIO) * price
+        selected = masks[:, solar][None, :]
+        savings = savings + np.where(selected, solar_savings, 0.0)
+        reduction_kg = reduction_kg + np.where(selected, production * _ROI.ELECTRICITY_KG_PER_KWH, 0.0)
+
+    investment = matrix["investment"] @ masks.T.astype(float)                    # (F, S)
+    return {
+        "masks": masks,
+        "investment": investment,
+        "savings": savings,
+        "reduction": reduction_kg / 1000,
+    }
+
+
+def optimise(
+    options: Dict[str, np.ndarray],
+    budget_tl: Optional[float] = None,
+    resolution: int = DEFAULT_RESOLUTION
+) -> Dict:
+    """
+    Çoklu seçimli sırt çantası DP'si: dp[b] = bütçe ≤ b ile en yüksek azaltım.
+    Yatırımlar bütçe adımına yukarı yuvarlanır; seçilen gerçek toplam bütçeyi aşmaz.
+    """
+    investment, reduction = options["investment"], options["reduction"]
+    facility_count = investment.shape[0]
+
+    max_budget = float(investment.max(axis=1).sum()) if budget_tl is None else float(budget_tl)
+    step = max(max_budget / resolution, 1e-9)
+    buckets = np.arange(resolution + 1)
+    cost_units = np.ceil(investment / step - 1e-9).astype(int)                  # (F, S)
+
+    dp = np.zeros(resolution + 1)
+    choices = np.zeros((facility_count, resolution + 1), dtype=np.int16)
+    for f in range(facility_count):
+        source = buckets[None, :] - cost_units[f][:, None]                       # (S, B)
+        candidates = np.where(source >= 0, dp[np.clip(source, 0, None)], -np.inf) + reduction[f][:, None]
+        choices[f] = candidates.argmax(axis=0)
+        dp = candidates.max(axis=0)
+
+    return {"dp": dp, "choices": choices, "cost_units": cost_units, "step": step}
+
+
+def _backtrack(solution: Dict, bucket: int) -> np.ndarray:
+    """Bütçe seviyesinden tesis başına seçilen seçenek indekslerini çıkarır"""
+    choices, cost_units = solution["choices"], solution["cost_units"]
+    picked = np.zeros(choices.shape[0], dtype=int)
+    for f in range(choices.shape[0] - 1, -1, -1):
+        picked[f] = choices[f, bucket]
+        bucket -= cost_units[f, picked[f]]
+    return picked
+
+
+class PortfolioOptimizerService:
+    """Tesis × önlem yatırım portföyü için bütçe/CO2e kısıtlı optimizasyon"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def optimise_company(
+        self,
+        company_id: int,
+        budget_tl: Optional[float] = None,
+        target_reduction_tco2e: Optional[float] = None,
+        measure_types: Optional[List[str]] = None,
+        resolution: int = DEFAULT_RESOLUTION
+    ) -> Dict:
+        started = time.perf_counter()
+        measures = measure_types or list(_POTENTIALS)
+        unknown = [m for m in measures if m not in _POTENTIALS]
+        if unknown:
+            raise ValueError(f"Geçersiz önlem tipi: {', '.join(unknown)}")
+
+        snapshot = ROICalculatorService(self.db).load_snapshot(company_id, period_months=12)
+        facilities = snapshot.facilities
+        if not facilities:
+            raise ValueError("Optimizasyon için şirkete ait tesis bulunamadı")
+
+        options = facility_options(snapshot, measures)
+        solution = optimise(options, budget_tl, resolution)
+        dp = solution["dp"]
+
+        def describe(bucket: int, with_selection: bool = False) -> Dict:
+            picked = _backtrack(solution, bucket)
+            rows = np.arange(len(facilities))
+            investment = float(options["investment"][rows, picked].sum())
+            savings = float(options["savings"][rows, picked].sum())
+            point = {
+                "investment_tl": round(investment, 0),
+                "annual_reduction_tco2e": round(float(options["reduction"][rows, picked].sum()), 3),
+                "annual_savings_tl": round(savings, 0),
+                "payback_months": round(investment / savings * 12, 1) if savings > 0 else None,
+                "measure_count": int(options["masks"][picked].sum()),
+            }
+            if with_selection:
+                point["selections"] = [
+                    {
+                        "facility_id": facility.facility_id,
+                        "facility_name": facility.name,
+                        "measures": [m for m, chosen in zip(measures, options["masks"][option], strict=True) if chosen],
+                        "investment_tl": round(float(options["investment"][i, option]), 0),
+                        "annual_reduction_tco2e": round(float(options["reduction"][i, option]), 3),
+                    }
+                    for i, (facility, option) in enumerate(zip(facilities, picked, strict=True)) if option
+                ]
+            return point
+
+        # Pareto cephesi: azaltımın arttığı bütçe seviyeleri
+        improving = np.flatnonzero(np.diff(dp, prepend=-np.inf) > 1e-9)
+        if len(improving) > MAX_FRONT_POINTS:
+            improving = improving[np.linspace(0, len(improving) - 1, MAX_FRONT_POINTS).round().astype(int)]
+        front = [describe(int(b)) for b in improving]
+
+        # Öneri: hedefi karşılayan en ucuz nokta, yoksa bütçe içindeki en yüksek azaltım
+        target_met = None
+        best = int(np.argmax(dp))
+        if target_reduction_tco2e is not None:
+            meeting = np.flatnonzero(dp >= target_reduction_tco2e - 1e-9)
+            target_met = bool(len(meeting))
+            if target_met:
+                best = int(meeting[0])
+        recommended = describe(best, with_selection=True)
+        recommended["target_met"] = target_met
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"📈 Portföy optimizasyonu: şirket {company_id}, {len(facilities)} tesis × {len(measures)} önlem, {elapsed_ms:.0f} ms")
+
+        return {
+            "company_id": company_id,
+            "data_version": snapshot.data_version,
+            "budget_tl": budget_tl,
+            "target_reduction_tco2e": target_reduction_tco2e,
+            "budget_step_tl": round(solution["step"], 2),
+            "measures": measures,
+            "pareto_front": front,
+            "recommended": recommended,
+            "elapsed_ms": round(elapsed_ms, 1),
+        }
@@ -0,0 +1,288 @@
+# backend/services/pv_simulation_service.py
+
+"""
+Saatlik GES Üretim Simülasyonu (8760 saat)
+
+GES önerisi ve güneş ROI hesabı üretimi "yıllık kWh ÷ (1350 × şehir faktörü)"
+ile tahmin edip öz tüketimi sabit oranla varsayıyordu. Bu modül yıl boyunca her
+saat için üretimi yerel olarak simüle eder:
+
+  1. İl profili: data/pv_irradiance_tr.json içindeki uzun dönem aylık ortalama
+     yatay ışınım ve sıcaklık (çevrimdışı, harici API yok).
+  2. Güneş geometrisi: deklinasyon, saat açısı, zenit (TSİ, boylam ve zaman
+     denklemi düzeltmesiyle gerçek güneş saati).
+  3. Saatlik yatay ışınım: açık gök şekli (Kasten-Young hava kütlesi, Meinel
+     zayıflaması) aylık ortalamaya ölçeklenir.
+  4. Erbs ayrıştırması ile direkt/yaygın bileşen, izotropik modelle eğik yüzey
+     (tilt/azimut) ışınımı ve yer yansıması.
+  5. Hücre sıcaklığı (NOCT) ile güç kaybı ve sistem kayıpları → AC kWh/saat.
+
+Tüketim tarafında aylık tüketim, tesis tipine göre saatlik yük profiline
+dağıtılır; öz tüketim = Σ min(üretim, yük). Tüm adımlar 8760 elemanlı NumPy
+dizileri üzerinde vektöreldir (tesis başına birkaç ms). Sonuçlar (il, kWp,
+eğim, azimut) anahtarıyla süreç içinde önbelleklenir.
+"""
+
+import json
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PATH = Path(__file__).resolve().parent.parent / "data" / "pv_irradiance_tr.json"
+
+DEFAULT_TILT_DEG = 30.0
+DEFAULT_AZIMUTH_DEG = 0.0  # 0 = güney, pozitif = batı
+ALBEDO = 0.2
+NOCT_C = 45.0
+TEMP_COEFFICIENT = -0.004  # Pmax sıcaklık katsayısı (1/°C)
+SYSTEM_LOSSES = 0.14       # İnverter, kablo, kirlenme, uyumsuzluk
+DIURNAL_TEMP_AMPLITUDE = 5.0
+TIMEZONE_MERIDIAN = 45.0   # TSİ (UTC+3)
+SOLAR_CONSTANT_KW = 1.367
+
+DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+HOURS_PER_YEAR = 8760
+
+# Saatlik yük profilleri: (mesai başlangıcı, bitişi, mesai dışı oranı, hafta sonu oranı)
+LOAD_PROFILES = {
+    "production": (6, 22, 0.45, 0.6),
+    "warehouse": (8, 18, 0.30, 0.35),
+    "office": (8, 18, 0.20, 0.15),
+}
+DEFAULT_LOAD_PROFILE = "production"
+
+_TR_ASCII = str.maketrans("çğıöşüÇĞİÖŞÜâîû", "cgiosucgiosuaiu")
+
+# Yıl ekseni (saat başına ay ve gün indeksleri) - modül yüklenirken bir kez
+_DAY_OF_YEAR = np.repeat(np.arange(1, 366), 24)                      # (8760,)
+_HOUR_OF_DAY = np.tile(np.arange(24), 365)                           # (8760,)
+_MONTH = np.repeat(np.repeat(np.arange(12), DAYS_IN_MONTH), 24)      # (8760,)
+
+
+@dataclass(frozen=True)
+class PVSimulationResult:
+    """Tek bir (il, kWp, yönelim) simülasyonunun sonucu; saatlik dizi salt okunurdur"""
+    city_key: str
+    capacity_kwp: float
+    tilt_deg: float
+    azimuth_deg: float
+    annual_kwh: float
+    specific_yield_kwh_per_kwp: float
+    monthly_kwh: Tuple[float, ...]
+    hourly_kwh: np.ndarray = field(repr=False, compare=False)
+
+
+def normalize_city(city: Optional[str]) -> str:
+    """Şehir adını profil anahtarına çevirir (Türkçe karakterler ASCII'ye, küçük harf)"""
+    if not city:
+        return ""
+    return city.strip().translate(_TR_ASCII).lower()
+
+
+@lru_cache(maxsize=1)
+def load_profiles() -> Dict:
+    """Paketlenmiş il güneşlenme profillerini okur"""
+    with open(PROFILE_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def resolve_city(city: Optional[str]) -> str:
+    """Profili olan il anahtarı; bilinmeyen şehirlerde varsayılan il"""
+    data = load_profiles()
+    key = normalize_city(city)
+    if key in data["provinces"]:
+        return key
+    if key:
+        logger.debug(f"GES profili bulunamadı, varsayılan il kullanılıyor: {city}")
+    return data["default"]
+
+
+@lru_cache(maxsize=256)
+def _unit_profile(city_key: str, tilt_deg: float, azimuth_deg: float) -> np.ndarray:
+    """1 kWp için saatlik AC üretim (kWh), 8760 eleman"""
+    province = load_profiles()["provinces"][city_key]
+    lat = np.radians(province["lat"])
+    monthly_ghi = np.asarray(province["ghi"], dtype=float)      # kWh/m²/gün
+    monthly_temp = np.asarray(province["temp"], dtype=float)
+    tilt, azimuth = np.radians(tilt_deg), np.radians(azimuth_deg)
+
+    # Güneş geometrisi (saat ortası)
+    day_angle = 2 * np.pi * (_DAY_OF_YEAR - 1) / 365
+    declination = np.radians(23.45) * np.sin(2 * np.pi * (284 + _DAY_OF_YEAR) / 365)
+    b = 2 * np.pi * (_DAY_OF_YEAR - 81) / 364
+    equation_of_time_h = (9.87 * np.sin(2 * b) - 7.53 * np.cos(b) - 1.5 * np.sin(b)) / 60
+    solar_time = _HOUR_OF_DAY + 0.5 + (province["lon"] - TIMEZONE_MERIDIAN) / 15 + equation_of_time_h
+    hour_angle = np.radians(15 * (solar_time - 12))
+
+    sin_dec, cos_dec = np.sin(declination), np.cos(declination)
+    sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+    cos_hour = np.cos(hour_angle)
+    cos_zenith = sin_lat * sin_dec + cos_lat * cos_dec * cos_hour
+    sun_up = cos_zenith > 0.01
+
+    # Atmosfer dışı yatay ışınım (kWh/m² saat başına)
+    extraterrestrial = SOLAR_CONSTANT_KW * (1 + 0.033 * np.cos(day_angle)) * np.where(sun_up, cos_zenith, 0.0)
+
+    # Açık gök şekli → aylık ortalamaya ölçekle
+    zenith_deg = np.degrees(np.arccos(np.clip(cos_zenith, 0.01, 1.0)))
+    air_mass = 1 / (np.clip(cos_zenith, 0.01, 1.0) + 0.50572 * (96.07995 - zenith_deg) ** -1.6364)
+    clear_sky = extraterrestrial * 0.7 ** (air_mass ** 0.678)
+    clear_monthly = np.bincount(_MONTH, weights=clear_sky, minlength=12)
+    scale = monthly_ghi * DAYS_IN_MONTH / np.where(clear_monthly > 0, clear_monthly, 1.0)
+    ghi = clear_sky * scale[_MONTH]
+
+    # Erbs: saatlik berraklık indeksinden yaygın oran
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kt = np.clip(np.where(extraterrestrial > 0, ghi / extraterrestrial, 0.0), 0.0, 1.0)
+    diffuse_fraction = np.select(
+        [kt <= 0.22, kt <= 0.80],
+        [1 - 0.09 * kt, 0.9511 - 0.1604 * kt + 4.388 * kt**2 - 16.638 * kt**3 + 12.336 * kt**4],
+        default=0.165,
+    )
+    diffuse = ghi * diffuse_fraction
+    beam = ghi - diffuse
+
+    # Eğik yüzeye geliş açısı
+    cos_incidence = (
+        sin_dec * sin_lat * np.cos(tilt)
+        - sin_dec * cos_lat * np.sin(tilt) * np.cos(azimuth)
+        + cos_dec * cos_lat * np.cos(tilt) * cos_hour
+        + cos_dec * sin_lat * np.sin(tilt) * np.cos(azimuth) * cos_hour
+        + cos_dec * np.sin(tilt) * np.sin(azimuth) * np.sin(hour_angle)
+    )
+    beam_ratio = np.where(sun_up, np.maximum(cos_incidence, 0.0) / np.maximum(cos_zenith, 0.087), 0.0)
+    poa = (
+        beam * beam_ratio
+        + diffuse * (1 + np.cos(tilt)) / 2
+        + ghi * ALBEDO * (1 - np.cos(tilt)) / 2
+    )
+
+    # Ortam sıcaklığı: aylık ortalama + 15:00'te tepe yapan günlük salınım
+    ambient = monthly_temp[_MONTH] + DIURNAL_TEMP_AMPLITUDE * np.cos(2 * np.pi * (_HOUR_OF_DAY + 0.5 - 15) / 24)
+    cell_temp = ambient + poa * 1000 / 800 * (NOCT_C - 20)
+    output = poa * (1 + TEMP_COEFFICIENT * (cell_temp - 25)) * (1 - SYSTEM_LOSSES)
+
+    output = np.maximum(output, 0.0)
+    output.flags.writeable = False
+    return output
+
+
+@lru_cache(maxsize=1024)
+def _simulate(city_key: str, capacity_kwp: float, tilt_deg: float, azimuth_deg: float) -> PVSimulationResult:
+    hourly = _unit_profile(city_key, tilt_deg, azimuth_deg) * capacity_kwp
+    hourly.flags.writeable = False
+    monthly = np.bincount(_MONTH, weights=hourly, minlength=12)
+    annual = float(monthly.sum())
+    return PVSimulationResult(
+        city_key=city_key,
+        capacity_kwp=capacity_kwp,
+        tilt_deg=tilt_deg,
+        azimuth_deg=azimuth_deg,
+        annual_kwh=annual,
+        specific_yield_kwh_per_kwp=annual / capacity_kwp if capacity_kwp > 0 else 0.0,
+        monthly_kwh=tuple(float(v) for v in monthly),
+        hourly_kwh=hourly,
+    )
+
+
+def simulate_pv(
+    city: Optional[str],
+    capacity_kwp: float,
+    tilt_deg: float = DEFAULT_TILT_DEG,
+    azimuth_deg: float = DEFAULT_AZIMUTH_DEG
+) -> PVSimulationResult:
+    """Verilen il ve yönelim için 8760 saatlik üretimi döndürür (önbellekli)"""
+    return _simulate(
+        resolve_city(city), round(float(capacity_kwp), 1), round(float(tilt_deg), 1), round(float(azimuth_deg), 1)
+    )
+
+
+def specific_yield(
+    city: Optional[str],
+    tilt_deg: float = DEFAULT_TILT_DEG,
+    azimuth_deg: float = DEFAULT_AZIMUTH_DEG
+) -> float:
+    """İl ve yönelim için yıllık özgül verim (kWh/kWp)"""
+    return simulate_pv(city, 1.0, tilt_deg, azimuth_deg).annual_kwh
+
+
+@lru_cache(maxsize=8)
+def _load_weights(profile: str) -> np.ndarray:
+    """Saatlik yük ağırlıkları; her ayın toplamı 1 olacak şekilde normalize"""
+    start, end, night_ratio, weekend_ratio = LOAD_PROFILES.get(profile, LOAD_PROFILES[DEFAULT_LOAD_PROFILE])
+    working_hours = (_HOUR_OF_DAY >= start) & (_HOUR_OF_DAY < end)
+    weekend = (_DAY_OF_YEAR - 1) % 7 >= 5
+    weights = np.where(working_hours, 1.0, night_ratio) * np.where(weekend, weekend_ratio, 1.0)
+    weights = weights / np.bincount(_MONTH, weights=weights, minlength=12)[_MONTH]
+    weights.flags.writeable = False
+    return weights
+
+
+def hourly_load(monthly_consumption_kwh: Sequence[float], profile: str = DEFAULT_LOAD_PROFILE) -> np.ndarray:
+    """12 aylık tüketimi (Ocak-Aralık) saatlik yük eğrisine dağıtır"""
+    monthly = np.asarray(monthly_consumption_kwh, dtype=float)
+    if monthly.shape != (12,):
+        raise ValueError("Aylık tüketim 12 elemanlı olmalı (Ocak-Aralık)")
+    return monthly[_MONTH] * _load_weights(profile)
+
+
+def monthly_from_profile(annual_kwh: float, calendar_profile: Sequence[float]) -> List[float]:
+    """
+    Yıllık tüketimi takvim profilinin (Ocak-Aralık) şekline göre aylara dağıtır.
+    Profil boşsa (veri yok) yıllık tüketim aylara eşit bölünür.
+    """
+    profile_total = sum(calendar_profile)
+    if profile_total <= 0:
+        return [annual_kwh / 12] * 12
+    return [value / profile_total * annual_kwh for value in calendar_profile]
+
+
+def self_consumed_kwh(
+    result: PVSimulationResult,
+    monthly_consumption_kwh: Sequence[float],
+    profile: str = DEFAULT_LOAD_PROFILE,
+    capacity_scale: Union[float, np.ndarray] = 1.0,
+    load_scale: Union[float, np.ndarray] = 1.0
+) -> np.ndarray:
+    """
+    Σ min(üretim × capacity_scale, yük × load_scale). Ölçekler birbirine yayınlanır;
+    böylece kapasite ızgarası veya verimlilik sonrası kalan yük seçenekleri tek
+    çağrıda değerlendirilir (üretim kapasiteyle doğrusaldır).
+    """
+    load = hourly_load(monthly_consumption_kwh, profile)
+    capacity_scale = np.asarray(capacity_scale, dtype=float)[..., None]
+    load_scale = np.asarray(load_scale, dtype=float)[..., None]
+    return np.minimum(result.hourly_kwh * capacity_scale, load * load_scale).sum(axis=-1)
+
+
+def match_consumption(
+    result: PVSimulationResult,
+    monthly_consumption_kwh: Sequence[float],
+    profile: str = DEFAULT_LOAD_PROFILE
+) -> Dict[str, float]:
+    """
+    Üretimi saatlik yükle eşleştirir: öz tüketilen ve şebekeye verilen enerji.
+    self_consumption_ratio üretimin, solar_fraction tüketimin karşılanan payıdır.
+    """
+    self_consumed = float(self_consumed_kwh(result, monthly_consumption_kwh, profile))
+    total_load = float(sum(monthly_consumption_kwh))
+    return {
+        "production_kwh": result.annual_kwh,
+        "self_consumed_kwh": self_consumed,
+        "exported_kwh": result.annual_kwh - self_consumed,
+        "self_consumption_ratio": self_consumed / result.annual_kwh if result.annual_kwh > 0 else 0.0,
+        "solar_fraction": self_consumed / total_load if total_load > 0 else 0.0,
+    }
+
+
+def clear_cache() -> None:
+    """Simülasyon önbelleklerini temizler (profil dosyası güncellendiğinde)"""
+    load_profiles.cache_clear()
+    _unit_profile.cache_clear()
+    _simulate.cache_clear()
@@ -0,0 +1,93 @@
+# backend/services/read_routing.py
+
+"""
+Okuma Yönlendirme - Kendi Yazımını Okuma Kuralı
+
+Okuma replikası primary'nin birkaç saniye gerisinden gelebilir. Kullanıcı bir
+kayıt ekleyip hemen dashboard'a döndüğünde kendi verisini görmeyebilir. Bu
+modül kullanıcının son yazımını Redis'te işaretler; işaret
+READ_AFTER_WRITE_SECONDS boyunca yaşar ve bu süre içinde kullanıcının okuma
+oturumları (ve kullanıcı adına üretilen raporlar) primary'ye açılır (bkz.
+auth.get_user_read_db, celery_config.DBTask.read_db_for).
+
+İşaretleme oturum olaylarıyla yapılır: get_current_user kullanıcı id'sini
+isteğin oturumuna yazar; bu oturum değişiklik flush edip commit ederse
+kullanıcı "yeni yazmış" sayılır. Redis erişilemezse güvenli taraf seçilir ve
+primary'den okunur.
+"""
+
+import logging
+import math
+import os
+from typing import Optional
+
+import redis
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database import DATABASE_READ_MAX_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# İşaret, izin verilen en büyük replika gecikmesi kadar yaşamalı; yoksa gecikmeli
+# replikadan üretilen bir rapor kullanıcının az önce yüklediği satırları atlayabilir
+READ_AFTER_WRITE_SECONDS = int(os.getenv("READ_AFTER_WRITE_SECONDS", str(math.ceil(DATABASE_READ_MAX_LAG_SECONDS))))
+LAST_WRITE_KEY = "db:last_write:{user_id}"
+
+_USER_KEY = "read_routing_user_id"
+_WROTE_KEY = "read_routing_wrote"
+
+_redis_client: Optional[redis.Redis] = None
+
+
+def _get_redis() -> redis.Redis:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(
+            os.getenv('REDIS_URL', 'redis://localhost:6379/0'), socket_connect_timeout=1, socket_timeout=1
+        )
+    return _redis_client
+
+
+def bind_user(db: Session, user_id: int) -> None:
+    """İsteğin oturumunu kullanıcıyla ilişkilendirir; commit edilen yazımlar ona sayılır"""
+    db.info[_USER_KEY] = user_id
+
+
+def mark_write(user_id: int) -> None:
+    if READ_AFTER_WRITE_SECONDS <= 0:
+        return
+    try:
+        _get_redis().set(LAST_WRITE_KEY.format(user_id=user_id), 1, ex=READ_AFTER_WRITE_SECONDS)
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Son yazım işareti kaydedilemedi: {e}")
+
+
+def wrote_recently(user_id: int) -> bool:
+    """Kullanıcı son READ_AFTER_WRITE_SECONDS içinde yazdıysa (veya bilinemiyorsa) True"""
+    if READ_AFTER_WRITE_SECONDS <= 0:
+        return False
+    try:
+        return bool(_get_redis().exists(LAST_WRITE_KEY.format(user_id=user_id)))
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Son yazım işareti okunamadı, primary kullanılacak: {e}")
+        return True
+
+
+# --- Değişiklik yakalama ---------------------------------------------------
+
+@event.listens_for(Session, "after_flush")
+def _note_flush(session: Session, flush_context) -> None:
+    if _USER_KEY in session.info and (session.new or session.dirty or session.deleted):
+        session.info[_WROTE_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_committed(session: Session) -> None:
+    if session.info.pop(_WROTE_KEY, False):
+        mark_write(session.info[_USER_KEY])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session) -> None:
+    session.info.pop(_WROTE_KEY, None)
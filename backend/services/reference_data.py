@@ -0,0 +1,282 @@
+# backend/services/reference_data.py
+
+"""
+Referans Tabloları için Süreç İçi Versiyonlu Görüntü
+
+SuggestionParameter, EmissionFactor, IndustryTemplate ve Badge tabloları nadiren
+değişir ama her öneri, hesaplama, onboarding ve ROI isteğinde yeniden
+sorgulanıyordu. Bu modül dört tabloyu değiştirilemez bir `ReferenceSnapshot`
+olarak süreç belleğinde tutar; sıcak yollar veritabanına gitmez.
+
+Versiyonlama ve geçersiz kılma:
+  - Redis'teki `reference_data:version` sayacı global versiyondur.
+  - Admin endpoint'leri, sqladmin görünümleri (veya herhangi bir oturum) bu
+    tablolarda değişiklik commit ettiğinde sayaç artırılır ve yeni versiyon
+    `reference_data:changed` kanalında yayınlanır.
+  - Her API ve Celery süreci arka plan iş parçacığında kanalı dinler; daha yeni
+    bir versiyon gelince tabloları yeniden yükler ve görüntüyü tek atamayla
+    değiştirir (okuyanlar ya eski ya yeni görüntünün tamamını görür).
+  - Bağlantı koptuğunda yeniden bağlanınca ve REFERENCE_DATA_RECHECK_SECONDS'ta
+    bir versiyon karşılaştırılır; kaçırılan mesajlar böylece telafi edilir.
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, fields
+from datetime import date, datetime
+from functools import cached_property
+from itertools import chain
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+import redis
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+from services.emission_factor_index import EmissionFactorIndex
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "reference_data:version"
+CHANNEL = "reference_data:changed"
+RECHECK_SECONDS = int(os.getenv("REFERENCE_DATA_RECHECK_SECONDS", "300"))
+LISTENER_ENABLED = os.getenv("REFERENCE_DATA_LISTENER", "1") != "0"
+
+REFERENCE_MODELS = (models.SuggestionParameter, models.EmissionFactor, models.IndustryTemplate, models.Badge)
+
+_INFO_KEY = "reference_data_changed"
+
+
+@dataclass(frozen=True)
+class EmissionFactorRecord:
+    id: int
+    key: str
+    value: float
+    unit: str
+    source: Optional[str]
+    year: Optional[int]
+    description: Optional[str]
+    valid_from: Optional[date]
+    valid_to: Optional[date]
+
+
+@dataclass(frozen=True)
+class IndustryTemplateRecord:
+    id: int
+    industry_name: str
+    industry_type: models.IndustryType
+    typical_electricity_kwh_per_employee: float
+    typical_gas_m3_per_employee: float
+    typical_fuel_liters_per_vehicle: float
+    typical_electricity_cost_ratio: Optional[float]
+    typical_gas_cost_ratio: Optional[float]
+    best_in_class_electricity_kwh: Optional[float]
+    average_electricity_kwh: Optional[float]
+    description: Optional[str]
+    created_at: Optional[date]
+
+
+@dataclass(frozen=True)
+class BadgeRecord:
+    id: int
+    badge_name: str
+    description: Optional[str]
+    icon_emoji: Optional[str]
+    unlock_condition: Optional[str]
+    category: Optional[str]
+    is_active: Optional[bool]
+    created_at: Optional[datetime]
+
+
+def _record(record_type, obj):
+    """ORM nesnesini oturumdan bağımsız, değiştirilemez kayda kopyalar"""
+    return record_type(**{f.name: getattr(obj, f.name) for f in fields(record_type)})
+
+
+@dataclass(frozen=True)
+class ReferenceSnapshot:
+    """Referans tablolarının belirli bir versiyondaki değiştirilemez kopyası"""
+    version: int
+    loaded_at: float
+    suggestion_parameters: Mapping[str, float]
+    emission_factors: Tuple[EmissionFactorRecord, ...]  # tüm versiyonlar
+    industry_templates: Tuple[IndustryTemplateRecord, ...]  # id sıralı
+    badges: Mapping[int, BadgeRecord]
+
+    @cached_property
+    def _templates_by_name(self) -> Dict[str, IndustryTemplateRecord]:
+        return {t.industry_name: t for t in self.industry_templates}
+
+    @cached_property
+    def _templates_by_type(self) -> Dict[models.IndustryType, IndustryTemplateRecord]:
+        by_type = {}
+        for template in self.industry_templates:
+            by_type.setdefault(template.industry_type, template)
+        return by_type
+
+    def industry_template_by_name(self, industry_name: str) -> Optional[IndustryTemplateRecord]:
+        return self._templates_by_name.get(industry_name)
+
+    def industry_template_for_type(self, industry_type) -> Optional[IndustryTemplateRecord]:
+        """Sektörün ilk (en küçük id'li) şablonu"""
+        return self._templates_by_type.get(industry_type)
+
+    @cached_property
+    def emission_factor_index(self) -> EmissionFactorIndex:
+        return EmissionFactorIndex(self.emission_factors)
+
+    def emission_factors_as_of(self, on: date) -> Dict[str, EmissionFactorRecord]:
+        """Her anahtarın verilen tarihte geçerli versiyonu"""
+        return self.emission_factor_index.as_of(on)
+
+
+def load_snapshot(db: Session, version: int) -> ReferenceSnapshot:
+    """Dört referans tablosunu okuyup yeni bir görüntü oluşturur"""
+    params = db.query(models.SuggestionParameter).all()
+    factors = db.query(models.EmissionFactor).order_by(models.EmissionFactor.key, models.EmissionFactor.id).all()
+    templates = db.query(models.IndustryTemplate).order_by(models.IndustryTemplate.id).all()
+    badges = db.query(models.Badge).order_by(models.Badge.id).all()
+    return ReferenceSnapshot(
+        version=version,
+        loaded_at=time.time(),
+        suggestion_parameters=MappingProxyType({p.key: p.value for p in params}),
+        emission_factors=tuple(_record(EmissionFactorRecord, f) for f in factors),
+        industry_templates=tuple(_record(IndustryTemplateRecord, t) for t in templates),
+        badges=MappingProxyType({b.id: _record(BadgeRecord, b) for b in badges}),
+    )
+
+
+_snapshot: Optional[ReferenceSnapshot] = None
+_local_stale = False
+_lock = threading.Lock()
+_redis_client: Optional[redis.Redis] = None
+_listener_pid: Optional[int] = None
+
+
+def _get_redis() -> redis.Redis:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(
+            os.getenv('REDIS_URL', 'redis://localhost:6379/0'), socket_connect_timeout=2
+        )
+    return _redis_client
+
+
+def _current_version() -> int:
+    """Global versiyon; Redis erişilemezse eldeki görüntünün versiyonu"""
+    try:
+        return int(_get_redis().get(VERSION_KEY) or 0)
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Referans veri versiyonu okunamadı: {e}")
+        return _snapshot.version if _snapshot else 0
+
+
+def reload(db: Optional[Session] = None) -> ReferenceSnapshot:
+    """Tabloları yeniden yükler ve görüntüyü atomik olarak değiştirir"""
+    global _snapshot, _local_stale
+    with _lock:
+        # Versiyon yüklemeden önce okunur; yükleme sırasında gelen değişiklik yeni bir yükleme tetikler
+        version = _current_version()
+        _local_stale = False
+        if db is not None:
+            snapshot = load_snapshot(db, version)
+        else:
+            with SessionLocal() as own_db:
+                snapshot = load_snapshot(own_db, version)
+        _snapshot = snapshot
+    logger.info(
+        f"📚 Referans veriler yüklendi: v{version}, {len(snapshot.suggestion_parameters)} parametre, "
+        f"{len(snapshot.emission_factors)} faktör, {len(snapshot.industry_templates)} şablon, {len(snapshot.badges)} rozet"
+    )
+    return snapshot
+
+
+def refresh_if_outdated(version: Optional[int] = None) -> None:
+    """Verilen (yoksa Redis'teki) versiyon eldekinden yeniyse yeniden yükler"""
+    target = version if version is not None else _current_version()
+    current = _snapshot
+    if current is None or target > current.version:
+        reload()
+
+
+def get_reference_snapshot(db: Optional[Session] = None) -> ReferenceSnapshot:
+    """
+    Güncel görüntü. Yalnızca ilk kullanımda veya bu süreçteki bir değişiklikten
+    sonra yükleme yapar (varsa verilen oturumla); diğer durumlarda sorgu yoktur.
+    """
+    _ensure_listener()
+    snapshot = _snapshot
+    if snapshot is None or _local_stale:
+        snapshot = reload(db)
+    return snapshot
+
+
+def announce_change() -> None:
+    """Versiyonu artırır ve tüm süreçlere yayınlar"""
+    global _local_stale
+    _local_stale = True
+    try:
+        client = _get_redis()
+        version = client.incr(VERSION_KEY)
+        client.publish(CHANNEL, version)
+        logger.info(f"📣 Referans veri değişikliği yayınlandı: v{version}")
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Referans veri değişikliği yayınlanamadı: {e}")
+
+
+def _listen() -> None:
+    backoff = 1
+    while True:
+        try:
+            pubsub = _get_redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CHANNEL)
+            # Bağlantı yokken kaçırılan değişiklikler
+            if _snapshot is not None:
+                refresh_if_outdated()
+            backoff = 1
+            last_check = time.monotonic()
+            while True:
+                message = pubsub.get_message(timeout=1.0)
+                if message:
+                    refresh_if_outdated(int(message["data"]))
+                elif _snapshot is not None and time.monotonic() - last_check > RECHECK_SECONDS:
+                    refresh_if_outdated()
+                    last_check = time.monotonic()
+        except Exception as e:
+            logger.warning(f"⚠️ Referans veri dinleyicisi hatası, {backoff} sn sonra yeniden bağlanılacak: {e}")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+
+def _ensure_listener() -> None:
+    """Dinleyiciyi süreç başına bir kez başlatır (fork sonrası çocuk süreçte yeniden)"""
+    global _listener_pid, _redis_client
+    if not LISTENER_ENABLED or _listener_pid == os.getpid():
+        return
+    with _lock:
+        if _listener_pid == os.getpid():
+            return
+        _redis_client = None  # Ebeveynden kalan bağlantı havuzu paylaşılmaz
+        _listener_pid = os.getpid()
+        threading.Thread(target=_listen, name="reference-data-listener", daemon=True).start()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context) -> None:
+    if any(isinstance(obj, REFERENCE_MODELS) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info[_INFO_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session: Session) -> None:
+    if session.info.pop(_INFO_KEY, False):
+        announce_change()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session) -> None:
+    session.info.pop(_INFO_KEY, None)
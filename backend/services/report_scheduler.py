@@ -0,0 +1,312 @@
+# backend/services/report_scheduler.py
+
+"""
+Rapor Zamanlayıcı - öncelik şeritleri ve şirket bazlı adil dağıtım
+
+Rapor işleri doğrudan Celery'ye atılmaz; önce Redis'teki şirket kuyruğuna yazılır:
+    report_sched:{lane}:pending:{company_id}   →  iş listesi (FIFO)
+    report_sched:{lane}:tenants                →  bekleyen işi olan şirketler halkası
+
+Dağıtıcı, önce `interactive` sonra `bulk` şeridinde şirketler arasında round-robin
+döner ve her şirketten, eşzamanlılık sınırı (Redis token'ı) izin verdiği sürece
+bir iş alıp şeridin Celery kuyruğuna gönderir. Böylece 200 rapor isteyen bir şirket
+diğerlerini aç bırakmaz; etkileşimli istekler toplu işlerin arkasında beklemez.
+
+Token'lar `report_sched:running:{company_id}` sorted set'inde (skor = gönderim zamanı)
+kiralama olarak tutulur; görev bittiğinde bırakılır, çöken worker'ların kiraları
+LEASE_SECONDS sonra kendiliğinden düşer. Bırakılan kiralardan ölçülen süreler
+tahmini bekleme süresini (`estimated_time_seconds`) besler.
+"""
+
+import json
+import logging
+import math
+import os
+import time
+import uuid
+from typing import Dict, Optional
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+LANE_INTERACTIVE = "interactive"
+LANE_BULK = "bulk"
+LANES = (LANE_INTERACTIVE, LANE_BULK)  # Öncelik sırasıyla
+
+LANE_QUEUES = {
+    LANE_INTERACTIVE: "q_reports_interactive",
+    LANE_BULK: "q_reports_bulk",
+}
+
+# Rapor tipi → (Celery görevi, ölçüm yokken varsayılan süre)
+REPORT_KINDS = {
+    "cbam_xml": ("tasks.generate_cbam_report_async", 20.0),
+    "roi_analysis": ("tasks.calculate_roi_analysis_async", 15.0),
+    "combined": (None, 20.0),  # chord: render_*_report_part + finalize_combined_report
+}
+
+KEY_PREFIX = "report_sched"
+LEASES_KEY = f"{KEY_PREFIX}:leases"
+DURATIONS_KEY = f"{KEY_PREFIX}:durations"
+DISPATCH_LOCK_KEY = f"{KEY_PREFIX}:dispatch_lock"
+
+COMPANY_CONCURRENCY = int(os.getenv("REPORT_COMPANY_CONCURRENCY", "2"))
+LANE_WORKERS = {
+    LANE_INTERACTIVE: int(os.getenv("REPORT_INTERACTIVE_WORKERS", "4")),
+    LANE_BULK: int(os.getenv("REPORT_BULK_WORKERS", "4")),
+}
+LEASE_SECONDS = int(os.getenv("REPORT_LEASE_SECONDS", "1800"))
+DURATION_ALPHA = 0.2  # Süre ölçümleri için üstel hareketli ortalama katsayısı
+
+# KEYS[1] = şirketin iş listesi, KEYS[2] = şeridin şirket halkası
+# ARGV[1] = iş (JSON), ARGV[2] = company_id
+# Şirket halkada zaten varsa yeri korunur (aktif şirket öne geçemez/geri düşmez)
+_ENQUEUE_SCRIPT = """
+redis.call('RPUSH', KEYS[1], ARGV[1])
+if not redis.call('LPOS', KEYS[2], ARGV[2]) then
+    redis.call('RPUSH', KEYS[2], ARGV[2])
+end
+return 1
+"""
+
+# KEYS[1] = şirketin iş listesi, KEYS[2] = şeridin şirket halkası, ARGV[1] = company_id
+# Liste boşsa şirketi halkadan çıkarır (arada gelen iş kaybolmasın diye atomik)
+_PRUNE_SCRIPT = """
+if redis.call('LLEN', KEYS[1]) == 0 then
+    redis.call('LREM', KEYS[2], 0, ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# KEYS[1] = şirketin running zset'i
+# ARGV[1] = şimdi, ARGV[2] = kira süresi, ARGV[3] = sınır, ARGV[4] = report_id
+_ACQUIRE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', tonumber(ARGV[1]) - tonumber(ARGV[2]))
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], ARGV[1], ARGV[4])
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+def pending_key(lane: str, company_id) -> str:
+    return f"{KEY_PREFIX}:{lane}:pending:{company_id}"
+
+
+def tenants_key(lane: str) -> str:
+    return f"{KEY_PREFIX}:{lane}:tenants"
+
+
+def running_key(company_id) -> str:
+    return f"{KEY_PREFIX}:running:{company_id}"
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class ReportScheduler:
+    """Şeritli, şirket bazlı adil rapor iş zamanlayıcısı"""
+
+    def __init__(self, redis_client: redis.Redis, celery_app=None):
+        self.redis = redis_client
+        self._celery_app = celery_app
+        self._enqueue = self.redis.register_script(_ENQUEUE_SCRIPT)
+        self._prune = self.redis.register_script(_PRUNE_SCRIPT)
+        self._acquire = self.redis.register_script(_ACQUIRE_SCRIPT)
+
+    @property
+    def celery_app(self):
+        if self._celery_app is None:
+            from celery_config import app
+            self._celery_app = app
+        return self._celery_app
+
+    # --- Kuyruğa alma ---
+
+    def enqueue(self, report_id: int, company_id: int, report_type: str, lane: str = LANE_INTERACTIVE) -> Dict:
+        """
+        İşi şirket kuyruğuna yazar ve dağıtıcıyı tetikler.
+        Celery görev id'si önceden üretilir; rapor satırına hemen yazılabilir.
+        """
+        report_type = getattr(report_type, "value", report_type)
+        if report_type not in REPORT_KINDS:
+            raise ValueError(f"Bilinmeyen rapor tipi: {report_type}")
+        if lane not in LANES:
+            raise ValueError(f"Bilinmeyen şerit: {lane}")
+
+        task_id = str(uuid.uuid4())
+        # Tahmin, bu işten önce bekleyenlere göre yapılır
+        estimated_time = self.estimate_wait_seconds(company_id, report_type, lane)
+
+        job = json.dumps({
+            "report_id": report_id,
+            "company_id": company_id,
+            "report_type": report_type,
+            "task_id": task_id,
+            "enqueued_at": time.time(),
+        })
+        self._enqueue(keys=[pending_key(lane, company_id), tenants_key(lane)], args=[job, company_id])
+
+        self.dispatch()
+        return {"task_id": task_id, "estimated_time_seconds": estimated_time}
+
+    # --- Dağıtım ---
+
+    def dispatch(self, max_jobs: int = 500) -> int:
+        """
+        Şeritleri öncelik sırasıyla dolaşıp token'ı olan şirketlerden birer iş
+        gönderir (round-robin). Aynı anda tek dağıtıcı çalışır.
+        """
+        lock_token = str(uuid.uuid4())
+        if not self.redis.set(DISPATCH_LOCK_KEY, lock_token, nx=True, ex=30):
+            return 0
+
+        dispatched = 0
+        try:
+            for lane in LANES:
+                progress = True
+                while progress and dispatched < max_jobs:
+                    progress = False
+                    ring = tenants_key(lane)
+                    for _ in range(self.redis.llen(ring)):
+                        # Halkayı döndür: baştaki şirket sona geçer
+                        company_id = _decode(self.redis.lmove(ring, ring, "LEFT", "RIGHT"))
+                        if company_id is None:
+                            break
+                        queue = pending_key(lane, company_id)
+                        raw_job = self.redis.lindex(queue, 0)
+                        if raw_job is None:
+                            self._prune(keys=[queue, ring], args=[company_id])
+                            continue
+
+                        job = json.loads(raw_job)
+                        if not self._acquire(
+                            keys=[running_key(company_id)],
+                            args=[time.time(), LEASE_SECONDS, COMPANY_CONCURRENCY, job["report_id"]]
+                        ):
+                            continue  # Şirket sınırda; sıradaki şirkete geç
+
+                        self.redis.lpop(queue)
+                        self.redis.hset(LEASES_KEY, job["report_id"], json.dumps({
+                            "company_id": company_id,
+                            "report_type": job["report_type"],
+                            "dispatched_at": time.time(),
+                        }))
+                        try:
+                            self._send(job, lane)
+                        except Exception:
+                            # Gönderilemediyse işi geri koy, kirayı bırak
+                            self.redis.lpush(queue, raw_job)
+                            self.release(job["report_id"], record_duration=False)
+                            raise
+                        dispatched += 1
+                        progress = True
+                        if dispatched >= max_jobs:
+                            break
+        finally:
+            if _decode(self.redis.get(DISPATCH_LOCK_KEY)) == lock_token:
+                self.redis.delete(DISPATCH_LOCK_KEY)
+
+        if dispatched:
+            logger.info(f"📤 {dispatched} rapor işi şeritlere dağıtıldı")
+        return dispatched
+
+    def _send(self, job: Dict, lane: str) -> None:
+        queue = LANE_QUEUES[lane]
+        task_name, _ = REPORT_KINDS[job["report_type"]]
+        app = self.celery_app
+
+        if task_name:
+            app.send_task(task_name, args=[job["report_id"]], task_id=job["task_id"], queue=queue)
+            return
+
+        # Birleşik rapor: parçalar paralel, callback satırı bir kez tamamlar
+        from celery import chord
+        report_id = job["report_id"]
+        header = [
+            app.signature("tasks.render_cbam_report_part", args=(report_id,), queue=queue),
+            app.signature("tasks.render_roi_report_part", args=(report_id,), queue=queue),
+        ]
+        callback = app.signature("tasks.finalize_combined_report", args=(report_id,), queue=queue)
+        callback.on_error(app.signature("tasks.mark_combined_report_failed", args=(report_id,), queue=queue))
+        chord(header, callback).apply_async(task_id=job["task_id"], queue=queue)
+
+    # --- Token bırakma ve süre ölçümü ---
+
+    def release(self, report_id: int, record_duration: bool = True) -> None:
+        """Raporun token'ını bırakır ve (isteğe bağlı) geçen süreyi ölçüme ekler"""
+        raw_lease = self.redis.hget(LEASES_KEY, report_id)
+        if not raw_lease:
+            return
+        lease = json.loads(raw_lease)
+
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.zrem(running_key(lease["company_id"]), report_id)
+        pipe.hdel(LEASES_KEY, report_id)
+        pipe.execute()
+
+        if record_duration:
+            self.record_duration(lease["report_type"], time.time() - lease["dispatched_at"])
+
+    def record_duration(self, report_type: str, seconds: float) -> None:
+        previous = self.redis.hget(DURATIONS_KEY, report_type)
+        if previous is None:
+            value = seconds
+        else:
+            value = (1 - DURATION_ALPHA) * float(previous) + DURATION_ALPHA * seconds
+        self.redis.hset(DURATIONS_KEY, report_type, value)
+
+    def average_duration(self, report_type: str) -> float:
+        measured = self.redis.hget(DURATIONS_KEY, report_type)
+        if measured is not None:
+            return float(measured)
+        return REPORT_KINDS[report_type][1]
+
+    # --- Tahmin ---
+
+    def estimate_wait_seconds(self, company_id: int, report_type: str, lane: str = LANE_INTERACTIVE) -> int:
+        """
+        Yeni iş için tahmini tamamlanma süresi:
+        şirketin sıradaki ve çalışan işleri (sınır kadar paralel) ile şeridin
+        Celery kuyruğundaki birikim (worker sayısı kadar paralel) dalga sayısı × ölçülen süre.
+        """
+        duration = self.average_duration(report_type)
+        try:
+            running_key_ = running_key(company_id)
+            self.redis.zremrangebyscore(running_key_, "-inf", time.time() - LEASE_SECONDS)
+            company_ahead = self.redis.llen(pending_key(lane, company_id)) + self.redis.zcard(running_key_)
+            # Redis broker'da kuyruk adı = liste anahtarı
+            broker_backlog = self.redis.llen(LANE_QUEUES[lane])
+        except redis.RedisError as e:
+            logger.warning(f"Rapor kuyruğu konumu okunamadı: {e}")
+            return math.ceil(duration)
+
+        waves = max(
+            company_ahead // max(COMPANY_CONCURRENCY, 1),
+            broker_backlog // max(LANE_WORKERS[lane], 1),
+        )
+        return math.ceil(duration * (waves + 1))
+
+    def queue_position(self, report_id: int, company_id: int, lane: str = LANE_INTERACTIVE) -> Optional[int]:
+        """İşin şirket kuyruğundaki sırası (1 = sıradaki); gönderilmişse None"""
+        for index, raw_job in enumerate(self.redis.lrange(pending_key(lane, company_id), 0, -1)):
+            if json.loads(raw_job)["report_id"] == report_id:
+                return index + 1
+        return None
+
+
+# Singleton instance
+_report_scheduler = None
+
+def get_report_scheduler() -> ReportScheduler:
+    """Rapor zamanlayıcı singleton"""
+    global _report_scheduler
+    if _report_scheduler is None:
+        client = redis.Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+        _report_scheduler = ReportScheduler(client)
+    return _report_scheduler
@@ -0,0 +1,163 @@
+# backend/services/report_storage.py
+
+"""
+Rapor Artefakt Deposu - sıkıştırılmış rapor dosyaları
+
+Raporlar diske gzip ile sıkıştırılmış olarak yazılır (`*.xml.gz`, `*.json.gz`).
+İndirme tarafında istemci gzip kabul ediyorsa sıkıştırılmış baytlar olduğu gibi
+(Content-Encoding: gzip) gönderilir; etmiyorsa dosya parça parça açılarak
+akıtılır. Her iki yolda da Range istekleri (devam ettirilebilir indirme) desteklenir.
+"""
+
+import gzip
+import os
+import shutil
+import struct
+import zipfile
+from typing import IO, Dict, Iterator, Optional, Tuple
+
+REPORT_DIR = os.getenv("REPORT_DIR", "/tmp/reports")
+COMPRESSED_SUFFIX = ".gz"
+COMPRESS_LEVEL = 6
+CHUNK_SIZE = 64 * 1024
+
+MEDIA_TYPES = {
+    ".xml": "application/xml",
+    ".json": "application/json",
+    ".zip": "application/zip",
+}
+
+
+class RangeNotSatisfiable(Exception):
+    """İstenen bayt aralığı dosya boyutunun dışında"""
+
+
+def new_artifact_path(
+    prefix: str,
+    company_id: int,
+    extension: str,
+    unique_id: str,
+    compressed: bool = True
+) -> str:
+    """Artefakt için yeni dosya yolu (örn: /tmp/reports/cbam_5_<uuid>.xml.gz)"""
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    suffix = COMPRESSED_SUFFIX if compressed else ""
+    return os.path.join(REPORT_DIR, f"{prefix}_{company_id}_{unique_id}{extension}{suffix}")
+
+
+def open_artifact(file_path: str, mode: str = "wb") -> IO:
+    """
+    Artefaktı yazmak için aç; `.gz` uzantılı yollar gzip akışı olarak açılır.
+    Metin kipleri süreç yerel ayarından bağımsız olarak UTF-8 yazar.
+    """
+    encoding = "utf-8" if "t" in mode else None
+    if is_compressed(file_path):
+        return gzip.open(file_path, mode, compresslevel=COMPRESS_LEVEL, encoding=encoding)
+    return open(file_path, mode, encoding=encoding)
+
+
+def write_bundle(bundle_path: str, members: Dict[str, str]) -> None:
+    """
+    Parça artefaktları tek bir zip paketinde birleştirir ({arşiv içi ad: parça yolu}).
+    Parçalar açılarak akıtılır; hiçbiri belleğe tamamen alınmaz.
+    """
+    with zipfile.ZipFile(bundle_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, part_path in members.items():
+            opener = gzip.open if is_compressed(part_path) else open
+            with opener(part_path, "rb") as src, zf.open(name, "w") as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+
+def is_compressed(file_path: str) -> bool:
+    return file_path.endswith(COMPRESSED_SUFFIX)
+
+
+def content_extension(file_path: str) -> str:
+    """Sıkıştırma son ekini atlayarak içerik uzantısını döndürür (.xml / .json)"""
+    if is_compressed(file_path):
+        file_path = file_path[:-len(COMPRESSED_SUFFIX)]
+    return os.path.splitext(file_path)[1].lower()
+
+
+def media_type_for(file_path: str) -> str:
+    return MEDIA_TYPES.get(content_extension(file_path), "application/octet-stream")
+
+
+def uncompressed_size(file_path: str) -> int:
+    """
+    gzip trailer'ındaki ISIZE alanından açık boyutu okur (dosyayı açmadan).
+    ISIZE 2^32 modunda tutulur; rapor boyutları için yeterlidir.
+    """
+    with open(file_path, "rb") as f:
+        f.seek(-4, os.SEEK_END)
+        return struct.unpack("<I", f.read(4))[0]
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Accept-Encoding başlığı gzip'e (q > 0) izin veriyor mu?"""
+    if not accept_encoding:
+        return False
+
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if coding not in ("gzip", "x-gzip", "*"):
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            return True
+    return False
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Tek aralıklı `bytes=start-end` başlığını (dahil sınırlarla) çözer.
+    Başlık yoksa veya anlaşılamıyorsa None döner (tam içerik gönderilir).
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec:
+        return None  # Çoklu aralık: tam içerik gönder
+
+    start_str, sep, end_str = spec.partition("-")
+    if not sep:
+        return None
+
+    try:
+        if start_str == "":
+            # Son N bayt
+            suffix = int(end_str)
+            if suffix <= 0 or size == 0:
+                raise RangeNotSatisfiable(range_header)
+            return max(size - suffix, 0), size - 1
+        start = int(start_str)
+        end = int(end_str) if end_str else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        raise RangeNotSatisfiable(range_header)
+    return start, min(end, size - 1)
+
+
+def iter_decompressed(file_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    """Sıkıştırılmış artefaktı açarak [start, end] aralığını parça parça akıtır"""
+    with gzip.open(file_path, "rb") as f:
+        if start:
+            f.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
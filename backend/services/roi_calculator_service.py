@@ -6,17 +6,130 @@ KOBİ'lere somut TL bazlı tasarruf potansiyeli gösterir
 """
 
 import logging
+from dataclasses import dataclass
 from datetime import date, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+from sqlalchemy import and_, case, func, select
 from sqlalchemy.orm import Session
 
 import models
 import schemas
+from services import cashflow_engine, data_revision, pv_simulation_service
+from services.data_analysis_service import DataAnalysisService
+from services.reference_data import get_reference_snapshot
 
 logger = logging.getLogger(__name__)
 
 
+# Varsayılan birim maliyetler (2024 Türkiye)
+DEFAULT_ELECTRICITY_COST = 4.5  # TL/kWh
+DEFAULT_GAS_COST = 15.0  # TL/m³
+DEFAULT_DIESEL_COST = 35.0  # TL/litre
+DEFAULT_FACILITY_AREA_M2 = 1000  # Yüzey alanı girilmemiş tesisler için
+
+_SNAPSHOT_CACHE_MAX = 1024
+
+
+@dataclass(frozen=True)
+class FacilityConsumption:
+    """Tesis bazında yıllığa normalize tüketim (ConsumptionSnapshot içinde)"""
+    facility_id: int
+    name: str
+    city: Optional[str]
+    electricity_kwh: float
+    natural_gas_m3: float
+    diesel_liters: float
+    total_co2_tons: float
+    area_m2: float  # Alan girilmemişse 1000 m²
+    facility_type: Optional[models.FacilityType] = None
+    electricity_profile: Tuple[float, ...] = (0.0,) * 12  # Ocak-Aralık ortalama kWh (şekil)
+
+    @property
+    def load_profile(self) -> str:
+        """Saatlik yük profili anahtarı (pv_simulation_service.LOAD_PROFILES)"""
+        return self.facility_type.value if self.facility_type else pv_simulation_service.DEFAULT_LOAD_PROFILE
+
+    @property
+    def monthly_electricity_kwh(self) -> List[float]:
+        """Yıllık elektrik tüketiminin takvim profiline göre aylık dağılımı (Ocak-Aralık)"""
+        return pv_simulation_service.monthly_from_profile(self.electricity_kwh, self.electricity_profile)
+
+
+@dataclass(frozen=True)
+class ConsumptionSnapshot:
+    """
+    Bir şirketin ROI hesaplarına giren tüm verilerinin değişmez anlık görüntüsü.
+    Tek bir SQL ifadesiyle yüklenir ve tüm ROI metotlarına aynen geçirilir.
+    Tüketim değerleri yıllığa normalize edilmiştir.
+    """
+    company_id: int
+    industry_type: Optional[models.IndustryType]
+    period_months: int
+    electricity_kwh: float
+    natural_gas_m3: float
+    diesel_liters: float
+    total_co2_tons: float
+    facility_count: int
+    total_area_m2: float  # Alanı girilmemiş tesisler 1000 m² sayılır
+    electricity_cost_kwh: float
+    gas_cost_m3: float
+    has_template: bool
+    best_in_class_kwh_per_employee: Optional[float]
+    average_kwh_per_employee: Optional[float]
+    typical_electricity_ratio: Optional[float]
+    data_version: str
+    facilities: Tuple[FacilityConsumption, ...] = ()
+    reference_version: int = 0  # Sektör şablonunun okunduğu referans görüntüsü
+    period_end: Optional[date] = None  # Dönem penceresi [period_end - period_months*30 gün, period_end]
+
+    @property
+    def consumption(self) -> Dict[str, float]:
+        """Eski sözlük biçiminde tüketim (her çağrıda yeni kopya)"""
+        return {
+            "electricity_kwh": self.electricity_kwh,
+            "natural_gas_m3": self.natural_gas_m3,
+            "diesel_liters": self.diesel_liters,
+            "total_co2_tons": self.total_co2_tons,
+        }
+
+    @property
+    def primary_facility(self) -> Optional[FacilityConsumption]:
+        """En çok elektrik tüketen tesis (GES simülasyonunun ili ve yük profili)"""
+        return max(self.facilities, key=lambda f: f.electricity_kwh, default=None)
+
+    @property
+    def solar_city(self) -> Optional[str]:
+        primary = self.primary_facility
+        return primary.city if primary else None
+
+    @property
+    def load_profile(self) -> str:
+        primary = self.primary_facility
+        return primary.load_profile if primary else pv_simulation_service.DEFAULT_LOAD_PROFILE
+
+    @property
+    def monthly_electricity_kwh(self) -> List[float]:
+        """Şirket geneli aylık elektrik tüketimi: tesislerin takvim profillerinin toplamı"""
+        if not self.facilities:
+            return [self.electricity_kwh / 12] * 12
+        return np.sum([f.monthly_electricity_kwh for f in self.facilities], axis=0).tolist()
+
+
+# (company_id, period_months) → snapshot; geçerliliği veri versiyonu ile denetlenir
+_snapshot_cache: Dict[Tuple[int, int], ConsumptionSnapshot] = {}
+
+
+def invalidate_snapshot_cache(company_id: Optional[int] = None) -> None:
+    """Süreç içi snapshot önbelleğini (şirket için veya tamamen) temizler"""
+    if company_id is None:
+        _snapshot_cache.clear()
+        return
+    for key in [k for k in _snapshot_cache if k[0] == company_id]:
+        _snapshot_cache.pop(key, None)
+
+
 class ROICalculatorService:
     """
     ROI ve tasarruf potansiyeli hesaplama servisi
@@ -24,6 +137,10 @@ class ROICalculatorService:
     somut TL değerleri üretir
     """
     
+    # Rapor çıktısını veya aşağıdaki önlem varsayımlarını etkileyen her değişiklikte
+    # artırılmalı (rapor parmak izi; simülatör yüzeyi ve MACC önbellek anahtarları)
+    GENERATOR_VERSION = "4"
+    
     # Enerji verimliliği iyileştirme potansiyelleri (%)
     IMPROVEMENT_POTENTIALS = {
         "lighting_upgrade": 0.30,  # LED dönüşümü
@@ -44,13 +161,225 @@ class ROICalculatorService:
         "process_optimization": 100000,  # Ortalama maliyet
     }
     
+    MEASURE_NAMES = {
+        "lighting_upgrade": "LED Aydınlatma Dönüşümü",
+        "hvac_optimization": "HVAC Sistem Optimizasyonu",
+        "insulation_improvement": "Isı Yalıtımı İyileştirmesi",
+        "solar_panel": "Güneş Enerjisi Sistemi",
+        "energy_management": "Enerji Yönetim Sistemi",
+        "process_optimization": "Süreç Optimizasyonu"
+    }
+    
+    # Önlem ekonomik ömrü (yıl) ve yıllık verim kaybı
+    MEASURE_LIFETIMES = {
+        "lighting_upgrade": 10,
+        "hvac_optimization": 15,
+        "insulation_improvement": 20,
+        "solar_panel": 25,
+        "energy_management": 10,
+        "process_optimization": 10,
+    }
+    MEASURE_DEGRADATION = {"solar_panel": 0.005}
+    DISCOUNT_RATE = 0.15
+    
+    # Tekil önlem hesaplarının varsayımları; simülatör yüzeyi, MACC ve portföy
+    # optimizasyonu da buradan okur
+    ELECTRICITY_KG_PER_KWH = 0.42
+    GAS_KG_PER_M3 = 2.03
+    DIESEL_KG_PER_LITER = 2.68
+    DIESEL_COST_TL = 35.0
+    FEED_IN_RATIO = 0.7  # Şebekeye satış tarifesi / elektrik fiyatı
+    ROOF_SHARE = 0.3  # GES'e ayrılabilecek çatı payı
+    M2_PER_KWP = 7
+    LIGHTING_SHARE = 0.18  # Elektriğin aydınlatma payı
+    LED_SAVINGS_RATE = 0.60
+    M2_PER_FIXTURE = 10
+    COST_PER_FIXTURE = 500
+    HVAC_SHARE = 0.25  # Elektriğin HVAC payı
+    HEATING_GAS_SHARE = 0.85  # Doğalgazın ısıtma payı
+    INSULATION_SAVINGS_RATE = 0.22
+    WALL_AREA_RATIO = 0.6  # Yalıtılacak duvar alanı / kapalı alan
+    
     def __init__(self, db: Session):
         self.db = db
     
+    def load_snapshot(
+        self,
+        company_id: int,
+        period_months: int = 12,
+        use_cache: bool = True
+    ) -> ConsumptionSnapshot:
+        """
+        Şirketin tüketim, tesis ve finansal verilerini tek sorguyla yükler (sektör
+        şablonu süreç içi referans görüntüsünden) ve süreç içinde önbellekler.
+
+        Önbellekteki snapshot, şirketin güncel veri versiyonu (crud.get_company_data_version,
+        tek birincil anahtar okuması), referans verisi versiyonu ve dönem penceresi
+        aynıysa kullanılır; veri değiştiği anda yeniden yüklenir. Snapshot'ın
+        data_version alanı türetilmiş sonuçların önbellek anahtarıdır.
+        """
+        import crud  # döngüsel import'u önlemek için
+        
+        cache_key = (company_id, period_months)
+        if use_cache:
+            cached = _snapshot_cache.get(cache_key)
+            if (
+                cached is not None
+                and cached.period_end == date.today()
+                and cached.reference_version == get_reference_snapshot(self.db).version
+                and cached.data_version == crud.get_company_data_version(self.db, company_id)
+            ):
+                return cached
+        
+        snapshot = self._query_snapshot(company_id, period_months)
+        
+        if len(_snapshot_cache) >= _SNAPSHOT_CACHE_MAX:
+            _snapshot_cache.clear()
+        _snapshot_cache[cache_key] = snapshot
+        return snapshot
+    
+    def _query_snapshot(self, company_id: int, period_months: int) -> ConsumptionSnapshot:
+        end_date = date.today()
+        start_date = end_date - timedelta(days=period_months * 30)
+        
+        AD = models.ActivityData
+        in_period = and_(AD.start_date >= start_date, AD.end_date <= end_date)
+        
+        def period_sum(activity_type):
+            return func.sum(case((and_(in_period, AD.activity_type == activity_type), AD.quantity), else_=0))
+        
+        # Dönem içi gerçek tüketim
+        activity = select(
+            models.Facility.company_id.label("company_id"),
+            period_sum(models.ActivityType.electricity).label("electricity_kwh"),
+            period_sum(models.ActivityType.natural_gas).label("natural_gas_m3"),
+            period_sum(models.ActivityType.diesel_fuel).label("diesel_liters"),
+            func.sum(case((in_period, AD.calculated_co2e_kg), else_=0)).label("period_co2e_kg"),
+        ).join(
+            models.Facility, models.Facility.id == AD.facility_id
+        ).where(
+            models.Facility.company_id == company_id,
+            AD.is_simulation == False
+        ).group_by(models.Facility.company_id).subquery()
+        
+        # Dönem içi tesis bazında tüketim
+        per_facility = select(
+            AD.facility_id.label("facility_id"),
+            period_sum(models.ActivityType.electricity).label("electricity_kwh"),
+            period_sum(models.ActivityType.natural_gas).label("natural_gas_m3"),
+            period_sum(models.ActivityType.diesel_fuel).label("diesel_liters"),
+            func.sum(case((in_period, AD.calculated_co2e_kg), else_=0)).label("period_co2e_kg"),
+        ).join(
+            models.Facility, models.Facility.id == AD.facility_id
+        ).where(
+            models.Facility.company_id == company_id,
+            AD.is_simulation == False
+        ).group_by(AD.facility_id).subquery()
+        
+        facilities = select(
+            models.Facility.company_id.label("company_id"),
+            func.count(models.Facility.id).label("facility_count"),
+            func.sum(func.coalesce(
+                func.nullif(models.Facility.surface_area_m2, 0), DEFAULT_FACILITY_AREA_M2
+            )).label("effective_area_m2"),
+        ).where(
+            models.Facility.company_id == company_id
+        ).group_by(models.Facility.company_id).subquery()
+        
+        # Şirket düzeyi sütunlar her tesis satırında tekrarlanır (tesis yoksa tek satır)
+        rows = self.db.execute(
+            select(
+                models.Company.industry_type,
+                models.Company.data_revision,
+                models.CompanyFinancials.company_id.label("financials_company_id"),
+                models.CompanyFinancials.avg_electricity_cost_kwh,
+                models.CompanyFinancials.avg_gas_cost_m3,
+                activity,
+                facilities.c.facility_count,
+                facilities.c.effective_area_m2,
+                models.Facility.id.label("facility_id"),
+                models.Facility.name.label("facility_name"),
+                models.Facility.city.label("facility_city"),
+                models.Facility.surface_area_m2.label("facility_area_m2"),
+                models.Facility.facility_type,
+                per_facility.c.electricity_kwh.label("facility_electricity_kwh"),
+                per_facility.c.natural_gas_m3.label("facility_natural_gas_m3"),
+                per_facility.c.diesel_liters.label("facility_diesel_liters"),
+                per_facility.c.period_co2e_kg.label("facility_co2e_kg"),
+            ).select_from(models.Company).outerjoin(
+                models.CompanyFinancials, models.CompanyFinancials.company_id == models.Company.id
+            ).outerjoin(
+                activity, activity.c.company_id == models.Company.id
+            ).outerjoin(
+                facilities, facilities.c.company_id == models.Company.id
+            ).outerjoin(
+                models.Facility, models.Facility.company_id == models.Company.id
+            ).outerjoin(
+                per_facility, per_facility.c.facility_id == models.Facility.id
+            ).where(models.Company.id == company_id).order_by(models.Facility.id)
+        ).all()
+        
+        if not rows:
+            raise ValueError(f"Şirket bulunamadı: {company_id}")
+        row = rows[0]
+        
+        # Yıllık değerlere normalize et
+        factor = 12 / period_months if period_months != 12 else 1
+        
+        # Sektörün (varsa) ilk şablonu - süreç içi referans görüntüsünden
+        reference = get_reference_snapshot(self.db)
+        template = reference.industry_template_for_type(row.industry_type)
+        
+        # GES öz tüketimi için tesis bazında aylık elektrik şekli (tek gruplanmış sorgu)
+        monthly = DataAnalysisService(self.db).get_company_monthly_summaries(
+            company_id, months_ago=period_months, include_simulation=False
+        )
+        
+        has_financials = row.financials_company_id is not None
+        electricity_cost = row.avg_electricity_cost_kwh if has_financials else None
+        gas_cost = row.avg_gas_cost_m3 if has_financials else None
+        
+        return ConsumptionSnapshot(
+            company_id=company_id,
+            industry_type=row.industry_type,
+            period_months=period_months,
+            electricity_kwh=(row.electricity_kwh or 0) * factor,
+            natural_gas_m3=(row.natural_gas_m3 or 0) * factor,
+            diesel_liters=(row.diesel_liters or 0) * factor,
+            total_co2_tons=(row.period_co2e_kg or 0) / 1000 * factor,
+            facility_count=row.facility_count or 0,
+            total_area_m2=row.effective_area_m2 or 0,
+            electricity_cost_kwh=electricity_cost if electricity_cost is not None else DEFAULT_ELECTRICITY_COST,
+            gas_cost_m3=gas_cost if gas_cost is not None else DEFAULT_GAS_COST,
+            has_template=template is not None,
+            best_in_class_kwh_per_employee=template.best_in_class_electricity_kwh if template else None,
+            average_kwh_per_employee=template.average_electricity_kwh if template else None,
+            typical_electricity_ratio=template.typical_electricity_cost_ratio if template else None,
+            data_version=data_revision.label(row.data_revision),
+            facilities=tuple(
+                FacilityConsumption(
+                    facility_id=r.facility_id,
+                    name=r.facility_name,
+                    city=r.facility_city,
+                    electricity_kwh=(r.facility_electricity_kwh or 0) * factor,
+                    natural_gas_m3=(r.facility_natural_gas_m3 or 0) * factor,
+                    diesel_liters=(r.facility_diesel_liters or 0) * factor,
+                    total_co2_tons=(r.facility_co2e_kg or 0) / 1000 * factor,
+                    area_m2=r.facility_area_m2 or DEFAULT_FACILITY_AREA_M2,
+                    facility_type=r.facility_type,
+                    electricity_profile=monthly.get(r.facility_id, models.ActivityType.electricity).calendar_profile,
+                )
+                for r in rows if r.facility_id is not None
+            ),
+            reference_version=reference.version,
+            period_end=end_date,
+        )
+    
     def calculate_roi_potential(
         self,
         company_id: int,
-        period_months: int = 12
+        period_months: int = 12,
+        snapshot: Optional[ConsumptionSnapshot] = None
     ) -> schemas.ROIAnalysisResponse:
         """
         Şirket için ROI potansiyelini hesapla
@@ -58,33 +387,25 @@ class ROICalculatorService:
         Args:
             company_id: Şirket ID'si
             period_months: Analiz dönemi (ay)
+            snapshot: Önceden yüklenmiş tüketim görüntüsü (yoksa yüklenir)
         
         Returns:
             ROI analiz sonuçları
         """
         
-        # Şirket ve finansal bilgileri al
-        company = self.db.query(models.Company).filter(
-            models.Company.id == company_id
-        ).first()
-        
-        if not company:
-            raise ValueError(f"Şirket bulunamadı: {company_id}")
-        
-        financials = self.db.query(models.CompanyFinancials).filter(
-            models.CompanyFinancials.company_id == company_id
-        ).first()
+        if snapshot is None or snapshot.period_months != period_months:
+            snapshot = self.load_snapshot(company_id, period_months)
         
         # Mevcut tüketim ve maliyetleri hesapla
-        current_consumption = self._calculate_current_consumption(company, period_months)
-        current_costs = self._calculate_current_costs(current_consumption, financials)
+        current_consumption = snapshot.consumption
+        current_costs = self._calculate_current_costs(snapshot)
         
         # Sektör benchmark'larını al
-        benchmarks = self._get_industry_benchmarks(company.industry_type)
+        benchmarks = self._get_industry_benchmarks(snapshot)
         
         # Tasarruf fırsatlarını hesapla
         savings_opportunities = self._identify_savings_opportunities(
-            company, current_consumption, current_costs, benchmarks
+            snapshot, current_costs, benchmarks
         )
         
         # En iyi 3 fırsatı seç
@@ -98,6 +419,9 @@ class ROICalculatorService:
         total_potential_savings = sum(opp["annual_savings_tl"] for opp in top_opportunities)
         total_investment_required = sum(opp["investment_tl"] for opp in top_opportunities)
         
+        # Tüm fırsatların NPV/IRR'si tek motor çağrısıyla
+        self._attach_cashflow_metrics(top_opportunities)
+        
         # Ortalama geri ödeme süresi
         avg_payback_months = (total_investment_required / total_potential_savings * 12) if total_potential_savings > 0 else 0
         
@@ -121,7 +445,8 @@ class ROICalculatorService:
         self,
         company_id: int,
         measure_type: str,
-        custom_parameters: Optional[Dict] = None
+        custom_parameters: Optional[Dict] = None,
+        snapshot: Optional[ConsumptionSnapshot] = None
     ) -> Dict:
         """
         Belirli bir enerji verimliliği önlemi için ROI hesapla
@@ -130,6 +455,7 @@ class ROICalculatorService:
             company_id: Şirket ID'si
             measure_type: Önlem tipi (lighting_upgrade, solar_panel vb.)
             custom_parameters: Özel parametreler
+            snapshot: Önceden yüklenmiş 12 aylık tüketim görüntüsü (yoksa yüklenir)
         
         Returns:
             Önlem bazlı ROI analizi
@@ -138,43 +464,29 @@ class ROICalculatorService:
         if measure_type not in self.IMPROVEMENT_POTENTIALS:
             raise ValueError(f"Geçersiz önlem tipi: {measure_type}")
         
-        company = self.db.query(models.Company).filter(
-            models.Company.id == company_id
-        ).first()
-        
-        financials = self.db.query(models.CompanyFinancials).filter(
-            models.CompanyFinancials.company_id == company_id
-        ).first()
-        
-        # Mevcut tüketimi hesapla
-        current_consumption = self._calculate_current_consumption(company, 12)
+        if snapshot is None or snapshot.period_months != 12:
+            snapshot = self.load_snapshot(company_id, 12)
         
         # Önlem bazlı tasarruf hesapla
         if measure_type == "solar_panel":
-            return self._calculate_solar_roi(
-                company, current_consumption, financials, custom_parameters
-            )
+            return self._calculate_solar_roi(snapshot, custom_parameters)
         elif measure_type == "lighting_upgrade":
-            return self._calculate_lighting_roi(
-                company, current_consumption, financials, custom_parameters
-            )
+            return self._calculate_lighting_roi(snapshot, custom_parameters)
         elif measure_type == "insulation_improvement":
-            return self._calculate_insulation_roi(
-                company, current_consumption, financials, custom_parameters
-            )
+            return self._calculate_insulation_roi(snapshot, custom_parameters)
         else:
             # Genel hesaplama
             improvement_rate = self.IMPROVEMENT_POTENTIALS[measure_type]
             
             # Elektrik tasarrufu
-            electricity_savings_kwh = current_consumption["electricity_kwh"] * improvement_rate
-            electricity_savings_tl = electricity_savings_kwh * (financials.avg_electricity_cost_kwh if financials else 4.5)
+            electricity_savings_kwh = snapshot.electricity_kwh * improvement_rate
+            electricity_savings_tl = electricity_savings_kwh * snapshot.electricity_cost_kwh
             
             # Yatırım maliyeti
             base_cost = self.INVESTMENT_COSTS[measure_type]
             if measure_type in ["lighting_upgrade", "hvac_optimization"]:
                 # kW bazlı hesaplama
-                peak_power_kw = current_consumption["electricity_kwh"] / (365 * 8)  # 8 saat/gün varsayım
+                peak_power_kw = snapshot.electricity_kwh / (365 * 8)  # 8 saat/gün varsayım
                 investment_cost = base_cost * peak_power_kw
             else:
                 investment_cost = base_cost
@@ -182,11 +494,10 @@ class ROICalculatorService:
             # Geri ödeme süresi
             payback_months = (investment_cost / electricity_savings_tl * 12) if electricity_savings_tl > 0 else 999
             
-            # Net bugünkü değer (NPV) - 5 yıl, %15 iskonto oranı
-            npv = self._calculate_npv(electricity_savings_tl, investment_cost, years=5, discount_rate=0.15)
-            
-            # İç verim oranı (IRR) - basitleştirilmiş
-            irr = (electricity_savings_tl / investment_cost - 1) if investment_cost > 0 else 0
+            # Net bugünkü değer (NPV) ve iç verim oranı (IRR) - 5 yıl, %15 iskonto oranı
+            flows = cashflow_engine.level_flows(electricity_savings_tl, investment_cost, years=5)
+            npv = float(cashflow_engine.npv(flows, self.DISCOUNT_RATE))
+            irr = self._irr_or_zero(flows)
             
             return {
                 "measure_type": measure_type,
@@ -197,75 +508,21 @@ class ROICalculatorService:
                 "payback_months": round(payback_months, 1),
                 "npv_5_years": round(npv, 0),
                 "irr_percentage": round(irr * 100, 1),
-                "co2_reduction_tons": electricity_savings_kwh * 0.42 / 1000,
+                "co2_reduction_tons": electricity_savings_kwh * self.ELECTRICITY_KG_PER_KWH / 1000,
                 "implementation_difficulty": self._get_implementation_difficulty(measure_type)
             }
     
-    def _calculate_current_consumption(
-        self,
-        company: models.Company,
-        period_months: int
-    ) -> Dict[str, float]:
-        """
-        Şirketin mevcut enerji tüketimini hesapla
-        """
-        end_date = date.today()
-        start_date = end_date - timedelta(days=period_months * 30)
-        
-        consumption = {
-            "electricity_kwh": 0,
-            "natural_gas_m3": 0,
-            "diesel_liters": 0,
-            "total_co2_tons": 0
-        }
-        
-        for facility in company.facilities:
-            activity_data = self.db.query(models.ActivityData).filter(
-                models.ActivityData.facility_id == facility.id,
-                models.ActivityData.start_date >= start_date,
-                models.ActivityData.end_date <= end_date,
-                models.ActivityData.is_simulation == False
-            ).all()
-            
-            for data in activity_data:
-                if data.activity_type == models.ActivityType.electricity:
-                    consumption["electricity_kwh"] += data.quantity
-                elif data.activity_type == models.ActivityType.natural_gas:
-                    consumption["natural_gas_m3"] += data.quantity
-                elif data.activity_type == models.ActivityType.diesel_fuel:
-                    consumption["diesel_liters"] += data.quantity
-                
-                if data.calculated_co2e_kg:
-                    consumption["total_co2_tons"] += data.calculated_co2e_kg / 1000
-        
-        # Yıllık değerlere normalize et
-        if period_months != 12:
-            factor = 12 / period_months
-            for key in consumption:
-                consumption[key] *= factor
-        
-        return consumption
-    
     def _calculate_current_costs(
         self,
-        consumption: Dict[str, float],
-        financials: Optional[models.CompanyFinancials]
+        snapshot: ConsumptionSnapshot
     ) -> Dict[str, float]:
         """
         Mevcut enerji maliyetlerini hesapla
         """
-        # Default birim maliyetler (2024 Türkiye)
-        default_electricity_cost = 4.5  # TL/kWh
-        default_gas_cost = 15.0  # TL/m³
-        default_diesel_cost = 35.0  # TL/litre
-        
-        electricity_cost_per_kwh = financials.avg_electricity_cost_kwh if financials else default_electricity_cost
-        gas_cost_per_m3 = financials.avg_gas_cost_m3 if financials else default_gas_cost
-        
         costs = {
-            "electricity": consumption["electricity_kwh"] * electricity_cost_per_kwh,
-            "natural_gas": consumption["natural_gas_m3"] * gas_cost_per_m3,
-            "diesel": consumption["diesel_liters"] * default_diesel_cost,
+            "electricity": snapshot.electricity_kwh * snapshot.electricity_cost_kwh,
+            "natural_gas": snapshot.natural_gas_m3 * snapshot.gas_cost_m3,
+            "diesel": snapshot.diesel_liters * DEFAULT_DIESEL_COST,
             "total": 0
         }
         
@@ -275,33 +532,20 @@ class ROICalculatorService:
     
     def _get_industry_benchmarks(
         self,
-        industry_type: Optional[models.IndustryType]
+        snapshot: ConsumptionSnapshot
     ) -> Dict:
         """
-        Sektör benchmark değerlerini al
+        Sektör benchmark değerlerini al (şablon snapshot ile birlikte yüklenir)
         """
-        if not industry_type:
-            # Default değerler
-            return {
-                "best_in_class_kwh_per_m2": 100,
-                "average_kwh_per_m2": 150,
-                "best_in_class_gas_m3_per_m2": 15,
-                "efficiency_gap_percentage": 0.25
-            }
-        
-        # Sektör template'ini al
-        template = self.db.query(models.IndustryTemplate).filter(
-            models.IndustryTemplate.industry_type == industry_type
-        ).first()
-        
-        if template:
+        if snapshot.industry_type and snapshot.has_template:
             return {
-                "best_in_class_kwh_per_employee": template.best_in_class_electricity_kwh,
-                "average_kwh_per_employee": template.average_electricity_kwh,
-                "typical_electricity_ratio": template.typical_electricity_cost_ratio,
+                "best_in_class_kwh_per_employee": snapshot.best_in_class_kwh_per_employee,
+                "average_kwh_per_employee": snapshot.average_kwh_per_employee,
+                "typical_electricity_ratio": snapshot.typical_electricity_ratio,
                 "efficiency_gap_percentage": 0.20  # En iyi %20'lik dilim ile fark
             }
         
+        # Default değerler
         return {
             "best_in_class_kwh_per_m2": 100,
             "average_kwh_per_m2": 150,
@@ -311,14 +555,14 @@ class ROICalculatorService:
     
     def _identify_savings_opportunities(
         self,
-        company: models.Company,
-        consumption: Dict,
+        snapshot: ConsumptionSnapshot,
         costs: Dict,
         benchmarks: Dict
     ) -> List[Dict]:
         """
         Tasarruf fırsatlarını belirle
         """
+        consumption = snapshot.consumption
         opportunities = []
         
         # 1. Elektrik verimliliği
@@ -334,16 +578,21 @@ class ROICalculatorService:
                 "investment_tl": lighting_savings / 2000 * self.INVESTMENT_COSTS["lighting_upgrade"],  # 2000 saat/yıl
                 "payback_months": 18,
                 "difficulty": "Kolay",
-                "co2_reduction_tons": lighting_savings * self.IMPROVEMENT_POTENTIALS["lighting_upgrade"] * 0.42 / 1000
+                "co2_reduction_tons": lighting_savings * self.IMPROVEMENT_POTENTIALS["lighting_upgrade"] * self.ELECTRICITY_KG_PER_KWH / 1000
             })
             
             # Güneş paneli
-            roof_area = sum(f.surface_area_m2 or 1000 for f in company.facilities) * 0.3  # Çatının %30'u
-            solar_capacity_kwp = roof_area / 7  # 7 m²/kWp
-            solar_production_kwh = solar_capacity_kwp * 1400  # Türkiye ortalaması 1400 saat/yıl
+            roof_area = snapshot.total_area_m2 * self.ROOF_SHARE
+            solar_capacity_kwp = roof_area / self.M2_PER_KWP
+            simulation = pv_simulation_service.simulate_pv(snapshot.solar_city, solar_capacity_kwp)
+            solar_production_kwh = simulation.annual_kwh
             
             if solar_production_kwh > consumption["electricity_kwh"] * 0.1:  # En az %10 karşılama
-                solar_savings = min(solar_production_kwh, consumption["electricity_kwh"] * 0.5)
+                # Şebekeye verilen üretim satış tarifesiyle (%70) öz tüketime eşdeğer kWh'e çevrilir
+                energy = pv_simulation_service.match_consumption(
+                    simulation, snapshot.monthly_electricity_kwh, snapshot.load_profile
+                )
+                solar_savings = energy["self_consumed_kwh"] + energy["exported_kwh"] * self.FEED_IN_RATIO
                 opportunities.append({
                     "measure": "solar_panel",
                     "name": "Güneş Enerjisi Sistemi (GES)",
@@ -353,13 +602,13 @@ class ROICalculatorService:
                     "investment_tl": solar_capacity_kwp * self.INVESTMENT_COSTS["solar_panel"],
                     "payback_months": (solar_capacity_kwp * self.INVESTMENT_COSTS["solar_panel"]) / (solar_savings * costs["electricity"] / consumption["electricity_kwh"] / 12) if solar_savings > 0 else 999,
                     "difficulty": "Orta",
-                    "co2_reduction_tons": solar_savings * 0.42 / 1000
+                    "co2_reduction_tons": solar_production_kwh * self.ELECTRICITY_KG_PER_KWH / 1000
                 })
         
         # 2. Doğalgaz verimliliği
         if consumption["natural_gas_m3"] > 0:
             # Yalıtım iyileştirmesi
-            total_area = sum(f.surface_area_m2 or 1000 for f in company.facilities)
+            total_area = snapshot.total_area_m2
             gas_savings_m3 = consumption["natural_gas_m3"] * self.IMPROVEMENT_POTENTIALS["insulation_improvement"]
             
             opportunities.append({
@@ -372,7 +621,7 @@ class ROICalculatorService:
                 "investment_tl": total_area * self.INVESTMENT_COSTS["insulation_improvement"],
                 "payback_months": 36,
                 "difficulty": "Orta",
-                "co2_reduction_tons": gas_savings_m3 * 2.03 / 1000
+                "co2_reduction_tons": gas_savings_m3 * self.GAS_KG_PER_M3 / 1000
             })
         
         # 3. Enerji Yönetim Sistemi
@@ -394,9 +643,7 @@ class ROICalculatorService:
     
     def _calculate_solar_roi(
         self,
-        company: models.Company,
-        consumption: Dict,
-        financials: Optional[models.CompanyFinancials],
+        snapshot: ConsumptionSnapshot,
         params: Optional[Dict]
     ) -> Dict:
         """
@@ -406,38 +653,41 @@ class ROICalculatorService:
         capacity_kwp = params.get("capacity_kwp", 100) if params else 100
         installation_cost_per_kwp = params.get("cost_per_kwp", self.INVESTMENT_COSTS["solar_panel"]) if params else self.INVESTMENT_COSTS["solar_panel"]
         
-        # Üretim tahmini (Türkiye ortalaması)
-        annual_production_kwh = capacity_kwp * 1400  # 1400 tam güneş saati/yıl
-        self_consumption_rate = min(0.7, consumption["electricity_kwh"] / annual_production_kwh) if annual_production_kwh > 0 else 0
+        # Üretim: en çok elektrik tüketen tesisin ilinde saatlik simülasyon
+        city = params.get("city") if params and params.get("city") else snapshot.solar_city
+        simulation = pv_simulation_service.simulate_pv(
+            city,
+            capacity_kwp,
+            params.get("tilt_deg", pv_simulation_service.DEFAULT_TILT_DEG) if params else pv_simulation_service.DEFAULT_TILT_DEG,
+            params.get("azimuth_deg", pv_simulation_service.DEFAULT_AZIMUTH_DEG) if params else pv_simulation_service.DEFAULT_AZIMUTH_DEG
+        )
+        annual_production_kwh = simulation.annual_kwh
+        
+        # Öz tüketim: yıllık tüketim tesislerin takvim profillerine göre aylara
+        # dağıtılıp tesis tipinin saatlik yük eğrisiyle eşleştirilir
+        energy = pv_simulation_service.match_consumption(
+            simulation, snapshot.monthly_electricity_kwh, snapshot.load_profile
+        )
+        self_consumption_rate = energy["self_consumption_ratio"]
         
         # Tasarruflar
-        self_consumed_kwh = annual_production_kwh * self_consumption_rate
-        grid_feed_kwh = annual_production_kwh * (1 - self_consumption_rate)
+        self_consumed_kwh = energy["self_consumed_kwh"]
+        grid_feed_kwh = energy["exported_kwh"]
         
-        electricity_cost_per_kwh = financials.avg_electricity_cost_kwh if financials else 4.5
-        feed_in_tariff = electricity_cost_per_kwh * 0.7  # Şebekeye satış tarifesi
+        electricity_cost_per_kwh = snapshot.electricity_cost_kwh
+        feed_in_tariff = electricity_cost_per_kwh * self.FEED_IN_RATIO
         
         annual_savings = (self_consumed_kwh * electricity_cost_per_kwh) + (grid_feed_kwh * feed_in_tariff)
         
         # Yatırım maliyeti
         total_investment = capacity_kwp * installation_cost_per_kwp
         
-        # 25 yıllık analiz
-        total_savings_25_years = 0
-        for year in range(1, 26):
-            # Panel verimliliği yıllık %0.5 düşüş
-            efficiency = 1 - (year * 0.005)
-            yearly_savings = annual_savings * efficiency
-            
-            # Elektrik fiyat artışı yıllık %10
-            price_increase = (1.10 ** year)
-            yearly_savings *= price_increase
-            
-            # İskonto oranı %15
-            discount_factor = 1 / ((1.15) ** year)
-            total_savings_25_years += yearly_savings * discount_factor
-        
-        npv = total_savings_25_years - total_investment
+        # 25 yıllık analiz: panel verimliliği yıllık %0.5 düşüş, elektrik fiyatı yıllık %10 artış
+        flows = cashflow_engine.level_flows(
+            annual_savings, total_investment, years=25,
+            growth=0.10, degradation=self.MEASURE_DEGRADATION["solar_panel"]
+        )
+        npv = float(cashflow_engine.npv(flows, self.DISCOUNT_RATE))
         payback_years = total_investment / annual_savings if annual_savings > 0 else 999
         
         return {
@@ -445,43 +695,44 @@ class ROICalculatorService:
             "measure_name": f"{capacity_kwp} kWp Güneş Enerjisi Sistemi",
             "capacity_kwp": capacity_kwp,
             "annual_production_kwh": annual_production_kwh,
+            "specific_yield_kwh_per_kwp": round(simulation.specific_yield_kwh_per_kwp, 0),
+            "simulation_city": simulation.city_key,
             "self_consumption_kwh": self_consumed_kwh,
+            "self_consumption_rate": round(self_consumption_rate, 3),
             "grid_feed_kwh": grid_feed_kwh,
             "annual_savings_tl": annual_savings,
             "investment_tl": total_investment,
             "payback_years": round(payback_years, 1),
             "npv_25_years": round(npv, 0),
-            "irr_percentage": round(((total_savings_25_years / total_investment) ** (1/25) - 1) * 100, 1),
-            "co2_reduction_tons": annual_production_kwh * 0.42 / 1000,
-            "lcoe_tl_kwh": round(total_investment / (annual_production_kwh * 25), 2)  # Levelized cost
+            "irr_percentage": round(self._irr_or_zero(flows) * 100, 1),
+            "co2_reduction_tons": annual_production_kwh * self.ELECTRICITY_KG_PER_KWH / 1000,
+            "lcoe_tl_kwh": round(total_investment / (annual_production_kwh * 25), 2) if annual_production_kwh > 0 else None  # Levelized cost
         }
     
     def _calculate_lighting_roi(
         self,
-        company: models.Company,
-        consumption: Dict,
-        financials: Optional[models.CompanyFinancials],
+        snapshot: ConsumptionSnapshot,
         params: Optional[Dict]
     ) -> Dict:
         """
         LED aydınlatma dönüşümü ROI hesaplama
         """
         # Aydınlatma tüketimini tahmin et (%15-20)
-        lighting_percentage = params.get("lighting_percentage", 0.18) if params else 0.18
-        current_lighting_kwh = consumption["electricity_kwh"] * lighting_percentage
+        lighting_percentage = params.get("lighting_percentage", self.LIGHTING_SHARE) if params else self.LIGHTING_SHARE
+        current_lighting_kwh = snapshot.electricity_kwh * lighting_percentage
         
         # LED tasarruf oranı (%50-70)
-        led_savings_rate = params.get("savings_rate", 0.60) if params else 0.60
+        led_savings_rate = params.get("savings_rate", self.LED_SAVINGS_RATE) if params else self.LED_SAVINGS_RATE
         annual_savings_kwh = current_lighting_kwh * led_savings_rate
         
         # Maliyet hesaplama
-        electricity_cost_per_kwh = financials.avg_electricity_cost_kwh if financials else 4.5
+        electricity_cost_per_kwh = snapshot.electricity_cost_kwh
         annual_savings_tl = annual_savings_kwh * electricity_cost_per_kwh
         
         # Yatırım maliyeti (armatür sayısına göre)
-        total_area = sum(f.surface_area_m2 or 1000 for f in company.facilities)
-        fixtures_count = total_area / 10  # Her 10 m² için 1 armatür
-        cost_per_fixture = params.get("cost_per_fixture", 500) if params else 500
+        total_area = snapshot.total_area_m2
+        fixtures_count = total_area / self.M2_PER_FIXTURE
+        cost_per_fixture = params.get("cost_per_fixture", self.COST_PER_FIXTURE) if params else self.COST_PER_FIXTURE
         total_investment = fixtures_count * cost_per_fixture
         
         payback_months = (total_investment / annual_savings_tl * 12) if annual_savings_tl > 0 else 999
@@ -495,46 +746,44 @@ class ROICalculatorService:
             "fixtures_count": int(fixtures_count),
             "investment_tl": total_investment,
             "payback_months": round(payback_months, 1),
-            "co2_reduction_tons": annual_savings_kwh * 0.42 / 1000,
+            "co2_reduction_tons": annual_savings_kwh * self.ELECTRICITY_KG_PER_KWH / 1000,
             "implementation_difficulty": "Kolay"
         }
     
     def _calculate_insulation_roi(
         self,
-        company: models.Company,
-        consumption: Dict,
-        financials: Optional[models.CompanyFinancials],
+        snapshot: ConsumptionSnapshot,
         params: Optional[Dict]
     ) -> Dict:
         """
         Isı yalıtımı iyileştirmesi ROI hesaplama
         """
         # Isıtma/soğutma tüketimi (doğalgaz + elektrik HVAC)
-        heating_gas_m3 = consumption["natural_gas_m3"] * 0.85  # Doğalgazın %85'i ısıtma
-        hvac_electricity_kwh = consumption["electricity_kwh"] * 0.25  # Elektriğin %25'i HVAC
+        heating_gas_m3 = snapshot.natural_gas_m3 * self.HEATING_GAS_SHARE
+        hvac_electricity_kwh = snapshot.electricity_kwh * self.HVAC_SHARE
         
         # Yalıtım tasarruf oranı (%15-30)
-        insulation_savings_rate = params.get("savings_rate", 0.22) if params else 0.22
+        insulation_savings_rate = params.get("savings_rate", self.INSULATION_SAVINGS_RATE) if params else self.INSULATION_SAVINGS_RATE
         
         gas_savings_m3 = heating_gas_m3 * insulation_savings_rate
         electricity_savings_kwh = hvac_electricity_kwh * insulation_savings_rate
         
         # Maliyet hesaplama
-        gas_cost_per_m3 = financials.avg_gas_cost_m3 if financials else 15.0
-        electricity_cost_per_kwh = financials.avg_electricity_cost_kwh if financials else 4.5
+        gas_cost_per_m3 = snapshot.gas_cost_m3
+        electricity_cost_per_kwh = snapshot.electricity_cost_kwh
         
         annual_savings_tl = (gas_savings_m3 * gas_cost_per_m3) + (electricity_savings_kwh * electricity_cost_per_kwh)
         
         # Yatırım maliyeti
-        total_area = sum(f.surface_area_m2 or 1000 for f in company.facilities)
-        wall_area = total_area * 0.6  # Duvar alanı tahmin
+        total_area = snapshot.total_area_m2
+        wall_area = total_area * self.WALL_AREA_RATIO
         cost_per_m2 = params.get("cost_per_m2", self.INVESTMENT_COSTS["insulation_improvement"]) if params else self.INVESTMENT_COSTS["insulation_improvement"]
         total_investment = wall_area * cost_per_m2
         
         payback_months = (total_investment / annual_savings_tl * 12) if annual_savings_tl > 0 else 999
         
         # CO2 azaltımı
-        co2_reduction = (gas_savings_m3 * 2.03 + electricity_savings_kwh * 0.42) / 1000
+        co2_reduction = (gas_savings_m3 * self.GAS_KG_PER_M3 + electricity_savings_kwh * self.ELECTRICITY_KG_PER_KWH) / 1000
         
         return {
             "measure_type": "insulation_improvement",
@@ -625,37 +874,41 @@ class ROICalculatorService:
         
         return sorted(quick_wins, key=lambda x: x["payback_months"])[:3]
     
-    def _calculate_npv(
-        self,
-        annual_cash_flow: float,
-        initial_investment: float,
-        years: int = 5,
-        discount_rate: float = 0.15
-    ) -> float:
+    @staticmethod
+    def _irr_or_zero(flows) -> float:
+        """Tek akış için IRR; kök yoksa (ör. hiç geri dönmeyen yatırım) 0"""
+        irr = float(cashflow_engine.irr(flows))
+        return irr if irr == irr else 0.0
+    
+    def _attach_cashflow_metrics(self, opportunities: List[Dict]) -> None:
         """
-        Net Bugünkü Değer (NPV) hesaplama
+        Fırsatlar × yıl nakit akışı matrisini kurup NPV ve IRR'yi tek çağrıda hesaplar.
+        Her önlem kendi ömrü boyunca tasarruf üretir; ömür sonrası akışlar sıfırdır.
         """
-        npv = -initial_investment
-        
-        for year in range(1, years + 1):
-            discounted_cash_flow = annual_cash_flow / ((1 + discount_rate) ** year)
-            npv += discounted_cash_flow
+        if not opportunities:
+            return
+        
+        measures = [opp["measure"] for opp in opportunities]
+        lifetimes = np.array([self.MEASURE_LIFETIMES.get(m, 10) for m in measures])
+        flows = cashflow_engine.level_flows(
+            np.array([opp["annual_savings_tl"] for opp in opportunities]),
+            np.array([opp["investment_tl"] for opp in opportunities]),
+            years=int(lifetimes.max()),
+            degradation=np.array([self.MEASURE_DEGRADATION.get(m, 0.0) for m in measures])
+        )
+        flows[np.arange(flows.shape[1])[None, :] > lifetimes[:, None]] = 0
         
-        return npv
+        npvs = cashflow_engine.npv(flows, self.DISCOUNT_RATE)
+        irrs = cashflow_engine.irr(flows)
+        for opp, value, rate in zip(opportunities, npvs, irrs, strict=True):
+            opp["npv_tl"] = round(float(value), 0)
+            opp["irr_percentage"] = round(float(rate) * 100, 1) if np.isfinite(rate) else None
     
     def _get_measure_name(self, measure_type: str) -> str:
         """
         Önlem tipi için Türkçe isim
         """
-        names = {
-            "lighting_upgrade": "LED Aydınlatma Dönüşümü",
-            "hvac_optimization": "HVAC Sistem Optimizasyonu",
-            "insulation_improvement": "Isı Yalıtımı İyileştirmesi",
-            "solar_panel": "Güneş Enerjisi Sistemi",
-            "energy_management": "Enerji Yönetim Sistemi",
-            "process_optimization": "Süreç Optimizasyonu"
-        }
-        return names.get(measure_type, measure_type)
+        return self.MEASURE_NAMES.get(measure_type, measure_type)
     
     def _get_implementation_difficulty(self, measure_type: str) -> str:
         """
@@ -0,0 +1,272 @@
+# backend/services/roi_monte_carlo_service.py
+
+"""
+ROI Monte Carlo Belirsizlik Analizi
+
+ROICalculatorService tek noktalı tahminler üretir (sabit iyileştirme oranı,
+sabit yatırım maliyeti, %15 iskonto). Bu servis her önlem için iyileştirme
+oranı çarpanını, yıllık enerji fiyat artışı patikasını, yatırım maliyeti
+çarpanını ve iskonto oranını yapılandırılabilir dağılımlardan örnekler ve
+senaryoların tamamını NumPy dizileri olarak (senaryo başına Python döngüsü
+olmadan) değerlendirir. Çıktı: önlem ve portföy bazında P10/P50/P90 NPV ve
+geri ödeme süresi.
+
+Aynı senaryo çekilişleri (fiyat patikası, iskonto) tüm önlemlerde ortaktır;
+böylece portföy dağılımı önlemler arası korelasyonu korur. ROI_MC_PROCESSES > 1
+ise senaryolar parçalara bölünüp süreç havuzunda hesaplanır.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from services import cashflow_engine
+from services.roi_calculator_service import ConsumptionSnapshot, ROICalculatorService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCENARIOS = 100_000
+PROCESSES = int(os.getenv("ROI_MC_PROCESSES", "1"))
+NO_PAYBACK_MONTHS = 999
+
+# Varsayılan dağılımlar - istek ile parametre bazında ezilebilir
+DEFAULT_DISTRIBUTIONS = {
+    # IMPROVEMENT_POTENTIALS değerine uygulanan çarpan
+    "improvement_factor": {"dist": "triangular", "low": 0.7, "mode": 1.0, "high": 1.2},
+    # Yıllık enerji fiyat artışı (her yıl için ayrı çekiliş → fiyat patikası)
+    "price_growth": {"dist": "normal", "mean": 0.10, "std": 0.05},
+    # INVESTMENT_COSTS değerine uygulanan çarpan
+    "investment_factor": {"dist": "triangular", "low": 0.9, "mode": 1.0, "high": 1.35},
+    "discount_rate": {"dist": "uniform", "low": 0.12, "high": 0.18},
+}
+
+MEASURE_LIFETIMES = ROICalculatorService.MEASURE_LIFETIMES
+MEASURE_DEGRADATION = ROICalculatorService.MEASURE_DEGRADATION
+
+PERCENTILES = (10, 50, 90)
+
+# Örneklenen değerlerin anlamlı aralığı: oranlar -100%'ün altına inemez ((1+r)^t tanımsız),
+# çarpanlar negatif olamaz. Sınırsız dağılımların (normal) kuyrukları bu sınırlara kırpılır.
+MIN_RATE = -0.99
+SAMPLE_BOUNDS = {
+    "improvement_factor": (0.0, None),
+    "price_growth": (MIN_RATE, None),
+    "investment_factor": (0.0, None),
+    "discount_rate": (MIN_RATE, None),
+}
+
+_REQUIRED_PARAMS = {
+    "triangular": ("low", "mode", "high"),
+    "normal": ("mean", "std"),
+    "uniform": ("low", "high"),
+    "lognormal": ("mean", "sigma"),
+}
+
+
+def resolve_distributions(overrides: Optional[Dict[str, Dict]] = None) -> Dict[str, Dict]:
+    """Varsayılanları istek ile birleştirir ve parametreleri doğrular (ValueError)"""
+    distributions = dict(DEFAULT_DISTRIBUTIONS)
+    for name, spec in (overrides or {}).items():
+        if name not in DEFAULT_DISTRIBUTIONS:
+            raise ValueError(f"Bilinmeyen dağılım parametresi: {name}")
+        spec = {k: v for k, v in spec.items() if v is not None}
+        missing = [p for p in _REQUIRED_PARAMS.get(spec.get("dist"), ()) if p not in spec]
+        if spec.get("dist") not in _REQUIRED_PARAMS or missing:
+            raise ValueError(f"{name} için eksik dağılım parametreleri: {', '.join(missing) or 'dist'}")
+        if spec["dist"] == "triangular" and not spec["low"] <= spec["mode"] <= spec["high"]:
+            raise ValueError(f"{name}: low <= mode <= high olmalı")
+        if spec["dist"] == "uniform" and spec["low"] > spec["high"]:
+            raise ValueError(f"{name}: low <= high olmalı")
+        distributions[name] = spec
+    return distributions
+
+
+def _sample(rng: np.random.Generator, distributions: Dict[str, Dict], name: str, size) -> np.ndarray:
+    spec = distributions[name]
+    dist = spec["dist"]
+    if dist == "triangular":
+        if spec["low"] == spec["high"]:
+            values = np.full(size, float(spec["mode"]))
+        else:
+            values = rng.triangular(spec["low"], spec["mode"], spec["high"], size)
+    elif dist == "normal":
+        values = rng.normal(spec["mean"], spec["std"], size)
+    elif dist == "uniform":
+        values = rng.uniform(spec["low"], spec["high"], size)
+    else:
+        values = rng.lognormal(spec["mean"], spec["sigma"], size)
+    low, high = SAMPLE_BOUNDS[name]
+    return np.clip(values, low, high)
+
+
+def _simulate_chunk(
+    measures: List[Tuple[str, float, float]],
+    distributions: Dict[str, Dict],
+    scenarios: int,
+    seed_sequence: np.random.SeedSequence
+) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Bir senaryo parçasını değerlendirir. measures: (önlem, yıllık tasarruf, yatırım).
+    Dönen: {önlem: (npv, payback_ay)}; "__portfolio__" anahtarı tüm önlemlerin toplamıdır.
+    Süreç havuzunda çalışabilmesi için yalnızca düz Python/NumPy verisi alır.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    horizon = max(MEASURE_LIFETIMES.get(m, 10) for m, _, _ in measures)
+    years = np.arange(1, horizon + 1)
+
+    # Önlemler arası ortak çekilişler
+    growth = _sample(rng, distributions, "price_growth", (scenarios, horizon))
+    price_index = np.cumprod(1 + growth, axis=1)                         # (N, Y)
+    rate = _sample(rng, distributions, "discount_rate", scenarios)
+    discount = cashflow_engine.discount_factors(rate, horizon + 1)[:, 1:]  # (N, Y)
+    discounted_index = price_index * discount
+
+    results = {}
+    portfolio_flows = np.zeros((scenarios, horizon + 1))
+    portfolio_npv = np.zeros(scenarios)
+
+    for measure, annual_savings, investment in measures:
+        lifetime = MEASURE_LIFETIMES.get(measure, 10)
+        profile = 1 - years[:lifetime] * MEASURE_DEGRADATION.get(measure, 0.0)   # (L,)
+
+        savings = annual_savings * _sample(rng, distributions, "improvement_factor", scenarios)
+        capex = investment * _sample(rng, distributions, "investment_factor", scenarios)
+
+        # İskontolu toplam, (N, L) × (L,) çarpımıyla; nakit akışları geri ödeme için
+        npv = savings * (discounted_index[:, :lifetime] @ profile) - capex
+        flows = np.empty((scenarios, lifetime + 1))
+        flows[:, 0] = -capex
+        flows[:, 1:] = savings[:, None] * price_index[:, :lifetime] * profile
+
+        results[measure] = (npv, _payback_months(flows))
+        portfolio_flows[:, :lifetime + 1] += flows
+        portfolio_npv += npv
+
+    results["__portfolio__"] = (portfolio_npv, _payback_months(portfolio_flows))
+    return results
+
+
+def _payback_months(flows: np.ndarray) -> np.ndarray:
+    """Kümülatif (iskontosuz) akışın sıfırı geçtiği kesirli ay; ulaşılamazsa 999"""
+    years = cashflow_engine.payback_years(flows)
+    return np.where(np.isnan(years), NO_PAYBACK_MONTHS, years * 12)
+
+
+def _summarise(npv: np.ndarray, payback: np.ndarray) -> Dict:
+    npv_p = np.percentile(npv, PERCENTILES)
+    payback_p = np.percentile(payback, PERCENTILES)
+    return {
+        "npv_tl": {f"p{p}": round(float(v), 0) for p, v in zip(PERCENTILES, npv_p, strict=True)} | {"mean": round(float(npv.mean()), 0)},
+        "payback_months": {f"p{p}": round(float(v), 1) for p, v in zip(PERCENTILES, payback_p, strict=True)},
+        "probability_positive_npv": round(float((npv > 0).mean()), 4),
+    }
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=PROCESSES)
+    return _executor
+
+
+def simulate_measures(
+    measures: List[Tuple[str, float, float]],
+    scenarios: int = DEFAULT_SCENARIOS,
+    distributions: Optional[Dict[str, Dict]] = None,
+    seed: Optional[int] = None,
+    processes: Optional[int] = None
+) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Önlem listesini senaryolar üzerinde değerlendirir; processes > 1 ise senaryolar
+    süreç havuzundaki parçalara bölünür (her parça bağımsız bir alt tohum alır).
+    """
+    distributions = distributions or DEFAULT_DISTRIBUTIONS
+    processes = processes or PROCESSES
+    root = np.random.SeedSequence(seed)
+
+    if processes <= 1:
+        return _simulate_chunk(measures, distributions, scenarios, root)
+
+    sizes = [len(part) for part in np.array_split(np.arange(scenarios), processes)]
+    futures = [
+        _get_executor().submit(_simulate_chunk, measures, distributions, size, child)
+        for size, child in zip(sizes, root.spawn(processes), strict=True)
+    ]
+    chunks = [f.result() for f in futures]
+    return {
+        key: tuple(np.concatenate([chunk[key][i] for chunk in chunks]) for i in range(2))
+        for key in chunks[0]
+    }
+
+
+class ROIMonteCarloService:
+    """Şirket önlemleri için Monte Carlo ROI analizi"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.roi_service = ROICalculatorService(db)
+
+    def base_measures(
+        self,
+        snapshot: ConsumptionSnapshot,
+        measure_types: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """Tek noktalı ROI hesaplarını Monte Carlo'nun taban değerleri olarak kullanır"""
+        measure_types = measure_types or list(ROICalculatorService.IMPROVEMENT_POTENTIALS)
+        measures = []
+        for measure_type in measure_types:
+            result = self.roi_service.calculate_specific_measure_roi(
+                snapshot.company_id, measure_type, snapshot=snapshot
+            )
+            measures.append({
+                "measure_type": measure_type,
+                "measure_name": result.get("measure_name", measure_type),
+                "base_annual_savings_tl": float(result.get("annual_savings_tl") or 0),
+                "base_investment_tl": float(result.get("investment_tl") or 0),
+                "lifetime_years": MEASURE_LIFETIMES.get(measure_type, 10),
+            })
+        return measures
+
+    def analyze(
+        self,
+        company_id: int,
+        scenarios: int = DEFAULT_SCENARIOS,
+        measure_types: Optional[List[str]] = None,
+        distributions: Optional[Dict[str, Dict]] = None,
+        seed: Optional[int] = None
+    ) -> Dict:
+        started = time.perf_counter()
+        distributions = resolve_distributions(distributions)
+        snapshot = self.roi_service.load_snapshot(company_id, period_months=12)
+
+        measures = self.base_measures(snapshot, measure_types)
+        simulated = simulate_measures(
+            [(m["measure_type"], m["base_annual_savings_tl"], m["base_investment_tl"]) for m in measures],
+            scenarios=scenarios,
+            distributions=distributions,
+            seed=seed
+        )
+
+        for measure in measures:
+            measure.update(_summarise(*simulated[measure["measure_type"]]))
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"🎲 Monte Carlo ROI: şirket {company_id}, {scenarios} senaryo × {len(measures)} önlem, {elapsed_ms:.0f} ms")
+
+        return {
+            "company_id": company_id,
+            "scenarios": scenarios,
+            "seed": seed,
+            "data_version": snapshot.data_version,
+            "distributions": distributions,
+            "measures": sorted(measures, key=lambda m: m["npv_tl"]["p50"], reverse=True),
+            "portfolio": _summarise(*simulated["__portfolio__"]),
+            "elapsed_ms": round(elapsed_ms, 1),
+        }
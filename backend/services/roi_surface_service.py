@@ -0,0 +1,193 @@
+# backend/services/roi_surface_service.py
+
+"""
+ROI Simülatörü Yanıt Yüzeyi - slider ızgarasının tamamı tek NumPy geçişinde
+
+Frontend ROI simülatörü her slider hareketinde `/roi-simulator` çağırmak yerine
+bu yüzeyi bir kez alır ve ızgara noktaları arasında yerel olarak interpolasyon
+yapar. Izgara `SLIDER_RANGES` ile tanımlıdır (güneş kapasitesi × elektrik fiyat
+artışı × LED tasarruf oranı); her noktada geri ödeme, NPV ve yıllık tasarruf
+hesaplanır.
+
+Diziler float32 olarak base64 ile kodlanır (C sırası, `shape` eksen sırasıyla).
+Yüzey Redis'te şirket + veri versiyonu anahtarıyla önbelleklenir; veri değiştiğinde
+anahtar da değiştiği için eski yüzeyler TTL ile kendiliğinden düşer.
+"""
+
+import base64
+import json
+import logging
+import os
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+import redis
+from sqlalchemy.orm import Session
+
+from services import cashflow_engine, pv_simulation_service
+from services.roi_calculator_service import ConsumptionSnapshot, ROICalculatorService
+
+logger = logging.getLogger(__name__)
+
+# Simülatör slider aralıkları (/roi-simulator yanıtındaki slider_ranges ile aynı)
+SLIDER_RANGES = {
+    "solar_kwp": {"min": 10, "max": 500, "step": 10},
+    "electricity_price_increase": {"min": 0.05, "max": 0.25, "step": 0.01},
+    "led_savings_rate": {"min": 0.40, "max": 0.80, "step": 0.05},
+}
+
+# Yüzey çıktısını etkileyen her değişiklikte artırılmalı (önbellek anahtarı)
+SURFACE_VERSION = "2"
+SURFACE_TTL_SECONDS = int(os.getenv("ROI_SURFACE_TTL_SECONDS", str(24 * 3600)))
+KEY_PREFIX = "roi_surface"
+
+# Sabit varsayımlar tekil ROI hesaplarından okunur; değiştiklerinde önbellek
+# anahtarındaki ROI üretici versiyonu da değişir
+_ROI = ROICalculatorService
+HORIZON_YEARS = _ROI.MEASURE_LIFETIMES["solar_panel"]
+NO_PAYBACK_MONTHS = 999
+
+
+def slider_axis(name: str) -> np.ndarray:
+    """Slider aralığının ızgara noktaları (uç değerler dahil)"""
+    spec = SLIDER_RANGES[name]
+    count = int(round((spec["max"] - spec["min"]) / spec["step"])) + 1
+    return np.round(spec["min"] + spec["step"] * np.arange(count), 6)
+
+
+def _encode(array: np.ndarray, axes: List[str]) -> Dict:
+    data = np.ascontiguousarray(array, dtype="<f4")
+    return {
+        "axes": axes,
+        "shape": list(data.shape),
+        "dtype": "float32",
+        "data": base64.b64encode(data.tobytes()).decode("ascii"),
+    }
+
+
+def decode_array(payload: Dict) -> np.ndarray:
+    """`_encode` çıktısını tekrar NumPy dizisine çevirir"""
+    raw = base64.b64decode(payload["data"])
+    return np.frombuffer(raw, dtype="<f4").reshape(payload["shape"])
+
+
+def compute_surface(snapshot: ConsumptionSnapshot) -> Dict:
+    """
+    Tüm slider ızgarasını tek vektörel geçişte değerlendirir.
+
+    Portföy: seçilen kapasitede GES + seçilen oranda LED + sabit yalıtım.
+    Tüm tasarruflar yıllık fiyat artışıyla büyür, GES üretimi yıllık %0.5 düşer.
+    NPV %15 iskonto ile 25 yıl üzerinden, geri ödeme iskontosuz kümülatif
+    tasarrufun yatırımı karşıladığı (kesirli) ay olarak hesaplanır.
+    """
+    kwp = slider_axis("solar_kwp")                           # (K,)
+    growth = slider_axis("electricity_price_increase")       # (G,)
+    led_rate = slider_axis("led_savings_rate")               # (R,)
+    years = np.arange(1, HORIZON_YEARS + 1)                  # (Y,)
+
+    price = snapshot.electricity_cost_kwh
+    electricity_kwh = snapshot.electricity_kwh
+
+    # GES - _calculate_solar_roi ile aynı saatlik simülasyon; üretim kapasiteyle doğrusal
+    # olduğundan 1 kWp profili tüm kapasite ızgarasına ölçeklenir
+    unit = pv_simulation_service.simulate_pv(snapshot.solar_city, 1.0)
+    production = kwp * unit.annual_kwh
+    self_consumed = pv_simulation_service.self_consumed_kwh(
+        unit, snapshot.monthly_electricity_kwh, snapshot.load_profile, capacity_scale=kwp
+    )
+    solar_savings = self_consumed * price + (production - self_consumed) * price * _ROI.FEED_IN_RATIO
+    solar_investment = kwp * _ROI.INVESTMENT_COSTS["solar_panel"]
+
+    # LED - _calculate_lighting_roi ile aynı
+    led_savings = electricity_kwh * _ROI.LIGHTING_SHARE * led_rate * price
+    led_investment = snapshot.total_area_m2 / _ROI.M2_PER_FIXTURE * _ROI.COST_PER_FIXTURE
+
+    # Yalıtım - slider'dan bağımsız sabit katkı
+    insulation_savings = (
+        snapshot.natural_gas_m3 * _ROI.HEATING_GAS_SHARE * _ROI.INSULATION_SAVINGS_RATE * snapshot.gas_cost_m3
+        + electricity_kwh * _ROI.HVAC_SHARE * _ROI.INSULATION_SAVINGS_RATE * price
+    )
+    insulation_investment = (
+        snapshot.total_area_m2 * _ROI.WALL_AREA_RATIO * _ROI.INVESTMENT_COSTS["insulation_improvement"]
+    )
+
+    # İlk yıl tasarrufu (K, R) - fiyat artışından bağımsız
+    annual_savings = solar_savings[:, None] + led_savings[None, :] + insulation_savings
+    investment = (solar_investment[:, None] + led_investment + insulation_investment)[:, None, :]  # (K, 1, R)
+
+    # Yıllık nakit akışları (K, G, R, Y)
+    escalation = (1 + growth[:, None]) ** years[None, :]                 # (G, Y)
+    degradation = 1 - years * _ROI.MEASURE_DEGRADATION["solar_panel"]  # (Y,)
+    solar_flow = solar_savings[:, None, None] * degradation              # (K, 1, Y)
+    other_flow = (led_savings + insulation_savings)[None, :, None]       # (1, R, 1)
+    flows = (solar_flow[:, None, :, :] + other_flow[None, :, :, :]) * escalation[None, :, None, :]
+
+    flows = np.concatenate([np.broadcast_to(-investment, flows.shape[:-1])[..., None], flows], axis=-1)
+
+    npv = cashflow_engine.npv(flows, _ROI.DISCOUNT_RATE)
+    payback = cashflow_engine.payback_years(flows)
+    payback_months = np.where(np.isnan(payback), NO_PAYBACK_MONTHS, payback * 12)
+
+    return {
+        "company_id": snapshot.company_id,
+        "data_version": snapshot.data_version,
+        "surface_version": SURFACE_VERSION,
+        "horizon_years": HORIZON_YEARS,
+        "discount_rate": _ROI.DISCOUNT_RATE,
+        "axes": {
+            "solar_kwp": kwp.tolist(),
+            "electricity_price_increase": growth.tolist(),
+            "led_savings_rate": led_rate.tolist(),
+        },
+        "slider_ranges": SLIDER_RANGES,
+        "metrics": {
+            "payback_months": _encode(payback_months, ["solar_kwp", "electricity_price_increase", "led_savings_rate"]),
+            "npv_tl": _encode(npv, ["solar_kwp", "electricity_price_increase", "led_savings_rate"]),
+            "annual_savings_tl": _encode(annual_savings, ["solar_kwp", "led_savings_rate"]),
+        },
+    }
+
+
+class ROISurfaceService:
+    """Yanıt yüzeyini hesaplar ve şirket + veri versiyonu başına Redis'te tutar"""
+
+    def __init__(self, redis_client: redis.Redis):
+        self.redis = redis_client
+
+    @staticmethod
+    def cache_key(company_id: int, data_version: str) -> str:
+        # Elektrik fiyatı ve tüketim penceresi güne bağlı olduğu için tarih de anahtarda
+        versions = f"{SURFACE_VERSION}.{_ROI.GENERATOR_VERSION}"
+        return f"{KEY_PREFIX}:{company_id}:{data_version}:{versions}:{date.today().isoformat()}"
+
+    def get_surface(self, db: Session, company_id: int) -> Dict:
+        snapshot = ROICalculatorService(db).load_snapshot(company_id, period_months=12)
+        key = self.cache_key(company_id, snapshot.data_version)
+
+        try:
+            cached = self.redis.get(key)
+            if cached:
+                return json.loads(cached)
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ ROI yüzeyi önbelleği okunamadı: {e}")
+
+        surface = compute_surface(snapshot)
+
+        try:
+            self.redis.setex(key, SURFACE_TTL_SECONDS, json.dumps(surface))
+        except redis.RedisError as e:
+            logger.warning(f"⚠️ ROI yüzeyi önbelleğe yazılamadı: {e}")
+
+        return surface
+
+
+_roi_surface_service: Optional[ROISurfaceService] = None
+
+def get_roi_surface_service() -> ROISurfaceService:
+    """ROI yüzey servisi singleton"""
+    global _roi_surface_service
+    if _roi_surface_service is None:
+        client = redis.Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+        _roi_surface_service = ROISurfaceService(client)
+    return _roi_surface_service
@@ -0,0 +1,210 @@
+# backend/services/suggestion_store.py
+
+"""
+Önceden Hesaplanmış Öneri Sonuçları
+
+`/companies/{id}/suggestions` her çağrıda tüm stratejileri çalıştırmak yerine
+company_suggestion_sets tablosundaki sonucu döndürür. Sonuç şu durumlarda arka
+planda (q_analytics) yeniden hesaplanır:
+
+  - Şirketin aktivite verisi, tesisleri veya finansal bilgileri değiştiğinde
+  - Herhangi bir SuggestionParameter değiştiğinde (tüm saklı şirketler)
+
+Değişiklikler SQLAlchemy oturum olaylarıyla yakalanır; böylece API, CSV içe
+aktarma, ingestion görevleri ve admin paneli aynı yoldan geçer. Flush sırasında
+etkilenen satırlar `stale_since` ile işaretlenir, commit sonrasında yenileme
+görevi kuyruğa alınır. Aynı şirket için kısa sürede gelen değişiklikler Redis'teki
+bekleyen-görev anahtarıyla tek göreve birleştirilir.
+
+Yenileme kaybolursa (Redis/worker erişilemez) STALE_MAX_SECONDS sonrasında
+endpoint öneriyi senkron olarak yeniden hesaplar.
+"""
+
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Dict, Iterable, List, Optional
+
+import redis
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+import models
+import schemas
+from celery_config import app as celery_app
+
+logger = logging.getLogger(__name__)
+
+REFRESH_DELAY_SECONDS = int(os.getenv("SUGGESTION_REFRESH_DELAY_SECONDS", "5"))
+STALE_MAX_SECONDS = int(os.getenv("SUGGESTION_STALE_MAX_SECONDS", "300"))
+REFRESH_QUEUE = "q_analytics"
+PENDING_KEY = "suggestions:refresh_pending:{company_id}"
+
+_INFO_KEY = "suggestion_refresh"
+
+_SUGGESTION_SCHEMAS = {
+    "ges_investment": schemas.GESSuggestion,
+    "insulation_investment": schemas.InsulationSuggestion,
+    "information": schemas.InfoSuggestion,
+}
+
+
+def refresh_company_suggestions(db: Session, company_id: int) -> Optional[models.CompanySuggestionSet]:
+    """Şirketin önerilerini hesaplar ve saklar; şirket yoksa None"""
+    import suggestion_engine
+
+    company = db.query(models.Company).options(
+        joinedload(models.Company.financials),
+        selectinload(models.Company.facilities)
+    ).filter(models.Company.id == company_id).first()
+    if not company:
+        return None
+
+    suggestions, metrics = suggestion_engine.run_strategies(company, db)
+
+    stored = db.get(models.CompanySuggestionSet, company_id)
+    if stored is None:
+        stored = models.CompanySuggestionSet(company_id=company_id)
+        db.add(stored)
+    stored.suggestions = [s.model_dump(mode="json") for s in suggestions]
+    stored.strategy_metrics = metrics
+    stored.computed_at = datetime.utcnow()
+    stored.stale_since = None
+    db.commit()
+
+    total_ms = sum(m["elapsed_ms"] for m in metrics)
+    logger.info(f"💡 Öneriler yenilendi: şirket {company_id}, {len(suggestions)} öneri, {total_ms:.0f} ms")
+    return stored
+
+
+def get_company_suggestions(db: Session, company_id: int) -> List[schemas.SuggestionBase]:
+    """
+    Saklı önerileri döndürür. Hiç hesaplanmamışsa veya yenileme STALE_MAX_SECONDS
+    içinde gerçekleşmemişse senkron olarak hesaplar.
+    """
+    stored = db.get(models.CompanySuggestionSet, company_id)
+    overdue = (
+        stored is not None
+        and stored.stale_since is not None
+        and datetime.utcnow() - stored.stale_since > timedelta(seconds=STALE_MAX_SECONDS)
+    )
+    if stored is None or overdue:
+        stored = refresh_company_suggestions(db, company_id)
+        if stored is None:
+            return []
+
+    return [
+        _SUGGESTION_SCHEMAS.get(item.get("suggestion_type"), schemas.SuggestionBase).model_validate(item)
+        for item in stored.suggestions
+    ]
+
+
+def strategy_stats(db: Session) -> List[Dict]:
+    """Saklı ölçümlerden strateji bazında süre ve sorgu sayısı özeti (en yavaş önce)"""
+    grouped: Dict[str, List[Dict]] = defaultdict(list)
+    for (metrics,) in db.query(models.CompanySuggestionSet.strategy_metrics).all():
+        for metric in metrics or []:
+            grouped[metric["strategy"]].append(metric)
+
+    stats = []
+    for strategy, items in grouped.items():
+        elapsed = sorted(m["elapsed_ms"] for m in items)
+        stats.append({
+            "strategy": strategy,
+            "companies": len(items),
+            "avg_elapsed_ms": round(sum(elapsed) / len(elapsed), 2),
+            "p95_elapsed_ms": elapsed[min(len(elapsed) - 1, int(len(elapsed) * 0.95))],
+            "max_elapsed_ms": elapsed[-1],
+            "avg_query_count": round(sum(m["query_count"] for m in items) / len(items), 2),
+            "max_query_count": max(m["query_count"] for m in items),
+        })
+    return sorted(stats, key=lambda s: s["avg_elapsed_ms"], reverse=True)
+
+
+# --- Değişiklik yakalama ---------------------------------------------------
+
+_redis_client: Optional[redis.Redis] = None
+
+def _get_redis() -> redis.Redis:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+    return _redis_client
+
+
+def schedule_refresh(company_ids: Iterable[int] = (), all_companies: bool = False) -> None:
+    """Yenileme görevlerini kuyruğa alır; bekleyen görevi olan şirketler atlanır"""
+    try:
+        if all_companies:
+            celery_app.send_task(
+                "tasks.refresh_all_suggestions", queue=REFRESH_QUEUE, countdown=REFRESH_DELAY_SECONDS
+            )
+            return
+
+        client = _get_redis()
+        for company_id in company_ids:
+            key = PENDING_KEY.format(company_id=company_id)
+            if client.set(key, 1, nx=True, ex=REFRESH_DELAY_SECONDS + STALE_MAX_SECONDS):
+                celery_app.send_task(
+                    "tasks.refresh_company_suggestions", args=[company_id],
+                    queue=REFRESH_QUEUE, countdown=REFRESH_DELAY_SECONDS
+                )
+    except Exception as e:
+        logger.warning(f"⚠️ Öneri yenileme kuyruğa alınamadı: {e}")
+
+
+def clear_pending(company_id: int) -> None:
+    """Görev başlarken çağrılır; bu andan sonraki değişiklikler yeni görev açabilir"""
+    try:
+        _get_redis().delete(PENDING_KEY.format(company_id=company_id))
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Bekleyen öneri yenileme anahtarı silinemedi: {e}")
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context) -> None:
+    company_ids, facility_ids, all_companies = set(), set(), False
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, models.ActivityData):
+            facility_ids.add(obj.facility_id)
+        elif isinstance(obj, (models.Facility, models.CompanyFinancials)):
+            company_ids.add(obj.company_id)
+        elif isinstance(obj, models.SuggestionParameter):
+            all_companies = True
+
+    facility_ids.discard(None)
+    company_ids.discard(None)
+    if not (company_ids or facility_ids or all_companies):
+        return
+
+    connection = session.connection()
+    if facility_ids:
+        company_ids.update(connection.execute(
+            select(models.Facility.company_id).where(models.Facility.id.in_(facility_ids))
+        ).scalars())
+
+    # Saklı sonucu aynı işlem içinde bayat olarak işaretle
+    stale = update(models.CompanySuggestionSet).values(
+        stale_since=func.coalesce(models.CompanySuggestionSet.stale_since, datetime.utcnow())
+    )
+    if not all_companies:
+        stale = stale.where(models.CompanySuggestionSet.company_id.in_(company_ids))
+    connection.execute(stale)
+
+    pending = session.info.setdefault(_INFO_KEY, {"company_ids": set(), "all": False})
+    pending["company_ids"].update(company_ids)
+    pending["all"] = pending["all"] or all_companies
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_refresh(session: Session) -> None:
+    pending = session.info.pop(_INFO_KEY, None)
+    if pending:
+        schedule_refresh(pending["company_ids"], all_companies=pending["all"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session) -> None:
+    session.info.pop(_INFO_KEY, None)
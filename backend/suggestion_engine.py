@@ -1,32 +1,96 @@
 # backend/suggestion_engine.py
-from typing import List, Union
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple, Union
 
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 
 import crud
 import models
 import schemas
+from suggestion_strategies.context import SuggestionContext
 from suggestion_strategies.ges_strategy import GESSuggestionStrategy
 
 # Gelecekte eklenecek stratejiler buraya import edilecek
 from suggestion_strategies.insulation_strategy import InsulationStrategy
 
+logger = logging.getLogger(__name__)
+
 # Tüm strateji sınıflarını bir listede topla
 ALL_STRATEGIES = [
     GESSuggestionStrategy,
     InsulationStrategy,
 ]
 
-def generate_suggestions(company: models.Company, db: Session) -> List[Union[schemas.SuggestionBase]]:
+# Bu süreyi aşan stratejiler uyarı olarak loglanır
+SLOW_STRATEGY_MS = float(os.getenv("SUGGESTION_SLOW_STRATEGY_MS", "500"))
+
+# Strateji çalışırken çalıştırılan SQL ifadelerinin sayacı (yalnızca ölçüm sırasında ayarlı)
+_query_counter: ContextVar[Optional[List[int]]] = ContextVar("suggestion_query_counter", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_queries(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def _measure(name: str, func):
+    """func'ı çalıştırır; (sonuç, {"strategy", "elapsed_ms", "query_count"}) döndürür"""
+    counter = [0]
+    token = _query_counter.set(counter)
+    started = time.perf_counter()
+    try:
+        result = func()
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        _query_counter.reset(token)
+    if elapsed_ms > SLOW_STRATEGY_MS:
+        logger.warning(f"🐢 Yavaş öneri stratejisi: {name} {elapsed_ms:.0f} ms, {counter[0]} sorgu")
+    return result, {"strategy": name, "elapsed_ms": round(elapsed_ms, 2), "query_count": counter[0]}
+
+
+def _run_strategy(strategy) -> Optional[List[schemas.SuggestionBase]]:
+    """Uygulanabilirse stratejinin önerilerini, değilse None döndürür"""
+    if not strategy.is_applicable():
+        return None
+    return strategy.generate()
+
+
+def run_strategies(
+    company: models.Company,
+    db: Session,
+    params: Optional[dict] = None
+) -> Tuple[List[schemas.SuggestionBase], List[Dict]]:
+    """Tüm stratejileri çalıştırır; öneriler ve strateji başına süre/sorgu ölçümleri döner"""
     all_suggestions = []
-    # Parametreleri başta tek seferde çek
-    params = crud.get_all_suggestion_parameters(db)
+    metrics = []
+
+    # Parametreler ve tesislerin aylık özetleri başta tek seferde, tüm stratejiler için ortak
+    context, context_metrics = _measure(
+        SuggestionContext.__name__,
+        lambda: SuggestionContext.load(company, db, params if params is not None else crud.get_all_suggestion_parameters(db))
+    )
+    metrics.append(context_metrics)
 
     # Tüm stratejileri sırayla çalıştır
     for StrategyClass in ALL_STRATEGIES:
-        strategy_instance = StrategyClass(company, db, params)
-        if strategy_instance.is_applicable():
-            suggestions = strategy_instance.generate()
-            all_suggestions.extend(suggestions)
-    
-    return all_suggestions
\ No newline at end of file
+        strategy_instance = StrategyClass(company, db, context.params, context)
+
+        suggestions, strategy_metrics = _measure(StrategyClass.__name__, lambda s=strategy_instance: _run_strategy(s))
+        strategy_metrics["applicable"] = suggestions is not None
+        strategy_metrics["suggestion_count"] = len(suggestions or [])
+        metrics.append(strategy_metrics)
+        all_suggestions.extend(suggestions or [])
+
+    return all_suggestions, metrics
+
+
+def generate_suggestions(company: models.Company, db: Session) -> List[Union[schemas.SuggestionBase]]:
+    suggestions, _ = run_strategies(company, db)
+    return suggestions
@@ -1,18 +1,27 @@
 ### backend/suggestion_strategies/base.py
 from abc import ABC, abstractmethod
-from typing import List, Union
+from typing import List, Optional, Union
 
 from sqlalchemy.orm import Session
 
 import models
 import schemas
+from suggestion_strategies.context import SuggestionContext
 
 
 class BaseSuggestionStrategy(ABC):
-    def __init__(self, company: models.Company, db: Session, params: dict):
+    def __init__(
+        self,
+        company: models.Company,
+        db: Session,
+        params: dict,
+        context: Optional[SuggestionContext] = None
+    ):
         self.company = company
         self.db = db
         self.params = params
+        # Motor tüm stratejilere aynı bağlamı verir; tek başına kullanımda burada yüklenir
+        self.context = context or SuggestionContext.load(company, db, params)
 
     @abstractmethod
     def is_applicable(self) -> bool:
@@ -0,0 +1,29 @@
+### backend/suggestion_strategies/context.py
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+import crud
+import models
+from services.data_analysis_service import CompanyMonthlySummaries, DataAnalysisService
+
+
+@dataclass
+class SuggestionContext:
+    """
+    Tüm stratejilerin paylaştığı, öneri üretimi başında bir kez yüklenen veriler.
+    Stratejiler tesis bazında veritabanına gitmek yerine buradan okur; böylece
+    sorgu sayısı tesis sayısından bağımsızdır.
+    """
+    company: models.Company
+    params: dict
+    monthly: CompanyMonthlySummaries
+
+    @classmethod
+    def load(cls, company: models.Company, db: Session, params: Optional[dict] = None) -> "SuggestionContext":
+        return cls(
+            company=company,
+            params=params if params is not None else crud.get_all_suggestion_parameters(db),
+            monthly=DataAnalysisService(db).get_company_monthly_summaries(company.id),
+        )
@@ -3,7 +3,7 @@ from typing import List, Union
 
 import models
 import schemas
-from services.data_analysis_service import DataAnalysisService
+from services import pv_simulation_service
 from suggestion_strategies.base import BaseSuggestionStrategy
 
 
@@ -21,7 +21,7 @@ class GESSuggestionStrategy(BaseSuggestionStrategy):
         all_suggestions = []
         financials = self.company.financials
         ges_config = self.params
-        data_service = DataAnalysisService(self.db)
+        monthly = self.context.monthly
 
         # İlgili tesisleri döngüye al
         relevant_facilities = [
@@ -30,10 +30,8 @@ class GESSuggestionStrategy(BaseSuggestionStrategy):
         ]
 
         for facility in relevant_facilities:
-            months_with_data, avg_monthly_kwh = data_service.get_monthly_activity_data_summary(
-                facility_id=facility.id,
-                activity_type=models.ActivityType.electricity
-            )
+            electricity = monthly.get(facility.id, models.ActivityType.electricity)
+            months_with_data, avg_monthly_kwh = electricity.months_with_data, electricity.avg_monthly_quantity
 
             if months_with_data < 9:
                 info = schemas.InfoSuggestion(
@@ -53,22 +51,32 @@ class GESSuggestionStrategy(BaseSuggestionStrategy):
                 all_suggestions.append(info)
                 continue # Bu tesis için tüketim düşük, sonrakine geç
 
-            # Şehir bazlı güneşlenme faktörü al
-            city_key = f"city_factor_{facility.city.lower()}" if facility.city else "city_factor_default"
-            city_ges_factor = ges_config.get(city_key, ges_config.get("city_factor_default", 1.0))
-            
-            # ROI hesaplamaları (tesis bazında, şehir faktörü ile ayarlanmış)
+            # Saatlik GES simülasyonu: il profili + panel yönelimi
+            tilt_deg = ges_config.get("ges_panel_tilt_deg", pv_simulation_service.DEFAULT_TILT_DEG)
+            azimuth_deg = ges_config.get("ges_panel_azimuth_deg", pv_simulation_service.DEFAULT_AZIMUTH_DEG)
+            kwh_per_kwp = pv_simulation_service.specific_yield(facility.city, tilt_deg, azimuth_deg)
             base_kwh_per_kwp = ges_config.get("ges_kwh_generation_per_kwp_annual", 1350)
-            adjusted_kwh_per_kwp = base_kwh_per_kwp * city_ges_factor  # Şehre göre ayarla
-            
-            required_kwp = (annual_electricity_kwh_estimated * ges_config.get("ges_annual_savings_factor", 0.9)) / adjusted_kwh_per_kwp
+            city_ges_factor = kwh_per_kwp / base_kwh_per_kwp  # Türkiye ortalamasına göre bölgesel faktör
+
+            # Yıllık tüketimin hedeflenen payını karşılayacak kurulu güç
+            required_kwp = (annual_electricity_kwh_estimated * ges_config.get("ges_annual_savings_factor", 0.9)) / kwh_per_kwp
             estimated_ges_cost = required_kwp * ges_config.get("ges_estimated_cost_per_kwp", 25000.0)
-            annual_cost_before = annual_electricity_kwh_estimated * financials.avg_electricity_cost_kwh
-            annual_savings = annual_cost_before * ges_config.get("ges_annual_savings_factor", 0.9)
+
+            # Üretimi aylık tüketim şekline göre saatlik yükle eşleştir
+            monthly_kwh = pv_simulation_service.monthly_from_profile(
+                annual_electricity_kwh_estimated, electricity.calendar_profile
+            )
+            simulation = pv_simulation_service.simulate_pv(facility.city, required_kwp, tilt_deg, azimuth_deg)
+            energy = pv_simulation_service.match_consumption(simulation, monthly_kwh, profile=facility.facility_type.value)
+
+            price = financials.avg_electricity_cost_kwh
+            feed_in_ratio = ges_config.get("ges_feed_in_ratio", 0.7)
+            annual_cost_before = annual_electricity_kwh_estimated * price
+            annual_savings = energy["self_consumed_kwh"] * price + energy["exported_kwh"] * price * feed_in_ratio
             roi_years = estimated_ges_cost / annual_savings if annual_savings > 0 else float('inf')
 
             if roi_years <= ges_config.get("ges_max_roi_years", 10):
-                savings_percentage = ges_config.get('ges_annual_savings_factor', 0.9) * 100
+                savings_percentage = annual_savings / annual_cost_before * 100
                 city_name = facility.city if facility.city else "bölgeniz"
                 
                 # Şehir faktörüne göre açıklama ekle
@@ -84,14 +92,17 @@ class GESSuggestionStrategy(BaseSuggestionStrategy):
                 description_text = (
                     f"'{facility.name}' adlı tesisiniz için tahmin edilen yıllık ~{annual_electricity_kwh_estimated:,.0f} kWh elektrik tüketiminize uygun, "
                     f"yaklaşık {required_kwp:.1f} kWp gücünde bir GES yatırımı ile maliyetlerinizi ~%{savings_percentage:.0f} oranında düşürebilirsiniz. "
+                    f"Öz tüketim oranı ~%{energy['self_consumption_ratio'] * 100:.0f}; kalan üretim şebekeye verilir. "
                     f"{solar_note} (Bölgesel üretim faktörü: {city_ges_factor:.2f}x)"
                 )
                 
                 details = schemas.GESSuggestionDetails(
                     annual_electricity_kwh_estimated=annual_electricity_kwh_estimated,
-                    avg_electricity_cost_kwh=financials.avg_electricity_cost_kwh,
+                    avg_electricity_cost_kwh=price,
                     ges_estimated_cost_per_kwp=ges_config.get("ges_estimated_cost_per_kwp", 25000.0),
-                    ges_kwh_generation_per_kwp_annual=adjusted_kwh_per_kwp  # Ayarlanmış değeri kullan
+                    ges_kwh_generation_per_kwp_annual=kwh_per_kwp,  # Simüle edilen özgül verim
+                    self_consumption_ratio=energy["self_consumption_ratio"],
+                    grid_export_kwh_annual=energy["exported_kwh"]
                 )
 
                 suggestion_object = schemas.GESSuggestion(
@@ -3,7 +3,6 @@ from typing import List, Union
 
 import models
 import schemas
-from services.data_analysis_service import DataAnalysisService
 from suggestion_strategies.base import BaseSuggestionStrategy
 
 
@@ -19,14 +18,10 @@ class InsulationStrategy(BaseSuggestionStrategy):
         # Uygun olan her bir ofis tesisi için ayrı bir döngü başlat
         office_facilities = [f for f in self.company.facilities if f.facility_type == models.FacilityType.office and f.surface_area_m2]
         params = self.params
-        data_service = DataAnalysisService(self.db)
+        monthly = self.context.monthly
 
         for facility in office_facilities:
-            months_with_gas_data, _ = data_service.get_monthly_activity_data_summary(
-                facility_id=facility.id,
-                activity_type=models.ActivityType.natural_gas,
-                months_ago=12
-            )
+            months_with_gas_data, _ = monthly.summary(facility.id, models.ActivityType.natural_gas)
 
             if months_with_gas_data < 6:
                 info = schemas.InfoSuggestion(
@@ -1,4 +1,4 @@
-# backend/tasks.py
+# backend/tasks/__init__.py
 
 """
 Celery görevleri - Asenkron, periyodik işlemler
@@ -8,7 +8,8 @@ from datetime import datetime, timedelta
 from sqlalchemy import func
 
 import models
-from celery_config import DBTask, app
+from celery_config import DBTask, ReadOnlyDBTask, app
+from services import reference_data, suggestion_store
 
 logger = logging.getLogger(__name__)
 
@@ -16,18 +17,20 @@ logger = logging.getLogger(__name__)
 @app.task(name='tasks.update_industry_benchmarks', base=DBTask, bind=True, max_retries=3)
 def update_industry_benchmarks(self):
     db = self.db
+    # Toplamlar okuma oturumundan; yalnızca şablon güncellemeleri primary'ye yazılır
+    read_db = self.read_db
     try:
         logger.info("🔄 Benchmark güncelleme başladı...")
         industry_templates = db.query(models.IndustryTemplate).all()
         updated_count = 0
         for template in industry_templates:
             try:
-                companies_in_industry = db.query(models.Company).filter(models.Company.industry_type == template.industry_type).all()
+                companies_in_industry = read_db.query(models.Company).filter(models.Company.industry_type == template.industry_type).all()
                 if not companies_in_industry:
                     logger.warning(f"⚠️ {template.industry_name} için şirket yok")
                     continue
                 cutoff_date = datetime.now().date() - timedelta(days=30)
-                electricity_data = db.query(
+                electricity_data = read_db.query(
                     func.sum(models.ActivityData.quantity).label('total_kwh'),
                     models.Facility.company_id
                 ).filter(
@@ -63,13 +66,15 @@ def update_industry_benchmarks(self):
 @app.task(name='tasks.detect_anomalies', base=DBTask, bind=True, max_retries=2)
 def detect_anomalies(self):
     db = self.db
+    # Taramalar okuma oturumundan; bildirimler primary'ye yazılır
+    read_db = self.read_db
     try:
         logger.info("🔍 Anomali tespiti başladı...")
         anomaly_count = 0
-        for company in db.query(models.Company).all():
+        for company in read_db.query(models.Company).all():
             try:
                 cutoff_date = datetime.now().date() - timedelta(days=30)
-                historical_avg = db.query(func.avg(models.ActivityData.quantity)).filter(
+                historical_avg = read_db.query(func.avg(models.ActivityData.quantity)).filter(
                     models.ActivityData.activity_type == models.ActivityType.electricity,
                     models.ActivityData.is_simulation == False,
                     models.ActivityData.start_date >= cutoff_date,
@@ -78,7 +83,7 @@ def detect_anomalies(self):
                 ).scalar()
                 if not historical_avg:
                     continue
-                recent = db.query(models.ActivityData).filter(
+                recent = read_db.query(models.ActivityData).filter(
                     models.ActivityData.activity_type == models.ActivityType.electricity,
                     models.ActivityData.is_simulation == False,
                     models.ActivityData.start_date >= cutoff_date,
@@ -117,7 +122,7 @@ def detect_anomalies(self):
         raise detect_anomalies.retry(exc=exc, countdown=300)
 
 
-@app.task(name='tasks.calculate_supplier_benchmarks', base=DBTask, bind=True, max_retries=3)
+@app.task(name='tasks.calculate_supplier_benchmarks', base=ReadOnlyDBTask, bind=True, max_retries=3)
 def calculate_supplier_benchmarks(self):
     db = self.db
     try:
@@ -158,3 +163,47 @@ def calculate_supplier_benchmarks(self):
         raise calculate_supplier_benchmarks.retry(exc=exc, countdown=60)
 
 
+@app.task(name='tasks.rebuild_leaderboard_cache', base=ReadOnlyDBTask, bind=True, max_retries=3)
+def rebuild_leaderboard_cache(self):
+    db = self.db
+    try:
+        from services.leaderboard_service import get_leaderboard_service
+        count = get_leaderboard_service().rebuild_from_db(db)
+        return {"companies": count, "timestamp": datetime.now().isoformat()}
+    except Exception as exc:
+        logger.error(f"❌ Leaderboard cache yeniden oluşturma hatası: {exc}")
+        raise rebuild_leaderboard_cache.retry(exc=exc, countdown=60)
+
+
+@app.task(name='tasks.refresh_company_suggestions', base=DBTask, bind=True, max_retries=3)
+def refresh_company_suggestions(self, company_id: int):
+    db = self.db
+    try:
+        suggestion_store.clear_pending(company_id)
+        stored = suggestion_store.refresh_company_suggestions(db, company_id)
+        if stored is None:
+            return {"company_id": company_id, "status": "company_not_found"}
+        return {"company_id": company_id, "suggestions": len(stored.suggestions), "computed_at": stored.computed_at.isoformat()}
+    except Exception as exc:
+        db.rollback()
+        logger.error(f"❌ Öneri yenileme hatası (şirket {company_id}): {exc}")
+        raise refresh_company_suggestions.retry(exc=exc, countdown=60)
+
+
+@app.task(name='tasks.refresh_all_suggestions', base=DBTask, bind=True, max_retries=2)
+def refresh_all_suggestions(self):
+    """Parametre değişiminde saklı önerisi olan tüm şirketleri yeniler"""
+    db = self.db
+    # Parametre değişikliği bu sürece henüz ulaşmamış olabilir
+    reference_data.refresh_if_outdated()
+    company_ids = [cid for (cid,) in db.query(models.CompanySuggestionSet.company_id).all()]
+    refreshed = 0
+    for company_id in company_ids:
+        try:
+            suggestion_store.refresh_company_suggestions(db, company_id)
+            refreshed += 1
+        except Exception as e:
+            db.rollback()
+            logger.error(f"❌ Öneri yenileme hatası (şirket {company_id}): {e}")
+    logger.info(f"✅ Öneriler yenilendi: {refreshed}/{len(company_ids)} şirket")
+    return {"refreshed": refreshed, "total": len(company_ids), "timestamp": datetime.now().isoformat()}
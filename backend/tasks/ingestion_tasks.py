@@ -6,6 +6,7 @@ import logging
 
 import models
 from celery_config import DeadLetterTask, app
+from services import suggestion_store  # noqa: F401 - öneri yenileme oturum olayları
 from services.events import ActivityInvalidEvent, ActivityValidatedEvent, InvoiceVerifiedEvent
 from tasks.utils import idempotent_task
 
@@ -6,86 +6,179 @@ import json
 import logging
 import os
 import uuid
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
+from celery import states
+
+import crud
 import models
 from celery_config import DBTask, app
+from services import report_storage
 
 logger = logging.getLogger(__name__)
 
 
-@app.task(name='tasks.generate_cbam_report_async', base=DBTask, bind=True, max_retries=3)
-def generate_cbam_report_async(self, report_id: int):
-    db = self.db
-    try:
-        logger.info(f"📊 CBAM raporu oluşturuluyor: Report #{report_id}")
-        report = db.query(models.Report).filter(models.Report.id == report_id).first()
-        if not report:
-            logger.error(f"❌ Rapor bulunamadı: #{report_id}")
-            return {"status": "failed", "reason": "report_not_found"}
+REPORT_TTL = timedelta(days=7)
+
+
+class LeasedReportTask(DBTask):
+    """
+    Rapor satırını sonlandıran görevler için taban sınıf: görev kesin olarak
+    bittiğinde (başarı veya tüm denemelerden sonra hata) şirketin eşzamanlılık
+    token'ını bırakır ve boşalan yere sıradaki işi dağıtır. Retry'a giren görev
+    token'ını korur (takılan işlerin kirası yine LEASE_SECONDS sonra düşer).
+    report_id son konumsal argümandır.
+    """
+
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        super().after_return(status, retval, task_id, args, kwargs, einfo)
+        if status not in states.READY_STATES:
+            return  # RETRY: görev yeniden çalışacak
+        report_id = kwargs.get('report_id') if kwargs and 'report_id' in kwargs else (args[-1] if args else None)
+        if report_id is None:
+            return
+        try:
+            from services.report_scheduler import get_report_scheduler
+            scheduler = get_report_scheduler()
+            # Süre ölçümü yalnızca başarılı işlerden; hatalar tahmini bozmasın
+            scheduler.release(report_id, record_duration=status == states.SUCCESS)
+            scheduler.dispatch()
+        except Exception as e:
+            logger.warning(f"⚠️ Rapor token'ı bırakılamadı: Report #{report_id}: {e}")
 
-        report.status = models.ReportStatus.processing
-        report.requested_at = datetime.utcnow()
+
+def _start_report(db, report: models.Report, read_db=None) -> None:
+    report.status = models.ReportStatus.processing
+    report.requested_at = datetime.utcnow()
+    # Parmak izi, üretimin gerçekten okuduğu veri versiyonunu yansıtsın (replikadan okunuyorsa replikanınkini)
+    report.fingerprint = crud.get_report_fingerprint(
+        read_db or db, report.report_type, report.company_id, report.start_date, report.end_date
+    )
+    db.commit()
+
+
+def _complete_report(db, report: models.Report, file_path: str) -> int:
+    file_size = os.path.getsize(file_path)
+    report.status = models.ReportStatus.completed
+    report.file_path = file_path
+    report.file_size_bytes = file_size
+    report.completed_at = datetime.utcnow()
+    report.expires_at = datetime.utcnow() + REPORT_TTL
+    db.commit()
+    return file_size
+
+
+def _fail_report(db, report: Optional[models.Report], exc: Exception) -> None:
+    if report:
+        report.status = models.ReportStatus.failed
+        report.error_message = str(exc)
         db.commit()
 
-        from services.cbam_service import CBAMReportService
-        cbam_service = CBAMReportService()
-        xml_content = cbam_service.generate_cbam_report(
+
+def _render_cbam_artifact(db, report: models.Report) -> Tuple[str, Dict[str, float]]:
+    """CBAM XML'ini sıkıştırılmış artefakta yazar; (dosya yolu, toplamlar) döner"""
+    from services import get_calculation_service
+    from services.cbam_service import CBAMReportService
+    cbam_service = CBAMReportService(db, get_calculation_service(db))
+
+    file_path = report_storage.new_artifact_path("cbam", report.company_id, ".xml", uuid.uuid4().hex)
+
+    # XML tesis tesis doğrudan sıkıştırılmış dosyaya akıtılır
+    with report_storage.open_artifact(file_path) as f:
+        totals = cbam_service.write_cbam_report(
+            f,
             company_id=report.company_id,
             start_date=report.start_date,
             end_date=report.end_date,
             reporting_period=report.period_name
         )
+    return file_path, totals
 
-        report_dir = "/tmp/reports"
-        os.makedirs(report_dir, exist_ok=True)
-        filename = f"cbam_{report.company_id}_{uuid.uuid4()}.xml"
-        file_path = os.path.join(report_dir, filename)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(xml_content)
-
-        file_size = os.path.getsize(file_path)
-        report.status = models.ReportStatus.completed
-        report.file_path = file_path
-        report.file_size_bytes = file_size
-        report.completed_at = datetime.utcnow()
-        report.expires_at = datetime.utcnow() + timedelta(days=7)
-        db.commit()
 
-        logger.info(f"✅ CBAM raporu oluşturuldu: {filename} ({file_size} bytes)")
+def _render_roi_artifact(db, report: models.Report):
+    """ROI analizini sıkıştırılmış JSON artefaktına yazar; (dosya yolu, analiz) döner"""
+    from services.roi_calculator_service import ROICalculatorService
+    roi_service = ROICalculatorService(db)
+    period_months = 12
+    roi_analysis = roi_service.calculate_roi_potential(company_id=report.company_id, period_months=period_months)
 
-        if report.notify_user_when_ready:
-            try:
-                from services.notification_service import get_notification_service
-                notif_service = get_notification_service()
-                company = db.query(models.Company).filter(models.Company.id == report.company_id).first()
-                if company:
-                    notif_service.create_notification(
-                        db=db,
-                        user_id=report.user_id,
-                        notification_type='report_ready',
-                        title='📊 CBAM Raporunuz Hazır!',
-                        message=f"{company.name} için {report.period_name or 'belirtilen dönem'} CBAM XML raporu hazır.",
-                        company_id=report.company_id,
-                        action_url=f"/dashboard/reports/{report_id}/download",
-                        send_email=True
-                    )
-            except Exception as e:
-                logger.error(f"⚠️ Rapor hazır bildirimi gönderilemedi: {e}")
+    file_path = report_storage.new_artifact_path("roi", report.company_id, ".json", uuid.uuid4().hex)
+    with report_storage.open_artifact(file_path, 'wt') as f:
+        json.dump(roi_analysis.dict(), f, ensure_ascii=False, separators=(',', ':'), default=str)
+    return file_path, roi_analysis
+
+
+def _update_leaderboard(db, company_id: int, efficiency_score: float) -> None:
+    # Verimlilik skoru değiştiyse sıralamayı artımlı güncelle
+    try:
+        company = db.query(models.Company).filter(models.Company.id == company_id).first()
+        if company:
+            crud.upsert_leaderboard_entry(db, company, efficiency_score)
+    except Exception as e:
+        logger.warning(f"⚠️ Leaderboard skoru güncellenemedi: {e}")
+
+
+def _notify_report_ready(db, report: models.Report, title: str, message_template: str, action: str) -> None:
+    if not report.notify_user_when_ready:
+        return
+    try:
+        from services.notification_service import get_notification_service
+        notif_service = get_notification_service()
+        company = db.query(models.Company).filter(models.Company.id == report.company_id).first()
+        if company:
+            notif_service.create_notification(
+                db=db,
+                user_id=report.user_id,
+                notification_type='report_ready',
+                title=title,
+                message=message_template.format(company=company.name),
+                company_id=report.company_id,
+                action_url=f"/dashboard/reports/{report.id}/{action}",
+                send_email=True
+            )
+    except Exception as e:
+        logger.error(f"⚠️ Rapor hazır bildirimi gönderilemedi: {e}")
+
+
+@app.task(name='tasks.generate_cbam_report_async', base=LeasedReportTask, bind=True, max_retries=3)
+def generate_cbam_report_async(self, report_id: int):
+    db = self.db
+    report = None
+    try:
+        logger.info(f"📊 CBAM raporu oluşturuluyor: Report #{report_id}")
+        report = db.query(models.Report).filter(models.Report.id == report_id).first()
+        if not report:
+            logger.error(f"❌ Rapor bulunamadı: #{report_id}")
+            return {"status": "failed", "reason": "report_not_found"}
+
+        # Kullanıcı az önce veri yüklediyse replika gecikmesi o satırları atlamasın
+        read_db = self.read_db_for(report.user_id)
+        _start_report(db, report, read_db)
+        file_path, totals = _render_cbam_artifact(read_db, report)
+        report.total_emissions_tco2e = totals["total"]
+        file_size = _complete_report(db, report, file_path)
+
+        logger.info(f"✅ CBAM raporu oluşturuldu: {os.path.basename(file_path)} ({file_size} bytes)")
+
+        _notify_report_ready(
+            db, report,
+            title='📊 CBAM Raporunuz Hazır!',
+            message_template=f"{{company}} için {report.period_name or 'belirtilen dönem'} CBAM XML raporu hazır.",
+            action='download'
+        )
 
         return {"status": "success", "report_id": report_id, "file_path": file_path, "file_size": file_size}
     except Exception as exc:
         logger.error(f"❌ CBAM rapor görev hatası: {exc}")
-        if 'report' in locals() and report:
-            report.status = models.ReportStatus.failed
-            report.error_message = str(exc)
-            db.commit()
+        _fail_report(db, report, exc)
         raise generate_cbam_report_async.retry(exc=exc, countdown=600)
 
 
-@app.task(name='tasks.calculate_roi_analysis_async', base=DBTask, bind=True, max_retries=3)
+@app.task(name='tasks.calculate_roi_analysis_async', base=LeasedReportTask, bind=True, max_retries=3)
 def calculate_roi_analysis_async(self, report_id: int):
     db = self.db
+    report = None
     try:
         logger.info(f"💰 ROI analiz raporu oluşturuluyor: Report #{report_id}")
         report = db.query(models.Report).filter(models.Report.id == report_id).first()
@@ -93,63 +186,329 @@ def calculate_roi_analysis_async(self, report_id: int):
             logger.error(f"❌ Rapor bulunamadı: #{report_id}")
             return {"status": "failed", "reason": "report_not_found"}
 
-        report.status = models.ReportStatus.processing
-        report.requested_at = datetime.utcnow()
-        db.commit()
-
-        from services.roi_calculator_service import ROICalculatorService
-        roi_service = ROICalculatorService(db)
-        period_months = 12
-        roi_analysis = roi_service.calculate_roi_potential(company_id=report.company_id, period_months=period_months)
-
-        report_dir = "/tmp/reports"
-        os.makedirs(report_dir, exist_ok=True)
-        filename = f"roi_{report.company_id}_{uuid.uuid4()}.json"
-        file_path = os.path.join(report_dir, filename)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(roi_analysis.dict(), f, ensure_ascii=False, indent=2, default=str)
-
-        file_size = os.path.getsize(file_path)
-        report.status = models.ReportStatus.completed
-        report.file_path = file_path
-        report.file_size_bytes = file_size
+        read_db = self.read_db_for(report.user_id)
+        _start_report(db, report, read_db)
+        file_path, roi_analysis = _render_roi_artifact(read_db, report)
         report.total_savings_tl = roi_analysis.potential_annual_savings_tl
-        report.completed_at = datetime.utcnow()
-        report.expires_at = datetime.utcnow() + timedelta(days=7)
-        db.commit()
+        file_size = _complete_report(db, report, file_path)
 
-        logger.info(f"✅ ROI raporu oluşturuldu: {filename} (Tasarruf: {roi_analysis.potential_annual_savings_tl:.0f} TL)")
+        _update_leaderboard(db, report.company_id, roi_analysis.benchmark_comparison.efficiency_score)
 
-        if report.notify_user_when_ready:
-            try:
-                from services.notification_service import get_notification_service
-                notif_service = get_notification_service()
-                company = db.query(models.Company).filter(models.Company.id == report.company_id).first()
-                if company:
-                    notif_service.create_notification(
-                        db=db,
-                        user_id=report.user_id,
-                        notification_type='report_ready',
-                        title='💰 ROI Analiz Raporunuz Hazır!'
-                        ,
-                        message=f"{company.name} için yıllık {roi_analysis.potential_annual_savings_tl:.0f} TL tasarruf potansiyeli tespit edildi!",
-                        company_id=report.company_id,
-                        action_url=f"/dashboard/reports/{report_id}/view",
-                        send_email=True
-                    )
-            except Exception as e:
-                logger.error(f"⚠️ ROI rapor bildirim gönderilemedi: {e}")
+        logger.info(f"✅ ROI raporu oluşturuldu: {os.path.basename(file_path)} (Tasarruf: {roi_analysis.potential_annual_savings_tl:.0f} TL)")
+
+        _notify_report_ready(
+            db, report,
+            title='💰 ROI Analiz Raporunuz Hazır!',
+            message_template=f"{{company}} için yıllık {roi_analysis.potential_annual_savings_tl:.0f} TL tasarruf potansiyeli tespit edildi!",
+            action='view'
+        )
 
         return {"status": "success", "report_id": report_id, "file_path": file_path, "file_size": file_size, "total_savings_tl": roi_analysis.potential_annual_savings_tl}
     except Exception as exc:
         logger.error(f"❌ ROI rapor görev hatası: {exc}")
-        if 'report' in locals() and report:
-            report.status = models.ReportStatus.failed
-            report.error_message = str(exc)
-            db.commit()
+        _fail_report(db, report, exc)
         raise calculate_roi_analysis_async.retry(exc=exc, countdown=600)
 
 
+# --- Birleşik rapor: CBAM ve ROI paralel (group), tek seferlik sonlandırma (chord) ---
+# Chord, services.report_scheduler tarafından şeridin kuyruğunda kurulur.
+
+@app.task(name='tasks.render_cbam_report_part', base=DBTask, bind=True, max_retries=3)
+def render_cbam_report_part(self, report_id: int):
+    """Birleşik raporun CBAM parçası; rapor satırının durumuna dokunmaz"""
+    db = self.db
+    try:
+        report = db.query(models.Report).filter(models.Report.id == report_id).one()
+        read_db = self.read_db_for(report.user_id)
+        if report.status == models.ReportStatus.pending:
+            _start_report(db, report, read_db)
+        file_path, totals = _render_cbam_artifact(read_db, report)
+        return {"file_path": file_path, "total_emissions_tco2e": totals["total"]}
+    except Exception as exc:
+        logger.error(f"❌ Birleşik rapor CBAM parçası hatası: Report #{report_id}: {exc}")
+        raise self.retry(exc=exc, countdown=60)
+
+
+@app.task(name='tasks.render_roi_report_part', base=DBTask, bind=True, max_retries=3)
+def render_roi_report_part(self, report_id: int):
+    """Birleşik raporun ROI parçası; rapor satırının durumuna dokunmaz"""
+    db = self.db
+    try:
+        report = db.query(models.Report).filter(models.Report.id == report_id).one()
+        file_path, roi_analysis = _render_roi_artifact(self.read_db_for(report.user_id), report)
+        return {
+            "file_path": file_path,
+            "total_savings_tl": roi_analysis.potential_annual_savings_tl,
+            "efficiency_score": roi_analysis.benchmark_comparison.efficiency_score,
+        }
+    except Exception as exc:
+        logger.error(f"❌ Birleşik rapor ROI parçası hatası: Report #{report_id}: {exc}")
+        raise self.retry(exc=exc, countdown=60)
+
+
+@app.task(name='tasks.finalize_combined_report', base=LeasedReportTask, bind=True, max_retries=3)
+def finalize_combined_report(self, parts: List[Dict], report_id: int):
+    """Chord callback: parçaları tek zip paketinde birleştirir ve satırı bir kez tamamlar"""
+    db = self.db
+    report = None
+    cbam_part, roi_part = parts
+    try:
+        report = db.query(models.Report).filter(models.Report.id == report_id).first()
+        if not report:
+            logger.error(f"❌ Rapor bulunamadı: #{report_id}")
+            return {"status": "failed", "reason": "report_not_found"}
+
+        bundle_path = report_storage.new_artifact_path(
+            "combined", report.company_id, ".zip", uuid.uuid4().hex, compressed=False
+        )
+        report_storage.write_bundle(bundle_path, {
+            f"cbam_{report.company_id}_{report.id}.xml": cbam_part["file_path"],
+            f"roi_{report.company_id}_{report.id}.json": roi_part["file_path"],
+        })
+
+        report.total_emissions_tco2e = cbam_part["total_emissions_tco2e"]
+        report.total_savings_tl = roi_part["total_savings_tl"]
+        file_size = _complete_report(db, report, bundle_path)
+
+        for part in parts:
+            try:
+                os.remove(part["file_path"])
+            except OSError:
+                pass
+
+        _update_leaderboard(db, report.company_id, roi_part["efficiency_score"])
+
+        logger.info(f"✅ Birleşik rapor oluşturuldu: {os.path.basename(bundle_path)} ({file_size} bytes)")
+
+        _notify_report_ready(
+            db, report,
+            title='📦 Birleşik Raporunuz Hazır!',
+            message_template=f"{{company}} için {report.period_name or 'belirtilen dönem'} CBAM + ROI raporu hazır.",
+            action='download'
+        )
+
+        return {"status": "success", "report_id": report_id, "file_path": bundle_path, "file_size": file_size}
+    except Exception as exc:
+        logger.error(f"❌ Birleşik rapor sonlandırma hatası: {exc}")
+        if self.request.retries >= self.max_retries:
+            _fail_report(db, report, exc)
+        raise self.retry(exc=exc, countdown=60)
+
+
+@app.task(name='tasks.mark_combined_report_failed', base=LeasedReportTask, bind=True)
+def mark_combined_report_failed(self, request, exc, traceback, report_id: int):
+    """Chord errback: bir parça tüm denemelerden sonra başarısız olduysa satırı işaretle"""
+    db = self.db
+    report = db.query(models.Report).filter(models.Report.id == report_id).first()
+    logger.error(f"❌ Birleşik rapor başarısız: Report #{report_id}, Task {request.id}: {exc}")
+    _fail_report(db, report, exc)
+
+
+# --- Dönem sonu toplu CBAM: tek veri taraması, XML üretimi worker'lara dağıtılır ---
+
+BULK_QUEUE = 'q_reports_bulk'
+BULK_CHUNK_SIZE = 200
+
+
+@app.task(name='tasks.generate_bulk_cbam_reports', base=DBTask, bind=True)
+def generate_bulk_cbam_reports(
+    self,
+    start_date: str,
+    end_date: str,
+    period_name: Optional[str] = None,
+    company_ids: Optional[List[int]] = None,
+    chunk_size: int = BULK_CHUNK_SIZE
+):
+    """
+    Seçili (veya tesisi olan tüm) şirketler için CBAM raporlarını üretir:
+    1. Report satırları toplu olarak oluşturulur,
+    2. tesis × scope toplamları tüm şirketler için tek sorguyla taranır,
+    3. XML üretimi şirket paketleri halinde `render_cbam_batch` görevlerine dağıtılır.
+    """
+    db = self.db
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    logger.info(f"📊 Toplu CBAM başlatıldı: {start} - {end}")
+
+    from services.cbam_service import CBAMReportService
+
+    company_query = db.query(
+        models.Company.id,
+        models.Company.name,
+        models.Company.tax_number,
+        models.Company.owner_id,
+        models.User.email,
+    ).outerjoin(
+        models.User, models.User.id == models.Company.owner_id
+    ).filter(
+        models.Company.owner_id.isnot(None),
+        db.query(models.Facility.id).filter(models.Facility.company_id == models.Company.id).exists()
+    )
+    if company_ids is not None:
+        company_query = company_query.filter(models.Company.id.in_(company_ids))
+    companies = company_query.all()
+    if not companies:
+        return {"status": "success", "reports": 0, "batches": 0}
+
+    # Veri versiyonları da şirket başına değil, gruplanmış sorgularla; tarama ile aynı (okuma) oturumundan
+    read_db = self.read_db
+    data_versions = crud.get_company_data_versions(read_db, [c.id for c in companies])
+
+    reports = {}
+    for company in companies:
+        reports[company.id] = models.Report(
+            company_id=company.id,
+            user_id=company.owner_id,
+            report_type=models.ReportType.cbam_xml,
+            start_date=start,
+            end_date=end,
+            period_name=period_name,
+            fingerprint=crud.get_report_fingerprint(
+                db, models.ReportType.cbam_xml, company.id, start, end,
+                data_version=data_versions.get(company.id)
+            ),
+            status=models.ReportStatus.processing,
+            notify_user_when_ready=False,
+            requested_at=datetime.utcnow()
+        )
+    db.add_all(reports.values())
+    db.commit()
+
+    declarants = {
+        c.id: {"company_id": c.id, "name": c.name, "tax_number": c.tax_number, "contact_email": c.email}
+        for c in companies
+    }
+
+    # Tek tarama; her paket dolduğunda render görevine gönderilir
+    cbam_service = CBAMReportService(read_db, None)
+    batch, batches = [], 0
+    undispatched = {report.id for report in reports.values()}
+    try:
+        for company_id, installations in cbam_service.iter_company_emissions(list(reports), start, end):
+            batch.append({
+                "report_id": reports[company_id].id,
+                "declarant": declarants[company_id],
+                "installations": [[facility, emissions] for facility, emissions in installations],
+            })
+            if len(batch) >= chunk_size:
+                render_cbam_batch.apply_async(args=[batch, start_date, period_name], queue=BULK_QUEUE)
+                undispatched -= {item["report_id"] for item in batch}
+                batch, batches = [], batches + 1
+        if batch:
+            render_cbam_batch.apply_async(args=[batch, start_date, period_name], queue=BULK_QUEUE)
+            undispatched -= {item["report_id"] for item in batch}
+            batches += 1
+    except Exception as exc:
+        # Pakete girmemiş raporlar hiçbir worker'a ulaşmayacak
+        logger.error(f"❌ Toplu CBAM taraması yarıda kaldı: {exc}")
+        _fail_processing_reports(db, sorted(undispatched), exc)
+        raise
+
+    logger.info(f"✅ Toplu CBAM dağıtıldı: {len(reports)} rapor, {batches} paket")
+    return {"status": "success", "reports": len(reports), "batches": batches}
+
+
+def _fail_processing_reports(db, report_ids: List[int], exc: Exception) -> None:
+    """Hâlâ işlemde görünen raporları başarısız işaretler (toplu üretim)"""
+    if not report_ids:
+        return
+    try:
+        db.rollback()
+        db.query(models.Report).filter(
+            models.Report.id.in_(report_ids),
+            models.Report.status == models.ReportStatus.processing
+        ).update({
+            models.Report.status: models.ReportStatus.failed,
+            models.Report.error_message: str(exc),
+        }, synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        logger.error(f"❌ Toplu CBAM raporları başarısız işaretlenemedi: {report_ids}: {e}")
+
+
+class BulkBatchTask(DBTask):
+    """
+    Toplu CBAM paketi: tüm denemeler tükenince paketteki raporlar `processing`
+    durumunda kalmaz, başarısız işaretlenir. Worker süreci ölürse mesaj
+    (acks_late + reject_on_worker_lost) kuyruğa geri döner ve paket yeniden işlenir.
+    """
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        super().on_failure(exc, task_id, args, kwargs, einfo)
+        items = kwargs.get('items') if kwargs and 'items' in kwargs else (args[0] if args else [])
+        _fail_processing_reports(self.db, [item["report_id"] for item in items], exc)
+
+
+@app.task(
+    name='tasks.render_cbam_batch', base=BulkBatchTask, bind=True,
+    max_retries=3, acks_late=True, reject_on_worker_lost=True
+)
+def render_cbam_batch(self, items: List[Dict], start_date: str, period_name: Optional[str] = None):
+    """Hazır toplamlardan XML artefaktlarını üretir; satırları tek seferde günceller"""
+    db = self.db
+    from services.cbam_service import CBAMReportService
+
+    start = date.fromisoformat(start_date)
+    now = datetime.utcnow()
+    updates = []
+    for item in items:
+        report_id = item["report_id"]
+        try:
+            file_path = report_storage.new_artifact_path(
+                "cbam", item["declarant"]["company_id"], ".xml", uuid.uuid4().hex
+            )
+            with report_storage.open_artifact(file_path) as f:
+                totals = CBAMReportService.render_cbam_report(
+                    f,
+                    declarant=item["declarant"],
+                    installations=item["installations"],
+                    start_date=start,
+                    reporting_period=period_name
+                )
+            updates.append({
+                "id": report_id,
+                "status": models.ReportStatus.completed,
+                "file_path": file_path,
+                "file_size_bytes": os.path.getsize(file_path),
+                "total_emissions_tco2e": totals["total"],
+                "completed_at": now,
+                "expires_at": now + REPORT_TTL,
+            })
+        except Exception as e:
+            logger.error(f"❌ Toplu CBAM raporu üretilemedi: Report #{report_id}: {e}")
+            updates.append({
+                "id": report_id,
+                "status": models.ReportStatus.failed,
+                "error_message": str(e),
+            })
+
+    try:
+        db.bulk_update_mappings(models.Report, updates)
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        # Yeniden denemede artefaktlar baştan üretilir; bunlar sahipsiz kalmasın
+        for update in updates:
+            if update.get("file_path"):
+                try:
+                    os.remove(update["file_path"])
+                except OSError:
+                    pass
+        logger.error(f"❌ Toplu CBAM paketi kaydedilemedi ({len(items)} rapor): {exc}")
+        raise self.retry(exc=exc, countdown=60)
+
+    completed = sum(1 for u in updates if u["status"] == models.ReportStatus.completed)
+    logger.info(f"✅ Toplu CBAM paketi: {completed}/{len(items)} rapor tamamlandı")
+    return {"completed": completed, "failed": len(items) - completed}
+
+
+@app.task(name='tasks.dispatch_report_jobs', bind=True)
+def dispatch_report_jobs(self):
+    """Periyodik güvenlik ağı: kaçırılmış tetiklemelere karşı bekleyen işleri dağıt"""
+    from services.report_scheduler import get_report_scheduler
+    dispatched = get_report_scheduler().dispatch()
+    return {"dispatched": dispatched}
+
+
 @app.task(name='tasks.cleanup_expired_reports', base=DBTask, bind=True)
 def cleanup_expired_reports(self):
     db = self.db
@@ -161,10 +520,15 @@ def cleanup_expired_reports(self):
     deleted_count = 0
     for report in expired_reports:
         try:
-            if report.file_path and os.path.exists(report.file_path):
+            report.status = models.ReportStatus.expired
+            # Önbellekten paylaşılan dosya, son kullanan rapor da sona erince silinir
+            if (
+                report.file_path
+                and os.path.exists(report.file_path)
+                and not crud.is_report_file_shared(db, report.file_path, report.id)
+            ):
                 os.remove(report.file_path)
                 logger.debug(f"📁 Dosya silindi: {report.file_path}")
-            report.status = models.ReportStatus.expired
             deleted_count += 1
         except Exception as e:
             logger.error(f"⚠️ Rapor temizleme hatası: {e}")
@@ -0,0 +1,47 @@
+"""
+Ortak test fixture'ları: bellek içi SQLite veritabanı ve sahte Redis.
+
+Test modülleri yalnızca kendi alan verilerini (şirket, tesis, aktivite...)
+hazırlar; ek kurulum gerektiren modüller `db` fixture'ını aynı adla
+genişletir (`def db(db): ...`).
+"""
+
+import fakeredis
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from services.roi_calculator_service import invalidate_snapshot_cache
+
+engine = create_engine(
+    "sqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture()
+def session_factory():
+    """Aynı bellek içi veritabanına ayrı oturumlar (ayrı istekleri taklit etmek için)"""
+    return TestingSessionLocal
+
+
+@pytest.fixture()
+def db():
+    Base.metadata.create_all(bind=engine)
+    # Süreç içi ROI snapshot önbelleği testler arasında taşınmasın
+    invalidate_snapshot_cache()
+    session = TestingSessionLocal()
+    yield session
+    session.close()
+    invalidate_snapshot_cache()
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture()
+def fake_redis():
+    """Modüllerin `_redis_client` tekillerinin yerine konur"""
+    return fakeredis.FakeRedis()
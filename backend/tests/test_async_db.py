@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import auth
+import models
+from database import Base, _async_url, get_async_db
+from main import app
+
+
+def test_sqlite_url_maps_to_aiosqlite():
+    assert _async_url("sqlite:///./karbon.db") == "sqlite+aiosqlite:///./karbon.db"
+    assert _async_url("postgresql://u:p@db/karbon") == "postgresql+psycopg://u:p@db/karbon"
+
+
+@pytest.fixture()
+def client(tmp_path):
+    # Senkron ve async motorlar aynı SQLite dosyasını paylaşır
+    path = tmp_path / "karbon.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as connection:
+        connection.execute(models.User.__table__.insert().values(id=1, email="a@example.com", hashed_password="x"))
+        connection.execute(models.Notification.__table__.insert(), [
+            {"user_id": 1, "notification_type": "anomaly", "title": "Elektrik", "message": "Anormal", "is_read": False},
+            {"user_id": 1, "notification_type": "update", "title": "Rapor", "message": "Hazır", "is_read": True},
+        ])
+
+    async_engine = create_async_engine(_async_url(f"sqlite:///{path}"))
+    sessions = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with sessions() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[auth.get_current_user_async] = lambda: models.User(id=1, email="a@example.com")
+    try:
+        yield TestClient(app)
+    finally:
+        # Diğer test modüllerinin override'larına dokunma
+        app.dependency_overrides.pop(get_async_db, None)
+        app.dependency_overrides.pop(auth.get_current_user_async, None)
+        asyncio.run(async_engine.dispose())
+        sync_engine.dispose()
+
+
+def test_notifications_served_from_async_session(client):
+    response = client.get("/notifications")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total_count"] == 2
+    assert body["unread_count"] == 1
@@ -0,0 +1,236 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import auth
+import models
+from database import Base
+from services import auth_cache
+
+
+@pytest.fixture(autouse=True)
+def redis_client(monkeypatch, fake_redis):
+    monkeypatch.setattr(auth_cache, "_redis_client", fake_redis)
+    return fake_redis
+
+
+@pytest.fixture()
+def member(db):
+    user = models.User(email="uye@example.com", hashed_password="x")
+    company = models.Company(name="Örnek A.Ş.")
+    member = models.Member(user=user, company=company, role=models.CompanyMemberRole.viewer)
+    db.add_all([user, company, member])
+    db.commit()
+    return member
+
+
+def _roles(session_factory, user_id, company_id):
+    # Her istek kendi oturumunu açar; yalnızca Redis katmanı paylaşılır
+    session = session_factory()
+    try:
+        return [m.role for m in auth_cache.get_company_memberships(session, user_id, company_id)]
+    finally:
+        session.close()
+
+
+def test_memberships_are_shared_through_redis(db, member, redis_client, session_factory):
+    assert _roles(session_factory, member.user_id, member.company_id) == [models.CompanyMemberRole.viewer]
+    assert redis_client.exists(auth_cache.MEMBERSHIPS_KEY.format(user_id=member.user_id))
+
+    # Veritabanını olay dinleyicilerini atlayarak değiştir: önbellek hâlâ eski değeri döner
+    db.execute(models.Member.__table__.update().values(role=models.CompanyMemberRole.admin))
+    db.commit()
+    assert _roles(session_factory, member.user_id, member.company_id) == [models.CompanyMemberRole.viewer]
+
+
+def test_member_add_update_delete_invalidate(db, member, redis_client, session_factory):
+    key = auth_cache.MEMBERSHIPS_KEY.format(user_id=member.user_id)
+    second = models.Company(name="İkinci A.Ş.")
+    db.add(second)
+    db.commit()
+
+    _roles(session_factory, member.user_id, member.company_id)
+    db.add(models.Member(user_id=member.user_id, company_id=second.id, role=models.CompanyMemberRole.data_entry))
+    db.commit()
+    assert not redis_client.exists(key)
+    assert _roles(session_factory, member.user_id, second.id) == [models.CompanyMemberRole.data_entry]
+
+    member.role = models.CompanyMemberRole.owner
+    db.commit()
+    assert not redis_client.exists(key)
+    assert _roles(session_factory, member.user_id, member.company_id) == [models.CompanyMemberRole.owner]
+
+    db.delete(member)
+    db.commit()
+    assert not redis_client.exists(key)
+    assert _roles(session_factory, member.user_id, member.company_id) == []
+
+
+def test_uncommitted_change_is_visible_in_same_session_only(db, member, redis_client, session_factory):
+    auth_cache.get_memberships(db, member.user_id)
+    member.role = models.CompanyMemberRole.admin
+    db.flush()
+
+    # Aynı oturum: istek içi önbellek düşer, Redis atlanır
+    assert [m.role for m in auth_cache.get_company_memberships(db, member.user_id, member.company_id)] == [
+        models.CompanyMemberRole.admin
+    ]
+    db.rollback()
+    assert _roles(session_factory, member.user_id, member.company_id) == [models.CompanyMemberRole.viewer]
+
+
+def test_user_email_change_invalidates_old_key(db, member, redis_client, session_factory):
+    session = session_factory()
+    assert auth_cache.get_user(session, "uye@example.com").id == member.user_id
+    session.close()
+    old_key = auth_cache.USER_KEY.format(email="uye@example.com")
+    assert redis_client.exists(old_key)
+
+    member.user.email = "yeni@example.com"
+    db.commit()
+
+    assert not redis_client.exists(old_key)
+    session = session_factory()
+    assert auth_cache.get_user(session, "uye@example.com") is None
+    assert auth_cache.get_user(session, "yeni@example.com").id == member.user_id
+    session.close()
+
+
+# --- İmzalı yetki talepleri ---
+
+@pytest.fixture()
+def claims_enabled(monkeypatch):
+    monkeypatch.setattr(auth_cache, "CLAIMS_ENABLED", True)
+
+
+def _payload(db, user):
+    return {"sub": user.email, **auth_cache.build_claims(db, user)}
+
+
+def test_fresh_claims_resolve_without_queries(db, member, claims_enabled, session_factory):
+    payload = _payload(db, member.user)
+    session = session_factory()
+    statements = []
+
+    def record(*args):
+        statements.append(args)
+
+    event.listen(db.get_bind(), "before_cursor_execute", record)
+    try:
+        user = auth_cache.user_from_claims(session, payload)
+        records = auth_cache.get_company_memberships(session, user.id, member.company_id)
+        is_active = user.is_active
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", record)
+        session.close()
+
+    assert user.email == "uye@example.com"
+    assert is_active is True
+    assert [(r.role, r.facility_id) for r in records] == [(models.CompanyMemberRole.viewer, None)]
+    assert statements == []
+
+
+def test_stale_claims_fall_back_after_member_change(db, member, claims_enabled, session_factory):
+    payload = _payload(db, member.user)
+
+    member.role = models.CompanyMemberRole.admin
+    db.commit()
+
+    session = session_factory()
+    assert auth_cache.user_from_claims(session, payload) is None
+    session.close()
+    # Yeni token güncel versiyonu taşır
+    assert auth_cache.user_from_claims(session_factory(), _payload(db, member.user)) is not None
+
+
+def test_stale_claims_rejected_by_policy(db, member, claims_enabled, monkeypatch, session_factory):
+    monkeypatch.setattr(auth_cache, "STALE_CLAIMS_POLICY", "reject")
+    payload = _payload(db, member.user)
+    auth_cache.bump_membership_versions([member.user_id])
+
+    with pytest.raises(auth_cache.StaleClaimsError):
+        auth_cache.user_from_claims(session_factory(), payload)
+
+
+def test_deactivation_revokes_claims_even_if_writer_has_them_disabled(
+    db, member, claims_enabled, monkeypatch, session_factory
+):
+    payload = _payload(db, member.user)
+
+    # Örneğin özelliği kapalı bir admin süreci kullanıcıyı pasifleştirir
+    monkeypatch.setattr(auth_cache, "CLAIMS_ENABLED", False)
+    member.user.is_active = False
+    db.commit()
+    monkeypatch.setattr(auth_cache, "CLAIMS_ENABLED", True)
+
+    session = session_factory()
+    assert auth_cache.user_from_claims(session, payload) is None
+    with pytest.raises(HTTPException) as exc_info:
+        auth._resolve_user(session, payload)
+    session.close()
+    assert exc_info.value.status_code == 401
+
+    # Pasif kullanıcı için üretilmiş güncel token da reddedilir
+    fresh = _payload(db, member.user)
+    assert fresh["act"] is False
+    with pytest.raises(HTTPException):
+        auth._resolve_user(session_factory(), fresh)
+
+
+def test_claims_ignored_when_disabled_or_redis_down(db, member, claims_enabled, monkeypatch):
+    payload = _payload(db, member.user)
+    assert payload["mv"] is not None
+
+    monkeypatch.setattr(auth_cache, "CLAIMS_ENABLED", False)
+    assert auth_cache.user_from_claims(db, payload) is None
+
+    monkeypatch.setattr(auth_cache, "CLAIMS_ENABLED", True)
+    assert auth_cache.user_from_claims(db, {"sub": member.user.email}) is None
+
+    class BrokenRedis:
+        def get(self, key):
+            raise auth_cache.redis.ConnectionError("bağlantı yok")
+
+    monkeypatch.setattr(auth_cache, "_redis_client", BrokenRedis())
+    assert auth_cache.user_from_claims(db, payload) is None
+
+
+# --- Async çözümleme ---
+
+def test_async_resolution_keeps_redis_off_the_event_loop(tmp_path, redis_client, monkeypatch):
+    path = tmp_path / "karbon.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=sync_engine)
+    with sessionmaker(bind=sync_engine)() as session:
+        user = models.User(email="uye@example.com", hashed_password="x")
+        session.add(models.Member(user=user, company=models.Company(name="Örnek A.Ş."), role=models.CompanyMemberRole.viewer))
+        session.commit()
+
+    redis_threads = []
+    monkeypatch.setattr(auth_cache, "_get_redis", lambda: redis_threads.append(threading.get_ident()) or redis_client)
+    monkeypatch.setattr(auth, "SECRET_KEY", "test-secret")
+    monkeypatch.setattr(auth, "ALGORITHM", "HS256")
+    token = auth.create_access_token({"sub": "uye@example.com"})
+
+    async def resolve_twice():
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        users = []
+        # İlk istek önbelleği doldurur, ikincisi önbellekten okur
+        for _ in range(2):
+            async with AsyncSession(async_engine) as session:
+                users.append(await auth.get_current_user_async(token, session))
+        await async_engine.dispose()
+        return threading.get_ident(), users
+
+    loop_thread, users = asyncio.run(resolve_twice())
+    sync_engine.dispose()
+
+    assert [u.email for u in users] == ["uye@example.com"] * 2
+    assert redis_threads and loop_thread not in redis_threads
+    assert redis_client.exists(auth_cache.USER_KEY.format(email="uye@example.com"))
+    assert redis_client.exists(auth_cache.MEMBERSHIPS_KEY.format(user_id=users[0].id))
@@ -0,0 +1,75 @@
+from datetime import date
+
+import pytest
+
+import models
+from services import report_storage
+from tasks.reporting_tasks import render_cbam_batch
+
+EMISSIONS = {
+    "scope1_total": 1.5, "scope2_total": 0.5, "electricity_kwh": 1000, "natural_gas_m3": 700,
+    "diesel_liters": 0, "natural_gas_co2": 1.5, "diesel_co2": 0, "electricity_factor": 0.5,
+}
+
+
+@pytest.fixture()
+def db(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(report_storage, "REPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(render_cbam_batch, "_db", db, raising=False)
+    return db
+
+
+@pytest.fixture()
+def items(db):
+    owner = models.User(email="owner@example.com", hashed_password="x")
+    db.add(owner)
+    db.flush()
+    items = []
+    for index in range(2):
+        company = models.Company(name=f"Şirket {index}", owner_id=owner.id)
+        db.add(company)
+        db.flush()
+        report = models.Report(
+            company_id=company.id, user_id=owner.id, report_type=models.ReportType.cbam_xml,
+            start_date=date(2025, 1, 1), end_date=date(2025, 3, 31),
+            status=models.ReportStatus.processing,
+        )
+        db.add(report)
+        db.flush()
+        items.append({
+            "report_id": report.id,
+            "declarant": {"company_id": company.id, "name": company.name},
+            "installations": [[{"id": index, "name": "Tesis", "city": "Bursa"}, EMISSIONS]],
+        })
+    db.commit()
+    return items
+
+
+def _statuses(db):
+    db.expire_all()
+    return [report.status for report in db.query(models.Report).order_by(models.Report.id)]
+
+
+def test_batch_completes_every_report(db, items, tmp_path):
+    result = render_cbam_batch.run(items, "2025-01-01", "2025-Q1")
+
+    assert result == {"completed": 2, "failed": 0}
+    assert _statuses(db) == [models.ReportStatus.completed] * 2
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_failed_commit_removes_artifacts_and_final_failure_marks_batch(db, items, tmp_path, monkeypatch):
+    def broken_update(*args, **kwargs):
+        raise RuntimeError("bağlantı koptu")
+
+    monkeypatch.setattr(db, "bulk_update_mappings", broken_update)
+    with pytest.raises(RuntimeError):
+        # Worker dışında çağrıldığında retry özgün hatayı yükseltir
+        render_cbam_batch.run(items, "2025-01-01", "2025-Q1")
+    assert list(tmp_path.iterdir()) == []
+    assert _statuses(db) == [models.ReportStatus.processing] * 2
+
+    # Tüm denemeler tükenince Celery on_failure'ı çağırır
+    render_cbam_batch.on_failure(RuntimeError("bağlantı koptu"), "task-id", (items, "2025-01-01"), {}, None)
+
+    assert _statuses(db) == [models.ReportStatus.failed] * 2
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from services import cashflow_engine
+
+
+def test_level_flows_shape_and_degradation():
+    flows = cashflow_engine.level_flows(100.0, 250.0, years=3, degradation=0.1)
+
+    assert flows.shape == (4,)
+    assert flows.tolist() == pytest.approx([-250.0, 90.0, 80.0, 70.0])
+
+
+def test_irr_single_root_matches_npv_zero():
+    flows = cashflow_engine.level_flows(np.array([30.0, 50.0]), np.array([100.0, 100.0]), years=5)
+
+    rates = cashflow_engine.irr(flows)
+
+    assert np.isfinite(rates).all()
+    assert cashflow_engine.npv(flows, rates) == pytest.approx([0.0, 0.0], abs=1e-5)
+
+
+def test_irr_without_root_is_nan():
+    # Akışlar hep negatif / hep pozitif / sıfır: işaret değişimi yok
+    flows = np.array([
+        [-100.0, -10.0, -10.0, -10.0],
+        [100.0, 10.0, 10.0, 10.0],
+        [0.0, 0.0, 0.0, 0.0],
+    ])
+
+    assert np.isnan(cashflow_engine.irr(flows)).all()
+
+
+def test_irr_multiple_roots_returns_a_bracketed_root():
+    # -100 + 230/(1+r) - 132/(1+r)^2 = 0 → r = %10 ve r = %20
+    flows = np.array([-100.0, 230.0, -132.0])
+
+    rate = float(cashflow_engine.irr(flows, lower=0.15, upper=1.0))
+    low_rate = float(cashflow_engine.irr(flows, lower=0.0, upper=0.15))
+
+    assert rate == pytest.approx(0.20, abs=1e-6)
+    assert low_rate == pytest.approx(0.10, abs=1e-6)
+    # Varsayılan aralıkta her iki uçta aynı işaret: kök bulunamaz, NaN döner
+    assert np.isnan(cashflow_engine.irr(flows))
+
+
+def test_payback_years_fractional_and_never():
+    flows = np.array([
+        [-150.0, 100.0, 100.0],
+        [-500.0, 100.0, 100.0],
+    ])
+
+    years = cashflow_engine.payback_years(flows)
+
+    assert years[0] == pytest.approx(1.5)
+    assert np.isnan(years[1])
@@ -0,0 +1,64 @@
+from datetime import date
+
+import pytest
+from lxml import etree
+
+import models
+from services.cbam_service import CBAMReportService
+
+NS = {"c": CBAMReportService.CBAM_NAMESPACE}
+
+
+def _activity(facility, activity_type, scope, quantity, co2e_kg, start, simulation=False):
+    return models.ActivityData(
+        facility=facility,
+        activity_type=activity_type,
+        quantity=quantity,
+        unit="x",
+        scope=scope,
+        start_date=start,
+        end_date=start.replace(day=28),
+        calculated_co2e_kg=co2e_kg,
+        is_simulation=simulation,
+    )
+
+
+@pytest.fixture()
+def company(db):
+    company = models.Company(name="Örnek A.Ş.", tax_number="1234567890")
+    busy = models.Facility(name="Fabrika", city="Bursa", company=company)
+    idle = models.Facility(name="Depo", city="İzmir", company=company)
+    db.add_all([
+        company, busy, idle,
+        _activity(busy, models.ActivityType.natural_gas, models.ScopeType.scope_1, 100, 2000, date(2025, 1, 1)),
+        _activity(busy, models.ActivityType.electricity, models.ScopeType.scope_2, 1000, 500, date(2025, 2, 1)),
+        _activity(busy, models.ActivityType.electricity, models.ScopeType.scope_2, 1000, 500, date(2025, 3, 1)),
+        # Dönem dışı ve simülasyon satırları rapora girmez
+        _activity(busy, models.ActivityType.electricity, models.ScopeType.scope_2, 1000, 9000, date(2025, 5, 1)),
+        _activity(busy, models.ActivityType.electricity, models.ScopeType.scope_2, 1000, 9000, date(2025, 2, 1), True),
+    ])
+    db.commit()
+    return company
+
+
+def test_report_streams_every_facility_with_grouped_totals(db, company):
+    xml = CBAMReportService(db, None).generate_cbam_report(
+        company.id, date(2025, 1, 1), date(2025, 3, 31), "2025-Q1"
+    )
+    root = etree.fromstring(xml.encode("utf-8"))
+
+    installations = root.findall("c:Installations/c:Installation", NS)
+    assert [i.findtext("c:Name", namespaces=NS) for i in installations] == ["Fabrika", "Depo"]
+
+    busy = installations[0]
+    assert busy.findtext("c:Emissions/c:DirectEmissions/c:CO2", namespaces=NS) == "2.00"
+    assert busy.findtext("c:Emissions/c:IndirectEmissions/c:Electricity/c:Consumption", namespaces=NS) == "2000.00"
+    assert len(installations[1].find("c:Emissions", NS)) == 0
+
+    assert root.findtext("c:Summary/c:TotalEmissions", namespaces=NS) == "3.00"
+    assert root.findtext("c:Declarant/c:Name", namespaces=NS) == "Örnek A.Ş."
+
+
+def test_unknown_company_raises(db):
+    with pytest.raises(ValueError):
+        CBAMReportService(db, None).generate_cbam_report(999, date(2025, 1, 1), date(2025, 3, 31))
@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import NullPool
+
+import db_pool
+
+POSTGRES_URL = "postgresql+psycopg://u:p@db/karbon"
+
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    for key in ("DB_PROCESS_ROLE", "DB_POOL_SIZE", "DB_POOL_SIZE_WORKER", "DB_READ_POOL_SIZE", "DB_READ_POOL_SIZE_WORKER"):
+        monkeypatch.delenv(key, raising=False)
+    monkeypatch.setattr(db_pool, "POOL_MODE", "queue")
+    monkeypatch.setattr(db_pool, "_engines", {})
+
+
+def test_role_from_env_and_celery_command(monkeypatch):
+    monkeypatch.setattr(db_pool.sys, "argv", ["/usr/bin/celery", "-A", "celery_worker", "beat"])
+    assert db_pool.process_role() == "beat"
+    monkeypatch.setattr(db_pool.sys, "argv", ["/usr/bin/celery", "-A", "celery_worker", "worker"])
+    assert db_pool.process_role() == "worker"
+    monkeypatch.setattr(db_pool.sys, "argv", ["uvicorn", "main:app"])
+    assert db_pool.process_role() == "api"
+
+    monkeypatch.setenv("DB_PROCESS_ROLE", "worker")
+    assert db_pool.process_role() == "worker"
+    monkeypatch.setenv("DB_PROCESS_ROLE", "scheduler")
+    with pytest.raises(ValueError):
+        db_pool.process_role()
+
+
+def test_settings_follow_precedence(monkeypatch):
+    monkeypatch.setattr(db_pool, "PROCESS_ROLE", "worker")
+    assert db_pool.engine_options(POSTGRES_URL)["pool_size"] == 2
+
+    monkeypatch.setenv("DB_POOL_SIZE", "7")
+    assert db_pool.engine_options(POSTGRES_URL, replica=True)["pool_size"] == 7
+    monkeypatch.setenv("DB_POOL_SIZE_WORKER", "5")
+    assert db_pool.engine_options(POSTGRES_URL)["pool_size"] == 5
+    monkeypatch.setenv("DB_READ_POOL_SIZE", "4")
+    assert db_pool.engine_options(POSTGRES_URL, replica=True)["pool_size"] == 4
+    monkeypatch.setenv("DB_READ_POOL_SIZE_WORKER", "3")
+    assert db_pool.engine_options(POSTGRES_URL, replica=True)["pool_size"] == 3
+    # Birincil havuz okuma ayarlarından etkilenmez
+    assert db_pool.engine_options(POSTGRES_URL)["pool_size"] == 5
+
+
+def test_pool_class_by_mode_and_backend(monkeypatch):
+    assert db_pool.engine_options("sqlite:///./karbon.db") == {}
+    assert db_pool.engine_options(POSTGRES_URL)["poolclass"] is db_pool.InstrumentedQueuePool
+    assert db_pool.engine_options(POSTGRES_URL, asynchronous=True)["poolclass"] is db_pool.InstrumentedAsyncQueuePool
+
+    monkeypatch.setattr(db_pool, "POOL_MODE", "null")
+    options = db_pool.engine_options(POSTGRES_URL)
+    assert options["poolclass"] is db_pool.InstrumentedNullPool
+    assert "pool_size" not in options
+
+
+def test_stats_count_checkouts_and_timeouts(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'karbon.db'}", poolclass=db_pool.InstrumentedQueuePool,
+        pool_size=1, max_overflow=0, pool_timeout=0.05,
+    )
+    plain = create_engine(f"sqlite:///{tmp_path / 'karbon.db'}", poolclass=NullPool)
+    db_pool.register("primary", engine)
+    db_pool.register("plain", plain)
+
+    with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        busy = db_pool.stats()["engines"]["primary"]
+    idle = db_pool.stats()["engines"]
+
+    assert busy["checked_out"] == 1
+    assert busy["in_use"] == 1
+    assert busy["timeouts"] == 1
+    assert idle["primary"]["in_use"] == 0
+    assert idle["primary"]["peak_in_use"] == 1
+    assert idle["primary"]["acquire_wait_ms"]["count"] == 2
+    assert idle["plain"]["pool_class"] == "NullPool"
+    assert "status" in idle["plain"]
+    engine.dispose()
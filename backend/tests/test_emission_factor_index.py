@@ -0,0 +1,82 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+import models
+from services.emission_factor_index import EmissionFactorIndex
+
+
+def _factor(id, key, value, valid_from=None, valid_to=None, year=None):
+    return models.EmissionFactor(
+        id=id, key=key, value=value, unit="kg/kWh", year=year, valid_from=valid_from, valid_to=valid_to
+    )
+
+
+@pytest.fixture()
+def index():
+    # elektrik: 2023 ve 2025 arasında 2024 boşluğu; doğalgaz: year ile başlar, ucu açık
+    return EmissionFactorIndex([
+        _factor(3, "electricity", 0.40, date(2025, 1, 1)),
+        _factor(1, "electricity", 0.45, date(2023, 1, 1), date(2024, 1, 1)),
+        _factor(2, "natural_gas", 2.0, year=2022),
+    ])
+
+
+@pytest.mark.parametrize("key, on, expected_id, covered", [
+    ("electricity", date(2022, 6, 1), 1, False),   # İlk versiyondan önce: ilk versiyon
+    ("electricity", date(2023, 6, 1), 1, True),
+    ("electricity", date(2024, 1, 1), 1, False),   # valid_to hariç: boşluğun ilk günü
+    ("electricity", date(2024, 6, 1), 1, False),   # Boşluk: en yakın önceki versiyon
+    ("electricity", date(2025, 1, 1), 3, True),
+    ("electricity", date(2030, 1, 1), 3, True),    # Ucu açık son versiyon
+    ("natural_gas", date(2021, 12, 31), 2, False),
+    ("natural_gas", date(2022, 1, 1), 2, True),    # year → 1 Ocak
+])
+def test_match(index, key, on, expected_id, covered):
+    record, in_range = index.match(key, on)
+
+    assert record.id == expected_id
+    assert in_range is covered
+
+
+def test_unknown_key(index):
+    assert index.match("coal", date(2024, 1, 1)) == (None, False)
+    assert index.match(None, date(2024, 1, 1)) == (None, False)
+    assert index.lookup("coal", date(2024, 1, 1)) is None
+
+
+def test_lookup_exact_skips_gap(index):
+    assert index.lookup("electricity", date(2024, 6, 1)).id == 1
+    assert index.lookup("electricity", date(2024, 6, 1), exact=True) is None
+    assert index.as_of(date(2025, 6, 1)) == {
+        "electricity": index.records[1],
+        "natural_gas": index.records[2],
+    }
+
+
+def test_lookup_many_matches_scalar_match(index):
+    keys = ["electricity", "electricity", "electricity", "coal", None, "natural_gas"]
+    dates = [date(2022, 6, 1), date(2024, 6, 1), date(2025, 3, 1), date(2025, 3, 1), date(2025, 3, 1), date(2021, 1, 1)]
+
+    joined = index.lookup_many(keys, dates)
+    from_datetime64 = index.lookup_many(keys, np.array(dates, dtype="datetime64[D]"))
+
+    for row, (key, on) in enumerate(zip(keys, dates, strict=True)):
+        record, covered = index.match(key, on)
+        assert joined.record(row) is record
+        assert bool(joined.covered[row]) is covered
+    assert np.isnan(joined.values[3]) and np.isnan(joined.values[4])
+    assert joined.positions[3] == -1
+    assert joined.values[:3].tolist() == [0.45, 0.45, 0.40]
+    np.testing.assert_array_equal(from_datetime64.positions, joined.positions)
+    np.testing.assert_array_equal(from_datetime64.covered, joined.covered)
+
+
+def test_lookup_many_edge_inputs(index):
+    empty = EmissionFactorIndex([]).lookup_many(["electricity"], [date(2024, 1, 1)])
+
+    assert empty.positions.tolist() == [-1]
+    assert index.lookup_many([], []).positions.size == 0
+    with pytest.raises(ValueError):
+        index.lookup_many(["electricity"], [])
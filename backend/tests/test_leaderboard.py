@@ -0,0 +1,48 @@
+import pytest
+
+import models
+from main import _get_leaderboard_from_db
+
+
+@pytest.fixture()
+def db(db):
+    # Saklanan rank değerleri kasıtlı olarak eski/yanlış
+    scores = [("A", 90.0, "İstanbul"), ("B", 80.0, "Ankara"), ("C", 70.0, "İstanbul"), ("D", 60.0, "İstanbul")]
+    for position, (name, score, region) in enumerate(scores, start=1):
+        company = models.Company(name=name, industry_type=models.IndustryType.manufacturing)
+        db.add(company)
+        db.flush()
+        db.add(models.LeaderboardEntry(
+            company_id=company.id,
+            industry_type=models.IndustryType.manufacturing,
+            region=region,
+            rank=99 - position,
+            efficiency_score=score,
+        ))
+    db.commit()
+    return db
+
+
+def _company_id(db, name):
+    return db.query(models.Company.id).filter(models.Company.name == name).scalar()
+
+
+def test_db_fallback_total_counts_all_ranked_companies(db):
+    board = _get_leaderboard_from_db(db, None, None, 2, None)
+
+    assert [entry["company_name"] for entry in board["entries"]] == ["A", "B"]
+    assert board["total"] == 4
+
+
+def test_db_fallback_ranks_company_outside_page_from_query(db):
+    board = _get_leaderboard_from_db(db, None, None, 1, _company_id(db, "D"))
+
+    assert board["your_rank"] == 4
+    assert board["your_score"] == 60.0
+
+
+def test_db_fallback_rank_respects_region_filter(db):
+    board = _get_leaderboard_from_db(db, None, "İstanbul", 1, _company_id(db, "D"))
+
+    assert board["total"] == 3
+    assert board["your_rank"] == 3
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from services import cashflow_engine
+from services.macc_service import compute_macc, measure_matrix
+from services.roi_calculator_service import ConsumptionSnapshot, FacilityConsumption, ROICalculatorService
+
+
+def _facility(facility_id, electricity_kwh, natural_gas_m3=0.0, area_m2=2000.0):
+    return FacilityConsumption(
+        facility_id=facility_id, name=f"Tesis {facility_id}", city="Bursa",
+        electricity_kwh=electricity_kwh, natural_gas_m3=natural_gas_m3, diesel_liters=0.0,
+        total_co2_tons=(electricity_kwh * 0.42 + natural_gas_m3 * 2.03) / 1000, area_m2=area_m2,
+    )
+
+
+def _snapshot(*facilities):
+    return ConsumptionSnapshot(
+        company_id=1, industry_type=None, period_months=12,
+        electricity_kwh=sum(f.electricity_kwh for f in facilities),
+        natural_gas_m3=sum(f.natural_gas_m3 for f in facilities), diesel_liters=0.0,
+        total_co2_tons=sum(f.total_co2_tons for f in facilities), facility_count=len(facilities),
+        total_area_m2=sum(f.area_m2 for f in facilities), electricity_cost_kwh=4.5, gas_cost_m3=15.0,
+        has_template=False, best_in_class_kwh_per_employee=None, average_kwh_per_employee=None,
+        typical_electricity_ratio=None, data_version="v1", facilities=tuple(facilities),
+    )
+
+
+def test_curve_is_sorted_with_running_total():
+    curve = compute_macc(_snapshot(_facility(1, 400000, 30000), _facility(2, 80000)))["curve"]
+
+    costs = [entry["cost_per_tco2e_tl"] for entry in curve]
+    assert costs == sorted(costs)
+    assert [entry["rank"] for entry in curve] == list(range(1, len(curve) + 1))
+    assert np.allclose(
+        [entry["cumulative_reduction_tco2e"] for entry in curve],
+        np.cumsum([entry["annual_reduction_tco2e"] for entry in curve]),
+        atol=0.01,
+    )
+
+
+def test_cost_per_tonne_is_negative_npv_over_lifetime_abatement():
+    snapshot = _snapshot(_facility(1, 400000))
+    result = compute_macc(snapshot, ["lighting_upgrade"])
+    entry = result["curve"][0]
+
+    matrix = measure_matrix(snapshot, ["lighting_upgrade"])
+    years = ROICalculatorService.MEASURE_LIFETIMES["lighting_upgrade"]
+    flows = cashflow_engine.level_flows(matrix["savings"][0, 0], matrix["investment"][0, 0], years)
+    npv = float(cashflow_engine.npv(flows, ROICalculatorService.DISCOUNT_RATE))
+
+    assert entry["cost_per_tco2e_tl"] == pytest.approx(-npv / (matrix["abatement"][0, 0] * years), abs=0.1)
+    assert result["negative_cost_reduction_tco2e"] == pytest.approx(entry["annual_reduction_tco2e"], abs=1e-3)
+
+
+def test_measures_without_abatement_are_left_out():
+    # Gaz tüketimi olmayan tesiste yalıtım yalnızca elektrikten azaltım sağlar; boş tesiste hiç yoktur
+    result = compute_macc(_snapshot(_facility(1, 0.0), _facility(2, 100000)), ["insulation_improvement"])
+
+    assert [entry["facility_id"] for entry in result["curve"]] == [2]
+    assert compute_macc(_snapshot())["curve"] == []
+
+
+def test_measures_share_roi_service_assumptions(monkeypatch):
+    snapshot = _snapshot(_facility(1, 400000, 30000))
+    service = ROICalculatorService(db=None)
+
+    monkeypatch.setattr(ROICalculatorService, "LED_SAVINGS_RATE", 0.5)
+    matrix = measure_matrix(snapshot, ["lighting_upgrade", "insulation_improvement"])
+    lighting = service._calculate_lighting_roi(snapshot, None)
+    insulation = service._calculate_insulation_roi(snapshot, None)
+
+    assert matrix["savings"][0, 0] == pytest.approx(lighting["annual_savings_tl"])
+    assert matrix["investment"][0, 0] == pytest.approx(lighting["investment_tl"])
+    assert matrix["abatement"][0, 0] == pytest.approx(lighting["co2_reduction_tons"])
+    assert matrix["savings"][0, 1] == pytest.approx(insulation["annual_savings_tl"])
+    assert matrix["investment"][0, 1] == pytest.approx(insulation["investment_tl"])
@@ -0,0 +1,71 @@
+from datetime import date
+
+import pytest
+from dateutil.relativedelta import relativedelta
+
+import models
+import suggestion_engine
+from services.data_analysis_service import DataAnalysisService, MonthlyActivitySummary
+
+
+def _company(db, facility_count, months=10):
+    company = models.Company(name="Örnek A.Ş.")
+    db.add(company)
+    first = date.today().replace(day=1)
+    for index in range(facility_count):
+        facility = models.Facility(
+            name=f"Tesis {index}", city="Bursa", company=company, facility_type=models.FacilityType.production
+        )
+        db.add(facility)
+        for back in range(1, months + 1):
+            start = first - relativedelta(months=back)
+            db.add(models.ActivityData(
+                facility=facility, activity_type=models.ActivityType.electricity, quantity=1000 * back,
+                unit="kWh", scope=models.ScopeType.scope_2, start_date=start, end_date=start + relativedelta(days=27),
+                calculated_co2e_kg=400, is_simulation=False,
+            ))
+    db.commit()
+    return company
+
+
+def test_from_months_fills_gaps_and_averages_years():
+    summary = MonthlyActivitySummary.from_months([(1, 100.0), (1, 300.0), (2, 50.0)])
+
+    assert summary.months_with_data == 3
+    assert summary.avg_monthly_quantity == pytest.approx(150.0)
+    assert summary.calendar_profile[0] == pytest.approx(200.0)
+    assert summary.calendar_profile[1] == pytest.approx(50.0)
+    # Verisi olmayan aylar bilinen ayların ortalamasıyla doldurulur
+    assert summary.calendar_profile[5] == pytest.approx(125.0)
+
+
+def test_company_summaries_match_per_facility_query(db):
+    company = _company(db, facility_count=2)
+    facility = company.facilities[0]
+    db.add(models.ActivityData(
+        facility=facility, activity_type=models.ActivityType.electricity, quantity=99999, unit="kWh",
+        scope=models.ScopeType.scope_2, start_date=date.today().replace(day=1) - relativedelta(months=1),
+        end_date=date.today().replace(day=1), calculated_co2e_kg=0, is_simulation=True,
+    ))
+    db.commit()
+    service = DataAnalysisService(db)
+
+    summaries = service.get_company_monthly_summaries(company.id)
+    real_only = service.get_company_monthly_summaries(company.id, include_simulation=False)
+
+    assert summaries.summary(facility.id, models.ActivityType.electricity) == pytest.approx(
+        service.get_monthly_activity_data_summary(facility.id, models.ActivityType.electricity)
+    )
+    assert real_only.summary(facility.id, models.ActivityType.electricity) == (10, pytest.approx(5500.0))
+    assert summaries.get(facility.id, models.ActivityType.natural_gas) is summaries.EMPTY
+
+
+def test_context_queries_do_not_grow_with_facilities(db):
+    counts = []
+    for facility_count in (1, 5):
+        company = _company(db, facility_count)
+        db.refresh(company)
+        _, metrics = suggestion_engine.run_strategies(company, db, params={})
+        counts.append(next(m["query_count"] for m in metrics if m["strategy"] == "SuggestionContext"))
+
+    assert counts == [1, 1]
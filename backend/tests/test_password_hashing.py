@@ -0,0 +1,92 @@
+import asyncio
+from collections import deque
+
+import pytest
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+
+import models
+from database import get_db
+from main import app
+from services import password_hashing
+
+
+@pytest.fixture()
+def pool(monkeypatch):
+    monkeypatch.setattr(password_hashing, "POOL_SIZE", 1)
+    monkeypatch.setattr(password_hashing, "_inflight", 0)
+    monkeypatch.setattr(password_hashing, "_counters", {"completed": 0, "rejected": 0, "failed": 0, "rehashed": 0})
+    monkeypatch.setattr(password_hashing, "_latencies", {"hash": deque(), "verify": deque()})
+    yield
+    executor = password_hashing._executor
+    password_hashing._executor, password_hashing._executor_pid = None, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def test_full_pool_rejects_without_queueing(pool, monkeypatch):
+    monkeypatch.setattr(password_hashing, "_inflight", password_hashing.MAX_PENDING)
+    monkeypatch.setattr(password_hashing, "_get_executor", lambda: pytest.fail("havuza iş gönderilmemeli"))
+
+    with pytest.raises(password_hashing.PasswordHashingBusy):
+        password_hashing.hash_password("gizli")
+
+    assert password_hashing.stats()["rejected"] == 1
+    assert password_hashing._inflight == password_hashing.MAX_PENDING
+
+
+def test_old_cost_hash_is_rehashed_on_login(pool):
+    # Daha düşük maliyetle üretilmiş eski hash
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("gizli")
+
+    valid, new_hash = asyncio.run(password_hashing.verify_and_update_async("gizli", old_hash))
+    assert valid and new_hash
+    assert asyncio.run(password_hashing.verify_and_update_async("gizli", new_hash)) == (True, None)
+    assert asyncio.run(password_hashing.verify_and_update_async("yanlış", old_hash)) == (False, None)
+
+    stats = password_hashing.stats()
+    assert stats["inflight"] == 0
+    assert stats["completed"] == 3
+    assert stats["rehashed"] == 1
+    assert stats["verify_latency_ms"]["count"] == 3
+
+
+def test_login_returns_429_when_busy(db, monkeypatch):
+    db.add(models.User(email="a@example.com", hashed_password="x"))
+    db.commit()
+
+    async def busy(*args):
+        raise password_hashing.PasswordHashingBusy("dolu")
+
+    monkeypatch.setattr(password_hashing, "verify_and_update_async", busy)
+    # Diğer test modüllerinin override'ı test sonunda geri yüklenir
+    monkeypatch.setitem(app.dependency_overrides, get_db, lambda: db)
+    response = TestClient(app).post("/token", data={"username": "a@example.com", "password": "gizli"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(password_hashing.RETRY_AFTER_SECONDS)
+
+
+def test_create_user_awaits_async_hash(db, monkeypatch):
+
+    async def fake_hash(password):
+        return f"hash:{password}"
+
+    async def busy(password):
+        raise password_hashing.PasswordHashingBusy("dolu")
+
+    # Senkron yol bir thread'i sonucu beklerken bloklar; endpoint onu kullanmamalı
+    monkeypatch.setattr(password_hashing, "hash_password", lambda *args: pytest.fail("senkron hash çağrıldı"))
+    monkeypatch.setattr(password_hashing, "hash_password_async", fake_hash)
+    monkeypatch.setitem(app.dependency_overrides, get_db, lambda: db)
+    client = TestClient(app)
+    created = client.post("/users/", json={"email": "yeni@example.com", "password": "gizli-sifre"})
+    stored = db.query(models.User).filter_by(email="yeni@example.com").one().hashed_password
+
+    monkeypatch.setattr(password_hashing, "hash_password_async", busy)
+    rejected = client.post("/users/", json={"email": "diger@example.com", "password": "gizli-sifre"})
+
+    assert created.status_code == 201
+    assert stored == "hash:gizli-sifre"
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == str(password_hashing.RETRY_AFTER_SECONDS)
@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+from itertools import product
+
+import numpy as np
+import pytest
+
+import models
+from services.portfolio_optimizer_service import PortfolioOptimizerService, _backtrack, optimise
+
+
+@pytest.fixture()
+def company(db):
+    company = models.Company(name="Örnek A.Ş.")
+    start = date.today() - timedelta(days=60)
+    rows = []
+    for name, kwh, gas in (("Fabrika", 500000, 40000), ("Depo", 60000, 0)):
+        facility = models.Facility(name=name, city="Bursa", company=company, surface_area_m2=2000)
+        rows.append(models.ActivityData(
+            facility=facility, activity_type=models.ActivityType.electricity, quantity=kwh, unit="kWh",
+            scope=models.ScopeType.scope_2, start_date=start, end_date=start + timedelta(days=29),
+            calculated_co2e_kg=kwh * 0.42, is_simulation=False,
+        ))
+        if gas:
+            rows.append(models.ActivityData(
+                facility=facility, activity_type=models.ActivityType.natural_gas, quantity=gas, unit="m3",
+                scope=models.ScopeType.scope_1, start_date=start, end_date=start + timedelta(days=29),
+                calculated_co2e_kg=gas * 2.03, is_simulation=False,
+            ))
+    db.add_all([company, *rows])
+    db.commit()
+    return company
+
+
+def test_dp_matches_brute_force():
+    rng = np.random.default_rng(7)
+    investment = np.concatenate([np.zeros((3, 1)), rng.uniform(1000, 9000, (3, 3))], axis=1)
+    reduction = np.concatenate([np.zeros((3, 1)), rng.uniform(1, 20, (3, 3))], axis=1)
+    options = {"investment": investment, "reduction": reduction}
+    budget = 12000.0
+
+    solution = optimise(options, budget, resolution=2000)
+    picked = _backtrack(solution, int(np.argmax(solution["dp"])))
+
+    best = max(
+        reduction[range(3), combo].sum()
+        for combo in product(range(4), repeat=3)
+        if investment[range(3), combo].sum() <= budget
+    )
+    assert investment[range(3), picked].sum() <= budget
+    # Bütçe adımına yukarı yuvarlama en fazla birkaç adımlık bütçe kaybettirir
+    assert reduction[range(3), picked].sum() == pytest.approx(best, rel=0.05)
+
+
+def test_front_is_increasing_and_budget_is_respected(db, company):
+    result = PortfolioOptimizerService(db).optimise_company(company.id, budget_tl=300000)
+    front = result["pareto_front"]
+
+    assert [p["investment_tl"] for p in front] == sorted(p["investment_tl"] for p in front)
+    reductions = [p["annual_reduction_tco2e"] for p in front]
+    assert reductions == sorted(reductions)
+    assert result["recommended"]["investment_tl"] <= 300000
+    assert result["recommended"]["target_met"] is None
+
+
+def test_target_picks_cheapest_point_meeting_it(db, company):
+    service = PortfolioOptimizerService(db)
+    unlimited = service.optimise_company(company.id)
+    target = unlimited["recommended"]["annual_reduction_tco2e"] / 2
+
+    result = service.optimise_company(company.id, target_reduction_tco2e=target)
+
+    assert result["recommended"]["target_met"] is True
+    assert result["recommended"]["annual_reduction_tco2e"] >= target - 1e-3
+    assert result["recommended"]["investment_tl"] < unlimited["recommended"]["investment_tl"]
+    assert service.optimise_company(company.id, target_reduction_tco2e=1e9)["recommended"]["target_met"] is False
+
+
+def test_unknown_measure_and_missing_facilities(db, company):
+    service = PortfolioOptimizerService(db)
+    empty = models.Company(name="Boş A.Ş.")
+    db.add(empty)
+    db.commit()
+
+    with pytest.raises(ValueError):
+        service.optimise_company(company.id, measure_types=["wind_turbine"])
+    with pytest.raises(ValueError):
+        service.optimise_company(empty.id)
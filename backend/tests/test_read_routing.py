@@ -0,0 +1,143 @@
+import asyncio
+import threading
+
+import pytest
+import redis
+
+import auth
+import database
+import models
+from services import read_routing
+
+
+@pytest.fixture(autouse=True)
+def redis_client(monkeypatch, fake_redis):
+    monkeypatch.setattr(read_routing, "_redis_client", fake_redis)
+    return fake_redis
+
+
+@pytest.fixture()
+def user(db):
+    user = models.User(email="a@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture()
+def sessions(monkeypatch, session_factory):
+    """Replika sağlıklı; hangi oturum fabrikasının seçildiğini kaydeder"""
+    opened = []
+    monkeypatch.setattr(database, "replica_is_fresh", lambda: True)
+    monkeypatch.setattr(database, "ReadSessionLocal", lambda: opened.append("replica") or session_factory())
+    monkeypatch.setattr(database, "PrimaryReadSessionLocal", lambda: opened.append("primary") or session_factory())
+    return opened
+
+
+def _open_read_db(user):
+    dependency = auth.get_user_read_db(current_user=user)
+    next(dependency)
+    dependency.close()
+
+
+def test_own_write_routes_reads_to_primary(db, user, sessions):
+    _open_read_db(user)
+
+    read_routing.bind_user(db, user.id)
+    db.add(models.Company(name="Örnek A.Ş.", owner_id=user.id))
+    db.commit()
+    _open_read_db(user)
+
+    assert sessions == ["replica", "primary"]
+
+
+def test_other_users_write_does_not_affect_routing(db, user, sessions):
+    other = models.User(email="b@example.com", hashed_password="x")
+    db.add(other)
+    db.commit()
+
+    read_routing.bind_user(db, other.id)
+    db.add(models.Company(name="Başka A.Ş.", owner_id=other.id))
+    db.commit()
+    _open_read_db(user)
+
+    assert sessions == ["replica"]
+    assert read_routing.wrote_recently(other.id)
+
+
+def test_report_task_reads_own_write_from_primary(db, user, sessions):
+    from celery_config import DBTask
+
+    read_routing.bind_user(db, user.id)
+    db.add(models.Company(name="Örnek A.Ş.", owner_id=user.id))
+    db.commit()
+
+    for user_id in (user.id, None):
+        task = DBTask()
+        task.read_db_for(user_id)
+        # Açılan oturum görev boyunca yeniden kullanılır
+        task.read_db_for(user_id)
+        task.after_return(None, None, None, (), {}, None)
+
+    assert sessions == ["primary", "replica"]
+
+
+def test_unbound_or_rolled_back_writes_are_not_marked(db, user):
+    db.add(models.Company(name="Görev A.Ş."))
+    db.commit()
+    assert not read_routing.wrote_recently(user.id)
+
+    read_routing.bind_user(db, user.id)
+    db.add(models.Company(name="Geri Alınan A.Ş."))
+    db.flush()
+    db.rollback()
+    db.commit()
+    assert not read_routing.wrote_recently(user.id)
+
+
+def test_mark_expires_with_ttl(user, redis_client):
+    read_routing.mark_write(user.id)
+
+    ttl = redis_client.ttl(read_routing.LAST_WRITE_KEY.format(user_id=user.id))
+    assert 0 < ttl <= read_routing.READ_AFTER_WRITE_SECONDS
+
+
+def test_redis_failure_prefers_primary(user, monkeypatch):
+    class BrokenRedis:
+        def exists(self, key):
+            raise redis.ConnectionError("bağlantı yok")
+
+    monkeypatch.setattr(read_routing, "_redis_client", BrokenRedis())
+    assert read_routing.wrote_recently(user.id)
+
+    monkeypatch.setattr(read_routing, "READ_AFTER_WRITE_SECONDS", 0)
+    assert not read_routing.wrote_recently(user.id)
+
+
+def test_async_read_db_checks_redis_off_the_event_loop(user, monkeypatch):
+    redis_threads, chosen = [], []
+    monkeypatch.setattr(read_routing, "wrote_recently", lambda user_id: redis_threads.append(threading.get_ident()) or True)
+
+    class ReadSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            return False
+
+    async def async_read_session(prefer_primary=False):
+        chosen.append(prefer_primary)
+        return ReadSession()
+
+    monkeypatch.setattr(auth, "async_read_session", async_read_session)
+
+    async def open_read_db():
+        dependency = auth.get_user_read_db_async(current_user=user)
+        await dependency.__anext__()
+        await dependency.aclose()
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(open_read_db())
+
+    assert chosen == [True]
+    assert redis_threads and loop_thread not in redis_threads
@@ -0,0 +1,84 @@
+from dataclasses import FrozenInstanceError
+from datetime import date
+
+import pytest
+
+import models
+from services import reference_data, suggestion_store
+
+
+@pytest.fixture()
+def redis_client(monkeypatch, fake_redis, session_factory):
+    monkeypatch.setattr(reference_data, "LISTENER_ENABLED", False)
+    monkeypatch.setattr(reference_data, "_redis_client", fake_redis)
+    monkeypatch.setattr(reference_data, "SessionLocal", session_factory)
+    monkeypatch.setattr(reference_data, "_snapshot", None)
+    monkeypatch.setattr(reference_data, "_local_stale", False)
+    # Parametre değişikliği öneri yenilemesi de tetikler; broker'a gitmesin
+    monkeypatch.setattr(suggestion_store, "schedule_refresh", lambda *args, **kwargs: None)
+    return fake_redis
+
+
+@pytest.fixture()
+def db(db, redis_client):
+    db.add_all([
+        models.SuggestionParameter(key="ges_max_roi_years", value=10),
+        models.EmissionFactor(key="electricity", value=0.45, unit="kg/kWh", valid_from=date(2024, 1, 1)),
+    ])
+    db.commit()
+    return db
+
+
+def test_snapshot_is_loaded_once(db, monkeypatch):
+    first = reference_data.get_reference_snapshot(db)
+
+    monkeypatch.setattr(reference_data, "load_snapshot", lambda *args: pytest.fail("yeniden yüklenmemeli"))
+
+    assert reference_data.get_reference_snapshot(db) is first
+    assert first.suggestion_parameters["ges_max_roi_years"] == 10
+    assert first.emission_factors_as_of(date(2025, 1, 1))["electricity"].value == 0.45
+
+
+def test_local_commit_bumps_version_and_reloads(db, redis_client):
+    first = reference_data.get_reference_snapshot(db)
+
+    db.get(models.SuggestionParameter, "ges_max_roi_years").value = 8
+    db.commit()
+    second = reference_data.get_reference_snapshot(db)
+
+    assert int(redis_client.get(reference_data.VERSION_KEY)) == first.version + 1
+    assert second.version == first.version + 1
+    assert second.suggestion_parameters["ges_max_roi_years"] == 8
+
+
+def test_other_process_change_is_picked_up_by_version(db, redis_client):
+    first = reference_data.get_reference_snapshot(db)
+    reference_data.refresh_if_outdated(first.version)
+    assert reference_data.get_reference_snapshot(db) is first
+
+    # Başka bir süreç değiştirdi: yalnızca versiyon ilerler
+    redis_client.set(reference_data.VERSION_KEY, first.version + 5)
+    reference_data.refresh_if_outdated()
+
+    assert reference_data.get_reference_snapshot(db).version == first.version + 5
+
+
+def test_rollback_does_not_announce(db, redis_client):
+    version = reference_data.get_reference_snapshot(db).version
+
+    db.add(models.SuggestionParameter(key="yeni", value=1))
+    db.flush()
+    db.rollback()
+    db.commit()
+
+    assert int(redis_client.get(reference_data.VERSION_KEY)) == version
+    assert reference_data.get_reference_snapshot(db).version == version
+
+
+def test_snapshot_is_immutable(db):
+    snapshot = reference_data.get_reference_snapshot(db)
+
+    with pytest.raises(TypeError):
+        snapshot.suggestion_parameters["ges_max_roi_years"] = 1
+    with pytest.raises(FrozenInstanceError):
+        snapshot.emission_factors[0].value = 1.0
@@ -0,0 +1,132 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import crud
+import models
+
+
+@pytest.fixture()
+def company(db):
+    owner = models.User(email="owner@example.com", hashed_password="x")
+    company = models.Company(name="Örnek A.Ş.", tax_number="1234567890", owner=owner)
+    company.facilities.append(models.Facility(name="Fabrika", city="Bursa"))
+    db.add(company)
+    db.commit()
+    return company
+
+
+def test_data_version_changes_when_rendered_company_fields_change(db, company):
+    before = crud.get_company_data_version(db, company.id)
+
+    company.name = "Yeni Unvan A.Ş."
+    db.commit()
+    renamed = crud.get_company_data_version(db, company.id)
+
+    company.tax_number = "9876543210"
+    db.commit()
+
+    assert renamed != before
+    assert crud.get_company_data_version(db, company.id) != renamed
+
+
+def test_data_version_changes_when_facility_name_or_city_changes(db, company):
+    before = crud.get_company_data_version(db, company.id)
+
+    company.facilities[0].city = "Kocaeli"
+    db.commit()
+    moved = crud.get_company_data_version(db, company.id)
+
+    company.facilities[0].name = "Ana Fabrika"
+    db.commit()
+
+    assert moved != before
+    assert crud.get_company_data_version(db, company.id) != moved
+
+
+def test_data_version_is_stable_without_changes(db, company):
+    assert crud.get_company_data_version(db, company.id) == crud.get_company_data_version(db, company.id)
+
+
+def _electricity(facility, start, quantity):
+    return models.ActivityData(
+        facility=facility, activity_type=models.ActivityType.electricity, quantity=quantity, unit="kWh",
+        scope=models.ScopeType.scope_2, start_date=start, end_date=start + timedelta(days=27),
+        calculated_co2e_kg=quantity * 0.4, is_simulation=False,
+    )
+
+
+def test_data_version_changes_when_row_moves_between_periods(db, company):
+    facility = company.facilities[0]
+    q1, q2 = _electricity(facility, date(2025, 2, 1), 1000), _electricity(facility, date(2025, 5, 1), 1000)
+    db.add_all([q1, q2])
+    db.commit()
+    before = crud.get_company_data_version(db, company.id)
+
+    # Toplamlar, satır sayısı ve tarih aralığı aynı kalır
+    q1.start_date, q1.end_date = date(2025, 4, 1), date(2025, 4, 28)
+    db.commit()
+    moved = crud.get_company_data_version(db, company.id)
+
+    q1.quantity, q2.quantity = 1500, 500
+    db.commit()
+
+    assert moved != before
+    assert crud.get_company_data_version(db, company.id) != moved
+
+
+def test_rolled_back_change_keeps_data_version(db, company):
+    before = crud.get_company_data_version(db, company.id)
+
+    db.add(_electricity(company.facilities[0], date(2025, 2, 1), 1000))
+    db.flush()
+    db.rollback()
+
+    assert crud.get_company_data_version(db, company.id) == before
+    assert crud.get_company_data_versions(db, [company.id, 999]) == {company.id: before}
+
+
+def _report(db, company, status, requested_at=None):
+    report = models.Report(
+        company_id=company.id,
+        user_id=company.owner_id,
+        report_type=models.ReportType.cbam_xml,
+        start_date=date(2025, 1, 1),
+        end_date=date(2025, 3, 31),
+        fingerprint="f" * 64,
+        status=status,
+        requested_at=requested_at or datetime.utcnow(),
+    )
+    db.add(report)
+    db.commit()
+    return report
+
+
+def test_inflight_report_is_found_for_pending_and_processing(db, company):
+    pending = _report(db, company, models.ReportStatus.pending)
+
+    assert crud.find_inflight_report(db, "f" * 64, company.owner_id).id == pending.id
+
+    pending.status = models.ReportStatus.processing
+    db.commit()
+
+    assert crud.find_inflight_report(db, "f" * 64, company.owner_id).id == pending.id
+
+
+def test_inflight_report_ignores_finished_stale_and_other_users(db, company):
+    _report(db, company, models.ReportStatus.failed)
+    _report(db, company, models.ReportStatus.pending, datetime.utcnow() - crud.REPORT_INFLIGHT_WINDOW - timedelta(minutes=1))
+
+    assert crud.find_inflight_report(db, "f" * 64, company.owner_id) is None
+
+    _report(db, company, models.ReportStatus.pending)
+
+    assert crud.find_inflight_report(db, "f" * 64, company.owner_id + 1) is None
+
+
+def test_roi_snapshot_uses_the_same_data_version(db, company):
+    from services.roi_calculator_service import ROICalculatorService
+
+    snapshot = ROICalculatorService(db).load_snapshot(company.id, 12)
+
+    assert snapshot.data_version == crud.get_company_data_version(db, company.id)
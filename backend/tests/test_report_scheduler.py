@@ -0,0 +1,89 @@
+import fakeredis
+import pytest
+from celery import states
+
+from services import report_scheduler
+from services.report_scheduler import LANE_BULK, LANE_INTERACTIVE, ReportScheduler
+
+
+class RecordingCeleryApp:
+    """Gönderilen görevleri kaydeder (broker yerine)"""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_task(self, name, args, task_id, queue):
+        self.sent.append((args[0], queue))
+
+
+@pytest.fixture()
+def scheduler(monkeypatch):
+    monkeypatch.setattr(report_scheduler, "COMPANY_CONCURRENCY", 2)
+    scheduler = ReportScheduler(fakeredis.FakeRedis(), RecordingCeleryApp())
+    monkeypatch.setattr(report_scheduler, "_report_scheduler", scheduler)
+    return scheduler
+
+
+def _sent_ids(scheduler):
+    return [report_id for report_id, _ in scheduler.celery_app.sent]
+
+
+def test_company_concurrency_cap_and_round_robin(scheduler):
+    for report_id in (1, 2, 3, 4):
+        scheduler.enqueue(report_id, company_id=10, report_type="cbam_xml")
+    scheduler.enqueue(5, company_id=20, report_type="cbam_xml")
+
+    # Şirket 10 en fazla 2 iş çalıştırır; şirket 20 onun arkasında beklemez
+    assert sorted(_sent_ids(scheduler)) == [1, 2, 5]
+    assert scheduler.queue_position(3, 10) == 1
+    assert scheduler.queue_position(4, 10) == 2
+
+
+def test_release_frees_slot_for_next_job(scheduler):
+    for report_id in (1, 2, 3):
+        scheduler.enqueue(report_id, company_id=10, report_type="roi_analysis")
+    assert _sent_ids(scheduler) == [1, 2]
+
+    scheduler.release(1)
+    scheduler.dispatch()
+
+    assert _sent_ids(scheduler) == [1, 2, 3]
+    assert scheduler.queue_position(3, 10) is None
+
+
+def test_release_of_unknown_report_is_noop(scheduler):
+    scheduler.release(999)
+    assert scheduler.redis.hlen(report_scheduler.DURATIONS_KEY) == 0
+
+
+def test_interactive_lane_is_dispatched_before_bulk(scheduler, monkeypatch):
+    monkeypatch.setattr(report_scheduler, "COMPANY_CONCURRENCY", 1)
+    # Başka bir dağıtıcı çalışıyormuş gibi: işler önce yalnızca kuyruğa girer
+    scheduler.redis.set(report_scheduler.DISPATCH_LOCK_KEY, "other")
+    scheduler.enqueue(1, company_id=10, report_type="cbam_xml", lane=LANE_BULK)
+    scheduler.enqueue(2, company_id=10, report_type="cbam_xml", lane=LANE_INTERACTIVE)
+    assert scheduler.celery_app.sent == []
+
+    scheduler.redis.delete(report_scheduler.DISPATCH_LOCK_KEY)
+    scheduler.dispatch()
+
+    assert scheduler.celery_app.sent == [(2, report_scheduler.LANE_QUEUES[LANE_INTERACTIVE])]
+
+
+def test_leased_task_keeps_token_while_retrying(scheduler):
+    from tasks.reporting_tasks import generate_cbam_report_async
+
+    for report_id in (1, 2, 3):
+        scheduler.enqueue(report_id, company_id=10, report_type="cbam_xml")
+
+    generate_cbam_report_async.after_return(states.RETRY, None, "t1", (1,), {}, None)
+    assert _sent_ids(scheduler) == [1, 2]
+    assert scheduler.redis.hget(report_scheduler.DURATIONS_KEY, "cbam_xml") is None
+
+    generate_cbam_report_async.after_return(states.FAILURE, None, "t1", (1,), {}, None)
+    assert _sent_ids(scheduler) == [1, 2, 3]
+    # Başarısız iş süre tahminine girmez
+    assert scheduler.redis.hget(report_scheduler.DURATIONS_KEY, "cbam_xml") is None
+
+    generate_cbam_report_async.after_return(states.SUCCESS, None, "t2", (2,), {}, None)
+    assert scheduler.redis.hget(report_scheduler.DURATIONS_KEY, "cbam_xml") is not None
@@ -0,0 +1,95 @@
+import gzip
+import zipfile
+
+import pytest
+
+from services import report_storage
+from services.report_storage import RangeNotSatisfiable, parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("items=0-10", None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-", (10, 99)),
+    ("bytes=90-500", (90, 99)),  # Son bayt dosya sonuna kırpılır
+    ("bytes=-10", (90, 99)),
+    ("bytes=-500", (0, 99)),  # Dosyadan uzun son ek: tüm dosya
+    ("bytes=0-0", (0, 0)),
+    ("bytes=0-10,20-30", None),  # Çoklu aralık: tam içerik
+    ("bytes=abc", None),
+    ("bytes=a-b", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=100-", 100),
+    ("bytes=150-200", 100),
+    ("bytes=50-10", 100),
+    ("bytes=-0", 100),
+    ("bytes=0-", 0),
+    ("bytes=-10", 0),
+])
+def test_parse_range_not_satisfiable(header, size):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, size)
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("identity", False),
+    ("gzip", True),
+    ("br, gzip;q=0.5", True),
+    ("gzip;q=0", False),
+    ("*", True),
+    ("gzip;q=abc", False),
+])
+def test_accepts_gzip(header, expected):
+    assert report_storage.accepts_gzip(header) is expected
+
+
+@pytest.fixture()
+def report_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_storage, "REPORT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_text_artifacts_are_written_as_utf8(report_dir):
+    path = report_storage.new_artifact_path("roi", 1, ".json", "abc")
+    with report_storage.open_artifact(path, "wt") as f:
+        f.write('{"tesis": "Şişli Üretim"}')
+
+    with gzip.open(path, "rb") as f:
+        assert f.read() == '{"tesis": "Şişli Üretim"}'.encode("utf-8")
+    assert report_storage.media_type_for(path) == "application/json"
+
+
+def test_decompressed_range_matches_original_bytes(report_dir):
+    payload = bytes(range(256)) * 1000
+    path = report_storage.new_artifact_path("cbam", 1, ".xml", "abc")
+    with report_storage.open_artifact(path) as f:
+        f.write(payload)
+
+    assert report_storage.uncompressed_size(path) == len(payload)
+    start, end = parse_range("bytes=70000-200000", len(payload))
+    assert b"".join(report_storage.iter_decompressed(path, start, end)) == payload[70000:200001]
+
+
+def test_bundle_contains_decompressed_parts(report_dir):
+    xml_part = report_storage.new_artifact_path("cbam", 1, ".xml", "part")
+    with report_storage.open_artifact(xml_part) as f:
+        f.write(b"<CBAMReport/>")
+    json_part = report_storage.new_artifact_path("roi", 1, ".json", "part", compressed=False)
+    with report_storage.open_artifact(json_part, "wt") as f:
+        f.write('{"şirket": "Örnek"}')
+
+    bundle = report_storage.new_artifact_path("combined", 1, ".zip", "bundle", compressed=False)
+    report_storage.write_bundle(bundle, {"cbam.xml": xml_part, "roi.json": json_part})
+
+    with zipfile.ZipFile(bundle) as zf:
+        assert zf.read("cbam.xml") == b"<CBAMReport/>"
+        assert zf.read("roi.json").decode("utf-8") == '{"şirket": "Örnek"}'
+    assert report_storage.media_type_for(bundle) == "application/zip"
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from services import roi_monte_carlo_service as mc
+
+MEASURES = [("lighting_upgrade", 50_000.0, 100_000.0), ("solar_panel", 80_000.0, 400_000.0)]
+
+
+def test_same_seed_gives_same_scenarios():
+    first = mc.simulate_measures(MEASURES, scenarios=2_000, seed=7, processes=1)
+    second = mc.simulate_measures(MEASURES, scenarios=2_000, seed=7, processes=1)
+
+    np.testing.assert_array_equal(first["__portfolio__"][0], second["__portfolio__"][0])
+
+
+def test_portfolio_is_sum_of_measures():
+    results = mc.simulate_measures(MEASURES, scenarios=2_000, seed=1, processes=1)
+
+    np.testing.assert_allclose(
+        results["__portfolio__"][0], results["lighting_upgrade"][0] + results["solar_panel"][0]
+    )
+
+
+def test_wide_rate_distributions_are_clipped_above_minus_one():
+    distributions = mc.resolve_distributions({
+        "price_growth": {"dist": "normal", "mean": 0.0, "std": 2.0},
+        "discount_rate": {"dist": "normal", "mean": 0.0, "std": 2.0},
+        "investment_factor": {"dist": "normal", "mean": 1.0, "std": 5.0},
+    })
+    rng = np.random.default_rng(0)
+
+    assert mc._sample(rng, distributions, "discount_rate", 10_000).min() >= mc.MIN_RATE
+    assert mc._sample(rng, distributions, "price_growth", 10_000).min() >= mc.MIN_RATE
+    assert mc._sample(rng, distributions, "investment_factor", 10_000).min() >= 0
+
+    npv, payback = mc.simulate_measures(MEASURES, scenarios=5_000, distributions=distributions, seed=3, processes=1)["__portfolio__"]
+    assert np.isfinite(npv).all()
+    assert np.isfinite(payback).all()
+
+
+@pytest.mark.parametrize("overrides", [
+    {"unknown": {"dist": "normal", "mean": 0, "std": 1}},
+    {"price_growth": {"dist": "normal", "mean": 0.1}},
+    {"improvement_factor": {"dist": "triangular", "low": 1.0, "mode": 0.5, "high": 2.0}},
+    {"discount_rate": {"dist": "uniform", "low": 0.2, "high": 0.1}},
+])
+def test_invalid_distributions_are_rejected(overrides):
+    with pytest.raises(ValueError):
+        mc.resolve_distributions(overrides)
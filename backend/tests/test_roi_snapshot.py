@@ -0,0 +1,97 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+import models
+from services.roi_calculator_service import ROICalculatorService
+
+
+@pytest.fixture()
+def facility(db):
+    company = models.Company(name="Örnek A.Ş.")
+    facility = models.Facility(name="Fabrika", city="Bursa", company=company)
+    db.add_all([company, facility, _electricity(facility, 1000)])
+    db.commit()
+    return facility
+
+
+def _electricity(facility, kwh):
+    start = date.today() - timedelta(days=60)
+    return models.ActivityData(
+        facility=facility, activity_type=models.ActivityType.electricity, quantity=kwh, unit="kWh",
+        scope=models.ScopeType.scope_2, start_date=start, end_date=start + timedelta(days=29),
+        calculated_co2e_kg=kwh * 0.4, is_simulation=False,
+    )
+
+
+def test_snapshot_is_reused_while_data_is_unchanged(db, facility):
+    service = ROICalculatorService(db)
+
+    first = service.load_snapshot(facility.company_id)
+
+    assert service.load_snapshot(facility.company_id) is first
+    assert first.electricity_kwh == 1000
+    assert first.period_end == date.today()
+
+
+def test_snapshot_reflects_edits_immediately(db, facility):
+    service = ROICalculatorService(db)
+    first = service.load_snapshot(facility.company_id)
+
+    db.add(_electricity(facility, 500))
+    db.commit()
+    grown = service.load_snapshot(facility.company_id)
+
+    facility.name = "Ana Fabrika"
+    db.commit()
+    renamed = service.load_snapshot(facility.company_id)
+
+    assert grown.electricity_kwh == 1500
+    assert grown.data_version != first.data_version
+    assert renamed.facilities[0].name == "Ana Fabrika"
+
+
+def test_cache_hit_is_validated_with_one_query(db, facility):
+    service = ROICalculatorService(db)
+    first = service.load_snapshot(facility.company_id)
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.get_bind(), "before_cursor_execute", record)
+    try:
+        assert service.load_snapshot(facility.company_id) is first
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", record)
+
+    assert len(statements) == 1
+
+
+def test_row_moved_out_of_period_reloads(db, facility):
+    service = ROICalculatorService(db)
+    first = service.load_snapshot(facility.company_id)
+
+    # Satır sayısı ve miktar toplamı aynı kalır, yalnızca dönem değişir
+    row = facility.activity_data[0]
+    row.start_date, row.end_date = date.today() - timedelta(days=500), date.today() - timedelta(days=472)
+    db.commit()
+    moved = service.load_snapshot(facility.company_id)
+
+    assert moved is not first
+    assert moved.electricity_kwh == 0
+
+
+def test_stale_period_window_is_reloaded(db, facility, monkeypatch):
+    service = ROICalculatorService(db)
+    first = service.load_snapshot(facility.company_id)
+
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date.fromordinal(date.today().toordinal() + 1)
+
+    monkeypatch.setattr("services.roi_calculator_service.date", Tomorrow)
+
+    assert service.load_snapshot(facility.company_id) is not first
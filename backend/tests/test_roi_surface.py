@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+
+import fakeredis
+import numpy as np
+import pytest
+
+import models
+from services import roi_surface_service
+from services.roi_calculator_service import ROICalculatorService
+from services.roi_surface_service import SLIDER_RANGES, ROISurfaceService, decode_array, slider_axis
+
+
+@pytest.fixture()
+def company(db):
+    company = models.Company(name="Örnek A.Ş.")
+    facility = models.Facility(name="Fabrika", city="İzmir", company=company, surface_area_m2=3000)
+    start = date.today() - timedelta(days=60)
+    db.add_all([company, facility, models.ActivityData(
+        facility=facility, activity_type=models.ActivityType.electricity, quantity=50000, unit="kWh",
+        scope=models.ScopeType.scope_2, start_date=start, end_date=start + timedelta(days=29),
+        calculated_co2e_kg=20000, is_simulation=False,
+    )])
+    db.commit()
+    return company
+
+
+@pytest.mark.parametrize("name", list(SLIDER_RANGES))
+def test_slider_axis_includes_both_ends(name):
+    spec = SLIDER_RANGES[name]
+    axis = slider_axis(name)
+
+    assert axis[0] == pytest.approx(spec["min"])
+    assert axis[-1] == pytest.approx(spec["max"])
+    assert np.allclose(np.diff(axis), spec["step"])
+
+
+def test_surface_shapes_and_monotonic_metrics(db, company):
+    surface = ROISurfaceService(fakeredis.FakeRedis()).get_surface(db, company.id)
+    npv = decode_array(surface["metrics"]["npv_tl"])
+    payback = decode_array(surface["metrics"]["payback_months"])
+    shape = [len(surface["axes"][name]) for name in SLIDER_RANGES]
+
+    assert list(npv.shape) == shape
+    assert list(payback.shape) == shape
+    assert list(decode_array(surface["metrics"]["annual_savings_tl"]).shape) == [shape[0], shape[2]]
+    # Daha hızlı fiyat artışı: NPV artar, geri ödeme kısalır
+    assert np.all(np.diff(npv, axis=1) > 0)
+    assert np.all(np.diff(payback, axis=1) <= 1e-3)
+
+
+def test_surface_is_cached_per_data_version(db, company, monkeypatch):
+    service = ROISurfaceService(fakeredis.FakeRedis())
+    calls = []
+    compute = roi_surface_service.compute_surface
+    monkeypatch.setattr(roi_surface_service, "compute_surface", lambda snapshot: calls.append(1) or compute(snapshot))
+
+    first = service.get_surface(db, company.id)
+    assert service.get_surface(db, company.id) == first
+    assert len(calls) == 1
+
+    db.add(models.CompanyFinancials(company_id=company.id, avg_electricity_cost_kwh=6.0))
+    db.commit()
+    updated = service.get_surface(db, company.id)
+
+    assert len(calls) == 2
+    assert updated["data_version"] != first["data_version"]
+
+
+def test_cache_key_follows_roi_generator_version(monkeypatch):
+    before = ROISurfaceService.cache_key(1, "r1")
+    monkeypatch.setattr(ROICalculatorService, "GENERATOR_VERSION", "test")
+
+    assert ROISurfaceService.cache_key(1, "r1") != before
@@ -0,0 +1,135 @@
+from dataclasses import replace
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from dateutil.relativedelta import relativedelta
+
+import models
+from services import macc_service, portfolio_optimizer_service, pv_simulation_service, roi_surface_service
+from services.roi_calculator_service import ROICalculatorService
+
+
+def _electricity(facility, start, kwh):
+    return models.ActivityData(
+        facility=facility, activity_type=models.ActivityType.electricity, quantity=kwh, unit="kWh",
+        scope=models.ScopeType.scope_2, start_date=start, end_date=start + timedelta(days=27),
+        calculated_co2e_kg=kwh * 0.4, is_simulation=False,
+    )
+
+
+@pytest.fixture()
+def snapshot(db):
+    company = models.Company(name="Örnek A.Ş.")
+    factory = models.Facility(
+        name="Fabrika", city="Konya", company=company, surface_area_m2=5000,
+        facility_type=models.FacilityType.production,
+    )
+    office = models.Facility(
+        name="Ofis", city="Ankara", company=company, surface_area_m2=800,
+        facility_type=models.FacilityType.office,
+    )
+    # Yazın iki kat tüketen fabrika, düz tüketen ofis (son 11 ay)
+    first = date.today().replace(day=1)
+    rows = []
+    for back in range(1, 12):
+        month_start = first - relativedelta(months=back)
+        rows.append(_electricity(factory, month_start, 40000 if month_start.month in (6, 7, 8) else 20000))
+        rows.append(_electricity(office, month_start, 3000))
+    db.add_all([company, factory, office, *rows])
+    db.commit()
+    return ROICalculatorService(db).load_snapshot(company.id)
+
+
+def test_monthly_from_profile_keeps_annual_total():
+    profile = [1.0] * 6 + [3.0] * 6
+
+    monthly = pv_simulation_service.monthly_from_profile(1200.0, profile)
+
+    assert sum(monthly) == pytest.approx(1200.0)
+    assert monthly[6] == pytest.approx(3 * monthly[0])
+    assert pv_simulation_service.monthly_from_profile(1200.0, [0.0] * 12) == [100.0] * 12
+
+
+def test_self_consumed_broadcasts_over_capacity_and_load():
+    unit = pv_simulation_service.simulate_pv("Konya", 1.0)
+    monthly = [20000.0] * 12
+    capacities = np.array([10.0, 100.0, 1000.0])
+
+    grid = pv_simulation_service.self_consumed_kwh(unit, monthly, capacity_scale=capacities)
+    full = pv_simulation_service.simulate_pv("Konya", 100.0)
+
+    assert grid[1] == pytest.approx(pv_simulation_service.match_consumption(full, monthly)["self_consumed_kwh"])
+    assert np.all(np.diff(grid) > 0)
+    assert np.all(grid <= capacities * unit.annual_kwh + 1e-6)
+    assert grid[-1] <= sum(monthly)
+    # Yük küçüldükçe öz tüketim azalır
+    reduced = pv_simulation_service.self_consumed_kwh(full, monthly, load_scale=np.array([1.0, 0.5]))
+    assert reduced[1] < reduced[0]
+
+
+def test_snapshot_carries_calendar_profile_and_type(snapshot):
+    factory = next(f for f in snapshot.facilities if f.name == "Fabrika")
+
+    monthly = factory.monthly_electricity_kwh
+
+    assert factory.load_profile == "production"
+    assert sum(monthly) == pytest.approx(factory.electricity_kwh)
+    assert max(monthly) == pytest.approx(2 * min(monthly))
+    assert snapshot.solar_city == "Konya"
+    assert sum(snapshot.monthly_electricity_kwh) == pytest.approx(snapshot.electricity_kwh)
+
+
+def test_solar_roi_uses_annualised_load(db, snapshot):
+    service = ROICalculatorService(db)
+    params = {"capacity_kwp": 300}
+
+    yearly = service._calculate_solar_roi(snapshot, params)
+    # Aynı yıllık tüketim, farklı dönem uzunluğu: öz tüketim değişmemeli
+    half_year = service._calculate_solar_roi(replace(snapshot, period_months=6), params)
+
+    assert half_year["self_consumption_kwh"] == pytest.approx(yearly["self_consumption_kwh"])
+    assert yearly["self_consumption_kwh"] <= snapshot.electricity_kwh
+    assert yearly["simulation_city"] == "konya"
+
+
+def test_surface_matches_solar_roi(db, snapshot):
+    surface = roi_surface_service.compute_surface(snapshot)
+    savings = roi_surface_service.decode_array(surface["metrics"]["annual_savings_tl"])
+    kwp = surface["axes"]["solar_kwp"]
+
+    service = ROICalculatorService(db)
+    low = service._calculate_solar_roi(snapshot, {"capacity_kwp": kwp[0]})
+    high = service._calculate_solar_roi(snapshot, {"capacity_kwp": kwp[-1]})
+
+    assert surface["surface_version"] == roi_surface_service.SURFACE_VERSION
+    assert savings[-1, 0] - savings[0, 0] == pytest.approx(
+        high["annual_savings_tl"] - low["annual_savings_tl"], rel=1e-4
+    )
+
+
+def test_macc_solar_uses_facility_city_and_load(snapshot):
+    matrix = macc_service.measure_matrix(snapshot, ["solar_panel"])
+    simulations = macc_service.solar_simulations(snapshot.facilities)
+    price = snapshot.electricity_cost_kwh
+
+    for index, (facility, simulation) in enumerate(zip(snapshot.facilities, simulations, strict=True)):
+        energy = pv_simulation_service.match_consumption(
+            simulation, facility.monthly_electricity_kwh, facility.load_profile
+        )
+        expected = (energy["self_consumed_kwh"] + energy["exported_kwh"] * ROICalculatorService.FEED_IN_RATIO) * price
+        assert simulation.city_key == pv_simulation_service.resolve_city(facility.city)
+        assert matrix["savings"][index, 0] == pytest.approx(expected)
+    assert simulations[0].specific_yield_kwh_per_kwp != simulations[1].specific_yield_kwh_per_kwp
+
+
+def test_portfolio_solar_self_consumption_shrinks_with_efficiency(snapshot):
+    measures = ["solar_panel", "process_optimization"]
+    options = portfolio_optimizer_service.facility_options(snapshot, measures)
+    savings = options["savings"]
+    masks = options["masks"].tolist()
+    solar, process, both = (masks.index(m) for m in ([True, False], [False, True], [True, True]))
+
+    # Süreç optimizasyonu yükü azaltınca GES'in öz tüketimi de azalır (etkileşim)
+    assert np.all(savings[:, both] <= savings[:, solar] + savings[:, process] + 1e-6)
+    assert np.any(savings[:, both] < savings[:, solar] + savings[:, process] - 1e-6)
@@ -0,0 +1,41 @@
+from datetime import date
+
+from sqlalchemy import create_engine, literal, select, text
+from sqlalchemy.dialects import postgresql
+
+from database import _build_engine, enable_sqlite_profile
+from db_functions import year_month
+
+
+def _pragma(connection, name):
+    return connection.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_profile_applies_to_every_connection(tmp_path):
+    engine = _build_engine(f"sqlite:///{tmp_path / 'karbon.db'}")
+
+    for _ in range(2):
+        with engine.connect() as connection:
+            assert _pragma(connection, "journal_mode") == "wal"
+            assert _pragma(connection, "synchronous") == 1  # NORMAL
+            assert _pragma(connection, "busy_timeout") == 5000
+            assert _pragma(connection, "temp_store") == 2  # MEMORY
+        engine.dispose()
+
+
+def test_custom_pragmas_override_defaults(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'karbon.db'}")
+    enable_sqlite_profile(engine, {"busy_timeout": 250})
+
+    with engine.connect() as connection:
+        assert _pragma(connection, "busy_timeout") == 250
+        assert _pragma(connection, "journal_mode") == "delete"
+    engine.dispose()
+
+
+def test_year_month_compiles_per_dialect():
+    expression = year_month(literal(date(2025, 3, 14)))
+
+    assert "to_char" in str(select(expression).compile(dialect=postgresql.dialect()))
+    with create_engine("sqlite://").connect() as connection:
+        assert connection.execute(select(expression)).scalar() == "2025-03"
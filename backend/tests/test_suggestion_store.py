@@ -0,0 +1,103 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import models
+from services import suggestion_store
+
+
+class RecordingCeleryApp:
+    """Gönderilen görevleri kaydeder (broker yerine)"""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_task(self, name, args=None, queue=None, countdown=None):
+        self.sent.append((name, args))
+
+
+@pytest.fixture(autouse=True)
+def celery_app(monkeypatch, fake_redis):
+    app = RecordingCeleryApp()
+    monkeypatch.setattr(suggestion_store, "celery_app", app)
+    monkeypatch.setattr(suggestion_store, "_redis_client", fake_redis)
+    return app
+
+
+@pytest.fixture()
+def facility(db, celery_app):
+    company = models.Company(name="Örnek A.Ş.")
+    facility = models.Facility(name="Fabrika", city="Bursa", company=company)
+    db.add_all([company, facility])
+    db.commit()
+    # Tesis eklemenin açtığı yenileme görevi çalışmış gibi
+    suggestion_store.clear_pending(company.id)
+    suggestion_store.refresh_company_suggestions(db, company.id)
+    celery_app.sent.clear()
+    return facility
+
+
+def _electricity(facility):
+    return models.ActivityData(
+        facility_id=facility.id, activity_type=models.ActivityType.electricity, quantity=1000, unit="kWh",
+        scope=models.ScopeType.scope_2, start_date=date(2025, 1, 1), end_date=date(2025, 1, 31),
+        calculated_co2e_kg=400, is_simulation=False,
+    )
+
+
+def _stored(db, company_id):
+    db.expire_all()
+    return db.get(models.CompanySuggestionSet, company_id)
+
+
+def test_data_change_marks_stale_and_coalesces_refreshes(db, facility, celery_app):
+    db.add(_electricity(facility))
+    db.commit()
+    db.add(_electricity(facility))
+    db.commit()
+
+    assert _stored(db, facility.company_id).stale_since is not None
+    # İki commit, tek bekleyen görev
+    assert celery_app.sent == [("tasks.refresh_company_suggestions", [facility.company_id])]
+
+    suggestion_store.clear_pending(facility.company_id)
+    suggestion_store.refresh_company_suggestions(db, facility.company_id)
+    assert _stored(db, facility.company_id).stale_since is None
+
+
+def test_rolled_back_change_schedules_nothing(db, facility, celery_app):
+    db.add(_electricity(facility))
+    db.flush()
+    db.rollback()
+    db.commit()
+
+    assert celery_app.sent == []
+    assert _stored(db, facility.company_id).stale_since is None
+
+
+def test_parameter_change_refreshes_all_companies(db, facility, celery_app):
+    db.add(models.SuggestionParameter(key="ges_max_roi_years", value=8))
+    db.commit()
+
+    assert celery_app.sent == [("tasks.refresh_all_suggestions", None)]
+    assert _stored(db, facility.company_id).stale_since is not None
+
+
+def test_overdue_result_is_recomputed_synchronously(db, facility):
+    stored = _stored(db, facility.company_id)
+    computed_at = stored.computed_at
+
+    stored.stale_since = datetime.utcnow() - timedelta(seconds=suggestion_store.STALE_MAX_SECONDS - 60)
+    db.commit()
+    suggestion_store.get_company_suggestions(db, facility.company_id)
+    assert _stored(db, facility.company_id).computed_at == computed_at
+
+    stored = _stored(db, facility.company_id)
+    stored.stale_since = datetime.utcnow() - timedelta(seconds=suggestion_store.STALE_MAX_SECONDS + 60)
+    db.commit()
+    suggestion_store.get_company_suggestions(db, facility.company_id)
+    assert _stored(db, facility.company_id).computed_at > computed_at
+
+
+def test_unknown_company_has_no_suggestions(db):
+    assert suggestion_store.get_company_suggestions(db, 999) == []